@@ -0,0 +1,734 @@
+# pragma version 0.4.0
+
+"""
+@license MIT
+@title MoveForwarder
+@author GuireWire
+@notice Relays EIP-712 signed zkTitans moves in batches, so many players' moves land in a single transaction,
+        plays the moves players queue for their next rounds, and settles battles played off-chain
+@dev zkTitans must list this contract as its trusted forwarder. Each relayed call appends the signing player's address to the calldata (ERC-2771).
+"""
+
+# ------------------------------------------------------------------
+#                         STATE VARIABLES
+# ------------------------------------------------------------------
+
+# EIP-712 type hashes
+DOMAIN_TYPEHASH: constant(bytes32) = keccak256("EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)")
+MOVE_TYPEHASH: public(constant(bytes32)) = keccak256("Move(address player,uint8 choice,string battleName,uint256 nonce,uint256 deadline)")
+CHANNEL_STATE_TYPEHASH: public(constant(bytes32)) = keccak256("ChannelState(uint256 battleId,uint256 round,uint8 move1,uint8 move2,uint256 health1,uint256 mana1,uint256 health2,uint256 mana2,uint256 attack1,uint256 attack2,uint8 winner)")
+EIP712_NAME: public(constant(String[50])) = "zkTitans MoveForwarder"
+EIP712_VERSION: public(constant(String[20])) = "1"
+
+# Upper half of the secp256k1 curve order, signatures with a larger `s` are malleable
+_MALLEABILITY_THRESHOLD: constant(uint256) = 57896044618658097711785492504343953926418782139537452191302581570759080747168
+
+# Batch limit and gas forwarded to zkTitans for each relayed move
+MAX_RELAY_BATCH: public(constant(uint256)) = 100
+MOVE_GAS_LIMIT: public(constant(uint256)) = 1_000_000
+
+# Longest move sequence a player can queue for a battle
+MAX_QUEUED_MOVES: public(constant(uint256)) = 32
+
+# Page limit of getPlayableBattles, each battle scanned costs a call to zkTitans
+MAX_PLAYABLE_PAGE: public(constant(uint256)) = 100
+
+# Number of battles moves were ever queued for, the length of queuedBattles
+queuedBattleCount: public(uint256)
+
+# Seconds the other player has to answer a channel dispute, as zkTitans MOVE_TIMEOUT
+CHANNEL_CHALLENGE_PERIOD: public(constant(uint256)) = 3600
+
+titans: public(immutable(address))
+_CACHED_CHAIN_ID: immutable(uint256)
+_CACHED_DOMAIN_SEPARATOR: immutable(bytes32)
+
+# ------------------------------------------------------------------
+#                            INTERFACES
+# ------------------------------------------------------------------
+
+# @dev zkTitans Battle struct, as returned by its battles getter; battleStatus is the BattleStatus flag
+struct Battle:
+    battleStatus: uint256
+    battleHash: bytes32
+    name: String[100]
+    players: address[2]
+    moves: uint8[2]
+    winner: address
+
+# @dev zkTitans Player struct, as returned by its getPlayer function
+struct Player:
+    playerAddress: address
+    playerName: String[100]
+    playerMana: uint256
+    playerHealth: uint256
+    inBattle: bool
+
+interface ZkTitans:
+    def battles(_index: uint256) -> Battle: view
+    def getPlayer(addr: address) -> Player: view
+    def channelOpen(_battleId: uint256) -> bool: view
+    def openChannel(_battleId: uint256): nonpayable
+    def closeChannel(_battleId: uint256, _health: uint256[2], _mana: uint256[2], _attack: uint256[2]): nonpayable
+
+# zkTitans BattleStatus.STARTED
+_STARTED: constant(uint256) = 2
+
+# zkTitans caps on a player's mana and a game token's attack strength
+_MAX_MANA: constant(uint256) = 25
+_MAX_ATTACK_DEFEND_STRENGTH: constant(uint256) = 10
+
+# ------------------------------------------------------------------
+#                             STRUCTS
+# ------------------------------------------------------------------
+
+# @dev SignedMove struct holding a player's move and its EIP-712 signature
+# @param player - Player Wallet Address that signed the move
+# @param choice - Move choice (1 for attack, 2 for defense)
+# @param battleName - Name of the battle the move is for
+# @param nonce - Player's current forwarder nonce, each nonce can be relayed once
+# @param deadline - Timestamp after which the move can no longer be relayed
+# @param v, r, s - Signature components
+struct SignedMove:
+    player: address
+    choice: uint8
+    battleName: String[100]
+    nonce: uint256
+    deadline: uint256
+    v: uint8
+    r: bytes32
+    s: bytes32
+
+# @dev ChannelState struct holding a round of a battle played off-chain, signed by both players
+# @param battleId - 1-based battle id, as stored in zkTitans battleInfo
+# @param round - Number of rounds played off-chain
+# @param move1, move2 - Players' moves in the last round (1 for attack, 2 for defense)
+# @param health1, mana1, health2, mana2 - Players' health and mana after the round
+# @param attack1, attack2 - Players' attack strength for the next round, defense is the rest of 10
+# @param winner - 1 or 2 if the round ended the battle, 0 otherwise
+struct ChannelState:
+    battleId: uint256
+    round: uint256
+    move1: uint8
+    move2: uint8
+    health1: uint256
+    mana1: uint256
+    health2: uint256
+    mana2: uint256
+    attack1: uint256
+    attack2: uint256
+    winner: uint8
+
+# @dev Signature struct holding the v, r, s components of an EIP-712 signature
+struct Signature:
+    v: uint8
+    r: bytes32
+    s: bytes32
+
+# @dev ChannelDispute struct for a battle whose off-chain play stalled
+# @param round - Round of the last state both players signed, kept once the dispute is answered
+#                so an older state cannot be disputed again
+# @param disputer - Player waiting for the other player, empty once the dispute is answered
+# @param deadline - Timestamp after which the disputer can claim the win
+# @param stateHash - EIP-712 digest of the disputed state, which an on-chain answer continues from
+struct ChannelDispute:
+    round: uint256
+    disputer: address
+    deadline: uint256
+    stateHash: bytes32
+
+# ------------------------------------------------------------------
+#                             MAPPINGS
+# ------------------------------------------------------------------
+
+# @dev Mapping of player addresses to the next nonce their signed move must use
+nonces: public(HashMap[address, uint256])
+
+# @dev Mapping of battle id and player address to the player's queued moves, two bits per move
+#      with the next move in the lowest bits; zero once the queue is empty
+moveQueues: public(HashMap[uint256, HashMap[address, uint256]])
+
+# @dev List of battle ids moves were queued for, in the order they were first queued, read from 0
+#      to queuedBattleCount so keepers can find queued moves that became due
+queuedBattles: public(HashMap[uint256, uint256])
+
+# @dev Mapping of battle id to whether it is listed in queuedBattles
+isQueuedBattle: public(HashMap[uint256, bool])
+
+# @dev Mapping of battle id to the open dispute of its off-chain channel, if any
+channelDisputes: public(HashMap[uint256, ChannelDispute])
+
+# @dev Mapping of battle id to whether its channel was closed, by a settlement or a dispute answered
+#      on-chain. A channel cannot be opened again, so states signed for it cannot be replayed.
+closedChannels: public(HashMap[uint256, bool])
+
+# ------------------------------------------------------------------
+#                              EVENTS
+# ------------------------------------------------------------------
+
+event MoveRelayed:
+    player: indexed(address)
+    nonce: uint256
+    success: bool
+
+event MovesQueued:
+    player: indexed(address)
+    battleId: indexed(uint256)
+    count: uint256
+
+event QueuedMovePlayed:
+    player: indexed(address)
+    battleId: indexed(uint256)
+    choice: uint8
+    success: bool
+
+event ChannelOpened:
+    battleId: indexed(uint256)
+
+event ChannelDisputed:
+    battleId: indexed(uint256)
+    disputer: indexed(address)
+    round: uint256
+    deadline: uint256
+
+event ChannelDisputeAnswered:
+    battleId: indexed(uint256)
+    player: indexed(address)
+    round: uint256
+
+event ChannelSettled:
+    battleId: indexed(uint256)
+    winner: indexed(address)
+    round: uint256
+
+# ------------------------------------------------------------------
+#                           CONSTRUCTOR
+# ------------------------------------------------------------------
+
+@deploy
+def __init__(_titans: address):
+    """
+    @dev Initialize forwarder for a zkTitans deployment
+    @param _titans Address of the zkTitans contract moves are relayed to
+    """
+    titans = _titans
+    _CACHED_CHAIN_ID = chain.id
+    _CACHED_DOMAIN_SEPARATOR = self._buildDomainSeparator()
+
+# ------------------------------------------------------------------
+#                     INTERNAL VIEW FUNCTIONS
+# ------------------------------------------------------------------
+
+@view
+@internal
+def _buildDomainSeparator() -> bytes32:
+    """
+    @dev Builds the EIP-712 domain separator for the current chain
+    @return Domain separator
+    """
+    return keccak256(
+        abi_encode(
+            DOMAIN_TYPEHASH,
+            keccak256(EIP712_NAME),
+            keccak256(EIP712_VERSION),
+            chain.id,
+            self
+        )
+    )
+
+@view
+@internal
+def _domainSeparator() -> bytes32:
+    """
+    @dev Returns the cached domain separator, rebuilt if the chain id changed since deployment
+    @return Domain separator
+    """
+    if chain.id == _CACHED_CHAIN_ID:
+        return _CACHED_DOMAIN_SEPARATOR
+    return self._buildDomainSeparator()
+
+@view
+@internal
+def _hashMove(_move: SignedMove) -> bytes32:
+    """
+    @dev Computes the EIP-712 digest a player signs for a move
+    @param _move Move to hash, the signature fields are ignored
+    @return Typed data digest
+    """
+    _struct_hash: bytes32 = keccak256(
+        abi_encode(
+            MOVE_TYPEHASH,
+            _move.player,
+            _move.choice,
+            keccak256(_move.battleName),
+            _move.nonce,
+            _move.deadline
+        )
+    )
+    return keccak256(concat(b"\x19\x01", self._domainSeparator(), _struct_hash))
+
+@view
+@internal
+def _recoverSigner(_digest: bytes32, _v: uint8, _r: bytes32, _s: bytes32) -> address:
+    """
+    @dev Recovers the signer of a digest, rejecting malleable signatures
+    @return Signer address, empty for invalid signatures
+    """
+    if convert(_s, uint256) > _MALLEABILITY_THRESHOLD:
+        return empty(address)
+    return ecrecover(_digest, _v, _r, _s)
+
+@view
+@internal
+def _isValidSignature(_move: SignedMove) -> bool:
+    """
+    @dev Checks that `_move` is signed by its player with a non-malleable signature
+    @param _move Signed move to verify
+    @return True if the signature is valid
+    """
+    _signer: address = self._recoverSigner(self._hashMove(_move), _move.v, _move.r, _move.s)
+    return _signer != empty(address) and _signer == _move.player
+
+@view
+@internal
+def _hashChannelState(_state: ChannelState) -> bytes32:
+    """
+    @dev Computes the EIP-712 digest both players sign for a channel state
+    @param _state Channel state to hash
+    @return Typed data digest
+    """
+    _struct_hash: bytes32 = keccak256(
+        abi_encode(
+            CHANNEL_STATE_TYPEHASH,
+            _state.battleId,
+            _state.round,
+            _state.move1,
+            _state.move2,
+            _state.health1,
+            _state.mana1,
+            _state.health2,
+            _state.mana2,
+            _state.attack1,
+            _state.attack2,
+            _state.winner
+        )
+    )
+    return keccak256(concat(b"\x19\x01", self._domainSeparator(), _struct_hash))
+
+@view
+@internal
+def _verifyChannelState(_state: ChannelState, _signatures: Signature[2]) -> Battle:
+    """
+    @dev Checks that a channel state is signed by both players of its started battle
+    @param _state Channel state to verify
+    @param _signatures Signatures of player 1 and player 2, in that order
+    @return The battle, as zkTitans stores it
+    """
+    _battle: Battle = staticcall ZkTitans(titans).battles(_state.battleId - 1)
+    assert _battle.battleStatus == _STARTED, "Battle not started"
+
+    _digest: bytes32 = self._hashChannelState(_state)
+    for _i: uint256 in range(2):
+        _signature: Signature = _signatures[_i]
+        _signer: address = self._recoverSigner(_digest, _signature.v, _signature.r, _signature.s)
+        assert _signer != empty(address) and _signer == _battle.players[_i], "Invalid signature"
+    return _battle
+
+@view
+@internal
+def _openDispute(_battleId: uint256) -> ChannelDispute:
+    """
+    @dev Returns the dispute of a battle, which must still be open to answers
+    @param _battleId 1-based battle id, as stored in zkTitans battleInfo
+    @return The open dispute
+    """
+    _dispute: ChannelDispute = self.channelDisputes[_battleId]
+    assert _dispute.disputer != empty(address), "No dispute"
+    assert block.timestamp <= _dispute.deadline, "Dispute expired"
+    return _dispute
+
+# ------------------------------------------------------------------
+#                        INTERNAL FUNCTIONS
+# ------------------------------------------------------------------
+
+@internal
+def _playQueuedMoves(_battleId: uint256) -> uint256:
+    """
+    @dev Plays the queued moves of a battle's players, round after round, until a player whose
+         move is due has nothing queued or the battle ends. Moves are relayed to
+         zkTitans.attackOrDefendChoiceById, which checks them as any other move, e.g. for mana;
+         a rejected move clears its player's queue.
+    @param _battleId 1-based battle id, as stored in zkTitans battleInfo
+    @return Number of moves zkTitans accepted
+    """
+    _played: uint256 = 0
+    for _round: uint256 in range(2 * MAX_QUEUED_MOVES):
+        _battle: Battle = staticcall ZkTitans(titans).battles(_battleId - 1)
+        if _battle.battleStatus != _STARTED:
+            break
+
+        _progressed: bool = False
+        for _i: uint256 in range(2):
+            _player: address = _battle.players[_i]
+            _queue: uint256 = self.moveQueues[_battleId][_player]
+            if _battle.moves[_i] != 0 or _queue == 0:
+                continue
+
+            _choice: uint8 = convert(_queue & 3, uint8)
+            _success: bool = raw_call(
+                titans,
+                concat(
+                    abi_encode(_choice, _battleId, method_id=method_id("attackOrDefendChoiceById(uint8,uint256)")),
+                    convert(_player, bytes20)
+                ),
+                gas=MOVE_GAS_LIMIT,
+                revert_on_failure=False
+            )
+            if _success:
+                self.moveQueues[_battleId][_player] = _queue >> 2
+                _played += 1
+                _progressed = True
+            else:
+                self.moveQueues[_battleId][_player] = 0
+
+            log QueuedMovePlayed(_player, _battleId, _choice, _success)
+
+        if not _progressed:
+            break
+
+    return _played
+
+@internal
+def _closeChannel(_state: ChannelState, _players: address[2]):
+    """
+    @dev Hands a battle back to zkTitans with the stats of a state both players signed, after
+         checking them against zkTitans: health can only have dropped off-chain, mana and attack
+         strength stay within their caps
+    @param _state Channel state the battle continues from
+    @param _players Addresses of the battle's players
+    """
+    assert staticcall ZkTitans(titans).channelOpen(_state.battleId), "Channel not open"
+    _health: uint256[2] = [_state.health1, _state.health2]
+    _mana: uint256[2] = [_state.mana1, _state.mana2]
+    _attack: uint256[2] = [_state.attack1, _state.attack2]
+    for _i: uint256 in range(2):
+        _player: Player = staticcall ZkTitans(titans).getPlayer(_players[_i])
+        assert _health[_i] <= _player.playerHealth and _mana[_i] <= _MAX_MANA and _attack[_i] <= _MAX_ATTACK_DEFEND_STRENGTH, "Invalid channel state"
+
+    self.closedChannels[_state.battleId] = True
+    extcall ZkTitans(titans).closeChannel(_state.battleId, _health, _mana, _attack)
+
+@internal
+def _settleChannel(_battleId: uint256, _winner: address, _loser: address, _round: uint256):
+    """
+    @dev Ends a battle for `_winner` by quitting it on behalf of `_loser` on zkTitans, which
+         applies the result through _endBattle as for any battle
+    """
+    self.channelDisputes[_battleId] = empty(ChannelDispute)
+    raw_call(
+        titans,
+        concat(
+            abi_encode(_battleId, method_id=method_id("quitBattleById(uint256)")),
+            convert(_loser, bytes20)
+        )
+    )
+    log ChannelSettled(_battleId, _winner, _round)
+
+# ------------------------------------------------------------------
+#                     EXTERNAL VIEW FUNCTIONS
+# ------------------------------------------------------------------
+
+@view
+@external
+def DOMAIN_SEPARATOR() -> bytes32:
+    """
+    @dev Returns the EIP-712 domain separator moves are signed under
+    @return Domain separator
+    """
+    return self._domainSeparator()
+
+@view
+@external
+def hashMove(_move: SignedMove) -> bytes32:
+    """
+    @dev Returns the EIP-712 digest a player signs for a move
+    @param _move Move to hash, the signature fields are ignored
+    @return Typed data digest
+    """
+    return self._hashMove(_move)
+
+@view
+@external
+def hashChannelState(_state: ChannelState) -> bytes32:
+    """
+    @dev Returns the EIP-712 digest both players sign for a channel state
+    @param _state Channel state to hash
+    @return Typed data digest
+    """
+    return self._hashChannelState(_state)
+
+@view
+@external
+def getQueuedMoves(_battleId: uint256, _player: address) -> DynArray[uint8, MAX_QUEUED_MOVES]:
+    """
+    @dev Returns the moves a player has queued for a battle, next move first
+    @param _battleId 1-based battle id, as stored in zkTitans battleInfo
+    @param _player Player Wallet Address
+    @return Queued moves (1 for attack, 2 for defense)
+    """
+    _moves: DynArray[uint8, MAX_QUEUED_MOVES] = []
+    _queue: uint256 = self.moveQueues[_battleId][_player]
+    for _i: uint256 in range(MAX_QUEUED_MOVES):
+        if _queue == 0:
+            break
+        _moves.append(convert(_queue & 3, uint8))
+        _queue >>= 2
+    return _moves
+
+@view
+@external
+def getPlayableBattles(_offset: uint256, _limit: uint256) -> (DynArray[uint256, MAX_PLAYABLE_PAGE], uint256):
+    """
+    @dev Lists battles with a queued move that is due, which playQueuedMoves would play, scanning one
+         page of queuedBattles. Moves become due without being played when a round is completed by
+         a move made directly on zkTitans.
+    @param _offset Number of entries of queuedBattles to skip
+    @param _limit Maximum number of entries to scan, capped at MAX_PLAYABLE_PAGE
+    @return (ids, total) Battle ids with due queued moves in the page and the length of queuedBattles
+    """
+    _ids: DynArray[uint256, MAX_PLAYABLE_PAGE] = []
+    _total: uint256 = self.queuedBattleCount
+
+    for i: uint256 in range(MAX_PLAYABLE_PAGE):
+        _index: uint256 = _offset + i
+        if i >= _limit or _index >= _total:
+            break
+
+        _battle_id: uint256 = self.queuedBattles[_index]
+        _battle: Battle = staticcall ZkTitans(titans).battles(_battle_id - 1)
+        if _battle.battleStatus != _STARTED:
+            continue
+        for _j: uint256 in range(2):
+            if _battle.moves[_j] == 0 and self.moveQueues[_battle_id][_battle.players[_j]] != 0:
+                _ids.append(_battle_id)
+                break
+
+    return (_ids, _total)
+
+# ------------------------------------------------------------------
+#                        EXTERNAL FUNCTIONS
+# ------------------------------------------------------------------
+
+@external
+def relayMoves(_moves: DynArray[SignedMove, MAX_RELAY_BATCH]) -> uint256:
+    """
+    @dev Verifies and relays a batch of signed moves to zkTitans.attackOrDefendChoice
+    @notice Moves that are expired, out of order or badly signed are skipped. A verified move
+            consumes its nonce even if zkTitans rejects it, so it can never be replayed later.
+            Each move gets at most MOVE_GAS_LIMIT gas, so one failing move cannot sink the batch.
+    @param _moves Signed moves to relay
+    @return Number of moves zkTitans accepted
+    """
+    _accepted: uint256 = 0
+    for _move: SignedMove in _moves:
+        if block.timestamp > _move.deadline:
+            continue
+        if _move.nonce != self.nonces[_move.player]:
+            continue
+        if not self._isValidSignature(_move):
+            continue
+
+        self.nonces[_move.player] = _move.nonce + 1
+
+        _success: bool = raw_call(
+            titans,
+            concat(
+                abi_encode(
+                    _move.choice,
+                    _move.battleName,
+                    method_id=method_id("attackOrDefendChoice(uint8,string)")
+                ),
+                convert(_move.player, bytes20)
+            ),
+            gas=MOVE_GAS_LIMIT,
+            revert_on_failure=False
+        )
+        if _success:
+            _accepted += 1
+
+        log MoveRelayed(_move.player, _move.nonce, _success)
+
+    return _accepted
+
+@external
+def queueMoves(_battleId: uint256, _moves: DynArray[uint8, MAX_QUEUED_MOVES]) -> uint256:
+    """
+    @dev Queues the sender's moves for the next rounds of a battle, replacing any moves queued
+         before, and plays every queued move of the battle that is due
+    @notice Moves are played as soon as their round starts whenever this forwarder plays queued
+            moves: on each queueMoves and playQueuedMoves call of either player. Queuing both
+            players' moves lets a whole battle resolve in two transactions. A round completed by
+            a move made directly on zkTitans does not play them; getPlayableBattles lists such
+            battles for a keeper to call playQueuedMoves on.
+    @param _battleId 1-based battle id, as stored in zkTitans battleInfo
+    @param _moves Move choices (1 for attack, 2 for defense), next round first; empty to clear the queue
+    @return Number of moves zkTitans accepted
+    """
+    _queue: uint256 = 0
+    for _i: uint256 in range(MAX_QUEUED_MOVES):
+        if _i == len(_moves):
+            break
+        _choice: uint8 = _moves[len(_moves) - 1 - _i]
+        assert _choice == 1 or _choice == 2, "Choice should be either 1 or 2!"
+        _queue = _queue << 2 | convert(_choice, uint256)
+
+    self.moveQueues[_battleId][msg.sender] = _queue
+    if _queue != 0 and not self.isQueuedBattle[_battleId]:
+        self.isQueuedBattle[_battleId] = True
+        self.queuedBattles[self.queuedBattleCount] = _battleId
+        self.queuedBattleCount += 1
+    log MovesQueued(msg.sender, _battleId, len(_moves))
+
+    return self._playQueuedMoves(_battleId)
+
+@external
+def playQueuedMoves(_battleId: uint256) -> uint256:
+    """
+    @dev Plays every queued move of a battle that is due, e.g. after a player moved directly on zkTitans
+    @notice Anyone can call this; only moves the players queued themselves are played
+    @param _battleId 1-based battle id, as stored in zkTitans battleInfo
+    @return Number of moves zkTitans accepted
+    """
+    return self._playQueuedMoves(_battleId)
+
+@external
+def openChannel(_state: ChannelState, _signatures: Signature[2]):
+    """
+    @dev Opens a channel for a started battle, whose rounds are then played off-chain. zkTitans
+         blocks on-chain moves and timeouts of the battle until the channel is closed.
+    @notice Anyone can submit the state. Both players signing it is their agreement to play off-chain.
+    @param _state Opening state, round 0 without moves, as ChannelState.open builds it
+    @param _signatures Signatures of player 1 and player 2, in that order
+    """
+    _battle: Battle = self._verifyChannelState(_state, _signatures)
+    assert _state.round == 0 and _state.winner == 0, "Not an opening state"
+    assert not self.closedChannels[_state.battleId], "Channel closed"
+    assert not staticcall ZkTitans(titans).channelOpen(_state.battleId), "Channel open"
+    assert _battle.moves[0] == 0 and _battle.moves[1] == 0, "Round in progress"
+
+    extcall ZkTitans(titans).openChannel(_state.battleId)
+    log ChannelOpened(_state.battleId)
+
+@external
+def settleChannel(_state: ChannelState, _signatures: Signature[2]):
+    """
+    @dev Settles a battle played off-chain with its final state, signed by both players
+    @notice Anyone can submit the state. Its health and mana are written to zkTitans, then the
+            outcome is applied as when the loser quits.
+    @param _state Final channel state, with a winner whose opponent has no health left
+    @param _signatures Signatures of player 1 and player 2, in that order
+    """
+    _players: address[2] = self._verifyChannelState(_state, _signatures).players
+    assert _state.winner == 1 or _state.winner == 2, "Battle not over"
+    _winner_index: uint256 = convert(_state.winner, uint256) - 1
+    if _winner_index == 0:
+        assert _state.health2 == 0, "Loser has health left"
+    else:
+        assert _state.health1 == 0, "Loser has health left"
+
+    self._closeChannel(_state, _players)
+    self._settleChannel(_state.battleId, _players[_winner_index], _players[1 - _winner_index], _state.round)
+
+@external
+def disputeChannel(_state: ChannelState, _signatures: Signature[2]):
+    """
+    @dev Opens a dispute when the other player stops playing off-chain. Unless they answer within
+         CHANNEL_CHALLENGE_PERIOD, the sender can claim the win with claimChannelTimeout. zkTitans
+         does not time the battle out while its channel is open.
+    @notice A dispute can be opened again, or by the other player, with a newer state, or with the
+            state that answered the last dispute
+    @param _state Last state both players signed
+    @param _signatures Signatures of player 1 and player 2, in that order
+    """
+    _players: address[2] = self._verifyChannelState(_state, _signatures).players
+    assert msg.sender == _players[0] or msg.sender == _players[1], "Not in battle"
+    assert _state.winner == 0, "Battle over, settle it"
+    assert staticcall ZkTitans(titans).channelOpen(_state.battleId), "Channel not open"
+
+    _dispute: ChannelDispute = self.channelDisputes[_state.battleId]
+    assert _state.round >= _dispute.round, "Stale state"
+    assert _dispute.disputer == empty(address) or _state.round > _dispute.round, "Dispute open"
+
+    _deadline: uint256 = block.timestamp + CHANNEL_CHALLENGE_PERIOD
+    self.channelDisputes[_state.battleId] = ChannelDispute(
+        round=_state.round,
+        disputer=msg.sender,
+        deadline=_deadline,
+        stateHash=self._hashChannelState(_state)
+    )
+    log ChannelDisputed(_state.battleId, msg.sender, _state.round, _deadline)
+
+@external
+def answerChannelDispute(_state: ChannelState, _signatures: Signature[2]):
+    """
+    @dev Closes a dispute with a state both players signed after the disputed one, showing that
+         off-chain play went on. The players continue off-chain from there.
+    @notice Anyone can submit the state. Without a newer state, the other player can only answer
+            by moving on-chain with answerChannelDisputeWithMove.
+    @param _state State signed by both players, with a higher round than the disputed state
+    @param _signatures Signatures of player 1 and player 2, in that order
+    """
+    _dispute: ChannelDispute = self._openDispute(_state.battleId)
+    self._verifyChannelState(_state, _signatures)
+    assert _state.round > _dispute.round, "State not newer"
+
+    self.channelDisputes[_state.battleId] = ChannelDispute(
+        round=_state.round,
+        disputer=empty(address),
+        deadline=0,
+        stateHash=empty(bytes32)
+    )
+    log ChannelDisputeAnswered(_state.battleId, msg.sender, _state.round)
+
+@external
+def answerChannelDisputeWithMove(_state: ChannelState, _choice: uint8):
+    """
+    @dev Closes a dispute by the other player making their move on zkTitans. The channel is closed
+         and the battle continues on-chain from the disputed state, whose health, mana and attack
+         strengths are written to zkTitans first, so withholding a signature gains nothing.
+    @param _state The disputed state, signed by both players when the dispute was opened
+    @param _choice Move choice (1 for attack, 2 for defense), checked by zkTitans as any other move
+    """
+    _battleId: uint256 = _state.battleId
+    _dispute: ChannelDispute = self._openDispute(_battleId)
+    _battle: Battle = staticcall ZkTitans(titans).battles(_battleId - 1)
+    assert msg.sender != _dispute.disputer and (msg.sender == _battle.players[0] or msg.sender == _battle.players[1]), "Not the other player"
+    assert self._hashChannelState(_state) == _dispute.stateHash, "Not the disputed state"
+
+    self.channelDisputes[_battleId] = empty(ChannelDispute)
+    self._closeChannel(_state, _battle.players)
+    raw_call(
+        titans,
+        concat(
+            abi_encode(_choice, _battleId, method_id=method_id("attackOrDefendChoiceById(uint8,uint256)")),
+            convert(msg.sender, bytes20)
+        )
+    )
+    log ChannelDisputeAnswered(_battleId, msg.sender, _dispute.round)
+
+@external
+def claimChannelTimeout(_battleId: uint256):
+    """
+    @dev Ends a battle for the disputer once the other player let the dispute expire
+    @param _battleId 1-based battle id, as stored in zkTitans battleInfo
+    """
+    _dispute: ChannelDispute = self.channelDisputes[_battleId]
+    assert _dispute.disputer != empty(address), "No dispute"
+    assert block.timestamp > _dispute.deadline, "Dispute still open"
+
+    _battle: Battle = staticcall ZkTitans(titans).battles(_battleId - 1)
+    assert _battle.battleStatus == _STARTED, "Battle not started"
+    _loser: address = _battle.players[0]
+    if _loser == _dispute.disputer:
+        _loser = _battle.players[1]
+    self._settleChannel(_battleId, _dispute.disputer, _loser, _dispute.round)
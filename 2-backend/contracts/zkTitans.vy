@@ -1,4 +1,5 @@
 # pragma version 0.4.0
+# pragma optimize codesize
 
 """
 @license MIT
@@ -119,12 +120,10 @@ def _mint(to: address, id: uint256, amount: uint256, data: Bytes[1024]):
     """
     assert to != empty(address), "ERC1155: mint to the zero address"
     
-    # Update balances
+    # Update balances; the total supply is derived from the number of game tokens, see TOTAL_SUPPLY
     self._balances[id][to] += amount
-    self.TOTAL_SUPPLY += amount
     
-    # Emit transfer event
-    log URI(concat(self.BASE_URI, ""), id)
+    # Emit transfer event; the metadata URI is served by uri(id) and only logged when it changes
     log TransferSingle(msg.sender, empty(address), to, id, amount)
     
     # If `to` is a contract, verify ERC1155Receiver implementation
@@ -132,16 +131,55 @@ def _mint(to: address, id: uint256, amount: uint256, data: Bytes[1024]):
         response: bytes4 = extcall IERC1155Receiver(to).onERC1155Received(msg.sender, empty(address), id, amount, data)
         assert response == method_id("onERC1155Received(address,address,uint256,uint256,bytes)", output_type=bytes4)
 
+@internal
+def _burn(_from: address, id: uint256, amount: uint256):
+    """
+    @dev Internal function to burn tokens
+    @param _from The address whose tokens are burnt
+    @param id The token id to burn
+    @param amount The amount of tokens to burn
+    """
+    self._balances[id][_from] -= amount
+    log TransferSingle(msg.sender, _from, empty(address), id, amount)
+
 # ------------------------------------------------------------------
 #                         STATE VARIABLES
 # ------------------------------------------------------------------
 
-BASE_URI: public(String[512])
-TOTAL_SUPPLY: public(uint256)
+# Longest BASE_URI whose card URIs, with up to 78 id digits and ".json", fit the String[512] of IERC1155MetadataURI.uri
+MAX_BASE_URI_LENGTH: public(constant(uint256)) = 429
+BASE_URI: public(String[MAX_BASE_URI_LENGTH])
+
+# @dev Forwarder allowed to submit moves on behalf of players, e.g. the MoveForwarder relay (ERC-2771)
+trustedForwarder: public(address)
 _balances: HashMap[uint256, HashMap[address, uint256]]
 _operatorApprovals: HashMap[address, HashMap[address, bool]]
 MAX_ATTACK_DEFEND_STRENGTH: public(constant(uint256)) = 10
 
+# Matchmaking queue pointers and the maximum number of stale entries skipped per call
+matchQueueHead: public(uint256)
+matchQueueTail: public(uint256)
+MAX_QUEUE_SKIP: public(constant(uint256)) = 10
+
+# Batch entry point limits and the inactivity period after which a started battle can be timed out
+MAX_BATCH_SIZE: public(constant(uint256)) = 50
+MAX_BATTLE_PAGE: public(constant(uint256)) = 500
+MOVE_TIMEOUT: public(constant(uint256)) = 3600
+
+# Bulk import from a previous deployment: opened by the constructor for migration targets only and
+# open until finishImport, the hash chain of every imported chunk, the player index balance imports
+# continue from, and the maximum number of items per import call
+importOpen: public(bool)
+importHash: public(bytes32)
+balanceImportIndex: uint256
+
+# Supply of imported balances and number of imported game tokens. Every other game token is backed by
+# exactly one card, so the total supply is derived from them rather than kept in a slot that every
+# registration writes.
+importedSupply: uint256
+importedTokens: uint256
+MAX_IMPORT_CHUNK: public(constant(uint256)) = 100
+
 # Card Type Constants
 AKUAKU: public(constant(uint256)) = 0
 ARACHNINA: public(constant(uint256)) = 1
@@ -244,6 +282,19 @@ struct P:
     attack: uint256
     defense: uint256
 
+# @dev Page of changes returned by getChangesSince
+# @param battleIds - 1-based ids of the changed battles
+# @param battles - Changed battles, in the same order as battleIds
+# @param players - Changed players
+# @param playerTokens - Game tokens of the changed players, in the same order as players
+# @param total - Length of the longer of the battles and players arrays, to page up to
+struct StateChanges:
+    battleIds: DynArray[uint256, MAX_BATTLE_PAGE]
+    battles: DynArray[Battle, MAX_BATTLE_PAGE]
+    players: DynArray[Player, MAX_BATTLE_PAGE]
+    playerTokens: DynArray[GameToken, MAX_BATTLE_PAGE]
+    total: uint256
+
 # ------------------------------------------------------------------
 #                             MAPPINGS
 # ------------------------------------------------------------------
@@ -257,6 +308,25 @@ playerTokenInfo: public(HashMap[address, uint256])
 # @dev Mapping of battle name to battle index in the battles array
 battleInfo: public(HashMap[String[1000], uint256])
 
+# @dev Mapping of player addresses to the battle index they are waiting in via queueForBattle
+queuedBattle: public(HashMap[address, uint256])
+
+# @dev Mapping of battle index to the timestamp of its last join or move, used to time out abandoned battles
+lastMoveTime: public(HashMap[uint256, uint256])
+
+# @dev Mapping of battle index to whether its rounds are played off-chain through the trusted forwarder;
+#      on-chain moves and timeouts wait until the forwarder closes the channel or ends the battle
+channelOpen: public(HashMap[uint256, bool])
+
+# @dev FIFO of battle indexes waiting for an opponent, read from matchQueueHead to matchQueueTail
+matchQueue: public(HashMap[uint256, uint256])
+
+# @dev Mapping of battle index (1-based) to the block number of its last change
+battleVersion: public(HashMap[uint256, uint256])
+
+# @dev Mapping of player index to the block number of its last change, including its game token
+playerVersion: public(HashMap[uint256, uint256])
+
 # ------------------------------------------------------------------
 #                              ARRAYS
 # ------------------------------------------------------------------
@@ -297,17 +367,22 @@ event NewGameToken:
 event RoundEnded:
     damagedPlayers: address[2]
 
-event Debug:
-    message: String[100]
+event ChunkImported:
+    start: uint256
+    count: uint256
+    chunkHash: bytes32
 
 # ------------------------------------------------------------------
 #                           CONSTRUCTOR
 # ------------------------------------------------------------------
 
 @deploy
-def __init__(_base_uri: String[512]):
+def __init__(_base_uri: String[MAX_BASE_URI_LENGTH], _importOpen: bool):
     """
     @dev Initialize contract with base URI for token metadata
+    @param _base_uri Base URI for token metadata
+    @param _importOpen Whether to accept bulk imports until finishImport, for migration targets only.
+           Registration and gameplay stay closed while import is open.
     """
     self.BASE_URI = _base_uri
     
@@ -329,6 +404,8 @@ def __init__(_base_uri: String[512]):
     
     # Initialize owner
     self._transfer_ownership(msg.sender)
+    self.importOpen = _importOpen
+    self.balanceImportIndex = 1
     log URI(concat(_base_uri, ""), 0)
 
 # ------------------------------------------------------------------
@@ -361,6 +438,18 @@ def _createRandomNum(_max: uint256, _sender: address) -> uint256:
         
     return randomValue
 
+@view
+@internal
+def _msgSender() -> address:
+    """
+    @dev Returns the player a call is made for. Calls relayed by the trusted forwarder
+         carry the player address in the last 20 bytes of calldata (ERC-2771).
+    @return Address of the player
+    """
+    if msg.sender == self.trustedForwarder and len(msg.data) >= 20:
+        return convert(convert(slice(msg.data, len(msg.data) - 20, 20), bytes20), address)
+    return msg.sender
+
 # ------------------------------------------------------------------
 #                        INTERNAL FUNCTIONS
 # ------------------------------------------------------------------
@@ -396,24 +485,135 @@ def initialize():
     ))
 
 @internal
-def updateBattle(_name: String[100], _newBattle: Battle):
+def updateBattle(_battle_index: uint256, _newBattle: Battle):
     """
     @dev Updates an existing battle with new battle data.
-    @param _name - The name of the battle to update.
+    @param _battle_index - 1-based index of the battle to update.
     @param _newBattle - The new battle data to store.
     """
-    _battle_index: uint256 = self.battleInfo[_name]
-    assert _battle_index != 0, "Battle doesn't exist"
     # Use 1-based indexing by subtracting 1 from battle index
     self.battles[_battle_index - 1] = _newBattle
+    self._touchBattle(_battle_index)
+
+@internal
+def _touchBattle(_battle_index: uint256):
+    """
+    @dev Stamps a battle with the current block number after it changed
+    @param _battle_index 1-based index of the battle in the battles array
+    """
+    self.battleVersion[_battle_index] = block.number
+
+@internal
+def _touchPlayer(_addr: address):
+    """
+    @dev Stamps a player with the current block number after it or its game token changed
+    @param _addr Address of the player, unregistered addresses are ignored
+    """
+    _index: uint256 = self.playerInfo[_addr]
+    if _index == 0:
+        return
+    self.playerVersion[_index] = block.number
+
+@view
+@internal
+def _checkImportClosed():
+    """
+    @dev Throws while a migration is still importing state, see finishImport
+    """
+    assert not self.importOpen, "Import in progress"
+
+@internal
+def _createBattle(_name: String[100]) -> Battle:
+    """
+    @dev Internal function to create a new pending battle with the sender as first player
+    @param _name Name of the battle
+    @return New battle struct
+    """
+    self._checkImportClosed()
+
+    # Check battle doesn't already exist
+    assert self.battleInfo[_name] == 0, "Battle already exists!"
+
+    # Create battle hash
+    battleHash: bytes32 = keccak256(abi_encode(_name))  # Changed from _abi_encode to abi_encode
+
+    # Create new battle struct
+    _battle: Battle = Battle(
+        battleStatus=BattleStatus.PENDING,
+        battleHash=battleHash,
+        name=_name,
+        players=[msg.sender, empty(address)],
+        moves=[convert(0, uint8), convert(0, uint8)],
+        winner=empty(address)
+    )
+
+    # Set the battle ID first (using current length + 1)
+    _id: uint256 = len(self.battles) + 1  # Changed from len - 1 to len + 1
+    self.battleInfo[_name] = _id
+
+    # Then add battle to storage
+    self.battles.append(_battle)
+    self._touchBattle(_id)
+    
+    # Emit NewBattle event
+    log NewBattle(_name, msg.sender, empty(address))
+    
+    return _battle
+
+@internal
+def _joinBattle(_battle_index: uint256) -> Battle:
+    """
+    @dev Internal function for the sender to join a pending battle as second player
+    @param _battle_index 1-based index of the battle in the battles array
+    @return Updated battle struct
+    """
+    self._checkImportClosed()
+    assert _battle_index != 0 and _battle_index <= len(self.battles), "No battle found"
+    assert self.playerInfo[msg.sender] != 0, "Player not registered"
+
+    # Get battle data (using 1-based indexing)
+    _battle: Battle = self.battles[_battle_index - 1]
+
+    # Check player requirements
+    assert msg.sender != _battle.players[0], "Own battle"
+    assert _battle.battleStatus == BattleStatus.PENDING, "Battle in progress"
+
+    # Check if player is in battle
+    player: Player = self.players[self.playerInfo[msg.sender]]
+    assert not player.inBattle, "Already in battle"
+
+    # Update battle
+    _battle.battleStatus = BattleStatus.STARTED
+    _battle.players[1] = msg.sender
+
+    # Update battle in storage
+    self.battles[_battle_index - 1] = _battle
+    self.lastMoveTime[_battle_index] = block.timestamp
+
+    # Update player statuses
+    self.players[self.playerInfo[_battle.players[0]]].inBattle = True
+    self.players[self.playerInfo[msg.sender]].inBattle = True
+
+    self._touchBattle(_battle_index)
+    self._touchPlayer(_battle.players[0])
+    self._touchPlayer(msg.sender)
+
+    # Emit event
+    log NewBattle(_battle.name, _battle.players[0], msg.sender)
+
+    return _battle
 
 @internal
 def _createGameToken(_name: String[1000]) -> GameToken:
     """
-    @dev Internal function to create a new Battle Card
+    @dev Internal function to create a new Battle Card. A player holds one card: a re-roll
+         overwrites the player's GameToken in place and burns the old card, so storage grows
+         with players rather than with re-rolls
     @param _name Name of the battle card
     @return New game token
     """
+    self._checkImportClosed()
+
     # Generate random attack and defense strengths
     randAttackStrength: uint256 = self._createRandomNum(MAX_ATTACK_DEFEND_STRENGTH, msg.sender)
     randDefenseStrength: uint256 = MAX_ATTACK_DEFEND_STRENGTH - randAttackStrength
@@ -443,10 +643,15 @@ def _createGameToken(_name: String[1000]) -> GameToken:
         defenseStrength=randDefenseStrength
     ) 
 
-    # Add token to storage
-    _id: uint256 = len(self.gameTokens)
-    self.gameTokens.append(newGameToken)
-    self.playerTokenInfo[msg.sender] = _id
+    # Add token to storage, or replace the player's current one
+    _id: uint256 = self.playerTokenInfo[msg.sender]
+    if _id == 0:
+        self.playerTokenInfo[msg.sender] = len(self.gameTokens)
+        self.gameTokens.append(newGameToken)
+    else:
+        self._burn(msg.sender, self.gameTokens[_id].id, 1)
+        self.gameTokens[_id] = newGameToken
+    self._touchPlayer(msg.sender)
 
     # Mint the token
     self._mint(msg.sender, convert(randId, uint256), 1, b"")
@@ -457,55 +662,129 @@ def _createGameToken(_name: String[1000]) -> GameToken:
     return newGameToken
 
 @internal
-def _registerPlayerMove(_player: uint256, _choice: uint8, _battleName: String[100]):
+def _registerPlayerMove(_sender: address, _player: uint256, _choice: uint8, _battle_index: uint256):
     """
     @dev Internal function to register a player's move in a battle
+    @param _sender Address of the player making the move
     @param _player Index of the player (0 or 1)
     @param _choice Move choice (1 for attack, 2 for defense)
-    @param _battleName Name of the battle
+    @param _battle_index 1-based index of the battle in the battles array
     """
-    # Verify valid move choice
-    assert _choice == 1 or _choice == 2, "Choice should be either 1 or 2!"
-
+    # The move choice is validated by _attackOrDefendChoice
     # Check mana if attacking
     if _choice == 1:
-        player: Player = self.players[self.playerInfo[msg.sender]]
+        player: Player = self.players[self.playerInfo[_sender]]
         assert player.playerMana >= 3, "Mana not sufficient for attacking!"
 
     # Update move in battle
-    _battle_index: uint256 = self.battleInfo[_battleName]
-    assert _battle_index != 0, "Battle doesn't exist!"
     self.battles[_battle_index - 1].moves[_player] = _choice  # Using 1-based indexing
+    self.lastMoveTime[_battle_index] = block.timestamp
+    self._touchBattle(_battle_index)
 
 @internal
-def _awaitBattleResults(_battleName: String[100]):
+def _awaitBattleResults(_sender: address, _battle_index: uint256):
     """
     @dev Internal function to check if battle can be resolved and trigger resolution
-    @param _battleName Name of the battle
+    @param _sender Address of the player requesting resolution
+    @param _battle_index 1-based index of the battle in the battles array
     """
-    # Get battle from storage
-    _battle_index: uint256 = self.battleInfo[_battleName]
-    assert _battle_index != 0, "Battle doesn't exist!"
-    
     # Use 1-based indexing for battles array
     _battle: Battle = self.battles[_battle_index - 1]
     
     # Check if sender is a player in the battle
-    assert msg.sender == _battle.players[0] or msg.sender == _battle.players[1], "Only players in this battle can make a move"
+    assert _sender == _battle.players[0] or _sender == _battle.players[1], "Only players in this battle can make a move"
     
     # Check if both players have made their moves
     assert _battle.moves[0] != 0 and _battle.moves[1] != 0, "Players still need to make a move"
     
-    # Resolve the battle
-    self._resolveBattle(_battle)
+    # Resolve the battle; _resolveBattle and _endBattle persist the updated battle themselves,
+    # so the local copy must not be written back over it
+    self._resolveBattle(_battle_index, _battle)
+
+@internal
+def _attackOrDefendChoice(_sender: address, _choice: uint8, _battle_index: uint256):
+    """
+    @dev Internal function for a player to choose attack or defense move in a battle
+    @param _sender Address of the player making the move
+    @param _choice Move choice (1 for attack, 2 for defense)
+    @param _battle_index 1-based index of the battle in the battles array, 0 if not found
+    """
+    # Initial validations
+    self._checkImportClosed()
+    assert _choice == 1 or _choice == 2, "Invalid move choice"
+    assert _battle_index != 0 and _battle_index <= len(self.battles), "Battle doesn't exist!"
     
-    # Update the battle in storage with 1-based indexing
-    self.battles[_battle_index - 1] = _battle
+    # Get battle data
+    _battle: Battle = self.battles[_battle_index - 1]
+    
+    # Battle status checks
+    assert _battle.battleStatus == BattleStatus.STARTED, "Battle not started"
+    
+    # Verify player participation
+    assert _sender == _battle.players[0] or _sender == _battle.players[1], "Not in battle"
+    assert not self.channelOpen[_battle_index], "Channel open"
+    
+    # Determine player index
+    _player_index: uint256 = 0
+    if _sender == _battle.players[1]:
+        _player_index = 1
+    
+    # Check if previous round needs resolution
+    if _battle.moves[0] != 0 and _battle.moves[1] != 0:
+        # Previous round needs resolution
+        self._awaitBattleResults(_sender, _battle_index)
+        # Reload battle state after resolution
+        _battle = self.battles[_battle_index - 1]
+    
+    # Verify move hasn't been made this round
+    assert _battle.moves[_player_index] == 0, "Move already made"
+    
+    # Register the move
+    self._registerPlayerMove(_sender, _player_index, _choice, _battle_index)
+    
+    # Get updated battle state
+    _battle = self.battles[_battle_index - 1]
+    
+    # Calculate and check if round complete
+    _moves_made: uint256 = 0
+    if _battle.moves[0] != 0:
+        _moves_made += 1
+    if _battle.moves[1] != 0:
+        _moves_made += 1
+    
+    # Emit move event
+    log BattleMove(_battle.name, _moves_made == 1)
+    
+    # Resolve round if both moves made
+    if _moves_made == 2:
+        self._awaitBattleResults(_sender, _battle_index)
+
+@internal
+def _quitBattle(_battle_index: uint256):
+    """
+    @dev Ends a battle in favour of the other player when the sender, or the player a forwarded
+         call is made for, quits it
+    @param _battle_index 1-based index of the battle in the battles array, 0 if not found
+    """
+    self._checkImportClosed()
+    assert _battle_index != 0 and _battle_index <= len(self.battles), "Battle doesn't exist!"
+    _battle: Battle = self.battles[_battle_index - 1]
+    _sender: address = self._msgSender()
+
+    # Verify sender is in the battle
+    assert _sender == _battle.players[0] or _sender == _battle.players[1], "You are not in this battle!"
+
+    # Determine winner (opposite of who quit)
+    if _battle.players[0] == _sender:
+        self._endBattle(_battle.players[1], _battle_index, _battle)
+    else:
+        self._endBattle(_battle.players[0], _battle_index, _battle)
 
 @internal
-def _resolveBattle(_battle: Battle):
+def _resolveBattle(_battle_index: uint256, _battle: Battle):
     """
     @dev Resolve battle function to determine winner and loser of battle
+    @param _battle_index 1-based index of the battle in the battles array
     @param _battle Battle struct containing the current battle state
     """
     # Initialize player 1 battle stats
@@ -528,150 +807,81 @@ def _resolveBattle(_battle: Battle):
 
     # Initialize common variables
     _damaged_players: address[2] = [_battle.players[0], _battle.players[1]]
-    healthAfterAttack: uint256 = 0
+    p1_mana: uint256 = self.players[p1.index].playerMana
+    p2_mana: uint256 = self.players[p2.index].playerMana
     PHAD: uint256 = 0
-    damage: uint256 = 0
+    _winner: address = empty(address)
 
     # Both players attack
     if p1.move == 1 and p2.move == 1:
-        log Debug("Both players attacked")
-        
-        # Calculate new health values with safe math
-        new_p1_health: uint256 = p1.health
-        new_p2_health: uint256 = p2.health
-
-        if p2.attack >= new_p1_health:
-            new_p1_health = 0
-        else:
-            new_p1_health = p1.health - p2.attack
-
-        if p1.attack >= new_p2_health:
-            new_p2_health = 0
-        else:
-            new_p2_health = p2.health - p1.attack
-
-        # Update health
-        self.players[p1.index].playerHealth = new_p1_health
-        self.players[p2.index].playerHealth = new_p2_health
-
-        # Update mana (ensure it doesn't go below 0)
-        p1_mana: uint256 = self.players[p1.index].playerMana
-        p2_mana: uint256 = self.players[p2.index].playerMana
-        self.players[p1.index].playerMana = p1_mana - min(p1_mana, 3)
-        self.players[p2.index].playerMana = p2_mana - min(p2_mana, 3)
-        
-        # Reset moves before checking for defeat
-        _battle.moves = [convert(0, uint8), convert(0, uint8)]
-        self.updateBattle(_battle.name, _battle)
-        
-        # Emit round ended event
-        log RoundEnded(_damaged_players)
+        # Calculate new health and mana values with safe math
+        p1.health -= min(p2.attack, p1.health)
+        p2.health -= min(p1.attack, p2.health)
+        p1_mana -= min(p1_mana, 3)
+        p2_mana -= min(p2_mana, 3)
 
         # Check for defeat after damage - handle simultaneous death
-        if new_p1_health == 0 and new_p2_health == 0:
+        if p1.health == 0 and p2.health == 0:
             if p1.attack > p2.attack:
-                _battle = self._endBattle(_battle.players[0], _battle)
+                _winner = _battle.players[0]
             else:
-                _battle = self._endBattle(_battle.players[1], _battle)
-        elif new_p1_health == 0:
-            _battle = self._endBattle(_battle.players[1], _battle)
-        elif new_p2_health == 0:
-            _battle = self._endBattle(_battle.players[0], _battle)
-        else:
-            # Update random stats if battle continues
-            self._updateRandomStats(_battle)
-        return
+                _winner = _battle.players[1]
+        elif p1.health == 0:
+            _winner = _battle.players[1]
+        elif p2.health == 0:
+            _winner = _battle.players[0]
 
     # Player 1 attacks, Player 2 defends
     elif p1.move == 1 and p2.move == 2:
-        log Debug("P1 attacks, P2 defends")
         PHAD = p2.health + p2.defense
-        damage = p1.attack
-        
-        if p2.defense >= damage:
-            healthAfterAttack = p2.health
-        else:
-            healthAfterAttack = PHAD - min(damage, PHAD)
-
-        # Update health and mana
-        self.players[p2.index].playerHealth = healthAfterAttack
-
-        # Update mana
-        p1_mana: uint256 = self.players[p1.index].playerMana
-        p2_mana: uint256 = self.players[p2.index].playerMana
-        self.players[p1.index].playerMana = p1_mana - min(p1_mana, 3)
-        self.players[p2.index].playerMana = min(p2_mana + 3, 25)
-        
-        # Reset moves before checking for defeat
-        _battle.moves = [convert(0, uint8), convert(0, uint8)]
-        self.updateBattle(_battle.name, _battle)
-        
-        # Emit round ended event
-        _damaged_players[0] = _battle.players[1]
-        log RoundEnded(_damaged_players)
+        if p2.defense < p1.attack:
+            p2.health = PHAD - min(p1.attack, PHAD)
 
-        if healthAfterAttack == 0:
-            _battle = self._endBattle(_battle.players[0], _battle)
-        else:
-            # Update random stats if battle continues
-            self._updateRandomStats(_battle)
-        return
+        p1_mana -= min(p1_mana, 3)
+        p2_mana = min(p2_mana + 3, 25)
+
+        _damaged_players[0] = _battle.players[1]
+        if p2.health == 0:
+            _winner = _battle.players[0]
 
     # Player 1 defends, Player 2 attacks
     elif p1.move == 2 and p2.move == 1:
-        log Debug("P1 defends, P2 attacks")
         PHAD = p1.health + p1.defense
-        damage = p2.attack
-        
-        if p1.defense >= damage:
-            healthAfterAttack = p1.health
-        else:
-            healthAfterAttack = PHAD - min(damage, PHAD)
-
-        # Update health and mana
-        self.players[p1.index].playerHealth = healthAfterAttack
-
-        # Update mana
-        p1_mana: uint256 = self.players[p1.index].playerMana
-        p2_mana: uint256 = self.players[p2.index].playerMana
-        self.players[p1.index].playerMana = min(p1_mana + 3, 25)
-        self.players[p2.index].playerMana = p2_mana - min(p2_mana, 3)
-        
-        # Reset moves before checking for defeat
-        _battle.moves = [convert(0, uint8), convert(0, uint8)]
-        self.updateBattle(_battle.name, _battle)
-        
-        # Emit round ended event
-        _damaged_players[0] = _battle.players[0]
-        log RoundEnded(_damaged_players)
+        if p1.defense < p2.attack:
+            p1.health = PHAD - min(p2.attack, PHAD)
 
-        if healthAfterAttack == 0:
-            _battle = self._endBattle(_battle.players[1], _battle)
-        else:
-            # Update random stats if battle continues
-            self._updateRandomStats(_battle)
-        return
+        p1_mana = min(p1_mana + 3, 25)
+        p2_mana -= min(p2_mana, 3)
+
+        _damaged_players[0] = _battle.players[0]
+        if p1.health == 0:
+            _winner = _battle.players[1]
 
     # Both players defend
     else:
-        log Debug("Both players defended")
-        
-        # Update mana
-        p1_mana: uint256 = self.players[p1.index].playerMana
-        p2_mana: uint256 = self.players[p2.index].playerMana
-        self.players[p1.index].playerMana = min(p1_mana + 3, 25)
-        self.players[p2.index].playerMana = min(p2_mana + 3, 25)
-        
-        # Reset moves
-        _battle.moves = [convert(0, uint8), convert(0, uint8)]
-        self.updateBattle(_battle.name, _battle)
-        
-        # Emit round ended event
-        log RoundEnded(_damaged_players)
-        
-        # Update random stats
+        p1_mana = min(p1_mana + 3, 25)
+        p2_mana = min(p2_mana + 3, 25)
+
+    # Update health and mana
+    self.players[p1.index].playerHealth = p1.health
+    self.players[p2.index].playerHealth = p2.health
+    self.players[p1.index].playerMana = p1_mana
+    self.players[p2.index].playerMana = p2_mana
+
+    # Reset moves before checking for defeat
+    _battle.moves = [convert(0, uint8), convert(0, uint8)]
+    self.updateBattle(_battle_index, _battle)
+
+    # Emit round ended event
+    log RoundEnded(_damaged_players)
+
+    if _winner != empty(address):
+        self._endBattle(_winner, _battle_index, _battle)
+    else:
+        # Update random stats if battle continues
         self._updateRandomStats(_battle)
-        return
+        self._touchPlayer(_battle.players[0])
+        self._touchPlayer(_battle.players[1])
 
 @internal
 def _updateRandomStats(_battle: Battle):
@@ -687,10 +897,11 @@ def _updateRandomStats(_battle: Battle):
     self.gameTokens[self.playerTokenInfo[_battle.players[1]]].defenseStrength = MAX_ATTACK_DEFEND_STRENGTH - _random_attack_p2
 
 @internal
-def _endBattle(battleEnder: address, _battle: Battle) -> Battle:
+def _endBattle(battleEnder: address, _battle_index: uint256, _battle: Battle) -> Battle:
     """
     @dev Internal function to end the battle
     @param battleEnder Winner's address
+    @param _battle_index 1-based index of the battle in the battles array
     @param _battle Battle struct taken from attackOrDefend function
     @return Updated battle struct
     """
@@ -701,6 +912,8 @@ def _endBattle(battleEnder: address, _battle: Battle) -> Battle:
     # Reset both players' battle status
     self.players[p1].inBattle = False
     self.players[p2].inBattle = False
+    self._touchPlayer(_battle.players[0])
+    self._touchPlayer(_battle.players[1])
 
     # Set winner explicitly before changing status
     _battle.winner = battleEnder
@@ -709,11 +922,15 @@ def _endBattle(battleEnder: address, _battle: Battle) -> Battle:
     _battle.battleStatus = BattleStatus.ENDED
     _battle.moves = [convert(0, uint8), convert(0, uint8)]
 
-    # Determine loser (for event)
-    _battleLoser: address = _battle.players[1] if battleEnder == _battle.players[0] else _battle.players[0]
+    # Determine loser (for event); a battle ended without winner has no loser either
+    _battleLoser: address = empty(address)
+    if battleEnder == _battle.players[0]:
+        _battleLoser = _battle.players[1]
+    elif battleEnder == _battle.players[1]:
+        _battleLoser = _battle.players[0]
 
     # Update battle in storage
-    self.updateBattle(_battle.name, _battle)
+    self.updateBattle(_battle_index, _battle)
 
     # Emit battle ended event
     log BattleEnded(_battle.name, battleEnder, _battleLoser)
@@ -803,6 +1020,20 @@ def getAllPlayerTokens() -> DynArray[GameToken, 10000]:
     """
     return self.gameTokens
 
+@view
+@internal
+def _totalSupply() -> uint256:
+    return self.importedSupply + len(self.gameTokens) - 1 - self.importedTokens
+
+@view
+@external
+def TOTAL_SUPPLY() -> uint256:
+    """
+    @dev Returns the total supply of all tokens, derived from the game tokens and imported balances
+    @return Current total supply
+    """
+    return self._totalSupply()
+
 @view
 @external
 def getTotalSupply() -> uint256:
@@ -810,7 +1041,7 @@ def getTotalSupply() -> uint256:
     @dev Returns the total supply of all tokens
     @return Current total supply
     """
-    return self.TOTAL_SUPPLY
+    return self._totalSupply()
 
 @view 
 @external 
@@ -867,30 +1098,252 @@ def getBattleMoves(_battleName: String[100]) -> (uint256, uint256):
         convert(_battle.moves[1], uint256)
     )
 
-# @view
-# @external
-# def tokenURI(tokenId: uint256) -> String[1000]:
-#     """
-#     @dev Returns the URI for a given token ID
-#     @param tokenId The ID of the token to get the URI for
-#     @return The token's URI
-#     """
-#     assert tokenId < MAX_CARD_TYPES, "Token ID out of range"
-#     return concat(self.BASE_URI, convert(tokenId, String[100]), ".json")
+@view
+@external
+def getBattleMovesById(_battleId: uint256) -> (uint256, uint256):
+    """
+    @dev Read battle move info for player 1 and player 2, addressed by battle id.
+         Only the moves are read, not the whole battle struct.
+    @param _battleId 1-based battle id, as stored in battleInfo
+    @return (P1Move, P2Move) Tuple containing moves of both players
+    """
+    assert _battleId != 0 and _battleId <= len(self.battles), "Battle doesn't exist!"
+    _moves: uint8[2] = self.battles[_battleId - 1].moves
+    return (convert(_moves[0], uint256), convert(_moves[1], uint256))
+
+@view
+@external
+def getResolvableBattles(_offset: uint256, _limit: uint256) -> (DynArray[uint256, MAX_BATTLE_PAGE], uint256):
+    """
+    @dev Lists battles that resolveBattles would act on, scanning one page of the battles array
+    @param _offset Number of battles to skip from the start of the battles array
+    @param _limit Maximum number of battles to scan, capped at MAX_BATTLE_PAGE
+    @return (ids, total) 1-based ids of resolvable battles in the page and the total number of battles
+    """
+    _ids: DynArray[uint256, MAX_BATTLE_PAGE] = []
+    _total: uint256 = len(self.battles)
+
+    for i: uint256 in range(MAX_BATTLE_PAGE):
+        _index: uint256 = _offset + i
+        if i >= _limit or _index >= _total:
+            break
+
+        _battle: Battle = self.battles[_index]
+        if _battle.battleStatus != BattleStatus.STARTED or self.channelOpen[_index + 1]:
+            continue
+        if (
+            (_battle.moves[0] != 0 and _battle.moves[1] != 0)
+            or block.timestamp >= self.lastMoveTime[_index + 1] + MOVE_TIMEOUT
+        ):
+            _ids.append(_index + 1)
+
+    return (_ids, _total)
+
+@view
+@external
+def getChangesSince(_block: uint256, _offset: uint256, _limit: uint256) -> StateChanges:
+    """
+    @dev Lists battles and players stamped after `_block`, scanning one page of indexes of both the
+         battles and the players arrays, so clients can refresh only what changed since their last sync
+    @notice Battles are addressed by 1-based id and players by index, both from `_offset + 1`; the
+            unused player at index 0 is never returned
+    @param _block Block number the client last synced at
+    @param _offset Number of indexes to skip
+    @param _limit Maximum number of indexes to scan, capped at MAX_BATTLE_PAGE
+    @return StateChanges with the changed battles and players and the total to page up to
+    """
+    _changes: StateChanges = empty(StateChanges)
+    _battle_total: uint256 = len(self.battles)
+    _player_total: uint256 = len(self.players) - 1
+    _changes.total = max(_battle_total, _player_total)
+
+    for i: uint256 in range(MAX_BATTLE_PAGE):
+        _index: uint256 = _offset + i + 1
+        if i >= _limit or _index > _changes.total:
+            break
+
+        if _index <= _battle_total and self.battleVersion[_index] > _block:
+            _changes.battleIds.append(_index)
+            _changes.battles.append(self.battles[_index - 1])
+
+        if _index <= _player_total and self.playerVersion[_index] > _block:
+            _player: Player = self.players[_index]
+            _changes.players.append(_player)
+            _changes.playerTokens.append(self.gameTokens[self.playerTokenInfo[_player.playerAddress]])
+
+    return _changes
+
+@view
+@external
+def uri(_id: uint256) -> String[512]:
+    """
+    @dev Returns the metadata URI of a card, BASE_URI followed by the card id and ".json"
+    @param _id The card id
+    @return The card's metadata URI
+    """
+    return concat(self.BASE_URI, uint2str(_id), ".json")
 
 # ------------------------------------------------------------------
 #                        EXTERNAL FUNCTIONS
 # ------------------------------------------------------------------
 
 @external
-def setURI(_new_uri: String[512]):
+def setURI(_new_uri: String[MAX_BASE_URI_LENGTH]):
     """
     @dev Updates the base URI for token metadata
     @param _new_uri New base URI for all tokens
     """
     self._check_owner()
     self.BASE_URI = _new_uri
-    log URI(concat(_new_uri, ""), 0)
+    log URI(_new_uri, 0)
+
+@external
+def setTrustedForwarder(_forwarder: address):
+    """
+    @dev Sets the forwarder allowed to relay moves on behalf of players
+    @param _forwarder Address of the forwarder contract, or the zero address to disable relaying
+    """
+    self._check_owner()
+    self.trustedForwarder = _forwarder
+
+@external
+def openChannel(_battleId: uint256):
+    """
+    @dev Hands a started battle's rounds to the trusted forwarder, which opens a channel once both
+         players signed its opening state. Moves and timeouts are blocked until the channel is closed.
+    @notice The forwarder checks that the battle is started and has no move of the round made yet
+    @param _battleId 1-based battle id, as stored in battleInfo
+    """
+    assert msg.sender == self.trustedForwarder, "Not the trusted forwarder"
+    self.channelOpen[_battleId] = True
+    self._touchBattle(_battleId)
+
+@external
+def closeChannel(_battleId: uint256, _health: uint256[2], _mana: uint256[2], _attack: uint256[2]):
+    """
+    @dev Takes a battle back from the trusted forwarder with the last state both players signed
+         off-chain, whose stats are written as if its rounds were played here. The battle goes on
+         on-chain, its move timeout counted from now.
+    @notice The forwarder checks the state: health can only have dropped off-chain, mana and attack
+            strength stay within their caps
+    @param _battleId 1-based battle id, as stored in battleInfo
+    @param _health Health of player 1 and player 2, in that order
+    @param _mana Mana of player 1 and player 2
+    @param _attack Attack strength of player 1's and player 2's game tokens, defense is the rest
+    """
+    assert msg.sender == self.trustedForwarder, "Not the trusted forwarder"
+    _players: address[2] = self.battles[_battleId - 1].players
+
+    for i: uint256 in range(2):
+        _index: uint256 = self.playerInfo[_players[i]]
+        self.players[_index].playerHealth = _health[i]
+        self.players[_index].playerMana = _mana[i]
+        _token: uint256 = self.playerTokenInfo[_players[i]]
+        self.gameTokens[_token].attackStrength = _attack[i]
+        self.gameTokens[_token].defenseStrength = MAX_ATTACK_DEFEND_STRENGTH - _attack[i]
+        self.playerVersion[_index] = block.number
+
+    self.channelOpen[_battleId] = False
+    self.lastMoveTime[_battleId] = block.timestamp
+    self._touchBattle(_battleId)
+
+# ------------------------------------------------------------------
+#                            MIGRATION
+# ------------------------------------------------------------------
+
+@internal
+def _importChunk(_start: uint256, _length: uint256, _count: uint256, _chunkHash: bytes32):
+    """
+    @dev Checks an import call and chains its chunk hash into importHash
+    @param _start Array index the chunk was read from in the previous deployment
+    @param _length Index the chunk must start at, e.g. the current length of the array it is appended to
+    @param _count Number of items in the chunk
+    @param _chunkHash Hash of the chunk computed by the migration tool, see script/migrate.py
+    """
+    self._check_owner()
+    assert self.importOpen, "Import is closed"
+    assert _start == _length, "Chunk out of order"
+    self.importHash = keccak256(concat(self.importHash, _chunkHash))
+    log ChunkImported(_start, _count, _chunkHash)
+
+@external
+def importGameTokens(_start: uint256, _tokens: DynArray[GameToken, MAX_IMPORT_CHUNK], _chunkHash: bytes32):
+    """
+    @dev Appends game tokens copied from a previous deployment, keeping their indexes
+    @param _start Index of the first token, must be the current number of tokens
+    @param _tokens Game tokens in index order
+    @param _chunkHash Hash of the chunk, chained into importHash
+    """
+    self._importChunk(_start, len(self.gameTokens), len(_tokens), _chunkHash)
+    self.importedTokens += len(_tokens)
+    for _token: GameToken in _tokens:
+        self.gameTokens.append(_token)
+
+@external
+def importPlayers(_start: uint256, _players: DynArray[Player, MAX_IMPORT_CHUNK], _tokenIndexes: DynArray[uint256, MAX_IMPORT_CHUNK], _chunkHash: bytes32):
+    """
+    @dev Appends players copied from a previous deployment, keeping their indexes
+    @param _start Index of the first player, must be the current number of players
+    @param _players Players in index order
+    @param _tokenIndexes Index of each player's current game token
+    @param _chunkHash Hash of the chunk, chained into importHash
+    """
+    self._importChunk(_start, len(self.players), len(_players), _chunkHash)
+    assert len(_tokenIndexes) == len(_players), "Players and token indexes length mismatch"
+    for i: uint256 in range(len(_players), bound=MAX_IMPORT_CHUNK):
+        _addr: address = _players[i].playerAddress
+        assert self.playerInfo[_addr] == 0, "Player already registered"
+        self.playerInfo[_addr] = len(self.players)
+        self.playerTokenInfo[_addr] = _tokenIndexes[i]
+        self.players.append(_players[i])
+
+@external
+def importBalances(_start: uint256, _balances: DynArray[uint256, MAX_IMPORT_CHUNK], _chunkHash: bytes32):
+    """
+    @dev Sets token balances copied from a previous deployment, once their owners are imported.
+         Chunks cover player index ranges in order: every owner must be a player at or after
+         `_start` and after the owners of earlier entries, and `_start` past the last owner of
+         the previous chunk, so a chunk cannot be resent or sent out of order.
+    @param _start Index of the first player the chunk was read from
+    @param _balances Balances packed as amount << 168 | token id << 160 | owner address,
+           ordered by owner player index
+    @param _chunkHash Hash of the chunk, chained into importHash
+    """
+    self._importChunk(_start, max(_start, self.balanceImportIndex), len(_balances), _chunkHash)
+    _index: uint256 = _start
+    for _entry: uint256 in _balances:
+        _owner: address = convert(convert(_entry & convert(max_value(uint160), uint256), uint160), address)
+        _id: uint256 = (_entry >> 160) & 255
+        assert self.playerInfo[_owner] >= _index, "Balance out of order"
+        _index = self.playerInfo[_owner]
+        self.importedSupply = self.importedSupply + (_entry >> 168) - self._balances[_id][_owner]
+        self._balances[_id][_owner] = _entry >> 168
+    self.balanceImportIndex = _index + 1
+
+@external
+def importBattles(_start: uint256, _battles: DynArray[Battle, MAX_IMPORT_CHUNK], _chunkHash: bytes32):
+    """
+    @dev Appends battles copied from a previous deployment, keeping their ids. Started battles
+         get a fresh move timeout from the time of import.
+    @param _start Index of the first battle, must be the current number of battles
+    @param _battles Battles in id order
+    @param _chunkHash Hash of the chunk, chained into importHash
+    """
+    self._importChunk(_start, len(self.battles), len(_battles), _chunkHash)
+    for _battle: Battle in _battles:
+        self.battles.append(_battle)
+        self.battleInfo[_battle.name] = len(self.battles)
+        if _battle.battleStatus == BattleStatus.STARTED:
+            self.lastMoveTime[len(self.battles)] = block.timestamp
+
+@external
+def finishImport():
+    """
+    @dev Permanently closes bulk import and opens registration and gameplay. Call it once a
+         migration into a contract deployed with import open is complete.
+    """
+    self._check_owner()
+    self.importOpen = False
 
 @external
 def registerPlayer(_name: String[100], _gameTokenName: String[1000]):
@@ -949,33 +1402,7 @@ def createBattle(_name: String[100]) -> Battle:
     # Check if player is registered
     assert self.playerInfo[msg.sender] != 0, "Please Register Player First"
 
-    # Check battle doesn't already exist
-    assert self.battleInfo[_name] == 0, "Battle already exists!"
-
-    # Create battle hash
-    battleHash: bytes32 = keccak256(abi_encode(_name))  # Changed from _abi_encode to abi_encode
-
-    # Create new battle struct
-    _battle: Battle = Battle(
-        battleStatus=BattleStatus.PENDING,
-        battleHash=battleHash,
-        name=_name,
-        players=[msg.sender, empty(address)],
-        moves=[convert(0, uint8), convert(0, uint8)],
-        winner=empty(address)
-    )
-
-    # Set the battle ID first (using current length + 1)
-    _id: uint256 = len(self.battles) + 1  # Changed from len - 1 to len + 1
-    self.battleInfo[_name] = _id
-
-    # Then add battle to storage
-    self.battles.append(_battle)
-    
-    # Emit NewBattle event
-    log NewBattle(_name, msg.sender, empty(address))
-    
-    return _battle
+    return self._createBattle(_name)
 
 @external
 def joinBattle(_name: String[100]) -> Battle:
@@ -984,35 +1411,71 @@ def joinBattle(_name: String[100]) -> Battle:
     @param _name battle name; name of battle player wants to join
     @return Battle struct containing the updated battle information
     """
-    # Get battle from storage
-    _battle_index: uint256 = self.battleInfo[_name]
-    assert _battle_index != 0, "No battle found"
-    
-    # Get battle data (using 1-based indexing)
-    _battle: Battle = self.battles[_battle_index - 1]
+    return self._joinBattle(self.battleInfo[_name])
 
-    # Check player requirements
-    assert self.playerInfo[msg.sender] != 0, "Player not registered"
-    assert msg.sender != _battle.players[0], "Own battle"
-    assert _battle.battleStatus == BattleStatus.PENDING, "Battle in progress"
-
-    # Check if player is in battle
-    player: Player = self.players[self.playerInfo[msg.sender]]
-    assert not player.inBattle, "Already in battle"
-
-    # Update battle
-    _battle.battleStatus = BattleStatus.STARTED
-    _battle.players[1] = msg.sender
-
-    # Update battle in storage
-    self.battles[_battle_index - 1] = _battle
-
-    # Update player statuses
-    self.players[self.playerInfo[_battle.players[0]]].inBattle = True
-    self.players[self.playerInfo[msg.sender]].inBattle = True
+@external
+def joinBattleById(_battleId: uint256) -> Battle:
+    """
+    @dev Player joins battle, addressed by id instead of name
+    @param _battleId 1-based battle id, as stored in battleInfo
+    @return Battle struct containing the updated battle information
+    """
+    return self._joinBattle(_battleId)
 
-    # Emit event
-    log NewBattle(_battle.name, _battle.players[0], msg.sender)
+@external
+def queueForBattle(_name: String[100]) -> Battle:
+    """
+    @dev Pairs the caller with the oldest player waiting in the matchmaking queue and starts the battle.
+         If nobody is waiting, a new pending battle named `_name` is created and queued instead.
+    @notice Queue entries whose battle was joined, quit or whose creator entered another battle are
+            skipped, at most MAX_QUEUE_SKIP per call; a skipped battle still pending is cancelled.
+            `_name` is only used when no opponent is found.
+    @param _name battle name used if the caller has to wait for an opponent
+    @return Battle struct containing the started or newly queued battle
+    """
+    assert self.playerInfo[msg.sender] != 0, "Please Register Player First"
+    assert not self.players[self.playerInfo[msg.sender]].inBattle, "Already in battle"
+
+    # A player can only wait in one queued battle at a time
+    _queued_index: uint256 = self.queuedBattle[msg.sender]
+    if _queued_index != 0:
+        assert self.battles[_queued_index - 1].battleStatus != BattleStatus.PENDING, "Already queued"
+
+    # Pop the oldest waiting battle that can still be joined
+    _head: uint256 = self.matchQueueHead
+    _tail: uint256 = self.matchQueueTail
+    for i: uint256 in range(MAX_QUEUE_SKIP):
+        if _head == _tail:
+            break
+
+        _battle_index: uint256 = self.matchQueue[_head]
+        _head += 1
+        _waiting: Battle = self.battles[_battle_index - 1]
+
+        if (
+            _waiting.battleStatus == BattleStatus.PENDING
+            and _waiting.players[0] != msg.sender
+            and not self.players[self.playerInfo[_waiting.players[0]]].inBattle
+        ):
+            self.matchQueueHead = _head
+            return self._joinBattle(_battle_index)
+
+        # A creator who entered another battle meanwhile can't be paired, cancel their waiting battle
+        # so they can queue again once that battle is over
+        if _waiting.battleStatus == BattleStatus.PENDING:
+            self.battles[_battle_index - 1].battleStatus = BattleStatus.ENDED
+            self._touchBattle(_battle_index)
+            self.queuedBattle[_waiting.players[0]] = 0
+            log BattleEnded(_waiting.name, empty(address), empty(address))
+
+    self.matchQueueHead = _head
+
+    # Nobody to pair with, wait at the tail of the queue
+    _battle: Battle = self._createBattle(_name)
+    _new_index: uint256 = self.battleInfo[_name]
+    self.matchQueue[_tail] = _new_index
+    self.matchQueueTail = _tail + 1
+    self.queuedBattle[msg.sender] = _new_index
 
     return _battle
     
@@ -1020,79 +1483,91 @@ def joinBattle(_name: String[100]) -> Battle:
 def attackOrDefendChoice(_choice: uint8, _battleName: String[100]):
     """
     @dev User chooses attack or defense move for battle card
+    @notice Can be relayed by the trusted forwarder on behalf of the player
     @param _choice Move choice (1 for attack, 2 for defense)
     @param _battleName Name of the battle
     """
-    # Initial validations
-    assert _choice == 1 or _choice == 2, "Invalid move choice"
-    
-    # Get battle from storage
-    _battle_index: uint256 = self.battleInfo[_battleName]
-    assert _battle_index != 0, "Battle doesn't exist!"
-    
-    # Get battle data
-    _battle: Battle = self.battles[_battle_index - 1]
-    
-    # Battle status checks
-    assert _battle.battleStatus == BattleStatus.STARTED, "Battle not started"
-    assert _battle.battleStatus != BattleStatus.ENDED, "Battle has ended"
-    
-    # Verify player participation
-    assert msg.sender == _battle.players[0] or msg.sender == _battle.players[1], "Not in battle"
-    
-    # Determine player index
-    _player_index: uint256 = 0
-    if msg.sender == _battle.players[1]:
-        _player_index = 1
-    
-    # Check if previous round needs resolution
-    if _battle.moves[0] != 0 and _battle.moves[1] != 0:
-        # Previous round needs resolution
-        self._awaitBattleResults(_battleName)
-        # Reload battle state after resolution
-        _battle = self.battles[_battle_index - 1]
-    
-    # Verify move hasn't been made this round
-    assert _battle.moves[_player_index] == 0, "Move already made"
-    
-    # Register the move
-    self._registerPlayerMove(_player_index, _choice, _battleName)
-    
-    # Get updated battle state
-    _battle = self.battles[_battle_index - 1]
-    
-    # Calculate and check if round complete
-    _moves_made: uint256 = 0
-    if _battle.moves[0] != 0:
-        _moves_made += 1
-    if _battle.moves[1] != 0:
-        _moves_made += 1
-    
-    # Emit move event
-    log BattleMove(_battleName, _moves_made == 1)
-    
-    # Resolve round if both moves made
-    if _moves_made == 2:
-        self._awaitBattleResults(_battleName)
+    self._attackOrDefendChoice(self._msgSender(), _choice, self.battleInfo[_battleName])
+
+@external
+def attackOrDefendChoiceById(_choice: uint8, _battleId: uint256):
+    """
+    @dev User chooses attack or defense move for battle card, addressed by battle id instead of
+         name, which saves the name's calldata and hashing
+    @notice Can be relayed by the trusted forwarder on behalf of the player
+    @param _choice Move choice (1 for attack, 2 for defense)
+    @param _battleId 1-based battle id, as stored in battleInfo
+    """
+    self._attackOrDefendChoice(self._msgSender(), _choice, _battleId)
+
+@external
+def batchAttackOrDefendChoice(_choices: DynArray[uint8, MAX_BATCH_SIZE], _battleNames: DynArray[String[100], MAX_BATCH_SIZE]):
+    """
+    @dev Submits the sender's moves for several battles in one transaction
+    @notice Reverts as a whole if any single move is invalid, as attackOrDefendChoice would
+    @param _choices Move choices (1 for attack, 2 for defense), one per battle
+    @param _battleNames Names of the battles, in the same order as `_choices`
+    """
+    assert len(_choices) == len(_battleNames), "Choices and battles length mismatch"
+
+    for i: uint256 in range(MAX_BATCH_SIZE):
+        if i >= len(_choices):
+            break
+        self._attackOrDefendChoice(msg.sender, _choices[i], self.battleInfo[_battleNames[i]])
+
+@external
+def resolveBattles(_battleIds: DynArray[uint256, MAX_BATCH_SIZE]) -> uint256:
+    """
+    @dev Resolves every listed battle whose moves are both set and times out abandoned ones.
+         Callable by anyone, intended for resolution keepers.
+    @notice A started battle with no move for MOVE_TIMEOUT seconds is ended in favour of the
+            player who moved, or without a winner if neither did. Battles that need no action
+            are skipped instead of reverting, so a stale id never fails the whole batch.
+    @param _battleIds 1-based battle indexes, as stored in battleInfo
+    @return Number of battles resolved or timed out
+    """
+    self._checkImportClosed()
+    _handled: uint256 = 0
+    for _battle_id: uint256 in _battleIds:
+        if _battle_id == 0 or _battle_id > len(self.battles):
+            continue
+
+        _battle: Battle = self.battles[_battle_id - 1]
+        if _battle.battleStatus != BattleStatus.STARTED or self.channelOpen[_battle_id]:
+            continue
+
+        if _battle.moves[0] != 0 and _battle.moves[1] != 0:
+            self._resolveBattle(_battle_id, _battle)
+            _handled += 1
+        elif block.timestamp >= self.lastMoveTime[_battle_id] + MOVE_TIMEOUT:
+            _winner: address = empty(address)
+            if _battle.moves[0] != 0:
+                _winner = _battle.players[0]
+            elif _battle.moves[1] != 0:
+                _winner = _battle.players[1]
+            self._endBattle(_winner, _battle_id, _battle)
+            _handled += 1
+
+    return _handled
+
 @external
 def quitBattle(_battleName: String[100]):
     """
     @dev Allows a player to quit an ongoing battle, resulting in the other player winning
+    @notice Can be relayed by the trusted forwarder on behalf of the player
     @param _battleName Name of the battle to quit
     """
-    # Get battle from storage
-    _battle_index: uint256 = self.battleInfo[_battleName]
-    assert self.battleInfo[_battleName] != 0, "Battle doesn't exist!"
-    _battle: Battle = self.battles[_battle_index - 1]
+    self._quitBattle(self.battleInfo[_battleName])
 
-    # Verify sender is in the battle
-    assert msg.sender == _battle.players[0] or msg.sender == _battle.players[1], "You are not in this battle!"
-
-    # Determine winner (opposite of who quit)
-    if _battle.players[0] == msg.sender:
-        self._endBattle(_battle.players[1], _battle)
-    else:
-        self._endBattle(_battle.players[0], _battle)
+@external
+def quitBattleById(_battleId: uint256):
+    """
+    @dev Allows a player to quit an ongoing battle, addressed by id instead of name
+    @notice Can be relayed by the trusted forwarder on behalf of the player, which settles
+            off-chain battles through it
+    @param _battleId 1-based battle id, as stored in battleInfo
+    """
+    self._quitBattle(_battleId)
 
 @external
 def getBattleState(_name: String[100]) -> Battle:
@@ -1121,11 +1596,28 @@ def checkBattleResolution(_name: String[100]) -> Battle:
     @param _name Name of the battle to check
     @return Battle Updated battle state
     """
-    _battle_index: uint256 = self.battleInfo[_name]
-    assert _battle_index != 0, "Battle doesn't exist!"
-    _battle: Battle = self.battles[_battle_index - 1]
-    
-    if _battle.moves[0] != 0 and _battle.moves[1] != 0:
-        self._awaitBattleResults(_name)
-        
+    return self._checkBattleResolution(self.battleInfo[_name])
+
+@external
+def checkBattleResolutionById(_battleId: uint256) -> Battle:
+    """
+    @dev Check and trigger battle resolution if needed, addressed by battle id
+    @param _battleId 1-based battle id, as stored in battleInfo
+    @return Battle Updated battle state
+    """
+    return self._checkBattleResolution(_battleId)
+
+@internal
+def _checkBattleResolution(_battle_index: uint256) -> Battle:
+    """
+    @dev Resolves the battle when both moves are in
+    @param _battle_index 1-based index of the battle in the battles array, 0 if not found
+    @return Battle Updated battle state
+    """
+    assert _battle_index != 0 and _battle_index <= len(self.battles), "Battle doesn't exist!"
+    _moves: uint8[2] = self.battles[_battle_index - 1].moves
+
+    if _moves[0] != 0 and _moves[1] != 0:
+        self._awaitBattleResults(msg.sender, _battle_index)
+
     return self.battles[_battle_index - 1]
\ No newline at end of file
@@ -0,0 +1,138 @@
+"""
+Calldata and gas of the battle entry points addressed by name versus by id.
+
+Every battle entry point taking a `String[100]` name has an id counterpart
+(`joinBattleById`, `attackOrDefendChoiceById`, ...) taking the 1-based battle
+id stored in `battleInfo`. The id is a single word of calldata, while a name
+costs an offset, a length and its padded bytes, and has to be hashed into the
+`battleInfo` key on every call. For battle names of several lengths, each pair
+of entry points is called from the same state and compared on calldata bytes,
+calldata gas and execution gas. Results are written to
+out/battle_id_benchmark.csv.
+
+Run with `mox run battle_id_benchmark`.
+"""
+
+import csv
+from pathlib import Path
+
+import boa
+
+from contracts import zkTitans
+
+OUT_DIR = Path("out")
+
+# Lengths of the benchmarked battle names, up to the String[100] maximum
+NAME_LENGTHS = [8, 32, 100]
+
+# Transaction calldata gas per zero and non-zero byte
+GAS_PER_ZERO_BYTE = 4
+GAS_PER_NONZERO_BYTE = 16
+
+# Entry point labels of the two attackOrDefendChoice measurements
+FIRST_MOVE = "first move"
+RESOLVING_MOVE = "resolving move"
+
+
+def calldata_gas(calldata: bytes) -> int:
+    zeros = calldata.count(0)
+    return zeros * GAS_PER_ZERO_BYTE + (len(calldata) - zeros) * GAS_PER_NONZERO_BYTE
+
+
+def _measure(titans, function: str, args: tuple, sender: str) -> dict:
+    method = getattr(titans, function)
+    calldata = method.prepare_calldata(*args)
+    with boa.env.prank(sender):
+        method(*args)
+    return {
+        "calldata_bytes": len(calldata),
+        "calldata_gas": calldata_gas(calldata),
+        "execution_gas": titans._computation.get_gas_used(),
+    }
+
+
+def benchmark_name(name_length: int) -> list[dict]:
+    """
+    Measure every name and id entry point pair on battles named with `name_length` characters.
+    @return: One row per entry point pair with the measurements of both variants
+    """
+    with boa.env.anchor():
+        titans = zkTitans.deploy("", False)
+        player1 = boa.env.generate_address("id benchmark player 1")
+        player2 = boa.env.generate_address("id benchmark player 2")
+        with boa.env.prank(player1):
+            titans.registerPlayer("Id Benchmark One", "Token")
+        with boa.env.prank(player2):
+            titans.registerPlayer("Id Benchmark Two", "Token")
+
+        name = "B" * name_length
+        with boa.env.prank(player1):
+            titans.createBattle(name)
+        battle_id = titans.battleInfo(name)
+
+        def compare(entry_point: str, function: str, by_name: tuple, by_id: tuple, sender: str, setup=()):
+            row = {"name_length": name_length, "entry_point": entry_point}
+            for variant, suffix, args in (("name", "", by_name), ("id", "ById", by_id)):
+                with boa.env.anchor():
+                    for setup_sender, setup_function, setup_args in setup:
+                        with boa.env.prank(setup_sender):
+                            getattr(titans, setup_function)(*setup_args)
+                    for key, value in _measure(titans, function + suffix, args, sender).items():
+                        row[f"{variant}_{key}"] = value
+            return row
+
+        joined = [(player2, "joinBattle", (name,))]
+        return [
+            compare("joinBattle", "joinBattle", (name,), (battle_id,), player2),
+            compare(FIRST_MOVE, "attackOrDefendChoice", (1, name), (1, battle_id), player1, joined),
+            compare(
+                RESOLVING_MOVE,
+                "attackOrDefendChoice",
+                (2, name),
+                (2, battle_id),
+                player2,
+                joined + [(player1, "attackOrDefendChoice", (1, name))],
+            ),
+            compare(
+                "checkBattleResolution",
+                "checkBattleResolution",
+                (name,),
+                (battle_id,),
+                player1,
+                joined + [(player1, "attackOrDefendChoice", (1, name))],
+            ),
+            compare("quitBattle", "quitBattle", (name,), (battle_id,), player1, joined),
+        ]
+
+
+def run(name_lengths: list[int] = NAME_LENGTHS) -> list[dict]:
+    rows = []
+    for length in name_lengths:
+        rows += benchmark_name(length)
+    for row in rows:
+        row["gas_saved"] = (row["name_calldata_gas"] + row["name_execution_gas"]) - (
+            row["id_calldata_gas"] + row["id_execution_gas"]
+        )
+    return rows
+
+
+def write_csv(rows: list[dict], path: Path = OUT_DIR / "battle_id_benchmark.csv"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def moccasin_main():
+    rows = run()
+    write_csv(rows)
+    print(f"{'name':>5} {'entry point':<22} {'calldata bytes':>16} {'calldata gas':>15} {'execution gas':>17} {'saved':>7}")
+    for row in rows:
+        print(
+            f"{row['name_length']:>5} {row['entry_point']:<22} "
+            f"{row['name_calldata_bytes']:>7} -> {row['id_calldata_bytes']:<5} "
+            f"{row['name_calldata_gas']:>6} -> {row['id_calldata_gas']:<5} "
+            f"{row['name_execution_gas']:>7} -> {row['id_execution_gas']:<6} "
+            f"{row['gas_saved']:>7,}"
+        )
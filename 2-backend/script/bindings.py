@@ -0,0 +1,294 @@
+"""
+Typed Python bindings for the zkTitans structs.
+
+`Player`, `GameToken` and `Battle` mirror the structs in contracts/zkTitans.vy
+field for field. They can be built from the tuples a contract call returns, or
+decoded straight from raw ABI return data with the `decode_*` functions, which
+know the contracts' fixed struct layouts and skip the generic eth_abi machinery.
+`battles_to_array` decodes a `getAllBattles` result into a NumPy structured
+array for columnar processing.
+
+NumPy and eth_utils are imported on first use, so that the module stays cheap
+to import for `script.client`.
+"""
+
+import enum
+import functools
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+WORD = 32
+
+
+class BattleStatus(enum.IntFlag):
+    PENDING = 1
+    STARTED = 2
+    ENDED = 4
+
+
+class _Struct:
+    """
+    Base class of the struct bindings; fields are set positionally in FIELDS order.
+    """
+
+    __slots__ = ()
+    FIELDS: tuple[str, ...] = ()
+    # ABI types of the fields, as in the compiled contract ABI
+    ABI_TYPES: tuple[str, ...] = ()
+
+    def __init__(self, *values):
+        for field, value in zip(self.FIELDS, values, strict=True):
+            setattr(self, field, value)
+
+    @classmethod
+    def from_tuple(cls, values: tuple):
+        return cls(*values)
+
+    @classmethod
+    def abi_type(cls) -> str:
+        return f"({','.join(cls.ABI_TYPES)})"
+
+    def to_tuple(self) -> tuple:
+        return tuple(getattr(self, field) for field in self.FIELDS)
+
+    def __eq__(self, other):
+        if isinstance(other, _Struct):
+            return type(self) is type(other) and self.to_tuple() == other.to_tuple()
+        if isinstance(other, tuple):
+            return self.to_tuple() == other
+        return NotImplemented
+
+    def __repr__(self):
+        values = ", ".join(f"{field}={getattr(self, field)!r}" for field in self.FIELDS)
+        return f"{type(self).__name__}({values})"
+
+
+class Player(_Struct):
+    __slots__ = FIELDS = ("playerAddress", "playerName", "playerMana", "playerHealth", "inBattle")
+    ABI_TYPES = ("address", "string", "uint256", "uint256", "bool")
+
+
+class GameToken(_Struct):
+    __slots__ = FIELDS = ("name", "id", "attackStrength", "defenseStrength")
+    ABI_TYPES = ("string", "uint256", "uint256", "uint256")
+
+
+class Battle(_Struct):
+    __slots__ = FIELDS = ("battleStatus", "battleHash", "name", "players", "moves", "winner")
+    ABI_TYPES = ("uint256", "bytes32", "string", "address[2]", "uint8[2]", "address")
+
+    @classmethod
+    def from_tuple(cls, values: tuple):
+        status, battle_hash, name, players, moves, winner = values
+        return cls(BattleStatus(status), battle_hash, name, tuple(players), tuple(moves), winner)
+
+
+# ------------------------------------------------------------------
+#                        SCALAR DECODING
+# ------------------------------------------------------------------
+
+
+def _uint(data: bytes, offset: int) -> int:
+    return int.from_bytes(data[offset : offset + WORD], "big")
+
+
+@functools.lru_cache(maxsize=65_536)
+def _checksum(raw: bytes) -> str:
+    # Checksumming hashes the address, and the same players show up over and over.
+    # EIP-55 with eth_hash directly, eth_utils takes several times longer to import
+    from eth_hash.auto import keccak
+
+    hex_address = raw.hex()
+    digest = keccak(hex_address.encode()).hex()
+    return "0x" + "".join(c.upper() if int(d, 16) >= 8 else c for c, d in zip(hex_address, digest))
+
+
+def _address(data: bytes, offset: int) -> str:
+    return _checksum(data[offset + 12 : offset + WORD])
+
+
+def _string(data: bytes, offset: int) -> str:
+    length = _uint(data, offset)
+    return data[offset + WORD : offset + WORD + length].decode()
+
+
+# ------------------------------------------------------------------
+#                        STRUCT DECODING
+# ------------------------------------------------------------------
+
+
+def _player_at(data: bytes, start: int) -> Player:
+    return Player(
+        _address(data, start),
+        _string(data, start + _uint(data, start + WORD)),
+        _uint(data, start + 2 * WORD),
+        _uint(data, start + 3 * WORD),
+        _uint(data, start + 4 * WORD) != 0,
+    )
+
+
+def _game_token_at(data: bytes, start: int) -> GameToken:
+    return GameToken(
+        _string(data, start + _uint(data, start)),
+        _uint(data, start + WORD),
+        _uint(data, start + 2 * WORD),
+        _uint(data, start + 3 * WORD),
+    )
+
+
+def _battle_at(data: bytes, start: int) -> Battle:
+    return Battle(
+        BattleStatus(_uint(data, start)),
+        data[start + WORD : start + 2 * WORD],
+        _string(data, start + _uint(data, start + 2 * WORD)),
+        (_address(data, start + 3 * WORD), _address(data, start + 4 * WORD)),
+        (_uint(data, start + 5 * WORD), _uint(data, start + 6 * WORD)),
+        _address(data, start + 7 * WORD),
+    )
+
+
+def _decode_one(data, decode_at):
+    data = bytes(data)
+    return decode_at(data, _uint(data, 0))
+
+
+def _decode_many(data, decode_at) -> list:
+    data = bytes(data)
+    base = _uint(data, 0)
+    count = _uint(data, base)
+    heads = base + WORD
+    return [decode_at(data, heads + _uint(data, heads + i * WORD)) for i in range(count)]
+
+
+def decode_player(data: bytes) -> Player:
+    """
+    Decode the return data of `getPlayer`
+    """
+    return _decode_one(data, _player_at)
+
+
+def decode_players(data: bytes) -> list[Player]:
+    """
+    Decode the return data of `getAllPlayers`
+    """
+    return _decode_many(data, _player_at)
+
+
+def decode_game_token(data: bytes) -> GameToken:
+    """
+    Decode the return data of `getPlayerToken`
+    """
+    return _decode_one(data, _game_token_at)
+
+
+def decode_game_tokens(data: bytes) -> list[GameToken]:
+    """
+    Decode the return data of `getAllPlayerTokens`
+    """
+    return _decode_many(data, _game_token_at)
+
+
+def decode_battle(data: bytes) -> Battle:
+    """
+    Decode the return data of `getBattle`
+    """
+    return _decode_one(data, _battle_at)
+
+
+def decode_battles(data: bytes) -> list[Battle]:
+    """
+    Decode the return data of `getAllBattles`
+    """
+    return _decode_many(data, _battle_at)
+
+
+# ------------------------------------------------------------------
+#                        COLUMNAR DECODING
+# ------------------------------------------------------------------
+
+
+@functools.cache
+def _battle_dtype() -> "np.dtype":
+    import numpy as np
+
+    # Addresses and the battle hash are kept as raw bytes, names as fixed-width unicode
+    return np.dtype(
+        [
+            ("battleStatus", "u1"),
+            ("battleHash", "V32"),
+            ("name", "U100"),
+            ("players", "V20", (2,)),
+            ("moves", "u1", (2,)),
+            ("winner", "V20"),
+        ]
+    )
+
+
+def __getattr__(name: str):
+    # BATTLE_DTYPE is built on first access, with NumPy
+    if name == "BATTLE_DTYPE":
+        return _battle_dtype()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _gather(buf: "np.ndarray", positions: "np.ndarray", width: int) -> "np.ndarray":
+    import numpy as np
+
+    # Row i holds the `width` bytes starting at positions[i]
+    return buf[positions[:, None] + np.arange(width)]
+
+
+def _words(buf: "np.ndarray", positions: "np.ndarray") -> "np.ndarray":
+    import numpy as np
+
+    # Every integer in these structs fits the low 8 bytes of its word
+    return _gather(buf, positions + WORD - 8, 8).view(">u8").ravel().astype(np.int64)
+
+
+def battles_to_array(data: bytes) -> "np.ndarray":
+    """
+    Decode the return data of `getAllBattles` into a BATTLE_DTYPE structured array,
+    gathering every fixed-size field for all battles at once.
+    """
+    import numpy as np
+
+    data = bytes(data)
+    buf = np.frombuffer(data, dtype=np.uint8)
+    base = _uint(data, 0)
+    count = _uint(data, base)
+    heads = base + WORD
+
+    starts = heads + _words(buf, heads + WORD * np.arange(count, dtype=np.int64))
+    table = np.empty(count, dtype=_battle_dtype())
+    if count == 0:
+        return table
+
+    table["battleStatus"] = _words(buf, starts)
+    table["battleHash"] = _gather(buf, starts + WORD, WORD).view("V32").ravel()
+    for i in range(2):
+        table["players"][:, i] = _gather(buf, starts + (3 + i) * WORD + 12, 20).view("V20").ravel()
+        table["moves"][:, i] = _words(buf, starts + (5 + i) * WORD)
+    table["winner"] = _gather(buf, starts + 7 * WORD + 12, 20).view("V20").ravel()
+
+    # Names are variable length, so they are sliced one by one
+    name_starts = starts + _words(buf, starts + 2 * WORD)
+    name_lengths = _words(buf, name_starts)
+    table["name"] = [
+        data[start + WORD : start + WORD + length].decode()
+        for start, length in zip(name_starts.tolist(), name_lengths.tolist())
+    ]
+    return table
+
+
+def call_raw(contract, function_name: str, *args) -> bytes:
+    """
+    Call a view function of a boa contract and return its raw ABI encoded output,
+    ready for the `decode_*` functions.
+    """
+    # Only needed here, the decoders work on bytes from any RPC client
+    import boa
+
+    calldata = getattr(contract, function_name).prepare_calldata(*args)
+    return bytes(boa.env.raw_call(contract.address, data=calldata).output)
@@ -0,0 +1,282 @@
+"""
+Read-through cache for zkTitans view calls.
+
+`CachedTitans` serves `getPlayer`, `getPlayerToken`, `isPlayer`, `isBattle`
+and `getBattle` from a bounded LRU keyed by (function, argument, block) and
+drops exactly the entries a contract event makes stale. Feed it every zkTitans
+log in order with `process_logs` before reading state from a newer block; an
+entry read at the latest block then stays valid until a processed event
+touches it. A read at an explicit block is fetched at that block, through the
+`call(name, *args, block=...)` of a `script.client.Client`, and is never
+invalidated, since a past block's state cannot change.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Iterable
+
+import eth_abi
+from eth_utils import keccak
+
+# Functions keyed by player address, the rest are keyed by battle name
+PLAYER_FUNCTIONS = ("getPlayer", "getPlayerToken", "isPlayer")
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+
+def decode_log(contract, topics: list[int], data: bytes) -> tuple[str, dict[str, Any]]:
+    """
+    Decode one raw log of `contract` to an (event name, args) pair.
+    Indexed strings are kept as their topic hash, which is all a log carries.
+    """
+    event_t = contract.event_for[topics[0]]
+    topic_values = iter(topics[1:])
+    data_types = [
+        typ.abi_type.selector_name()
+        for indexed, typ in zip(event_t.indexed, event_t.arguments.values())
+        if not indexed
+    ]
+    data_values = iter(eth_abi.decode(data_types, data))
+
+    args = {}
+    for indexed, (name, typ) in zip(event_t.indexed, event_t.arguments.items()):
+        if not indexed:
+            args[name] = next(data_values)
+            continue
+        topic = next(topic_values).to_bytes(32, "big")
+        if typ.abi_type.is_dynamic():
+            args[name] = topic
+        else:
+            args[name] = eth_abi.decode([typ.abi_type.selector_name()], topic)[0]
+    return event_t.name, args
+
+
+def decode_boa_logs(contract, computation=None) -> list[tuple[str, dict[str, Any]]]:
+    """
+    Decode the logs `contract` emitted in its last call to (event name, args) pairs.
+    Unlike `contract.get_logs()`, indexed strings are kept as their topic hash
+    instead of failing to decode.
+    """
+    computation = computation or contract._computation
+    return [
+        decode_log(contract, topics, data)
+        for _, address, topics, data in sorted(contract._get_logs(computation, True))
+        if address == contract._address.canonical_address
+    ]
+
+
+class CachedTitans:
+    """
+    Caching wrapper of a zkTitans contract.
+    @param titans: zkTitans contract, or any object with the cached view functions
+    @param max_entries: Maximum number of cached results before the least recently used is evicted
+    """
+
+    def __init__(self, titans, max_entries: int = 10_000):
+        self.titans = titans
+        self.max_entries = max_entries
+        self.block = 0
+
+        # (function, key) -> (result, block it was read at)
+        self._entries: OrderedDict[tuple[str, Any], tuple[Any, int]] = OrderedDict()
+        # Players of every known battle, and the unfinished battles of every player
+        self._battle_players: dict[str, tuple[str, str]] = {}
+        self._player_battles: dict[str, set[str]] = {}
+        # BattleMove only carries the hash of the battle name
+        self._name_hashes: dict[bytes, str] = {}
+        self._lock = threading.Lock()
+        # Bumped whenever logs are processed, so a read racing with them is not cached
+        self._generation = 0
+
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+    # ------------------------------------------------------------------
+    #                        CACHED VIEW CALLS
+    # ------------------------------------------------------------------
+
+    def getPlayer(self, addr: str, block: int | None = None):
+        return self._read("getPlayer", addr, block)
+
+    def getPlayerToken(self, addr: str, block: int | None = None):
+        return self._read("getPlayerToken", addr, block)
+
+    def isPlayer(self, addr: str, block: int | None = None) -> bool:
+        return self._read("isPlayer", addr, block)
+
+    def getBattle(self, name: str, block: int | None = None):
+        return self._read("getBattle", name, block)
+
+    def isBattle(self, name: str, block: int | None = None) -> bool:
+        return self._read("isBattle", name, block)
+
+    # ------------------------------------------------------------------
+    #                          INVALIDATION
+    # ------------------------------------------------------------------
+
+    def process_logs(self, logs: Iterable, block: int | None = None):
+        """
+        Invalidate entries made stale by `logs`, in emission order.
+        @param logs: (event name, args dict) pairs, see `decode_boa_logs`
+        @param block: Block the logs were emitted in, cached reads are tagged with it
+        """
+        logs = list(logs)
+        with self._lock:
+            unseen = {
+                args["battleName"]
+                for name, args in logs
+                if name == "BattleEnded" and args["winner"] == ZERO_ADDRESS and args["battleName"] not in self._battle_players
+            }
+        # A timed out battle without moves names no player; read who fought it before taking the lock
+        fetched = {battle_name: self._fetch_players(battle_name) for battle_name in unseen}
+
+        with self._lock:
+            self._generation += 1
+            for name, args in logs:
+                self._process_event(name, args, fetched)
+            if block is not None:
+                self.block = max(self.block, block)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def metrics(self) -> dict[str, float]:
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries), "hit_rate": self.hit_rate}
+
+    # ------------------------------------------------------------------
+    #                            INTERNALS
+    # ------------------------------------------------------------------
+
+    def _read(self, function: str, arg: str, block: int | None):
+        # Entries of the latest block have block None; they are the ones events invalidate
+        key = (function, self._normalize(function, arg), block)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[0]
+            self.stats["misses"] += 1
+            read_block = self.block if block is None else block
+            generation = self._generation
+
+        # Reverts propagate and are never cached
+        if block is None:
+            result = getattr(self.titans, function)(arg)
+        else:
+            result = self.titans.call(function, arg, block=hex(block))
+
+        with self._lock:
+            if block is None and generation != self._generation:
+                return result
+            self._entries[key] = (result, read_block)
+            self._entries.move_to_end(key)
+            if function == "getBattle" and block is None:
+                self._index_battle(arg, result[3][0], result[3][1], ended=result[0] == 4)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+        return result
+
+    @staticmethod
+    def _normalize(function: str, arg):
+        if function in PLAYER_FUNCTIONS:
+            return str(arg).lower()
+        return arg
+
+    def _invalidate(self, function: str, arg):
+        if self._entries.pop((function, self._normalize(function, arg), None), None) is not None:
+            self.stats["invalidations"] += 1
+
+    # isPlayer and isBattle only ever flip once, on NewPlayer and NewBattle
+    def _invalidate_player(self, addr: str):
+        self._invalidate("getPlayer", addr)
+        self._invalidate("getPlayerToken", addr)
+
+    def _invalidate_battle(self, name: str):
+        self._invalidate("getBattle", name)
+        for addr in self._battle_players.get(name, ()):
+            self._invalidate_player(addr)
+
+    def _index_battle(self, name: str, player1: str, player2: str, ended: bool = False):
+        self._name_hashes[keccak(text=name)] = name
+        self._battle_players[name] = (player1, player2)
+        for addr in (player1, player2):
+            if addr == ZERO_ADDRESS:
+                continue
+            battles = self._player_battles.setdefault(addr.lower(), set())
+            if ended:
+                battles.discard(name)
+            else:
+                battles.add(name)
+
+    def _process_event(self, name: str, args: dict[str, Any], fetched: dict[str, tuple[str, str] | None]):
+        if name == "NewPlayer":
+            self._invalidate("isPlayer", args["owner"])
+            self._invalidate_player(args["owner"])
+
+        elif name == "NewGameToken":
+            self._invalidate("getPlayerToken", args["owner"])
+
+        elif name == "NewBattle":
+            battle_name = args["battleName"]
+            self._index_battle(battle_name, args["player1"], args["player2"])
+            # Created, or joined which also flags both players as in battle
+            self._invalidate("isBattle", battle_name)
+            self._invalidate_battle(battle_name)
+
+        elif name == "BattleMove":
+            battle_name = args["battleName"]
+            if not isinstance(battle_name, str):
+                battle_name = self._name_hashes.get(bytes(battle_name))
+            if battle_name is not None:
+                self._invalidate("getBattle", battle_name)
+
+        elif name == "RoundEnded":
+            # Only damaged players are listed, but both players' health, mana and
+            # token stats change, so invalidate every battle they are fighting in
+            battles = set()
+            for addr in args["damagedPlayers"]:
+                self._invalidate_player(addr)
+                battles |= self._player_battles.get(str(addr).lower(), set())
+            if not battles:
+                # The battle was never seen, so its other player is unknown
+                self._drop_all()
+            for battle_name in battles:
+                self._invalidate_battle(battle_name)
+
+        elif name == "BattleEnded":
+            battle_name = args["battleName"]
+            if battle_name not in self._battle_players and args["winner"] == ZERO_ADDRESS:
+                # A timed out battle without moves names no player, but both were in it
+                players = fetched.get(battle_name)
+                if players is None:
+                    self._drop_all()
+                else:
+                    self._index_battle(battle_name, *players, ended=True)
+            self._invalidate_battle(battle_name)
+            for addr in self._battle_players.get(battle_name, ()):
+                self._player_battles.get(addr.lower(), set()).discard(battle_name)
+            for addr in (args["winner"], args["loser"]):
+                self._invalidate_player(addr)
+
+    def _fetch_players(self, battle_name: str) -> tuple[str, str] | None:
+        """
+        Players of a battle, read from the contract without the lock held; they never change
+        once it started. None if the read fails.
+        """
+        try:
+            battle = self.titans.getBattle(battle_name)
+        except Exception:
+            return None
+        return battle[3][0], battle[3][1]
+
+    def _drop_all(self):
+        self.stats["invalidations"] += len(self._entries)
+        self._entries.clear()
@@ -0,0 +1,209 @@
+"""
+Build the card metadata and images served to wallets and the frontend.
+
+For the 30 card types, ids 0 to 29 as in the AKUAKU ... YUKTOPUS constants of
+contracts/zkTitans.vy, the build writes to out/cards/:
+
+- metadata/<id>.json: ERC-1155 metadata JSON, fetched from `uri(id)`, which
+  the contract builds as BASE_URI followed by "<id>.json"
+- images/<card>.<hash>.webp: the card art resized to fit IMAGE_SIZE and
+  encoded as WebP, named after a hash of its content so it can be served with
+  an immutable cache policy
+- atlas.<hash>.webp: every card as a THUMBNAIL_SIZE thumbnail in one sprite
+  sheet, for lists that show many cards at once
+- manifest.json: the image and atlas frame of every card id
+
+The source art is the full-size PNGs in 1-frontend/client/src/assets. The
+images need Pillow with WebP support (`pip install pillow`); metadata alone is
+built with `build_metadata`.
+
+Run with `mox run cards`. Set CARD_IMAGE_BASE_URI to the URL out/cards/ is
+served from, and point the contract's BASE_URI at <that URL>/metadata/ with
+`setURI`.
+"""
+
+import hashlib
+import io
+import json
+import os
+from pathlib import Path
+from typing import NamedTuple
+
+ASSETS_DIR = Path(__file__).parent.parent.parent / "1-frontend" / "client" / "src" / "assets"
+OUT_DIR = Path("out") / "cards"
+
+# Bounding boxes, in pixels, of the card images and of the atlas thumbnails
+IMAGE_SIZE = (320, 412)
+THUMBNAIL_SIZE = (96, 124)
+ATLAS_COLUMNS = 6
+WEBP_QUALITY = 82
+# Hex digits of the SHA-256 content hash kept in file names
+HASH_LENGTH = 12
+
+
+class Card(NamedTuple):
+    id: int
+    constant: str
+    name: str
+    kind: str
+    image: str
+
+
+# Must match the card type constants in contracts/zkTitans.vy
+CARDS = (
+    Card(0, "AKUAKU", "Aku Aku", "Hero", "Aku_Aku-Hero.png"),
+    Card(1, "ARACHNINA", "Arachnina", "Titan", "Arachnina-Titan.png"),
+    Card(2, "COCO", "Coco", "Hero", "Coco-Hero.png"),
+    Card(3, "CRASH", "Crash", "Hero", "Crash-Hero.png"),
+    Card(4, "CRUNCH", "Crunch", "Hero", "Crunch-Hero.png"),
+    Card(5, "DOOMMONKEY", "Doom Monkey", "Minion", "Doom-Monkey-Minion.png"),
+    Card(6, "EELECTRIC", "Ee-lectric", "Titan", "Ee-lectric-Titan.png"),
+    Card(7, "MAGMADON", "Magmadon", "Titan", "Magmadon-Titan.png"),
+    Card(8, "NGIN", "N. Gin", "Villain", "N-Gin-Villain.png"),
+    Card(9, "NEOCORTEX", "Neo Cortex", "Villain", "Neo_Cortex-Villain.png"),
+    Card(10, "NINACORTEX", "Nina Cortex", "Villain", "Nina_Cortex-Villain.png"),
+    Card(11, "RATCICLEDOLL", "Ratcicle Doll", "Battle Doll", "Ratclicle_Doll-Battle-Doll.png"),
+    Card(12, "RATNICIAN", "Ratnician", "Minion", "Ratnician-Minion.png"),
+    Card(13, "RHINOROLLER", "Rhinoroller", "Titan", "Rhinoroller-Titan.png"),
+    Card(14, "SCORPORILLA", "Scorporilla", "Titan", "Scorporilla-Titan.png"),
+    Card(15, "SHELLEPHANT", "Shellephant", "Titan", "Shellephant-Titan.png"),
+    Card(16, "SNIPEDOLL", "Snipe Doll", "Battle Doll", "Snipe_Doll-Battle-Doll.png"),
+    Card(17, "THEBATTLER", "The Battler", "Titan", "The_Battler-Titan.png"),
+    Card(18, "THEBRATGIRL", "The Bratgirl", "Minion", "The_Bratgirl-Minion.png"),
+    Card(19, "THEGOAR", "The Goar", "Titan", "The_Goar-Titan.png"),
+    Card(20, "THEKOOALA", "The Koo-Ala", "Minion", "The_Koo-Ala-Minion.png"),
+    Card(21, "THERATICLICLE", "The Ratcicle", "Titan", "The_Ratclicle-Titan.png"),
+    Card(22, "THESLUDGE", "The Sludge", "Titan", "The_Sludge-Titan.png"),
+    Card(23, "THESNIPE", "The Snipe", "Titan", "The_Snipe-Titan.png"),
+    Card(24, "THESPIKE", "The Spike", "Titan", "The_Spike-Titan.png"),
+    Card(25, "THESTENCH", "The Stench", "Titan", "The_Stench-Titan.png"),
+    Card(26, "UKAUKATITAN", "Uka Uka", "Titan", "Uka_Uka-Titan.png"),
+    Card(27, "ULAUKAVILLAIN", "Uka Uka", "Villain", "Uka_Uka-Villain.png"),
+    Card(28, "VOODOOBUNNY", "Voodoo Bunny", "Minion", "Voodoo_Bunny-Minion.png"),
+    Card(29, "YUKTOPUS", "Yuktopus", "Titan", "Yuktopus-Titan.png"),
+)
+
+
+def _pillow():
+    try:
+        from PIL import Image
+    except ImportError:
+        raise ImportError("Building the card images needs Pillow: pip install pillow") from None
+    return Image
+
+
+def content_name(stem: str, data: bytes, suffix: str) -> str:
+    """
+    File name carrying a hash of `data`, e.g. "crash.1f2e3d4c5b6a.webp".
+    """
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{suffix}"
+
+
+def _write_hashed(directory: Path, stem: str, data: bytes, suffix: str = ".webp") -> str:
+    name = content_name(stem, data, suffix)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / name
+    # Same name, same content: files from earlier builds are left as they are
+    if not path.exists():
+        path.write_bytes(data)
+    return name
+
+
+def _webp(image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, "WEBP", quality=WEBP_QUALITY)
+    return buffer.getvalue()
+
+
+def _slug(card: Card) -> str:
+    return card.image.removesuffix(".png").lower().replace("_", "-")
+
+
+def build_images(assets_dir: Path = ASSETS_DIR, out_dir: Path = OUT_DIR) -> dict[int, str]:
+    """
+    Resize and encode the art of every card.
+    @return: Image file name in out_dir/images by card id
+    """
+    Image = _pillow()
+    images = {}
+    for card in CARDS:
+        with Image.open(assets_dir / card.image) as source:
+            image = source.convert("RGBA")
+        image.thumbnail(IMAGE_SIZE, Image.Resampling.LANCZOS)
+        images[card.id] = _write_hashed(out_dir / "images", _slug(card), _webp(image))
+    return images
+
+
+def build_atlas(assets_dir: Path = ASSETS_DIR, out_dir: Path = OUT_DIR) -> tuple[str, dict[int, list[int]]]:
+    """
+    Pack a thumbnail of every card into one sprite sheet.
+    @return: Atlas file name in out_dir, and the [x, y, width, height] frame of every card id
+    """
+    Image = _pillow()
+    width, height = THUMBNAIL_SIZE
+    rows = -(-len(CARDS) // ATLAS_COLUMNS)
+    atlas = Image.new("RGBA", (ATLAS_COLUMNS * width, rows * height), (0, 0, 0, 0))
+    frames = {}
+    for i, card in enumerate(CARDS):
+        with Image.open(assets_dir / card.image) as source:
+            thumbnail = source.convert("RGBA")
+        thumbnail.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+        x, y = (i % ATLAS_COLUMNS) * width, (i // ATLAS_COLUMNS) * height
+        atlas.paste(thumbnail, (x, y))
+        frames[card.id] = [x, y, thumbnail.width, thumbnail.height]
+    return _write_hashed(out_dir, "atlas", _webp(atlas)), frames
+
+
+def card_metadata(card: Card, image_uri: str) -> dict:
+    """
+    ERC-1155 metadata JSON of `card`.
+    """
+    return {
+        "name": card.name,
+        "description": f"{card.name}, a {card.kind} card of zkTitans.",
+        "image": image_uri,
+        "properties": {"cardId": card.id},
+        "attributes": [{"trait_type": "Class", "value": card.kind}],
+    }
+
+
+def build_metadata(out_dir: Path = OUT_DIR, image_base_uri: str = "", images: dict[int, str] | None = None) -> list[Path]:
+    """
+    Write the metadata file of every card, pointing at its image under `image_base_uri`.
+    @param images: Image file names by card id, as returned by `build_images`; the original PNGs if None
+    """
+    directory = out_dir / "metadata"
+    directory.mkdir(parents=True, exist_ok=True)
+    written = []
+    for card in CARDS:
+        image = f"images/{images[card.id]}" if images is not None else card.image
+        path = directory / f"{card.id}.json"
+        path.write_text(json.dumps(card_metadata(card, image_base_uri + image), indent=2) + "\n")
+        written.append(path)
+    return written
+
+
+def build(assets_dir: Path = ASSETS_DIR, out_dir: Path = OUT_DIR, image_base_uri: str = "") -> dict:
+    """
+    Build images, atlas, metadata and manifest.
+    @return: The manifest
+    """
+    images = build_images(assets_dir, out_dir)
+    atlas, frames = build_atlas(assets_dir, out_dir)
+    build_metadata(out_dir, image_base_uri, images)
+    manifest = {
+        "images": {str(card_id): f"images/{name}" for card_id, name in images.items()},
+        "atlas": {"image": atlas, "frames": {str(card_id): frame for card_id, frame in frames.items()}},
+    }
+    (out_dir / "manifest.json").write_text(json.dumps(manifest, indent=2) + "\n")
+    return manifest
+
+
+def moccasin_main():
+    image_base_uri = os.environ.get("CARD_IMAGE_BASE_URI", "")
+    manifest = build(image_base_uri=image_base_uri)
+    source_bytes = sum((ASSETS_DIR / card.image).stat().st_size for card in CARDS)
+    built_bytes = sum((OUT_DIR / name).stat().st_size for name in manifest["images"].values())
+    print(f"Wrote metadata, images and atlas for {len(CARDS)} cards to {OUT_DIR}")
+    print(f"Card images: {source_bytes / 1e6:.1f} MB of PNG -> {built_bytes / 1e6:.2f} MB of WebP")
+    print(f"Atlas: {(OUT_DIR / manifest['atlas']['image']).stat().st_size / 1e3:.0f} kB")
@@ -0,0 +1,382 @@
+"""
+Off-chain battle channel: play a battle's rounds off-chain, settle the result on-chain.
+
+Two players who started a battle on zkTitans can play its rounds without
+sending transactions. Both sign the opening state with `ChannelClient.open`,
+which either of them submits to `MoveForwarder.openChannel`; from then on
+zkTitans rejects moves for the battle and keepers leave it alone. Each round
+takes three messages through a `ChannelServer`:
+
+1. commit: keccak256 of the move and a random salt, so neither player sees the
+   other's move before choosing their own
+2. reveal: the move and the salt
+3. sign: both compute the round's `ChannelState` with `next_state`, which
+   applies `script.rules.resolve_round` and draws the next attack strengths
+   from both salts, and sign it as EIP-712 typed data for the MoveForwarder
+
+Once a state has a winner, anyone can submit it with both signatures to
+`MoveForwarder.settleChannel`, which writes its health and mana to zkTitans
+and ends the battle as if the loser quit. A 10-round battle takes 3
+transactions instead of about 20.
+
+If the other player stops answering, `ChannelClient.play_round` raises
+ChannelTimeout: submit the last state both signed to `disputeChannel`. The
+other player then has CHANNEL_CHALLENGE_PERIOD seconds to answer, after which
+`claimChannelTimeout` ends the battle for the disputer. Answering takes
+progress, so a dispute cannot be reset to stall the battle:
+
+- `answerChannelDispute` with a newer state both players signed, after which
+  the channel carries on from that state, or
+- `answerChannelDisputeWithMove`, a move on zkTitans, after which the channel
+  is closed and the battle is played on-chain from the disputed state: its
+  health, mana and attack strengths are written to zkTitans first.
+
+The player who reveals last sees the other move before revealing their own.
+Walking away from a round they would lose, or withholding their signature of
+it, then leaves them without a newer signed state: they either move on-chain
+from the last signed state or lose the battle to the dispute. A closed
+channel cannot be opened again, so its states cannot be replayed later.
+
+Start a local message server with `mox run channel`.
+"""
+
+import json
+import os
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import NamedTuple
+
+from eth_account import Account
+from eth_account.messages import encode_typed_data
+from eth_utils import keccak
+
+from script.relayer import _domain
+from script.rules import MAX_ATTACK_DEFEND_STRENGTH, PlayerState, can_attack, resolve_round
+
+CHANNEL_PORT = 8646
+
+CHANNEL_STATE_TYPES = {
+    "ChannelState": [
+        {"name": "battleId", "type": "uint256"},
+        {"name": "round", "type": "uint256"},
+        {"name": "move1", "type": "uint8"},
+        {"name": "move2", "type": "uint8"},
+        {"name": "health1", "type": "uint256"},
+        {"name": "mana1", "type": "uint256"},
+        {"name": "health2", "type": "uint256"},
+        {"name": "mana2", "type": "uint256"},
+        {"name": "attack1", "type": "uint256"},
+        {"name": "attack2", "type": "uint256"},
+        {"name": "winner", "type": "uint8"},
+    ]
+}
+
+
+class ChannelError(Exception):
+    """Raised when the other player sends a message that breaks the protocol."""
+
+
+class ChannelTimeout(ChannelError):
+    """Raised when the other player does not answer in time; dispute the channel on-chain."""
+
+
+class ChannelState(NamedTuple):
+    """
+    A round of a battle played off-chain, the MoveForwarder ChannelState struct.
+    Round 0 holds the players' state when the channel opens, without moves.
+    """
+
+    battleId: int
+    round: int
+    move1: int
+    move2: int
+    health1: int
+    mana1: int
+    health2: int
+    mana2: int
+    attack1: int
+    attack2: int
+    # 1 or 2 if the round ended the battle, 0 otherwise
+    winner: int
+
+    @classmethod
+    def open(cls, battle_id: int, p1: PlayerState, p2: PlayerState) -> "ChannelState":
+        return cls(battle_id, 0, 0, 0, p1.health, p1.mana, p2.health, p2.mana, p1.attack, p2.attack, 0)
+
+    def players(self) -> tuple[PlayerState, PlayerState]:
+        return PlayerState(self.health1, self.mana1, self.attack1), PlayerState(self.health2, self.mana2, self.attack2)
+
+
+def draw_attack(seed: bytes, player: int) -> int:
+    """
+    Attack strength of `player` (0 or 1) for the next round, distributed as `_createRandomNum` draws it.
+    """
+    value = int.from_bytes(keccak(seed + bytes([player])), "big") % MAX_ATTACK_DEFEND_STRENGTH
+    return value if value != 0 else MAX_ATTACK_DEFEND_STRENGTH // 2
+
+
+def next_state(state: ChannelState, move1: int, move2: int, seed: bytes) -> ChannelState:
+    """
+    Play a round on `state` with the rules of `_resolveBattle`.
+    @param seed: Randomness both players contributed to, for the next attack strengths
+    @raise ChannelError: If the battle is over or a player attacks without mana
+    """
+    if state.winner:
+        raise ChannelError("Battle is over")
+    p1, p2 = state.players()
+    for player, move in ((p1, move1), (p2, move2)):
+        if move not in (1, 2):
+            raise ChannelError("Choice should be either 1 or 2")
+        if move == 1 and not can_attack(player):
+            raise ChannelError("Mana not sufficient for attacking")
+
+    result = resolve_round(p1, p2, move1, move2)
+    # As on-chain, the stats are only redrawn while the battle continues
+    attack1, attack2 = (p1.attack, p2.attack) if result.winner is not None else (draw_attack(seed, 0), draw_attack(seed, 1))
+    return ChannelState(
+        state.battleId,
+        state.round + 1,
+        move1,
+        move2,
+        result.p1.health,
+        result.p1.mana,
+        result.p2.health,
+        result.p2.mana,
+        attack1,
+        attack2,
+        0 if result.winner is None else result.winner + 1,
+    )
+
+
+def _signable(forwarder_address: str, chain_id: int, state: ChannelState):
+    return encode_typed_data(
+        domain_data=_domain(forwarder_address, chain_id),
+        message_types=CHANNEL_STATE_TYPES,
+        message_data=state._asdict(),
+    )
+
+
+def sign_state(private_key, forwarder_address: str, chain_id: int, state: ChannelState) -> tuple[int, bytes, bytes]:
+    """
+    Sign a channel state as EIP-712 typed data for the MoveForwarder
+    @return: The (v, r, s) Signature struct
+    """
+    signed = Account.sign_message(_signable(forwarder_address, chain_id, state), private_key)
+    return signed.v, signed.r.to_bytes(32, "big"), signed.s.to_bytes(32, "big")
+
+
+def recover_state_signer(forwarder_address: str, chain_id: int, state: ChannelState, signature: tuple[int, bytes, bytes]) -> str:
+    return Account.recover_message(_signable(forwarder_address, chain_id, state), vrs=signature)
+
+
+def commitment(move: int, salt: bytes) -> bytes:
+    return keccak(bytes([move]) + salt)
+
+
+# ------------------------------------------------------------------
+#                          MESSAGE SERVER
+# ------------------------------------------------------------------
+
+
+class _ChannelRequestHandler(BaseHTTPRequestHandler):
+    server: "ChannelServer"
+
+    def do_POST(self):
+        battle_id = self._battle_id()
+        if battle_id is None:
+            return self._reply(404, {"error": "Not found"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            message = json.loads(self.rfile.read(length))
+        except (ValueError, json.JSONDecodeError) as e:
+            return self._reply(400, {"error": str(e)})
+        self._reply(202, {"index": self.server.post(battle_id, message)})
+
+    def do_GET(self):
+        battle_id = self._battle_id()
+        if battle_id is None:
+            return self._reply(404, {"error": "Not found"})
+        _, _, query = self.path.partition("?since=")
+        self._reply(200, {"messages": self.server.messages(battle_id, int(query or 0))})
+
+    def _battle_id(self) -> int | None:
+        parts = self.path.split("?")[0].strip("/").split("/")
+        if len(parts) != 2 or parts[0] != "channels" or not parts[1].isdigit():
+            return None
+        return int(parts[1])
+
+    def _reply(self, status: int, body: dict):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ChannelServer(ThreadingHTTPServer):
+    """
+    Local message board the players of a channel exchange messages through.
+    POST /channels/<battleId> appends a JSON message, GET /channels/<battleId>?since=<n>
+    returns the messages from the n-th on. Messages are not checked; clients verify them.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = CHANNEL_PORT):
+        super().__init__((host, port), _ChannelRequestHandler)
+        self._messages: dict[int, list[dict]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def post(self, battle_id: int, message: dict) -> int:
+        with self._lock:
+            messages = self._messages.setdefault(battle_id, [])
+            messages.append(message)
+            return len(messages) - 1
+
+    def messages(self, battle_id: int, since: int = 0) -> list[dict]:
+        with self._lock:
+            return self._messages.get(battle_id, [])[since:]
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+# ------------------------------------------------------------------
+#                             CLIENT
+# ------------------------------------------------------------------
+
+
+class ChannelClient:
+    """
+    One player's side of a channel.
+    @param account: The player's eth_account LocalAccount
+    @param players: Addresses of player 1 and player 2, as in the zkTitans battle
+    @param state: Last state both players agreed on, `ChannelState.open(...)` for a new channel
+    @param timeout: Seconds to wait for each message of the other player
+    """
+
+    def __init__(
+        self,
+        account,
+        forwarder_address: str,
+        chain_id: int,
+        players: tuple[str, str],
+        state: ChannelState,
+        server_url: str = f"http://127.0.0.1:{CHANNEL_PORT}",
+        timeout: float = 30.0,
+        poll_interval: float = 0.01,
+    ):
+        self.account = account
+        self.forwarder_address = str(forwarder_address)
+        self.chain_id = chain_id
+        self.players = tuple(str(player).lower() for player in players)
+        self.index = self.players.index(account.address.lower())
+        self.state = state
+        # Both players' signatures of `state`, None until the opening state is signed
+        self.signatures: tuple | None = None
+        self.server_url = server_url.rstrip("/")
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._seen = 0
+
+    def open(self) -> ChannelState:
+        """
+        Sign the opening state with the other player, for MoveForwarder.openChannel.
+        @raise ChannelTimeout: If the other player does not sign it
+        @raise ChannelError: If the state is not an opening state or signed by someone else
+        """
+        if self.state.round != 0:
+            raise ChannelError("Channel already opened")
+        self._exchange_signatures(self.state)
+        return self.state
+
+    def play_round(self, move: int) -> ChannelState:
+        """
+        Play the next round with `move` and return the state both players signed.
+        @raise ChannelTimeout: If the other player does not answer, see the module docstring
+        @raise ChannelError: If the other player breaks the protocol
+        """
+        round_number = self.state.round + 1
+        salt = os.urandom(32)
+        self._post("commit", round_number, commitment=commitment(move, salt).hex())
+        their_commitment = bytes.fromhex(self._receive("commit", round_number)["commitment"])
+
+        self._post("reveal", round_number, move=move, salt=salt.hex())
+        reveal = self._receive("reveal", round_number)
+        their_move, their_salt = int(reveal["move"]), bytes.fromhex(reveal["salt"])
+        if commitment(their_move, their_salt) != their_commitment:
+            raise ChannelError("Revealed move does not match its commitment")
+
+        moves = (move, their_move) if self.index == 0 else (their_move, move)
+        salts = (salt, their_salt) if self.index == 0 else (their_salt, salt)
+        state = next_state(self.state, *moves, keccak(salts[0] + salts[1]))
+        self._exchange_signatures(state)
+        return state
+
+    def _exchange_signatures(self, state: ChannelState):
+        signature = sign_state(self.account.key, self.forwarder_address, self.chain_id, state)
+        self._post("sign", state.round, signature=[signature[0], signature[1].hex(), signature[2].hex()])
+        v, r, s = self._receive("sign", state.round)["signature"]
+        their_signature = (int(v), bytes.fromhex(r), bytes.fromhex(s))
+        signer = recover_state_signer(self.forwarder_address, self.chain_id, state, their_signature)
+        if signer.lower() != self.players[1 - self.index]:
+            raise ChannelError("State signed by someone other than the other player")
+
+        self.state = state
+        self.signatures = (signature, their_signature) if self.index == 0 else (their_signature, signature)
+
+    def settlement(self) -> tuple[tuple, tuple]:
+        """
+        Arguments of MoveForwarder.settleChannel, disputeChannel or openChannel, for the last signed state.
+        """
+        if self.signatures is None:
+            raise ChannelError("No state signed by both players yet")
+        return tuple(self.state), self.signatures
+
+    def _post(self, kind: str, round_number: int, **fields):
+        message = {"kind": kind, "round": round_number, "player": self.index, **fields}
+        request = urllib.request.Request(
+            f"{self.server_url}/channels/{self.state.battleId}",
+            data=json.dumps(message).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+    def _receive(self, kind: str, round_number: int) -> dict:
+        deadline = time.monotonic() + self.timeout
+        url = f"{self.server_url}/channels/{self.state.battleId}?since={self._seen}"
+        while True:
+            with urllib.request.urlopen(url, timeout=self.timeout) as response:
+                messages = json.loads(response.read())["messages"]
+            for offset, message in enumerate(messages):
+                if message.get("player") == 1 - self.index and message.get("kind") == kind and message.get("round") == round_number:
+                    # Messages before this one were read already or belong to earlier steps
+                    self._seen += offset + 1
+                    return message
+            if time.monotonic() > deadline:
+                raise ChannelTimeout(f"No {kind} from the other player for round {round_number}")
+            time.sleep(self.poll_interval)
+
+
+def moccasin_main():
+    server = ChannelServer()
+    server.start()
+    print(f"Channel messages on {server.url}/channels/<battleId>")
+    try:
+        threading.Event().wait()
+    finally:
+        server.shutdown()
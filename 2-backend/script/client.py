@@ -0,0 +1,277 @@
+"""
+Slim zkTitans client for bots and short-lived jobs.
+
+Importing `script.deploy` or any boa contract loads moccasin, boa and the
+Vyper compiler, over a second before the first line of a job runs. `Client`
+only needs the ABI, which is checked in under script/abi/, and imports nothing
+but the standard library: eth_hash and the `script.rpc` transport are loaded
+on first use, and boa, Vyper and moccasin never are. Scalars, strings and
+arrays of them, which is what the game entry points take, are encoded and
+decoded here; eth_abi, which takes longer to import than the rest of a
+read-only job, is only loaded for tuples, i.e. the migration imports. Struct
+results are decoded with the specialized decoders of `script.bindings`.
+
+    client = Client.connect(address, [rpc_url])
+    battle = client.getBattle("Battle 1")
+    calldata = client.calldata("attackOrDefendChoiceById", 1, battle_id)
+
+`script/import_benchmark.py` measures the import time against the boa
+tooling. Regenerate the ABI files after changing a contract with
+`mox run client`.
+"""
+
+import functools
+import json
+import re
+from pathlib import Path
+from typing import Any
+
+ABI_DIR = Path(__file__).parent / "abi"
+CONTRACTS = ("zkTitans", "MoveForwarder")
+
+# Functions whose results `script.bindings` decodes, by function name
+STRUCT_DECODERS = {
+    "getPlayer": "decode_player",
+    "getAllPlayers": "decode_players",
+    "getPlayerToken": "decode_game_token",
+    "getAllPlayerTokens": "decode_game_tokens",
+    "getBattle": "decode_battle",
+    "getAllBattles": "decode_battles",
+}
+
+
+@functools.cache
+def load_abi(contract: str = "zkTitans") -> tuple[dict, ...]:
+    return tuple(json.loads((ABI_DIR / f"{contract}.json").read_text()))
+
+
+WORD = 32
+# ABI types `_encode` and `_decode` handle, eth_abi does the others
+_SIMPLE_TYPE = re.compile(r"(u?int\d*|address|bool|bytes\d*|string)(\[\])?")
+
+
+def _abi_type(item: dict) -> str:
+    # Tuples are spelled out as their component types, e.g. "tuple[]" -> "(string,uint256)[]"
+    if not item["type"].startswith("tuple"):
+        return item["type"]
+    components = ",".join(_abi_type(component) for component in item["components"])
+    return f"({components}){item['type'][len('tuple'):]}"
+
+
+# ------------------------------------------------------------------
+#                        ABI CODING
+# ------------------------------------------------------------------
+
+
+def _is_simple(types: list[str]) -> bool:
+    return all(_SIMPLE_TYPE.fullmatch(typ) for typ in types)
+
+
+def _is_dynamic(typ: str) -> bool:
+    return typ in ("string", "bytes") or typ.endswith("[]")
+
+
+def _bits(typ: str) -> int:
+    return int(typ.lstrip("uint") or 256)
+
+
+def _encode_word(typ: str, value) -> bytes:
+    if typ == "address":
+        raw = bytes.fromhex(value.removeprefix("0x")) if isinstance(value, str) else bytes(value)
+        if len(raw) != 20:
+            raise ValueError(f"Invalid address {value!r}")
+        return raw.rjust(WORD, b"\0")
+    if typ == "bool":
+        return int(bool(value)).to_bytes(WORD, "big")
+    if typ.startswith("bytes"):
+        if len(value) != int(typ[len("bytes") :]):
+            raise ValueError(f"{typ} value must be {typ[len('bytes'):]} bytes long")
+        return bytes(value).ljust(WORD, b"\0")
+    signed = not typ.startswith("uint")
+    bits = _bits(typ)
+    low, high = (-(2 ** (bits - 1)), 2 ** (bits - 1)) if signed else (0, 2**bits)
+    if not isinstance(value, int) or not low <= value < high:
+        raise ValueError(f"{value!r} is not a {typ}")
+    return value.to_bytes(WORD, "big", signed=signed)
+
+
+def _encode_dynamic(typ: str, value) -> bytes:
+    if typ.endswith("[]"):
+        return len(value).to_bytes(WORD, "big") + _encode([typ[:-2]] * len(value), value)
+    raw = value.encode() if isinstance(value, str) else bytes(value)
+    padded = -len(raw) % WORD
+    return len(raw).to_bytes(WORD, "big") + raw + b"\0" * padded
+
+
+def _encode(types: list[str], values) -> bytes:
+    if not _is_simple(types):
+        from eth_abi import encode
+
+        return encode(types, values)
+    heads, tails = [], []
+    offset = WORD * len(types)
+    for typ, value in zip(types, values, strict=True):
+        if _is_dynamic(typ):
+            tail = _encode_dynamic(typ, value)
+            heads.append(offset.to_bytes(WORD, "big"))
+            tails.append(tail)
+            offset += len(tail)
+        else:
+            heads.append(_encode_word(typ, value))
+    return b"".join(heads + tails)
+
+
+def _decode_word(typ: str, word: bytes):
+    if typ == "address":
+        from script.bindings import _checksum
+
+        return _checksum(word[12:])
+    if typ == "bool":
+        return word != bytes(WORD)
+    if typ.startswith("bytes"):
+        return word[: int(typ[len("bytes") :])]
+    return int.from_bytes(word, "big", signed=not typ.startswith("uint"))
+
+
+def _decode_at(typ: str, data: bytes, start: int):
+    length = int.from_bytes(data[start : start + WORD], "big")
+    if typ.endswith("[]"):
+        return _decode([typ[:-2]] * length, data[start + WORD :])
+    raw = data[start + WORD : start + WORD + length]
+    return raw.decode() if typ == "string" else raw
+
+
+def _decode(types: list[str], data: bytes) -> tuple:
+    if not _is_simple(types):
+        from eth_abi import decode
+
+        return decode(types, data)
+    values = []
+    for i, typ in enumerate(types):
+        word = data[i * WORD : (i + 1) * WORD]
+        if _is_dynamic(typ):
+            values.append(_decode_at(typ, data, int.from_bytes(word, "big")))
+        else:
+            values.append(_decode_word(typ, word))
+    return tuple(values)
+
+
+class Function:
+    """
+    One ABI function: encodes its calldata and decodes its return data.
+    """
+
+    def __init__(self, abi: dict):
+        self.name = abi["name"]
+        self.inputs = [_abi_type(item) for item in abi["inputs"]]
+        self.outputs = [_abi_type(item) for item in abi["outputs"]]
+        self.is_view = abi["stateMutability"] in ("view", "pure")
+
+    @property
+    def signature(self) -> str:
+        return f"{self.name}({','.join(self.inputs)})"
+
+    @functools.cached_property
+    def selector(self) -> bytes:
+        from eth_hash.auto import keccak
+
+        return keccak(self.signature.encode())[:4]
+
+    def encode(self, *args) -> bytes:
+        if len(args) != len(self.inputs):
+            raise TypeError(f"{self.signature} takes {len(self.inputs)} arguments, got {len(args)}")
+        return self.selector + _encode(self.inputs, args)
+
+    def decode(self, data: bytes) -> Any:
+        """
+        Decode return data like a boa contract call: None, the single value, or a tuple.
+        """
+        decoder = STRUCT_DECODERS.get(self.name)
+        if decoder is not None:
+            from script import bindings
+
+            return getattr(bindings, decoder)(data)
+        if not self.outputs:
+            return None
+        values = _decode(self.outputs, data)
+        return values[0] if len(values) == 1 else values
+
+
+class Client:
+    """
+    Reads and encodes calls of a deployed contract from its checked-in ABI.
+    View functions are available as methods, e.g. `client.getBattle(name)`.
+    @param address: Address of the deployed contract
+    @param rpc: JSON-RPC client with `call(method, params)`, e.g. an `RpcTransport`;
+        only needed for `call`
+    @param contract: Name of the ABI file in script/abi/
+    """
+
+    def __init__(self, address: str, rpc=None, contract: str = "zkTitans"):
+        self.address = address
+        self.rpc = rpc
+        self.contract = contract
+        self.functions = {item["name"]: Function(item) for item in load_abi(contract) if item["type"] == "function"}
+
+    @classmethod
+    def connect(cls, address: str, urls: list[str], contract: str = "zkTitans", **transport_options) -> "Client":
+        """
+        Client calling through a new `RpcTransport` to `urls`.
+        """
+        from script.rpc import RpcTransport
+
+        return cls(address, RpcTransport(urls, **transport_options), contract)
+
+    def function(self, name: str) -> Function:
+        try:
+            return self.functions[name]
+        except KeyError:
+            raise AttributeError(f"{self.contract} has no function {name!r}") from None
+
+    def calldata(self, name: str, *args) -> bytes:
+        """
+        Calldata of a call of `name`, to sign and send or to relay.
+        """
+        return self.function(name).encode(*args)
+
+    def call(self, name: str, *args, block: str = "latest") -> Any:
+        """
+        Run `name` with eth_call and decode its result.
+        """
+        if self.rpc is None:
+            raise ValueError("Client has no RPC to call through")
+        function = self.function(name)
+        params = {"to": self.address, "data": "0x" + function.encode(*args).hex()}
+        result = self.rpc.call("eth_call", [params, block])
+        return function.decode(bytes.fromhex(result.removeprefix("0x")))
+
+    def __getattr__(self, name: str):
+        if "functions" not in self.__dict__:
+            raise AttributeError(name)
+        function = self.function(name)
+        if not function.is_view:
+            raise AttributeError(f"{name} changes state, use calldata({name!r}, ...) and send it signed")
+        return functools.partial(self.call, name)
+
+
+def write_abi(contracts: tuple[str, ...] = CONTRACTS) -> list[Path]:
+    """
+    Compile `contracts` and write their ABI to script/abi/.
+    """
+    import boa
+    from vyper.compiler.output import build_abi_output
+
+    ABI_DIR.mkdir(exist_ok=True)
+    written = []
+    for contract in contracts:
+        deployer = boa.load_partial(f"contracts/{contract}.vy")
+        path = ABI_DIR / f"{contract}.json"
+        path.write_text(json.dumps(build_abi_output(deployer.compiler_data), indent=2) + "\n")
+        written.append(path)
+    load_abi.cache_clear()
+    return written
+
+
+def moccasin_main():
+    for path in write_abi():
+        print(f"Wrote {path}")
@@ -0,0 +1,123 @@
+"""
+Storage contention benchmark for zkTitans entry points.
+
+Transactions of different players and battles are independent in the game,
+but a chain that executes transactions in parallel, or a sequencer that
+batches them, still has to serialize any two that write the same storage
+slot. Globally shared slots, such as a counter or the length of an array
+every new entity is appended to, make every such pair conflict.
+
+`measure_contention` plays two independent games side by side on a fresh
+zkTitans, each with its own players and battle, and records the slots every
+call writes with a `StateDiffTracer`. A slot written by calls of both games is
+shared; per entry point the benchmark reports how many shared slots a call
+writes and which storage variables they belong to. A slot counts as written
+even when it ends up with its original value, since the write still conflicts.
+
+Joins, moves, quits and re-rolls write no shared slot. Registrations and new
+battles still do: the players, gameTokens and battles arrays hand out ids by
+appending, so each of them writes an array length every other creation writes
+too. Keying the arrays by id behind a counter would keep that counter shared,
+so this contention remains until ids no longer come from a global sequence.
+
+Run with `mox run contention` for a table, written to out/contention.csv.
+"""
+
+import csv
+from pathlib import Path
+
+import boa
+
+from script.pubdata import StateDiffTracer
+
+OUT_DIR = Path("out")
+GAMES = 2
+
+
+def _game_calls(titans, game: int) -> list[tuple]:
+    """
+    (entry point, function, args, sender) of a full game between two new players.
+    """
+    player1 = boa.env.generate_address(f"contention player {game}a")
+    player2 = boa.env.generate_address(f"contention player {game}b")
+    battle = f"Contention Battle {game}"
+    return [
+        ("registerPlayer", titans.registerPlayer, (f"Player {game}a", "Token"), player1),
+        ("registerPlayer", titans.registerPlayer, (f"Player {game}b", "Token"), player2),
+        ("createRandomGameToken", titans.createRandomGameToken, ("New Token",), player1),
+        ("createBattle", titans.createBattle, (battle,), player1),
+        ("joinBattle", titans.joinBattle, (battle,), player2),
+        ("attackOrDefendChoice (first move)", titans.attackOrDefendChoice, (1, battle), player1),
+        ("attackOrDefendChoice (resolves round)", titans.attackOrDefendChoice, (2, battle), player2),
+        ("quitBattle", titans.quitBattle, (battle,), player1),
+    ]
+
+
+def _written_slots(function, args, sender) -> dict[tuple[str, int], str]:
+    """
+    Run one transaction and return the variable of every slot it wrote, by (address, slot).
+    """
+    with StateDiffTracer() as tracer:
+        with boa.env.prank(sender):
+            function(*args)
+    return {(write.address, write.slot): write.variable for write in tracer.writes}
+
+
+def measure_contention(games: int = GAMES) -> list[dict]:
+    """
+    Play `games` independent games in lockstep on a fresh zkTitans and count the
+    slots each entry point shares with the other games.
+    Runs in a new environment, so earlier state cannot make games overlap.
+    @return: One row per entry point, in game order
+    """
+    # Deferred, deploy prints and imports the contract module
+    from script.deploy import deploy_zktitans
+
+    with boa.swap_env(boa.Env()):
+        titans = deploy_zktitans("")
+        plans = [_game_calls(titans, game) for game in range(games)]
+
+        # Per step, per game: the slots the call wrote
+        steps = []
+        for calls in zip(*plans):
+            steps.append([_written_slots(function, args, sender) for _, function, args, sender in calls])
+            boa.env.time_travel(blocks=1)
+
+    writers: dict[tuple[str, int], set[int]] = {}
+    for written in steps:
+        for game, slots in enumerate(written):
+            for key in slots:
+                writers.setdefault(key, set()).add(game)
+    shared = {key for key, games_writing in writers.items() if len(games_writing) > 1}
+
+    rows = []
+    for (entry_point, *_), written in zip(plans[0], steps):
+        # The busiest game of the step, all games run the same calls
+        slots = max(written, key=len)
+        variables = sorted({variable for key, variable in slots.items() if key in shared})
+        rows.append(
+            {
+                "entry_point": entry_point,
+                "slots_written": len(slots),
+                "shared_slots": sum(key in shared for key in slots),
+                "shared_variables": ", ".join(variables),
+            }
+        )
+    return rows
+
+
+def write_csv(rows: list[dict], path: Path = OUT_DIR / "contention.csv"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def moccasin_main():
+    rows = measure_contention()
+    write_csv(rows)
+
+    print(f"{'entry point':<40} {'slots':>6} {'shared':>7}  shared variables")
+    for row in rows:
+        print(f"{row['entry_point']:<40} {row['slots_written']:>6} {row['shared_slots']:>7}  {row['shared_variables']}")
@@ -0,0 +1,69 @@
+"""
+Bulk decode throughput of `getAllBattles` results: the generic eth_abi decoder
+versus the specialized decoders in `script.bindings`.
+
+Run with `mox run decode_benchmark`.
+"""
+
+import random
+import time
+
+import eth_abi
+
+from script.bindings import Battle, battles_to_array, decode_battles
+
+# Upper bound of the battles array in contracts/zkTitans.vy
+MAX_BATTLES = 20_000
+
+
+def make_battles_payload(count: int, players: int = 500, seed: int = 0) -> bytes:
+    """
+    ABI encode `count` random battles exactly as `getAllBattles` returns them.
+    """
+    rng = random.Random(seed)
+    addresses = [
+        eth_abi.decode(["address"], rng.randbytes(20).rjust(32, b"\0"))[0]
+        for _ in range(players)
+    ]
+    battles = [
+        (
+            rng.choice((1, 2, 4)),
+            rng.randbytes(32),
+            f"Battle {i}",
+            [rng.choice(addresses), rng.choice(addresses)],
+            [rng.randint(0, 2), rng.randint(0, 2)],
+            rng.choice(addresses),
+        )
+        for i in range(count)
+    ]
+    return eth_abi.encode([f"{Battle.abi_type()}[]"], [battles])
+
+
+def _throughput(decode, payload: bytes, count: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        decode(payload)
+        best = min(best, time.perf_counter() - started)
+    return count / best
+
+
+def benchmark(count: int = MAX_BATTLES, repeat: int = 3) -> dict[str, float]:
+    """
+    Measure battles decoded per second by each decoder, best of `repeat` runs.
+    """
+    payload = make_battles_payload(count)
+    abi_type = f"{Battle.abi_type()}[]"
+    return {
+        "eth_abi": _throughput(lambda data: eth_abi.decode([abi_type], data), payload, count, repeat),
+        "decode_battles": _throughput(decode_battles, payload, count, repeat),
+        "battles_to_array": _throughput(battles_to_array, payload, count, repeat),
+    }
+
+
+def moccasin_main():
+    results = benchmark()
+    baseline = results["eth_abi"]
+    print(f"Decoding {MAX_BATTLES} battles:")
+    for name, rate in results.items():
+        print(f"  {name:<18} {rate:>12,.0f} battles/s  ({rate / baseline:.1f}x)")
@@ -1,37 +1,103 @@
+import os
+
 from moccasin.boa_tools import VyperContract
 from moccasin.config import get_active_network
-from contracts import zkTitans
+from contracts import MoveForwarder, zkTitans
+from script.metrics import METRICS
+from script.shards import SHARDS_PATH, ShardRouter
 
 
-def deploy_zktitans(metadata_uri: str) -> VyperContract:
+def deploy_zktitans(metadata_uri: str, import_open: bool = False, deployer=zkTitans, env=None) -> VyperContract:
     """
     Deploy the zkTitans contract
     @param metadata_uri: Base URI for token metadata
+    @param import_open: Deploy a migration target, which takes imports and stays closed to
+        players until `finishImport`, see script/migrate.py
+    @param deployer: zkTitans deployer, e.g. one compiled with zkvyper for a zkSync network
+    @param env: boa env to deploy to, the global one by default
     """
     print("Using metadata URI:", metadata_uri)
 
-    titans: VyperContract = zkTitans.deploy(metadata_uri)
+    with METRICS.timed("zkTitans", "deploy"):
+        titans: VyperContract = deployer.deploy(metadata_uri, import_open, env=env)
     print("Deployed zkTitans contract at:", titans.address)
 
     return titans
 
 
+def deploy_move_forwarder(titans: VyperContract, deployer=MoveForwarder, trust: bool = True) -> VyperContract:
+    """
+    Deploy the MoveForwarder relay and register it as the zkTitans trusted forwarder
+    @param titans: Deployed zkTitans contract, the forwarder is deployed to its env
+    @param deployer: MoveForwarder deployer, compiled like the one of `titans`
+    @param trust: Register the forwarder right away; pass False to read the deployment
+        receipt first and call `trust_forwarder` after
+    """
+    with METRICS.timed("MoveForwarder", "deploy"):
+        forwarder: VyperContract = deployer.deploy(titans.address, env=titans.env)
+    print("Deployed MoveForwarder contract at:", forwarder.address)
+
+    if trust:
+        trust_forwarder(titans, forwarder)
+    return forwarder
+
+
+def trust_forwarder(titans: VyperContract, forwarder: VyperContract):
+    """
+    Register `forwarder` as the zkTitans trusted forwarder
+    """
+    with METRICS.timed("zkTitans", "setTrustedForwarder"):
+        titans.setTrustedForwarder(forwarder.address)
+
+
+def deploy_shards(metadata_uri: str, count: int, deployers: tuple = (zkTitans, MoveForwarder), env=None) -> list[tuple[VyperContract, VyperContract]]:
+    """
+    Deploy `count` zkTitans shards, each with its own MoveForwarder
+    @param metadata_uri: Base URI for token metadata
+    @param count: Number of shards
+    @param deployers: zkTitans and MoveForwarder deployers
+    @param env: boa env to deploy to, the global one by default
+    @return: (zkTitans, MoveForwarder) pair of every shard
+    """
+    titans_deployer, forwarder_deployer = deployers
+    shards = []
+    for _ in range(count):
+        titans = deploy_zktitans(metadata_uri, deployer=titans_deployer, env=env)
+        shards.append((titans, deploy_move_forwarder(titans, forwarder_deployer)))
+    return shards
+
+
 def moccasin_main() -> VyperContract:
     # Define metadata URI - same as in your deploy.ts
     metadata_uri = ""
+    # Number of zkTitans shards, see script/shards.py
+    shard_count = int(os.environ.get("ZKTITANS_SHARDS", "1"))
 
     active_network = get_active_network()
 
-    # Deploy contract
-    titans = deploy_zktitans(metadata_uri)
+    # Deploy contracts
+    if shard_count > 1:
+        shards = deploy_shards(metadata_uri, shard_count)
+        contracts = [contract for shard in shards for contract in shard]
+        titans = contracts[0]
+        ShardRouter([shard.address for shard, _ in shards]).save()
+        print(f"Saved {shard_count} shard addresses to {SHARDS_PATH}")
+    else:
+        titans = deploy_zktitans(metadata_uri)
+        contracts = [titans, deploy_move_forwarder(titans)]
 
     # Verify contract if on a non-local network
     if (
         active_network.has_explorer()
         and active_network.is_local_or_forked_network() is False
     ):
-        print("Verifying contract on explorer...")
-        result = active_network.moccasin_verify(titans)
-        result.wait_for_verification()
+        print("Verifying contracts on explorer...")
+        for contract in contracts:
+            with METRICS.timed(contract.contract_name, "verify"):
+                result = active_network.moccasin_verify(contract)
+                result.wait_for_verification()
+
+    if METRICS.enabled:
+        print(METRICS.render())
 
     return titans
@@ -0,0 +1,416 @@
+"""
+Call-tree gas profiler for zkTitans and any other vyper contract run in boa.
+
+Inside `with GasProfiler() as profiler:` every computation is metered step by
+step. Each step is attributed to the internal function it runs in, using the
+compiler's pc to AST map: entering a function that is not on the stack is a
+call, reaching one that is a return (vyper has no recursion). Storage, hashing,
+log and call opcodes get a leaf frame of their own, so the cost of events or of
+a cold SSTORE shows up under the function that caused it. Every computation
+starts with a frame named after its contract source, so calls into another
+contract nest under the function making them.
+
+The result is a `GasProfile` with gas per call stack and per source line. It
+saves as collapsed stacks (`zkTitans.vy;attackOrDefendChoice;_resolveBattle 8327`)
+for flamegraph.pl, speedscope or inferno, and two profiles can be diffed to
+see what an optimization actually saved.
+
+Gas is execution gas as counted by `boa.env.get_gas_used()`: intrinsic
+transaction gas is not part of any stack and refunds are reported separately.
+
+Run with `mox run gas_profile` to profile a full game; if
+out/gas_profile.baseline.folded exists the run is diffed against it.
+"""
+
+from collections import Counter
+from pathlib import Path
+
+import boa
+from eth.vm.gas_meter import GasMeter
+from vyper import ast as vy_ast
+
+OUT_DIR = Path("out")
+DEFAULT_PROFILE_PATH = OUT_DIR / "gas_profile.folded"
+DEFAULT_BASELINE_PATH = OUT_DIR / "gas_profile.baseline.folded"
+
+# Opcodes that get a leaf frame, they dominate the cost of the lines they are on
+OPCODE_FRAMES = {
+    0x20: "[KECCAK256]",
+    0x54: "[SLOAD]",
+    0x55: "[SSTORE]",
+    0xA0: "[LOG]",
+    0xA1: "[LOG]",
+    0xA2: "[LOG]",
+    0xA3: "[LOG]",
+    0xA4: "[LOG]",
+    0xF0: "[CREATE]",
+    0xF1: "[CALL]",
+    0xF2: "[CALL]",
+    0xF4: "[CALL]",
+    0xF5: "[CREATE]",
+    0xFA: "[CALL]",
+}
+CALL_OPCODES = {0xF0, 0xF1, 0xF2, 0xF4, 0xF5, 0xFA}
+
+UNKNOWN_CODE_FRAME = "<unknown code>"
+
+
+class GasProfile:
+    """
+    Gas used per call stack and per source line, mergeable across transactions.
+    """
+
+    def __init__(self):
+        # (contract.vy, function, ..., [OPCODE]) -> gas used by the innermost frame
+        self.stacks: Counter[tuple[str, ...]] = Counter()
+        # (contract, function, line number) -> gas used
+        self.lines: Counter[tuple[str, str, int]] = Counter()
+        self.line_sources: dict[tuple[str, int], str] = {}
+        self.calls: Counter[str] = Counter()
+        self.refunds = 0
+
+    @property
+    def total(self) -> int:
+        return sum(self.stacks.values())
+
+    def merge(self, other: "GasProfile") -> "GasProfile":
+        self.stacks.update(other.stacks)
+        self.lines.update(other.lines)
+        self.line_sources.update(other.line_sources)
+        self.calls.update(other.calls)
+        self.refunds += other.refunds
+        return self
+
+    def by_function(self) -> dict[str, dict[str, int]]:
+        """
+        Self and total (inclusive) gas and call count of every function, most expensive first.
+        Opcode leaf frames count towards the self gas of the function they ran in,
+        contract frames towards the caller's.
+        """
+        functions: dict[str, dict[str, int]] = {}
+        for stack, gas in self.stacks.items():
+            frames = [frame for frame in stack if not _is_pseudo_frame(frame)]
+            for frame in set(frames):
+                entry = functions.setdefault(frame, {"self": 0, "total": 0, "calls": self.calls[frame]})
+                entry["total"] += gas
+            if frames:
+                functions[frames[-1]]["self"] += gas
+        return dict(sorted(functions.items(), key=lambda item: -item[1]["total"]))
+
+    def top_lines(self, count: int = 20) -> list[tuple[str, str, int, int, str]]:
+        """
+        @return: (contract, function, line number, gas, source) of the most expensive lines
+        """
+        return [
+            (contract, function, lineno, gas, self.line_sources.get((contract, lineno), ""))
+            for (contract, function, lineno), gas in self.lines.most_common(count)
+        ]
+
+    def collapsed(self) -> str:
+        """
+        Collapsed stacks, one `frame;frame;frame gas` line per stack.
+        """
+        return "".join(f"{';'.join(stack)} {gas}\n" for stack, gas in sorted(self.stacks.items()) if gas)
+
+    def save(self, path: Path = DEFAULT_PROFILE_PATH) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(self.collapsed())
+        return path
+
+    @classmethod
+    def load(cls, path: Path = DEFAULT_PROFILE_PATH) -> "GasProfile":
+        """
+        Read collapsed stacks written by `save`; line data is not part of that format.
+        """
+        profile = cls()
+        for line in Path(path).read_text().splitlines():
+            if line.strip():
+                stack, gas = line.rsplit(" ", 1)
+                profile.stacks[tuple(stack.split(";"))] += int(gas)
+        return profile
+
+
+_LEAF_FRAMES = set(OPCODE_FRAMES.values())
+
+
+def _is_pseudo_frame(frame: str) -> bool:
+    return frame in _LEAF_FRAMES or frame == UNKNOWN_CODE_FRAME or frame.endswith(".vy")
+
+
+def diff(before: GasProfile, after: GasProfile) -> list[tuple[str, int, int, int]]:
+    """
+    Change of inclusive gas per function between two profiles, largest change first.
+    @return: (function, gas before, gas after, after - before)
+    """
+    old, new = before.by_function(), after.by_function()
+    rows = [
+        (name, old.get(name, {}).get("total", 0), new.get(name, {}).get("total", 0))
+        for name in old.keys() | new.keys()
+    ]
+    return sorted(((name, a, b, b - a) for name, a, b in rows), key=lambda row: (-abs(row[3]), row[0]))
+
+
+def collapsed_diff(before: GasProfile, after: GasProfile) -> str:
+    """
+    Both profiles as `stack gas_before gas_after` lines, the input of difffolded-style
+    differential flamegraphs (`flamegraph.pl` on the output of `difffolded.pl`).
+    """
+    stacks = sorted(before.stacks.keys() | after.stacks.keys())
+    return "".join(f"{';'.join(stack)} {before.stacks[stack]} {after.stacks[stack]}\n" for stack in stacks)
+
+
+class _StepGasMeter(GasMeter):
+    """
+    py-evm gas meter that keeps every (pc, gas) charge in order.
+    """
+
+    profiler: "GasProfiler"
+
+    def __init__(self, start_gas, *args, **kwargs):
+        super().__init__(start_gas, *args, **kwargs)
+        self.steps: list[tuple[int, int]] = []
+        self.refunds = 0
+        # (index of the parent's CALL step, child meter)
+        self.children: list[tuple[int, "_StepGasMeter"]] = []
+        self.profiler._register(self)
+
+    def _set_code(self, code):
+        self.code = code
+
+    def consume_gas(self, amount: int, reason: str) -> None:
+        super().consume_gas(amount, reason)
+        self.profiler._resume(self)
+        self.steps.append((self.code.program_counter - 1, amount))
+
+    def return_gas(self, amount: int) -> None:
+        super().return_gas(amount)
+        self.profiler._resume(self)
+        self.steps.append((self.code.program_counter - 1, -amount))
+
+    def refund_gas(self, amount: int) -> None:
+        super().refund_gas(amount)
+        self.refunds += amount
+
+
+class GasProfiler:
+    """
+    Context manager recording a call-tree gas profile of every transaction and call made inside it.
+    @param env: boa environment to profile, the active one by default
+    """
+
+    def __init__(self, env=None):
+        self.env = env or boa.env
+        self.profile = GasProfile()
+        self._meters: list[_StepGasMeter] = []
+        # Meters of computations that have not returned yet, innermost last
+        self._active: list[_StepGasMeter] = []
+        self._previous_meter_class = None
+
+    def __enter__(self) -> "GasProfiler":
+        self._previous_meter_class = self.env.get_gas_meter_class()
+        self.env.set_gas_meter_class(type("StepGasMeter", (_StepGasMeter,), {"profiler": self}))
+        return self
+
+    def __exit__(self, *exc):
+        self.env.set_gas_meter_class(self._previous_meter_class)
+        self.collect()
+
+    def collect(self) -> GasProfile:
+        """
+        Fold the computations recorded so far into `profile`.
+        """
+        codes = _CodeIndex(self.env)
+        for meter in self._meters:
+            if meter.parent is None:
+                self._fold(meter, (), codes)
+        self._meters.clear()
+        self._active.clear()
+        return self.profile
+
+    # ------------------------------------------------------------------
+    #                            INTERNALS
+    # ------------------------------------------------------------------
+
+    def _register(self, meter: _StepGasMeter):
+        meter.parent = None
+        if self._active:
+            caller = self._active[-1]
+            # A top-level call starts while the previous one's meter is still listed
+            if caller.steps and caller.code._raw_code_bytes[caller.steps[-1][0]] in CALL_OPCODES:
+                meter.parent = caller
+                caller.children.append((len(caller.steps) - 1, meter))
+        self._meters.append(meter)
+        self._active.append(meter)
+
+    def _resume(self, meter: _StepGasMeter):
+        # Charging the caller again means its callees have returned
+        if self._active[-1] is not meter and meter in self._active:
+            while self._active[-1] is not meter:
+                self._active.pop()
+
+    def _fold(self, meter: _StepGasMeter, prefix: tuple[str, ...], codes: "_CodeIndex") -> int:
+        """
+        Add the stacks of `meter` and its callees under `prefix`.
+        @return: Gas used by the computation, including its callees
+        """
+        profile = self.profile
+        code = bytes(meter.code._raw_code_bytes)
+        source = codes.lookup(code)
+        profile.refunds += meter.refunds
+        total = sum(gas for _, gas in meter.steps)
+
+        if source is None:
+            profile.stacks[prefix + (UNKNOWN_CODE_FRAME,)] += total
+            return total
+
+        name, ast_map, locations = source
+        child_indices = {index for index, _ in meter.children}
+
+        stack: list[str] = []
+        lineno = None
+        for index, (pc, gas) in enumerate(meter.steps):
+            location = locations.get(pc)
+            if location is None and pc not in locations:
+                location = locations[pc] = self._locate(ast_map, name, pc)
+            if location is not None:
+                function, lineno = location
+                if not stack or stack[-1] != function:
+                    if function in stack:
+                        del stack[stack.index(function) + 1 :]
+                    else:
+                        stack.append(function)
+                        profile.calls[function] += 1
+
+            frames = (*prefix, f"{name}.vy", *stack)
+            leaf = OPCODE_FRAMES.get(code[pc]) if pc < len(code) else None
+            full = frames + (leaf,) if leaf else frames
+            profile.stacks[full] += gas
+            if lineno is not None:
+                profile.lines[(name, stack[-1], lineno)] += gas
+
+            if index in child_indices:
+                # The CALL step was charged everything its callee used, move that to the callee
+                for child_index, child in meter.children:
+                    if child_index == index:
+                        used = self._fold(child, frames, codes)
+                        profile.stacks[full] -= used
+                        if lineno is not None:
+                            profile.lines[(name, stack[-1], lineno)] -= used
+        return total
+
+    def _locate(self, ast_map: dict, name: str, pc: int) -> tuple[str, int] | None:
+        node = ast_map.get(pc)
+        if node is None:
+            return None
+        function = node if isinstance(node, vy_ast.FunctionDef) else node.get_ancestor(vy_ast.FunctionDef)
+        if function is None:
+            return None
+
+        frame = function.name
+        module = Path(node.module_node.resolved_path).stem
+        if module != name:
+            frame = f"{module}.{frame}"
+
+        lines = node.full_source_code.splitlines()
+        if 0 < node.lineno <= len(lines):
+            self.profile.line_sources[(name, node.lineno)] = lines[node.lineno - 1].strip()
+        return frame, node.lineno
+
+
+class _CodeIndex:
+    """
+    Finds the vyper contract, and its source map, that running code was compiled from.
+    Matching on bytecode rather than on addresses also works for deployments
+    and after the environment has been rolled back.
+    """
+
+    def __init__(self, env):
+        self._compiled = {}
+        for contract in env._contracts.values():
+            compiler_data = getattr(contract, "compiler_data", None)
+            if compiler_data is not None:
+                self._compiled.setdefault(id(compiler_data), contract)
+        self._sources: dict[bytes, tuple[str, dict, dict] | None] = {}
+
+    def lookup(self, code: bytes) -> tuple[str, dict, dict] | None:
+        """
+        @return: Contract name, pc to AST node map and a cache for `_locate`, or None for unknown code
+        """
+        if code not in self._sources:
+            self._sources[code] = self._find(code)
+        return self._sources[code]
+
+    def _find(self, code: bytes) -> tuple[str, dict, dict] | None:
+        for contract in self._compiled.values():
+            compiler_data = contract.compiler_data
+            name = Path(compiler_data.contract_path).stem
+            # Immutables and constructor arguments are appended to the compiled code
+            if code.startswith(compiler_data.bytecode_runtime):
+                return name, contract.source_map["pc_raw_ast_map"], {}
+            if code.startswith(compiler_data.bytecode):
+                return name, contract._deployment_source_map["pc_raw_ast_map"], {}
+        return None
+
+
+def profile_game(rounds: int = 20) -> GasProfile:
+    """
+    Profile a full game on a fresh zkTitans: two registrations, a battle, and rounds until it ends.
+    """
+    # Deferred, deploy prints and imports the contract module
+    from script.deploy import deploy_zktitans
+
+    with boa.env.anchor():
+        titans = deploy_zktitans("")
+        player1 = boa.env.generate_address("profiled player 1")
+        player2 = boa.env.generate_address("profiled player 2")
+
+        with GasProfiler() as profiler:
+            with boa.env.prank(player1):
+                titans.registerPlayer("Profiled One", "Token")
+                titans.createBattle("Profiled Battle")
+            with boa.env.prank(player2):
+                titans.registerPlayer("Profiled Two", "Token")
+                titans.joinBattle("Profiled Battle")
+
+            for _ in range(rounds):
+                if titans.getBattle("Profiled Battle")[0] == 4:
+                    break
+                with boa.env.prank(player1):
+                    titans.attackOrDefendChoice(1, "Profiled Battle")
+                with boa.env.prank(player2):
+                    titans.attackOrDefendChoice(1, "Profiled Battle")
+                boa.env.time_travel(blocks=1)
+
+    return profiler.profile
+
+
+def print_profile(profile: GasProfile, lines: int = 15):
+    print(f"Execution gas: {profile.total:,}  (refunds: {profile.refunds:,})")
+    print(f"{'function':<32} {'calls':>6} {'self':>12} {'total':>12}")
+    for name, entry in profile.by_function().items():
+        print(f"{name:<32} {entry['calls']:>6} {entry['self']:>12,} {entry['total']:>12,}")
+
+    print("\nMost expensive lines:")
+    for contract, function, lineno, gas, source in profile.top_lines(lines):
+        print(f"{gas:>10,}  {contract}.vy:{lineno:<5} {function:<24} {source[:60]}")
+
+
+def print_diff(before: GasProfile, after: GasProfile):
+    print(f"Execution gas: {before.total:,} -> {after.total:,} ({after.total - before.total:+,})")
+    for name, old, new, change in diff(before, after):
+        if change:
+            print(f"{name:<32} {old:>12,} {new:>12,} {change:>+10,}")
+
+
+def moccasin_main():
+    profile = profile_game()
+    print_profile(profile)
+    path = profile.save()
+    print(f"\nCollapsed stacks written to {path}, render them with flamegraph.pl or speedscope")
+
+    if DEFAULT_BASELINE_PATH.exists():
+        print(f"\nCompared to {DEFAULT_BASELINE_PATH}:")
+        print_diff(GasProfile.load(DEFAULT_BASELINE_PATH), profile)
+    else:
+        print(f"Copy it to {DEFAULT_BASELINE_PATH} to diff later runs against it")
@@ -0,0 +1,229 @@
+"""
+Precomputed gas limits for zkTitans transactions.
+
+Bots normally send eth_estimateGas before every transaction, doubling the RPC
+calls per move. The entry points have few distinct code paths, so their
+worst-case gas can instead be measured once: `measure` plays random games in
+boa with maximum-length names and records the highest execution gas of every
+path, e.g. `attackOrDefendChoice/first`, the second move of each move
+combination (`AD` is player 1 attacking and player 2 defending) and the same
+combination ending the battle (`AD-end`).
+
+The table is bound to the keccak256 of the runtime bytecode it was measured
+on. `GasTable.matches` compares it with the deployed code once, and a table
+that does not match must not be used; zkSync networks run different bytecode,
+so they keep estimating. `GasTable.limit` adds intrinsic and calldata gas to
+the path's gas and a safety margin, all locally.
+
+Measurement needs boa, the lookup side only the standard library and
+`script.rules`. Write out/gas_table.json with `mox run gas_table`.
+"""
+
+import json
+import math
+import random
+from pathlib import Path
+
+from script.rules import ATTACK, DEFEND, PlayerState, can_attack, resolve_round
+
+TABLE_VERSION = 1
+GAS_TABLE_PATH = Path("out") / "gas_table.json"
+
+TRANSACTION_GAS = 21_000
+GAS_PER_ZERO_BYTE = 4
+GAS_PER_NONZERO_BYTE = 16
+# Headroom over the measured worst case, for state the games did not reach
+MARGIN = 0.15
+
+# Maximum lengths of the names the entry points take
+MAX_NAME_LENGTH = 100
+MAX_TOKEN_NAME_LENGTH = 1000
+
+MOVE_FUNCTIONS = ("attackOrDefendChoice", "attackOrDefendChoiceById")
+# Defending players never lose health, so DD cannot end a battle
+MOVE_PATHS = ("first", "AA", "AD", "DA", "DD", "AA-end", "AD-end", "DA-end")
+SINGLE_PATH_FUNCTIONS = ("registerPlayer", "createBattle", "joinBattle", "joinBattleById", "quitBattle", "quitBattleById")
+REQUIRED_PATHS = SINGLE_PATH_FUNCTIONS + tuple(f"{function}/{path}" for function in MOVE_FUNCTIONS for path in MOVE_PATHS)
+
+_MOVE_LETTERS = {ATTACK: "A", DEFEND: "D"}
+
+
+class GasTableError(Exception):
+    pass
+
+
+def calldata_gas(calldata: bytes) -> int:
+    zeros = calldata.count(0)
+    return zeros * GAS_PER_ZERO_BYTE + (len(calldata) - zeros) * GAS_PER_NONZERO_BYTE
+
+
+def move_path(moves: tuple[int, int], player: int, choice: int, states: tuple[PlayerState, PlayerState] | None = None) -> str | tuple[str, ...]:
+    """
+    Path of a move by `player` (0 or 1) in a battle whose moves so far are `moves`.
+    @param states: Both players' state, to tell whether the round ends the battle.
+        Without them the second move's continue and end paths are both returned,
+        and `GasTable.limit` takes the larger one.
+    """
+    if moves[1 - player] == 0:
+        return "first"
+    round_moves = list(moves)
+    round_moves[player] = choice
+    combination = "".join(_MOVE_LETTERS[move] for move in round_moves)
+    if states is None:
+        return (combination, f"{combination}-end")
+    ended = resolve_round(*states, *round_moves).winner is not None
+    return f"{combination}-end" if ended else combination
+
+
+class GasTable:
+    """
+    Worst-case execution gas per entry point path, for one bytecode.
+    @param paths: Gas by "<function>/<path>", or by "<function>" for functions with a single path
+    """
+
+    def __init__(self, bytecode_hash: str, paths: dict[str, int], version: int = TABLE_VERSION):
+        if version != TABLE_VERSION:
+            raise GasTableError(f"Gas table version {version} is not supported, expected {TABLE_VERSION}")
+        self.bytecode_hash = bytecode_hash
+        self.paths = paths
+
+    def save(self, path: Path = GAS_TABLE_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        table = {"version": TABLE_VERSION, "bytecode_hash": self.bytecode_hash, "paths": dict(sorted(self.paths.items()))}
+        path.write_text(json.dumps(table, indent=2) + "\n")
+
+    @classmethod
+    def load(cls, path: Path = GAS_TABLE_PATH) -> "GasTable":
+        table = json.loads(path.read_text())
+        return cls(table["bytecode_hash"], table["paths"], table["version"])
+
+    def matches(self, rpc, address: str) -> bool:
+        """
+        Whether the code deployed at `address` is the code this table was measured on.
+        @param rpc: JSON-RPC client with `call(method, params)`, e.g. an `RpcTransport`
+        """
+        from eth_hash.auto import keccak
+
+        code = bytes.fromhex(rpc.call("eth_getCode", [address, "latest"]).removeprefix("0x"))
+        return "0x" + keccak(code).hex() == self.bytecode_hash
+
+    def execution_gas(self, function: str, path: str | tuple[str, ...] | None = None) -> int:
+        keys = [function] if path is None else [f"{function}/{p}" for p in ((path,) if isinstance(path, str) else path)]
+        try:
+            return max(self.paths[key] for key in keys)
+        except KeyError as e:
+            raise GasTableError(f"No gas measured for {e.args[0]}") from None
+
+    def limit(self, function: str, calldata: bytes, path: str | tuple[str, ...] | None = None) -> int:
+        """
+        Gas limit for a transaction calling `function` with `calldata`, without estimating it.
+        @param path: Path of the call, see `move_path` for moves; None for single path functions
+        """
+        gas = TRANSACTION_GAS + calldata_gas(calldata) + self.execution_gas(function, path)
+        return math.ceil(gas * (1 + MARGIN))
+
+
+# ------------------------------------------------------------------
+#                        MEASUREMENT
+# ------------------------------------------------------------------
+
+
+def bytecode_hash(contract) -> str:
+    import boa
+    from eth_utils import keccak
+
+    return "0x" + keccak(boa.env.get_code(contract.address)).hex()
+
+
+class _Recorder:
+    def __init__(self, titans):
+        self.titans = titans
+        self.paths: dict[str, int] = {}
+        self.samples: dict[str, int] = {}
+
+    def missing(self, min_samples: int) -> list[str]:
+        return [key for key in REQUIRED_PATHS if self.samples.get(key, 0) < min_samples]
+
+    def call(self, sender, function: str, *args, path: str | None = None):
+        import boa
+
+        with boa.env.prank(sender):
+            getattr(self.titans, function)(*args)
+        key = function if path is None else f"{function}/{path}"
+        self.paths[key] = max(self.paths.get(key, 0), self.titans._computation.get_gas_used())
+        self.samples[key] = self.samples.get(key, 0) + 1
+
+
+def _state(titans, player) -> PlayerState:
+    player_data = titans.getPlayer(player)
+    return PlayerState(health=player_data[3], mana=player_data[2], attack=titans.getPlayerToken(player)[2])
+
+
+def _name(prefix: str, length: int = MAX_NAME_LENGTH) -> str:
+    return prefix[:length].ljust(length, "~")
+
+
+def measure(min_samples: int = 5, max_games: int = 500, seed: int = 0) -> GasTable:
+    """
+    Play random games on a fresh zkTitans and record the worst gas of every path,
+    until each of REQUIRED_PATHS ran at least `min_samples` times. Games alternate
+    between the name and id entry points, and some end with a player quitting.
+    @raise GasTableError: If `max_games` games did not reach every path
+    """
+    import boa
+
+    from contracts import zkTitans
+
+    rng = random.Random(seed)
+    with boa.env.anchor():
+        titans = zkTitans.deploy("", False)
+        recorder = _Recorder(titans)
+        game = 0
+        while recorder.missing(min_samples):
+            if game == max_games:
+                raise GasTableError(f"{max_games} games did not reach {', '.join(recorder.missing(min_samples))}")
+            players = [boa.env.generate_address(f"gas table {game} {i}") for i in range(2)]
+            for i, player in enumerate(players):
+                recorder.call(player, "registerPlayer", _name(f"Player {game} {i} "), _name("Token ", MAX_TOKEN_NAME_LENGTH))
+
+            name = _name(f"Gas Table Battle {game} ")
+            recorder.call(players[0], "createBattle", name)
+            battle_id = titans.battleInfo(name)
+            by_id = game % 2 == 1
+            if by_id:
+                recorder.call(players[1], "joinBattleById", battle_id)
+            else:
+                recorder.call(players[1], "joinBattle", name)
+
+            # Two games in four end with a quit, one by name and one by id
+            quit_after = rng.randrange(1, 6) if game % 4 >= 2 else None
+            rounds = 0
+            while titans.battles(battle_id - 1)[0] != 4:
+                if rounds == quit_after:
+                    if by_id:
+                        recorder.call(players[0], "quitBattleById", battle_id)
+                    else:
+                        recorder.call(players[0], "quitBattle", name)
+                    break
+                states = (_state(titans, players[0]), _state(titans, players[1]))
+                choices = [ATTACK if can_attack(state) and rng.random() < 0.6 else DEFEND for state in states]
+                order = [0, 1] if rng.random() < 0.5 else [1, 0]
+                moves = [0, 0]
+                for player in order:
+                    path = move_path(tuple(moves), player, choices[player], states)
+                    function = MOVE_FUNCTIONS[by_id]
+                    recorder.call(players[player], function, choices[player], battle_id if by_id else name, path=path)
+                    moves[player] = choices[player]
+                rounds += 1
+                boa.env.time_travel(seconds=rng.randrange(1, 600))
+            game += 1
+
+        return GasTable(bytecode_hash(titans), recorder.paths)
+
+
+def moccasin_main():
+    table = measure()
+    table.save()
+    print(f"Wrote {GAS_TABLE_PATH} for bytecode {table.bytecode_hash}")
+    for key, gas in sorted(table.paths.items()):
+        print(f"{key:<40} {gas:>10,}")
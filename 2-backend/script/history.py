@@ -0,0 +1,375 @@
+"""
+Columnar export of zkTitans game history for balance and economy analysis.
+
+`HistoryExporter` turns contract logs into two append-only tables:
+
+- rounds: one row per resolved round, from `RoundEnded`, tied to its battle by
+  the `BattleMove` of the same transaction that resolved it
+- results: one row per finished battle, from `BattleEnded`, with the card id
+  each player fought with (from their latest `NewGameToken`) and the number of
+  rounds played
+
+`RoundEnded` only lists damaged players, and the same pair is logged when both
+players attack, both defend or only player 2 attacks. When only player 1 attacks
+the defender is listed twice, so a round's moves can't be fully recovered from logs.
+
+Feed logs block by block with `process_logs` and `flush` to append them as a new
+part file; the exporter state (last block, open battles, player cards) is saved
+alongside, so an export can stop and resume at any block. `snapshot` writes the
+current players, game tokens and battles from the contract views.
+
+Parts are uncompressed Arrow IPC files, which `GameHistory` memory-maps: queries
+run vectorized over the mapped buffers without copying or decoding them, so
+tens of millions of rounds stay well within a laptop's memory. `export_parquet`
+converts every table to a single Parquet file for other tools.
+
+Requires pyarrow. Run with `mox run history --network <network>` to export the
+latest zkTitans deployment to out/history.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Iterable
+
+import numpy as np
+from eth_utils import keccak, to_canonical_address
+
+from script.bindings import battles_to_array, call_raw, decode_game_tokens, decode_players
+from script.cache import decode_log
+
+# Must match the constants in contracts/zkTitans.vy
+MAX_CARD_TYPES = 30
+MAX_MANA = 25
+
+HISTORY_DIR = Path("out") / "history"
+STATE_FILE = "state.json"
+# Blocks per eth_getLogs request
+LOG_PAGE = 10_000
+UNKNOWN_CARD = -1
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError as e:
+        raise ImportError("The history export needs pyarrow, install it with `pip install pyarrow`") from e
+    return pyarrow
+
+
+def _schemas() -> dict:
+    pa = _pyarrow()
+    address = pa.binary(20)
+    return {
+        "rounds": pa.schema(
+            [
+                ("block", pa.int64()),
+                ("battle_hash", pa.binary(32)),
+                ("round", pa.int32()),
+                ("damaged_1", address),
+                ("damaged_2", address),
+            ]
+        ),
+        "results": pa.schema(
+            [
+                ("block", pa.int64()),
+                ("battle_name", pa.string()),
+                ("winner", address),
+                ("loser", address),
+                ("winner_card", pa.int8()),
+                ("loser_card", pa.int8()),
+                ("rounds", pa.int32()),
+            ]
+        ),
+    }
+
+
+def _write_arrow(path: Path, table):
+    pa = _pyarrow()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Written aside then renamed, so readers never map a half-written part
+    tmp = path.with_suffix(".tmp")
+    with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)
+
+
+def _address(value) -> bytes:
+    return to_canonical_address(value)
+
+
+class HistoryExporter:
+    """
+    Appends zkTitans game history to columnar files under `path`.
+    @param path: Export directory; an existing export is resumed
+    """
+
+    def __init__(self, path: Path = HISTORY_DIR):
+        self.path = Path(path)
+        self.schemas = _schemas()
+        self._rows: dict[str, list[dict]] = {name: [] for name in self.schemas}
+
+        state = {}
+        if (self.path / STATE_FILE).exists():
+            state = json.loads((self.path / STATE_FILE).read_text())
+        # Last block whose logs were processed
+        self.last_block: int = state.get("last_block", -1)
+        # Rounds played in battles that have not ended yet, by battle name hash, as
+        # BattleMove only carries the hash and the battle may predate the export
+        self._rounds: dict[str, int] = state.get("rounds", {})
+        # Card id of every player's current game token
+        self._cards: dict[str, int] = state.get("cards", {})
+        self._parts: int = state.get("parts", 0)
+
+    def process_logs(self, logs: Iterable[tuple[str, dict[str, Any]]], block: int):
+        """
+        Record the zkTitans logs of one block, in emission order.
+        Blocks at or before the last processed one are skipped, so replaying a range is harmless.
+        @param logs: (event name, args dict) pairs, see `script.cache.decode_log`
+        """
+        if block <= self.last_block:
+            return
+        self.last_block = block
+
+        # The battle of the move last logged, RoundEnded carries no battle name
+        battle_hash = None
+        for name, args in logs:
+            if name == "NewGameToken":
+                self._cards[args["owner"].lower()] = args["id"]
+            elif name == "BattleMove":
+                battle_hash = bytes(args["battleName"])
+            elif name == "RoundEnded" and battle_hash is not None:
+                self._end_round(block, battle_hash, args["damagedPlayers"])
+            elif name == "BattleEnded":
+                self._end_battle(block, args)
+
+    def flush(self) -> int:
+        """
+        Append the rows recorded since the last flush as new part files and save the state.
+        @return: Number of rows written
+        """
+        pa = _pyarrow()
+        written = 0
+        if any(self._rows.values()):
+            self._parts += 1
+        for name, rows in self._rows.items():
+            if not rows:
+                continue
+            table = pa.Table.from_pylist(rows, schema=self.schemas[name])
+            _write_arrow(self.path / name / f"part-{self._parts:06d}.arrow", table)
+            written += len(rows)
+            rows.clear()
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        state = {
+            "last_block": self.last_block,
+            "rounds": self._rounds,
+            "cards": self._cards,
+            "parts": self._parts,
+        }
+        tmp = self.path / f"{STATE_FILE}.tmp"
+        tmp.write_text(json.dumps(state))
+        os.replace(tmp, self.path / STATE_FILE)
+        return written
+
+    def snapshot(self, titans):
+        """
+        Overwrite the players, game tokens and battles tables with the contract's current state.
+        """
+        pa = _pyarrow()
+        players = decode_players(call_raw(titans, "getAllPlayers"))[1:]
+        _write_arrow(
+            self.path / "players.arrow",
+            pa.table(
+                {
+                    "address": pa.array([_address(p.playerAddress) for p in players], pa.binary(20)),
+                    "name": pa.array([p.playerName for p in players], pa.string()),
+                    "mana": pa.array([p.playerMana for p in players], pa.int16()),
+                    "health": pa.array([p.playerHealth for p in players], pa.int16()),
+                    "in_battle": pa.array([p.inBattle for p in players], pa.bool_()),
+                }
+            ),
+        )
+
+        tokens = decode_game_tokens(call_raw(titans, "getAllPlayerTokens"))[1:]
+        _write_arrow(
+            self.path / "tokens.arrow",
+            pa.table(
+                {
+                    "name": pa.array([t.name for t in tokens], pa.string()),
+                    "card": pa.array([t.id for t in tokens], pa.int8()),
+                    "attack": pa.array([t.attackStrength for t in tokens], pa.int8()),
+                    "defense": pa.array([t.defenseStrength for t in tokens], pa.int8()),
+                }
+            ),
+        )
+
+        battles = battles_to_array(call_raw(titans, "getAllBattles"))
+        _write_arrow(
+            self.path / "battles.arrow",
+            pa.table(
+                {
+                    "status": pa.array(battles["battleStatus"], pa.uint8()),
+                    "name": pa.array(battles["name"].tolist(), pa.string()),
+                    "player_1": pa.array(battles["players"][:, 0].tolist(), pa.binary(20)),
+                    "player_2": pa.array(battles["players"][:, 1].tolist(), pa.binary(20)),
+                    "winner": pa.array(battles["winner"].tolist(), pa.binary(20)),
+                }
+            ),
+        )
+
+    def _end_round(self, block: int, battle_hash: bytes, damaged: list[str]):
+        key = battle_hash.hex()
+        self._rounds[key] = self._rounds.get(key, 0) + 1
+        self._rows["rounds"].append(
+            {
+                "block": block,
+                "battle_hash": battle_hash,
+                "round": self._rounds[key],
+                "damaged_1": _address(damaged[0]),
+                "damaged_2": _address(damaged[1]),
+            }
+        )
+
+    def _end_battle(self, block: int, args: dict[str, Any]):
+        name = args["battleName"]
+        self._rows["results"].append(
+            {
+                "block": block,
+                "battle_name": name,
+                "winner": _address(args["winner"]),
+                "loser": _address(args["loser"]),
+                "winner_card": self._cards.get(args["winner"].lower(), UNKNOWN_CARD),
+                "loser_card": self._cards.get(args["loser"].lower(), UNKNOWN_CARD),
+                "rounds": self._rounds.pop(keccak(text=name).hex(), 0),
+            }
+        )
+
+
+def fetch_logs(rpc, titans, from_block: int, to_block: int) -> list[tuple[int, list]]:
+    """
+    Fetch and decode the zkTitans logs of a block range with eth_getLogs.
+    @param rpc: boa RPC, or a `script.rpc.TransportRPC`
+    @return: (block, logs) pairs in block order, as `HistoryExporter.process_logs` takes them
+    """
+    raw = rpc.fetch(
+        "eth_getLogs",
+        [{"address": str(titans.address), "fromBlock": hex(from_block), "toBlock": hex(to_block)}],
+    )
+    raw.sort(key=lambda log: (int(log["blockNumber"], 16), int(log["logIndex"], 16)))
+
+    blocks: dict[int, list] = {}
+    for log in raw:
+        topics = [int(topic, 16) for topic in log["topics"]]
+        data = bytes.fromhex(log["data"].removeprefix("0x"))
+        blocks.setdefault(int(log["blockNumber"], 16), []).append(decode_log(titans, topics, data))
+    return list(blocks.items())
+
+
+class GameHistory:
+    """
+    Memory-mapped, read-only view of an export, with the standard balance queries.
+    @param path: Export directory written by `HistoryExporter`
+    """
+
+    def __init__(self, path: Path = HISTORY_DIR):
+        self.path = Path(path)
+
+    def table(self, name: str):
+        """
+        A table of the export as one pyarrow Table over the memory-mapped parts, without copies.
+        """
+        pa = _pyarrow()
+        files = sorted((self.path / name).glob("part-*.arrow")) or [self.path / f"{name}.arrow"]
+        tables = [pa.ipc.open_file(pa.memory_map(str(file), "r")).read_all() for file in files if file.exists()]
+        if not tables:
+            schemas = _schemas()
+            if name not in schemas:
+                raise FileNotFoundError(f"No {name} table in {self.path}")
+            return schemas[name].empty_table()
+        return pa.concat_tables(tables)
+
+    def _bincount(self, column, length: int) -> np.ndarray:
+        counts = np.zeros(length, dtype=np.int64)
+        for chunk in column.chunks:
+            values = chunk.to_numpy(zero_copy_only=True)
+            counts += np.bincount(values[values >= 0], minlength=length)[:length]
+        return counts
+
+    def win_rate_by_card(self) -> np.ndarray:
+        """
+        Share of finished battles won by players holding each card id 0-29, NaN for unplayed cards.
+        Battles whose player cards are unknown to the export are left out.
+        """
+        results = self.table("results")
+        wins = self._bincount(results["winner_card"], MAX_CARD_TYPES)
+        games = wins + self._bincount(results["loser_card"], MAX_CARD_TYPES)
+        return np.divide(wins, games, out=np.full(MAX_CARD_TYPES, np.nan), where=games > 0)
+
+    def average_rounds_per_battle(self) -> float:
+        """
+        Mean number of rounds of the finished battles, NaN if none finished.
+        """
+        rounds = self.table("results")["rounds"]
+        total = sum(int(chunk.to_numpy(zero_copy_only=True).sum()) for chunk in rounds.chunks)
+        return total / len(rounds) if len(rounds) else float("nan")
+
+    def mana_curve(self, in_battle: bool | None = None) -> np.ndarray:
+        """
+        Number of players at each mana level 0-25 in the latest snapshot.
+        @param in_battle: Only count players in a battle (True) or idle (False)
+        """
+        players = self.table("players")
+        mana = np.concatenate([chunk.to_numpy(zero_copy_only=True) for chunk in players["mana"].chunks] or [[]])
+        if in_battle is not None:
+            flags = np.concatenate([chunk.to_numpy(zero_copy_only=False) for chunk in players["in_battle"].chunks])
+            mana = mana[flags == in_battle]
+        return np.bincount(mana.astype(np.int64), minlength=MAX_MANA + 1)
+
+    def export_parquet(self, out_dir: Path | None = None) -> list[Path]:
+        """
+        Write every table of the export as a single Parquet file.
+        """
+        import pyarrow.parquet as pq
+
+        out_dir = Path(out_dir or self.path / "parquet")
+        out_dir.mkdir(parents=True, exist_ok=True)
+        written = []
+        for name in ("rounds", "results", "players", "tokens", "battles"):
+            try:
+                table = self.table(name)
+            except FileNotFoundError:
+                continue
+            pq.write_table(table, out_dir / f"{name}.parquet")
+            written.append(out_dir / f"{name}.parquet")
+        return written
+
+
+def moccasin_main():
+    import boa
+    from moccasin.config import get_active_network
+
+    active_network = get_active_network()
+    titans = active_network.get_latest_contract_unchecked("zkTitans")
+    if titans is None:
+        raise RuntimeError("No zkTitans deployment found on the active network")
+
+    exporter = HistoryExporter()
+    rpc = boa.env._rpc
+    latest = int(rpc.fetch("eth_blockNumber", []), 16)
+    start = exporter.last_block + 1
+    while start <= latest:
+        end = min(start + LOG_PAGE - 1, latest)
+        for block, logs in fetch_logs(rpc, titans, start, end):
+            exporter.process_logs(logs, block)
+        # A page without zkTitans logs still moves the export forward
+        exporter.last_block = max(exporter.last_block, end)
+        print(f"Blocks {start}-{end}: {exporter.flush()} rows")
+        start = end + 1
+    exporter.snapshot(titans)
+
+    history = GameHistory()
+    print("Win rate by card:", np.round(history.win_rate_by_card(), 3).tolist())
+    print(f"Average rounds per battle: {history.average_rounds_per_battle():.2f}")
+    print("Mana curve:", history.mana_curve().tolist())
@@ -0,0 +1,101 @@
+"""
+Import time and cold start of the slim client against the boa tooling.
+
+Each measurement runs in a fresh interpreter, so nothing is cached in
+sys.modules: `import_time` reads the cumulative time `python -X importtime`
+reports for a module, and `cold_start` times a read-only job end to end, from
+the first import to a decoded battle, and lists the modules it loaded. Times
+vary with the machine, so the tests check the work instead: the read-only job
+loads none of HEAVY_MODULES and at most MODULE_BUDGET modules on top of a bare
+interpreter, `baseline_modules`.
+
+Run with `mox run import_benchmark`.
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).parent.parent
+
+# Modules the client must not load
+HEAVY_MODULES = ("boa", "vyper", "moccasin", "eth_abi", "numpy")
+
+# Modules the read-only job may load beyond a bare interpreter; it loads about 75, import boa alone over 1100
+MODULE_BUDGET = 100
+
+# Modules compared by `moccasin_main`; deploy, keeper and relayer start with the moccasin ones
+MODULES = ["script.client", "script.bindings", "script.rpc", "boa", "moccasin.boa_tools"]
+
+# Read-only job: encode a getBattle call and decode its result, without the network
+READ_JOB = """
+import json, sys, time
+started = time.perf_counter()
+from script.client import Client
+client = Client("0x" + "00" * 20)
+client.calldata("getBattle", "Battle 1")
+client.function("getBattle").decode(bytes.fromhex(sys.argv[1]))
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+def _run(args: list[str]) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=PROJECT_DIR, capture_output=True, text=True, check=True)
+
+
+def import_time(module: str) -> float:
+    """
+    Seconds `module` takes to import in a fresh interpreter, dependencies included.
+    """
+    stderr = _run(["-X", "importtime", "-c", f"import {module}"]).stderr
+    for line in stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        _, cumulative, name = line.split("|")
+        if name.strip() == module:
+            return int(cumulative) / 1e6
+    raise ValueError(f"{module} was not imported:\n{stderr}")
+
+
+def battle_payload() -> bytes:
+    """
+    Return data of `getBattle` for a started battle.
+    """
+    from eth_abi import encode
+
+    from script.bindings import Battle
+
+    battle = (2, b"\x11" * 32, "Battle 1", ["0x" + "22" * 20, "0x" + "33" * 20], [1, 0], "0x" + "00" * 20)
+    return encode([Battle.abi_type()], [battle])
+
+
+def cold_start(payload: bytes | None = None) -> tuple[float, list[str]]:
+    """
+    Run READ_JOB in a fresh interpreter.
+    @return: Seconds from the first import to the decoded battle, and the modules loaded
+    """
+    payload = battle_payload() if payload is None else payload
+    result = json.loads(_run(["-c", READ_JOB, payload.hex()]).stdout)
+    return result["seconds"], result["modules"]
+
+
+def baseline_modules() -> list[str]:
+    """
+    Modules a fresh interpreter has loaded once it imported what READ_JOB imports itself.
+    """
+    return json.loads(_run(["-c", "import json, sys, time; print(json.dumps(sorted(sys.modules)))"]).stdout)
+
+
+def heavy_modules(modules: list[str]) -> list[str]:
+    return [module for module in modules if module.split(".")[0] in HEAVY_MODULES]
+
+
+def moccasin_main():
+    for module in MODULES:
+        print(f"import {module:<20} {import_time(module) * 1000:>8.1f} ms")
+    seconds, modules = cold_start()
+    print(f"client read-only job        {seconds * 1000:>8.1f} ms, {len(modules)} modules loaded")
+    heavy = heavy_modules(modules)
+    if heavy:
+        print(f"Heavy modules loaded: {', '.join(heavy)}")
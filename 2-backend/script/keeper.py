@@ -0,0 +1,150 @@
+import time
+
+from moccasin.boa_tools import VyperContract
+from moccasin.config import get_active_network
+
+from script.metrics import METRICS, MetricsHTTPServer, instrument
+
+# Must match the constants in contracts/zkTitans.vy
+MAX_BATCH_SIZE = 50
+MAX_BATTLE_PAGE = 500
+# Must match the constant in contracts/MoveForwarder.vy
+MAX_PLAYABLE_PAGE = 100
+
+DEFAULT_GAS_BUDGET = 5_000_000
+# Upper bounds, not averages: the intrinsic and calldata gas of a resolveBattles
+# transaction, and the gas one battle adds at most, a resolved round that ends it.
+# tests/unit/test_keeper.py checks them against measured gas.
+RESOLVE_BASE_GAS = 50_000
+MAX_GAS_PER_BATTLE = 150_000
+
+
+class ResolutionKeeper:
+    """
+    Sweeps zkTitans battles that are ready to resolve or abandoned and settles
+    them through `resolveBattles` in chunks sized to fit a gas budget.
+    Chunks are sized before sending, from an upper bound of the gas per battle,
+    so no transaction can exceed the budget.
+    Given the MoveForwarder, each sweep first plays queued moves that became due
+    when an opponent moved directly on zkTitans, which the forwarder can't see.
+    @param titans: Deployed zkTitans contract
+    @param gas_budget: Gas a single `resolveBattles` transaction may use
+    @param gas_per_item: Most gas a single battle adds to the transaction
+    @param forwarder: Deployed MoveForwarder whose queued moves to play, if any
+    """
+
+    def __init__(
+        self,
+        titans: VyperContract,
+        gas_budget: int = DEFAULT_GAS_BUDGET,
+        gas_per_item: int = MAX_GAS_PER_BATTLE,
+        forwarder: VyperContract | None = None,
+    ):
+        self.titans = titans
+        self.gas_budget = gas_budget
+        self.gas_per_item = gas_per_item
+        self.forwarder = forwarder
+
+    def find_resolvable_battles(self) -> list[int]:
+        """
+        Page through the battles array and collect ids `resolveBattles` would act on.
+        """
+        battle_ids = []
+        offset = 0
+        while True:
+            page, total = self.titans.getResolvableBattles(offset, MAX_BATTLE_PAGE)
+            battle_ids.extend(page)
+            offset += MAX_BATTLE_PAGE
+            if offset >= total:
+                return battle_ids
+
+    def find_playable_battles(self) -> list[int]:
+        """
+        Page through the forwarder's queued battles and collect ids with a queued move that is due.
+        """
+        if self.forwarder is None:
+            return []
+
+        battle_ids = []
+        offset = 0
+        while True:
+            page, total = self.forwarder.getPlayableBattles(offset, MAX_PLAYABLE_PAGE)
+            battle_ids.extend(page)
+            offset += MAX_PLAYABLE_PAGE
+            if offset >= total:
+                return battle_ids
+
+    def play_queued_moves(self) -> int:
+        """
+        Play the due queued moves of every battle the forwarder lists, one transaction per battle.
+        @return: Number of moves zkTitans accepted
+        """
+        played = 0
+        for battle_id in self.find_playable_battles():
+            played += self.forwarder.playQueuedMoves(battle_id)
+        return played
+
+    def chunk_size(self) -> int:
+        """
+        Number of battles per transaction that fits the gas budget.
+        """
+        return max(1, min(MAX_BATCH_SIZE, (self.gas_budget - RESOLVE_BASE_GAS) // self.gas_per_item))
+
+    def resolve(self, battle_ids: list[int]) -> int:
+        """
+        Resolve `battle_ids` in gas-bounded chunks.
+        @return: Number of battles the contract resolved or timed out
+        """
+        handled = 0
+        size = self.chunk_size()
+        for start in range(0, len(battle_ids), size):
+            handled += self.titans.resolveBattles(battle_ids[start : start + size])
+        return handled
+
+    def sweep(self) -> int:
+        """
+        Run a single find-and-resolve pass, after playing due queued moves so
+        their rounds resolve instead of timing out.
+        """
+        played = self.play_queued_moves()
+        if played:
+            print(f"Played {played} queued moves")
+
+        battle_ids = self.find_resolvable_battles()
+        if not battle_ids:
+            return 0
+
+        handled = self.resolve(battle_ids)
+        print(f"Resolved {handled} of {len(battle_ids)} battles")
+        return handled
+
+    def run(self, interval: float = 12.0, max_sweeps: int | None = None):
+        """
+        Sweep every `interval` seconds, forever or for `max_sweeps` passes.
+        A failed sweep is logged and retried on the next pass.
+        """
+        sweeps = 0
+        while max_sweeps is None or sweeps < max_sweeps:
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Sweep failed, retrying in {interval}s: {e!r}")
+            sweeps += 1
+            time.sleep(interval)
+
+
+def moccasin_main():
+    active_network = get_active_network()
+    titans = active_network.get_latest_contract_unchecked("zkTitans")
+    if titans is None:
+        raise RuntimeError("No zkTitans deployment found on the active network")
+
+    if METRICS.enabled:
+        MetricsHTTPServer(METRICS).start()
+
+    forwarder = active_network.get_latest_contract_unchecked("MoveForwarder")
+    if forwarder is not None:
+        forwarder = instrument(forwarder)
+
+    print("Running resolution keeper for zkTitans at:", titans.address)
+    ResolutionKeeper(instrument(titans), forwarder=forwarder).run()
@@ -0,0 +1,311 @@
+"""
+Metrics and tracing for zkTitans tooling.
+
+`Metrics` is a small thread-safe registry of counters and histograms rendered
+in the Prometheus text format. `instrument` wraps a boa contract so that every
+call of its functions records
+
+- zktitans_calls_total: calls per contract, function and outcome
+- zktitans_call_seconds: latency, which on a live network includes waiting for
+  the transaction to be confirmed
+- zktitans_gas_used: execution gas per call
+- zktitans_reverts_total: reverts per revert reason
+
+and, given an OpenTelemetry-style tracer, wraps each call in a span. The RPC
+transport, deploy script, keeper and relayer feed the same registry.
+
+Metrics are off unless `ZKTITANS_METRICS=1` is set: the shared `METRICS`
+registry is then disabled, `instrument` returns the contract unwrapped and
+`timed` does nothing, so the tooling runs as before. With metrics on, the
+keeper serves them on http://127.0.0.1:9464/metrics, the relayer on GET
+/metrics of its own server, and deploy prints them when done. Set `ZKTITANS_TRACING=1` to also emit
+spans through opentelemetry, if installed.
+"""
+
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+GAS_BUCKETS = (21_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 2_500_000, 5_000_000, 10_000_000, 30_000_000)
+
+# name -> (type, help, histogram buckets)
+FAMILIES: dict[str, tuple[str, str, tuple]] = {
+    "zktitans_calls_total": ("counter", "Contract calls by outcome", ()),
+    "zktitans_call_seconds": ("histogram", "Contract call latency, including confirmation", LATENCY_BUCKETS),
+    "zktitans_gas_used": ("histogram", "Execution gas used per contract call", GAS_BUCKETS),
+    "zktitans_reverts_total": ("counter", "Contract call reverts by reason", ()),
+    "zktitans_rpc_request_seconds": ("histogram", "JSON-RPC request latency per endpoint", LATENCY_BUCKETS),
+    "zktitans_rpc_failures_total": ("counter", "Failed JSON-RPC requests per endpoint", ()),
+}
+
+METRICS_PORT = 9464
+# Longest revert reason kept as a label, to bound label cardinality
+MAX_REASON_LENGTH = 100
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _labels(labels: dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class Metrics:
+    """
+    Registry of the FAMILIES counters and histograms.
+    @param enabled: A disabled registry records nothing, and `instrument` leaves contracts unwrapped
+    @param tracer: Optional OpenTelemetry-style tracer, with `start_as_current_span(name)`
+    """
+
+    def __init__(self, enabled: bool = True, tracer=None):
+        self.enabled = enabled
+        self.tracer = tracer
+        self._counters: dict[tuple[str, tuple], float] = {}
+        self._histograms: dict[tuple[str, tuple], _Histogram] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(labels.items()))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(labels.items()))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(FAMILIES[name][2])
+            histogram.observe(value)
+
+    def value(self, name: str, **labels) -> float:
+        """
+        Current value of a counter, or the number of observations of a histogram.
+        """
+        key = (name, tuple(labels.items()))
+        with self._lock:
+            if key in self._histograms:
+                return self._histograms[key].count
+            return self._counters.get(key, 0)
+
+    def span(self, name: str, **attributes):
+        """
+        A tracer span, or a no-op context manager without a tracer.
+        """
+        if self.tracer is None:
+            return nullcontext()
+        return self.tracer.start_as_current_span(name, attributes=attributes)
+
+    @contextmanager
+    def timed(self, contract: str, function: str):
+        """
+        Record a block of code as a call of `function`, for operations that are not
+        contract function calls, such as deployments.
+        """
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        status = "error"
+        try:
+            with self.span(f"{contract}.{function}", contract=contract, function=function):
+                yield
+            status = "ok"
+        finally:
+            self.inc("zktitans_calls_total", contract=contract, function=function, status=status)
+            self.observe("zktitans_call_seconds", time.perf_counter() - started, contract=contract, function=function)
+
+    def render(self) -> str:
+        """
+        Every recorded metric in the Prometheus text exposition format.
+        """
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+
+        lines = []
+        for name, (kind, description, _) in FAMILIES.items():
+            samples = []
+            for (metric, labels), value in counters:
+                if metric == name:
+                    samples.append(f"{name}{_labels(dict(labels))} {_number(value)}")
+            for (metric, labels), histogram in histograms:
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    samples.append(f"{name}_bucket{_labels({**dict(labels), 'le': _number(bound)})} {cumulative}")
+                samples.append(f"{name}_bucket{_labels({**dict(labels), 'le': '+Inf'})} {histogram.count}")
+                samples.append(f"{name}_sum{_labels(dict(labels))} {_number(histogram.sum)}")
+                samples.append(f"{name}_count{_labels(dict(labels))} {histogram.count}")
+            if samples:
+                lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}", *samples]
+        return "\n".join(lines) + "\n"
+
+
+def revert_reason(error: Exception) -> str:
+    """
+    Revert reason of a failed boa call, or the exception type for other failures.
+    """
+    stack_trace = getattr(error, "stack_trace", None)
+    frame = getattr(stack_trace, "last_frame", None)
+    if frame is None:
+        return type(error).__name__
+    reason = getattr(frame, "pretty_vm_reason", None) or str(frame)
+    return str(reason)[:MAX_REASON_LENGTH]
+
+
+class _InstrumentedFunction:
+    def __init__(self, contract, function, name: str, metrics: Metrics):
+        self._contract = contract
+        self._function = function
+        self._name = name
+        self._metrics = metrics
+        self._labels = {"contract": getattr(contract, "contract_name", type(contract).__name__), "function": name}
+
+    def __getattr__(self, name):
+        # prepare_calldata and the other function helpers stay reachable
+        return getattr(self._function, name)
+
+    def __call__(self, *args, **kwargs):
+        metrics = self._metrics
+        labels = self._labels
+        started = time.perf_counter()
+        try:
+            with metrics.span(f"{labels['contract']}.{self._name}", **labels):
+                result = self._function(*args, **kwargs)
+        except Exception as e:
+            metrics.inc("zktitans_calls_total", **labels, status="revert")
+            metrics.inc("zktitans_reverts_total", **labels, reason=revert_reason(e))
+            raise
+        finally:
+            metrics.observe("zktitans_call_seconds", time.perf_counter() - started, **labels)
+
+        metrics.inc("zktitans_calls_total", **labels, status="ok")
+        computation = getattr(self._contract, "_computation", None)
+        if computation is not None:
+            metrics.observe("zktitans_gas_used", computation.get_gas_used(), **labels)
+        return result
+
+
+class InstrumentedContract:
+    """
+    Proxy of a boa contract recording metrics for every function call, see `instrument`.
+    """
+
+    def __init__(self, contract, metrics: Metrics):
+        self._contract = contract
+        self._metrics = metrics
+        self._functions: dict[str, _InstrumentedFunction] = {}
+
+    def __getattr__(self, name):
+        function = self._functions.get(name)
+        if function is not None:
+            return function
+        attr = getattr(self._contract, name)
+        # Contract functions are the attributes that can encode calldata
+        if not hasattr(attr, "prepare_calldata"):
+            return attr
+        function = self._functions[name] = _InstrumentedFunction(self._contract, attr, name, self._metrics)
+        return function
+
+
+def instrument(contract, metrics: Metrics | None = None):
+    """
+    Wrap `contract` to record metrics for its calls, or return it as is when metrics are disabled.
+    """
+    metrics = METRICS if metrics is None else metrics
+    if not metrics.enabled:
+        return contract
+    return InstrumentedContract(contract, metrics)
+
+
+def _otel_tracer():
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        return None
+    return trace.get_tracer("zktitans")
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    server: "MetricsHTTPServer"
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        write_metrics(self, self.server.metrics)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def write_metrics(handler: BaseHTTPRequestHandler, metrics: Metrics):
+    """
+    Answer an HTTP request with `metrics` in the Prometheus text format.
+    """
+    payload = metrics.render().encode()
+    handler.send_response(200)
+    handler.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+    handler.send_header("Content-Length", str(len(payload)))
+    handler.end_headers()
+    handler.wfile.write(payload)
+
+
+class MetricsHTTPServer(ThreadingHTTPServer):
+    """
+    Serves GET /metrics for Prometheus to scrape.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, metrics: Metrics, host: str = "127.0.0.1", port: int = METRICS_PORT):
+        super().__init__((host, port), _MetricsRequestHandler)
+        self.metrics = metrics
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+# Registry shared by the scripts
+METRICS = Metrics(
+    enabled=os.environ.get("ZKTITANS_METRICS") == "1",
+    tracer=_otel_tracer() if os.environ.get("ZKTITANS_TRACING") == "1" else None,
+)
@@ -0,0 +1,421 @@
+"""
+Chunked, resumable migration of zkTitans state to a new deployment.
+
+`Migration` copies game tokens, players, token balances and battles from a
+previous deployment into a zkTitans deployed with import open, i.e.
+`deploy_zktitans(uri, import_open=True)`, through its owner-only `import*`
+functions, then closes the import with `finishImport`. Registration and
+gameplay on the target stay closed until then. Every array
+keeps its indexes, so battle ids and the player and token indexes stored in the
+mappings stay valid.
+
+- The source is read in pages through its public getters; array lengths and
+  balances, which have no getter, are read from storage at the slots of the
+  source's compiler storage layout. Bind the source to the compiler output of
+  the code that is actually deployed, e.g.
+  `boa.load_partial("old/zkTitans.vy").at(address)`.
+- Each import call carries a chunk of items sized to fit a gas budget, from the
+  number of storage words the chunk writes and its calldata.
+- Each chunk is hashed, and the contract chains the hashes into `importHash`.
+  After a chunk is sent it is read back from the target and its hash compared.
+- Progress is checkpointed to a JSON file before and after each transaction.
+  A rerun compares `importHash` with the checkpoint to tell whether an
+  interrupted chunk landed, and carries on from there.
+
+Deployments from before re-rolls replaced a player's token in place hold the
+orphaned tokens of earlier re-rolls. With `compact=True` only the token each
+player holds is copied, to the player's own index, so the new deployment has
+one token per player; player token indexes are remapped to match.
+
+The source must not change while it is copied, so stop gameplay first. The
+matchmaking queue, the battle and player version stamps and the ERC1155
+events of the source are not migrated, and started battles get a fresh move
+timeout.
+
+Run with `MIGRATION_SOURCE=<address> mox run migrate --network <network>`, adding
+`MIGRATION_COMPACT=1` to drop orphaned tokens.
+"""
+
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import boa
+from eth_abi import encode
+from eth_utils import keccak
+
+from script.bindings import Battle, GameToken, Player
+from script.seed import MAX_CARD_TYPES, encode_storage, hashmap_slot
+
+# Import phases, in the order they run
+PHASES = ("gameTokens", "players", "balances", "battles")
+# Index each phase starts reading the source at; index 0 of players and
+# gameTokens holds the dummy entries every deployment creates
+FIRST_INDEX = {"gameTokens": 1, "players": 1, "balances": 1, "battles": 0}
+IMPORT_FUNCTIONS = {
+    "gameTokens": "importGameTokens",
+    "players": "importPlayers",
+    "balances": "importBalances",
+    "battles": "importBattles",
+}
+
+DEFAULT_GAS_BUDGET = 15_000_000
+# Intrinsic gas, the chunk hash chain and event, and the array length update
+GAS_PER_TRANSACTION = 21_000 + 60_000
+GAS_PER_STORAGE_WORD = 22_100
+# Vyper copies a struct's whole storage footprint, unused string words included,
+# and storing zero over zero still costs a cold slot access
+GAS_PER_ZERO_WORD = 2_200
+GAS_PER_CALLDATA_BYTE = 16
+# Loop, memory copy and hashing overhead of one item
+GAS_PER_ITEM = 5_000
+# Storage words each item writes outside its array: player and token index
+# mappings for players, battleInfo and lastMoveTime for battles
+EXTRA_WORDS = {"gameTokens": 0, "players": 2, "balances": 0, "battles": 2}
+
+ZERO_HASH = b"\0" * 32
+CHECKPOINT_PATH = Path("out") / "migration.json"
+
+
+class MigrationError(Exception):
+    pass
+
+
+@dataclass
+class Chunk:
+    phase: str
+    # Source index range the chunk covers, `end` excluded
+    start: int
+    end: int
+    # One value per import item: token or battle tuples, (player tuple, token index)
+    # pairs, or packed balances
+    values: list
+
+    @property
+    def hash(self) -> bytes:
+        return chunk_hash(self.phase, self.start, self.values)
+
+    def args(self) -> tuple:
+        if self.phase == "players":
+            players, token_indexes = zip(*self.values)
+            return self.start, list(players), list(token_indexes), self.hash
+        return self.start, self.values, self.hash
+
+
+def chunk_hash(phase: str, start: int, values: list) -> bytes:
+    """
+    Hash of a chunk, as chained into the target's `importHash`.
+    """
+    if phase == "gameTokens":
+        data = encode(["uint256", f"{GameToken.abi_type()}[]"], [start, values])
+    elif phase == "players":
+        data = encode(["uint256", f"({Player.abi_type()},uint256)[]"], [start, values])
+    elif phase == "balances":
+        data = encode(["uint256", "uint256[]"], [start, values])
+    else:
+        data = encode(["uint256", f"{Battle.abi_type()}[]"], [start, values])
+    return keccak(phase.encode() + data)
+
+
+def chain_hash(chain: bytes, hash: bytes) -> bytes:
+    return keccak(chain + hash)
+
+
+def pack_balance(owner: str, token_id: int, amount: int) -> int:
+    return amount << 168 | token_id << 160 | int(owner, 16)
+
+
+class _StateReader:
+    """
+    Reads zkTitans state through public getters, and from storage where there is none.
+    @param contract: boa contract bound to the compiler output of its deployed code
+    @param compact: Read game tokens by player, each player's token at the player's index
+    """
+
+    def __init__(self, contract, compact: bool = False):
+        self.contract = contract
+        self.compact = compact
+        layout = contract.compiler_data.storage_layout["storage_layout"]
+        self.slots = {name: info["slot"] for name, info in layout.items()}
+        self.types = {name: var.typ for name, var in contract.compiler_data.global_ctx.variables.items()}
+
+    def length(self, name: str) -> int:
+        if self.compact and name == "gameTokens":
+            name = "players"
+        # A DynArray keeps its length at its first slot
+        return boa.env.get_storage(self.contract.address, self.slots[name])
+
+    def balance(self, owner: str, token_id: int) -> int:
+        slot = hashmap_slot(self.slots["_balances"], self.types["_balances"].key_type, token_id)
+        slot = hashmap_slot(slot, self.types["_balances"].value_type.key_type, owner)
+        return boa.env.get_storage(self.contract.address, slot)
+
+    def values(self, phase: str, index: int) -> list:
+        """
+        Import values the source item at `index` of `phase` contributes.
+        """
+        titans = self.contract
+        if phase == "gameTokens":
+            if self.compact:
+                index = titans.playerTokenInfo(Player.from_tuple(titans.players(index)).playerAddress)
+            return [GameToken.from_tuple(titans.gameTokens(index)).to_tuple()]
+        if phase == "battles":
+            return [Battle.from_tuple(titans.battles(index)).to_tuple()]
+
+        player = Player.from_tuple(titans.players(index))
+        if phase == "players":
+            token_index = index if self.compact else titans.playerTokenInfo(player.playerAddress)
+            return [(player.to_tuple(), token_index)]
+        return [
+            pack_balance(player.playerAddress, token_id, amount)
+            for token_id in range(MAX_CARD_TYPES)
+            if (amount := self.balance(player.playerAddress, token_id))
+        ]
+
+
+class Checkpoint:
+    """
+    Migration progress, saved to `path` after every change.
+    """
+
+    def __init__(self, path: Path, source: str, target: str, compact: bool = False):
+        self.path = Path(path)
+        self.source = source
+        self.target = target
+        self.compact = compact
+        # Hash chain of the chunks confirmed so far, as in the target's importHash
+        self.chain = ZERO_HASH
+        # Next source index to copy, per phase
+        self.next = dict(FIRST_INDEX)
+        # Chunk sent but not yet confirmed: phase, start, end and the chain once it lands
+        self.pending: dict | None = None
+        self.transactions = 0
+        self.finished = False
+
+    @classmethod
+    def load(cls, path: Path) -> "Checkpoint | None":
+        path = Path(path)
+        if not path.exists():
+            return None
+        data = json.loads(path.read_text())
+        checkpoint = cls(path, data["source"], data["target"], data.get("compact", False))
+        checkpoint.chain = bytes.fromhex(data["chain"])
+        checkpoint.next = data["next"]
+        checkpoint.pending = data["pending"]
+        checkpoint.transactions = data["transactions"]
+        checkpoint.finished = data["finished"]
+        return checkpoint
+
+    def save(self):
+        data = {
+            "source": self.source,
+            "target": self.target,
+            "compact": self.compact,
+            "chain": self.chain.hex(),
+            "next": self.next,
+            "pending": self.pending,
+            "transactions": self.transactions,
+            "finished": self.finished,
+        }
+        # Write then rename, so an interrupted save never leaves a truncated checkpoint
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data, indent=2))
+        os.replace(tmp, self.path)
+
+    def begin(self, chunk: Chunk):
+        self.pending = {
+            "phase": chunk.phase,
+            "start": chunk.start,
+            "end": chunk.end,
+            "chain": chain_hash(self.chain, chunk.hash).hex(),
+        }
+        self.save()
+
+    def commit(self):
+        self.chain = bytes.fromhex(self.pending["chain"])
+        self.next[self.pending["phase"]] = self.pending["end"]
+        self.pending = None
+        self.transactions += 1
+        self.save()
+
+
+class Migration:
+    """
+    Copies the state of a zkTitans deployment into a new one, see the module docstring.
+    @param source: Previous deployment, bound to the compiler output of its deployed code
+    @param target: New deployment, owned by the sender and with import still open
+    @param checkpoint_path: Progress file; an existing one for the same contracts is resumed
+    @param gas_budget: Gas a single import transaction may use
+    @param verify: Read every chunk back from the target after sending it
+    @param compact: Copy only the token each player holds, dropping orphaned tokens
+    """
+
+    def __init__(
+        self,
+        source,
+        target,
+        checkpoint_path: Path = CHECKPOINT_PATH,
+        gas_budget: int = DEFAULT_GAS_BUDGET,
+        verify: bool = True,
+        compact: bool = False,
+    ):
+        self.source = _StateReader(source, compact)
+        self.target = _StateReader(target)
+        self.titans = target
+        self.gas_budget = gas_budget
+        self.verify = verify
+        self.max_chunk = target.MAX_IMPORT_CHUNK()
+
+        source_address, target_address = str(source.address), str(target.address)
+        self.checkpoint = Checkpoint.load(checkpoint_path)
+        if self.checkpoint is None:
+            self.checkpoint = Checkpoint(checkpoint_path, source_address, target_address, compact)
+        elif (self.checkpoint.source, self.checkpoint.target) != (source_address, target_address):
+            raise MigrationError(f"{checkpoint_path} belongs to a migration between other contracts")
+        elif self.checkpoint.compact != compact:
+            raise MigrationError(f"{checkpoint_path} was started with compact={self.checkpoint.compact}")
+
+    @property
+    def finished(self) -> bool:
+        return self.checkpoint.finished
+
+    def item_gas(self, phase: str, value) -> int:
+        """
+        Estimated gas one import value costs: its storage writes and calldata.
+        """
+        if phase == "balances":
+            # The owner's player index is read to check the order
+            return GAS_PER_ITEM + GAS_PER_STORAGE_WORD + GAS_PER_ZERO_WORD + 32 * GAS_PER_CALLDATA_BYTE
+
+        typ = self.target.types[phase].value_type
+        item = value[0] if phase == "players" else value
+        words = len(encode_storage(typ, item))
+        calldata = len(encode([typ.abi_type.selector_name()], [item]))
+        return (
+            GAS_PER_ITEM
+            + (words + EXTRA_WORDS[phase]) * GAS_PER_STORAGE_WORD
+            + (typ.storage_size_in_words - words) * GAS_PER_ZERO_WORD
+            + calldata * GAS_PER_CALLDATA_BYTE
+        )
+
+    def chunks(self, phase: str):
+        """
+        Gas-bounded chunks of `phase` from the checkpoint on, read lazily from the source.
+        A source item is never split across chunks.
+        """
+        length = self.source.length("players" if phase == "balances" else phase)
+        start = index = self.checkpoint.next[phase]
+        values, gas = [], GAS_PER_TRANSACTION
+        while index < length:
+            item_values = self.source.values(phase, index)
+            item_gas = sum(self.item_gas(phase, value) for value in item_values)
+            if values and (len(values) + len(item_values) > self.max_chunk or gas + item_gas > self.gas_budget):
+                yield Chunk(phase, start, index, values)
+                start, values, gas = index, [], GAS_PER_TRANSACTION
+            values += item_values
+            gas += item_gas
+            index += 1
+        # Players without balances need no transaction
+        if values:
+            yield Chunk(phase, start, index, values)
+
+    def step(self, chunk: Chunk):
+        """
+        Send one chunk, checkpointing before and after so an interruption can be recovered.
+        """
+        self.checkpoint.begin(chunk)
+        getattr(self.titans, IMPORT_FUNCTIONS[chunk.phase])(*chunk.args())
+        if self.verify:
+            self._verify(chunk)
+        self.checkpoint.commit()
+
+    def run(self, max_chunks: int | None = None) -> bool:
+        """
+        Migrate, resuming from the checkpoint.
+        @param max_chunks: Stop after sending this many chunks
+        @return: Whether the migration is finished
+        """
+        if self.finished:
+            return True
+        self.recover()
+
+        sent = 0
+        for phase in PHASES:
+            for chunk in self.chunks(phase):
+                if max_chunks is not None and sent >= max_chunks:
+                    return False
+                self.step(chunk)
+                sent += 1
+
+        self.finish()
+        return True
+
+    def recover(self):
+        """
+        Reconcile the checkpoint with the target's `importHash` after an interruption.
+        """
+        onchain = bytes(self.titans.importHash())
+        pending = self.checkpoint.pending
+        if pending is not None and onchain == bytes.fromhex(pending["chain"]):
+            # The interrupted chunk landed
+            if self.verify:
+                self._verify(Chunk(pending["phase"], pending["start"], pending["end"], self._read_pending(pending)))
+            self.checkpoint.commit()
+        elif onchain == self.checkpoint.chain:
+            # Nothing landed since the last confirmed chunk, resend from there
+            self.checkpoint.pending = None
+        else:
+            raise MigrationError(f"Target importHash {onchain.hex()} does not match the checkpoint")
+
+    def finish(self):
+        """
+        Check that the target holds as much state as the source and close the import.
+        """
+        for name in ("players", "gameTokens", "battles"):
+            if self.target.length(name) != self.source.length(name):
+                raise MigrationError(f"Target has {self.target.length(name)} {name}, source {self.source.length(name)}")
+        if self.titans.TOTAL_SUPPLY() != self.source.contract.TOTAL_SUPPLY():
+            raise MigrationError("Target total supply differs from the source")
+
+        self.titans.finishImport()
+        self.checkpoint.finished = True
+        self.checkpoint.save()
+
+    def _read_pending(self, pending: dict) -> list:
+        values = []
+        for index in range(pending["start"], pending["end"]):
+            values += self.source.values(pending["phase"], index)
+        return values
+
+    def _verify(self, chunk: Chunk):
+        values = []
+        for index in range(chunk.start, chunk.end):
+            values += self.target.values(chunk.phase, index)
+        if chunk_hash(chunk.phase, chunk.start, values) != chunk.hash:
+            raise MigrationError(f"{chunk.phase} {chunk.start}..{chunk.end} read back from the target differ")
+
+
+def moccasin_main():
+    from moccasin.config import get_active_network
+
+    from script.deploy import deploy_zktitans
+
+    source_file = os.environ.get("MIGRATION_SOURCE_CONTRACT", "contracts/zkTitans.vy")
+    source = boa.load_partial(source_file).at(os.environ["MIGRATION_SOURCE"])
+
+    checkpoint = Checkpoint.load(CHECKPOINT_PATH)
+    if checkpoint is not None:
+        target = boa.load_partial("contracts/zkTitans.vy").at(checkpoint.target)
+        print(f"Resuming migration into {checkpoint.target} from {CHECKPOINT_PATH}")
+    else:
+        target = deploy_zktitans(source.BASE_URI(), import_open=True)
+
+    migration = Migration(source, target, compact=os.environ.get("MIGRATION_COMPACT", "") == "1")
+    migration.run()
+
+    print(f"Migrated {source.address} to {target.address} in {migration.checkpoint.transactions} import transactions")
+    if get_active_network().is_local_or_forked_network() is False:
+        print("Point the frontend at the new contract and set its trusted forwarder before opening it to players")
+    return target
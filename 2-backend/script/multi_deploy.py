@@ -0,0 +1,299 @@
+"""
+Deploy zkTitans to several networks at once.
+
+`mox run deploy` deploys to one network and then waits for the explorer to
+verify each contract in turn. `deploy_all` instead deploys zkTitans and its
+MoveForwarder to every target network on a thread of its own, each network in
+its own boa env, and submits each contract for verification as soon as it is
+deployed, without waiting for the result. `poll_verifications` then polls all
+submissions in parallel, backing off exponentially between rounds, until they
+are verified or POLL_TIMEOUT runs out.
+
+Everything ends up in one manifest, out/deployments.json: per network the
+chain id and, per contract, its address, the keccak256 of its runtime
+bytecode, the block it was deployed in and whether the explorer verified it.
+Networks deployed earlier and not part of this run are kept.
+
+Networks come from [tool.moccasin.networks] in pyproject.toml:
+
+    ZKTITANS_NETWORKS=sepolia-zksync,sepolia mox run multi_deploy
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, NamedTuple
+
+from script.metrics import METRICS
+
+MANIFEST_VERSION = 1
+MANIFEST_PATH = Path("out") / "deployments.json"
+CONTRACTS_DIR = Path(__file__).parent.parent / "contracts"
+
+# Seconds; explorers usually take tens of seconds to compile and compare
+POLL_TIMEOUT = 300.0
+POLL_BACKOFF = 2.0
+POLL_BACKOFF_FACTOR = 1.5
+POLL_MAX_BACKOFF = 30.0
+
+
+class Target(NamedTuple):
+    """
+    A network to deploy to.
+    @param env: boa env connected to the network, used only by this target's thread
+    @param verify: Submits a contract for verification and returns a result with
+        `is_verified()`, without waiting; None to skip verification
+    """
+
+    name: str
+    env: Any
+    chain_id: int | None = None
+    is_zksync: bool = False
+    verify: Callable[[Any], Any] | None = None
+
+
+class ContractDeployment(NamedTuple):
+    address: str
+    bytecode_hash: str
+    block: int
+
+
+class NetworkDeployment(NamedTuple):
+    network: str
+    chain_id: int | None
+    contracts: dict[str, ContractDeployment]
+    # Verification submissions by contract name, still to be polled
+    submissions: dict[str, Any]
+
+
+def _deployers(is_zksync: bool) -> tuple:
+    """
+    zkTitans and MoveForwarder deployers, compiled with zkvyper for zkSync networks.
+    """
+    if is_zksync:
+        import boa_zksync
+
+        load = boa_zksync.load_zksync_partial
+    else:
+        import boa
+
+        load = boa.load_partial
+    return tuple(load(str(CONTRACTS_DIR / f"{name}.vy")) for name in ("zkTitans", "MoveForwarder"))
+
+
+def _deployment_block(env) -> int:
+    """
+    Block of the last deployment `env` sent. Network envs report it in the receipt, see
+    `_keep_last_receipt`; a local env has no receipts and is at the block it deployed in.
+    """
+    receipt = getattr(env, "last_receipt", None)
+    if receipt is None:
+        return env.evm.patch.block_number
+    block = receipt["blockNumber"]
+    return int(block, 16) if isinstance(block, str) else int(block)
+
+
+def _keep_last_receipt(env):
+    """
+    Keep the receipt of every transaction a boa NetworkEnv sends in `env.last_receipt`,
+    as zkSync envs do; NetworkEnv only uses it internally.
+    """
+    send_txn = env._send_txn
+
+    def _send_txn(*args, **kwargs):
+        tx_data, receipt, trace = send_txn(*args, **kwargs)
+        env.last_receipt = receipt
+        return tx_data, receipt, trace
+
+    env.last_receipt = None
+    env._send_txn = _send_txn
+
+
+def _record(env, contract) -> ContractDeployment:
+    from eth_utils import keccak
+
+    code = env.get_code(contract.address)
+    return ContractDeployment(str(contract.address), "0x" + keccak(code).hex(), _deployment_block(env))
+
+
+def deploy_network(target: Target, metadata_uri: str, deployers: tuple) -> NetworkDeployment:
+    """
+    Deploy zkTitans and its MoveForwarder to `target` with the script.deploy helpers
+    and submit both for verification.
+    """
+    # Deferred, deploy loads the moccasin contract deployers
+    from script.deploy import deploy_move_forwarder, deploy_zktitans, trust_forwarder
+
+    titans_deployer, forwarder_deployer = deployers
+    env = target.env
+
+    # Record each contract while the env's last receipt is still its deployment's
+    titans = deploy_zktitans(metadata_uri, deployer=titans_deployer, env=env)
+    titans_deployment = _record(env, titans)
+    forwarder = deploy_move_forwarder(titans, forwarder_deployer, trust=False)
+    forwarder_deployment = _record(env, forwarder)
+    trust_forwarder(titans, forwarder)
+    print(f"[{target.name}] Deployed zkTitans at {titans.address} and MoveForwarder at {forwarder.address}")
+
+    submissions = {}
+    if target.verify is not None:
+        for name, contract in (("zkTitans", titans), ("MoveForwarder", forwarder)):
+            submissions[name] = target.verify(contract)
+        print(f"[{target.name}] Submitted contracts for verification")
+
+    contracts = {"zkTitans": titans_deployment, "MoveForwarder": forwarder_deployment}
+    return NetworkDeployment(target.name, target.chain_id, contracts, submissions)
+
+
+def deploy_all(targets: list[Target], metadata_uri: str = "") -> tuple[list[NetworkDeployment], dict[str, Exception]]:
+    """
+    Deploy to every target concurrently. A failing network does not stop the others.
+    @return: The deployments that succeeded, and the error of every network that failed
+    """
+    # Compile on this thread, once per kind of network
+    deployers = {is_zksync: _deployers(is_zksync) for is_zksync in {target.is_zksync for target in targets}}
+
+    deployments, errors = [], {}
+    with ThreadPoolExecutor(max_workers=max(len(targets), 1), thread_name_prefix="deploy") as pool:
+        futures = {
+            target.name: pool.submit(deploy_network, target, metadata_uri, deployers[target.is_zksync])
+            for target in targets
+        }
+        for name, future in futures.items():
+            try:
+                deployments.append(future.result())
+            except Exception as e:
+                errors[name] = e
+    return deployments, errors
+
+
+def poll_verifications(
+    submissions: dict[Any, Any],
+    timeout: float = POLL_TIMEOUT,
+    backoff: float = POLL_BACKOFF,
+    backoff_factor: float = POLL_BACKOFF_FACTOR,
+    max_backoff: float = POLL_MAX_BACKOFF,
+    sleep: Callable[[float], None] = time.sleep,
+    clock: Callable[[], float] = time.monotonic,
+) -> dict[Any, bool]:
+    """
+    Poll every submission's `is_verified()` until all are verified or `timeout` seconds passed.
+    Each round polls the pending submissions in parallel; a poll that raises, such as an
+    explorer answering 404 before it indexed the contract, counts as not verified yet.
+    @param submissions: Verification results by any key, e.g. (network, contract)
+    @return: Whether each submission was verified, by key
+    """
+    verified = {key: False for key in submissions}
+    if not submissions:
+        return verified
+
+    def poll(key) -> bool:
+        try:
+            return bool(submissions[key].is_verified())
+        except Exception:
+            return False
+
+    deadline = clock() + timeout
+    wait = backoff
+    with ThreadPoolExecutor(max_workers=len(submissions), thread_name_prefix="verify") as pool:
+        while True:
+            pending = [key for key, done in verified.items() if not done]
+            for key, done in zip(pending, pool.map(poll, pending)):
+                verified[key] = done
+            if all(verified.values()) or clock() + wait > deadline:
+                return verified
+            sleep(wait)
+            wait = min(wait * backoff_factor, max_backoff)
+
+
+def manifest_entry(deployment: NetworkDeployment, verified: dict[Any, bool]) -> dict:
+    """
+    Manifest JSON of one network.
+    @param verified: As returned by `poll_verifications`, keyed by (network, contract)
+    """
+    return {
+        "chain_id": deployment.chain_id,
+        "contracts": {
+            name: {**contract._asdict(), "verified": verified.get((deployment.network, name), False)}
+            for name, contract in deployment.contracts.items()
+        },
+    }
+
+
+def write_manifest(deployments: list[NetworkDeployment], verified: dict[Any, bool], path: Path = MANIFEST_PATH) -> dict:
+    """
+    Add `deployments` to the manifest at `path`, replacing earlier entries of the same networks.
+    @return: The manifest written
+    """
+    manifest = {"version": MANIFEST_VERSION, "networks": {}}
+    if path.exists():
+        manifest["networks"] = json.loads(path.read_text())["networks"]
+    for deployment in deployments:
+        manifest["networks"][deployment.network] = manifest_entry(deployment, verified)
+    manifest["networks"] = dict(sorted(manifest["networks"].items()))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(manifest, indent=2) + "\n")
+    return manifest
+
+
+def run(targets: list[Target], metadata_uri: str = "", path: Path = MANIFEST_PATH, **poll_options) -> tuple[dict, dict[str, Exception]]:
+    """
+    Deploy to `targets`, wait for verification and write the manifest.
+    @param poll_options: Passed on to `poll_verifications`
+    @return: The manifest, and the error of every network that failed to deploy
+    """
+    deployments, errors = deploy_all(targets, metadata_uri)
+    submissions = {
+        (deployment.network, name): submission
+        for deployment in deployments
+        for name, submission in deployment.submissions.items()
+    }
+    if submissions:
+        print(f"Waiting for {len(submissions)} verifications...")
+    verified = poll_verifications(submissions, **poll_options)
+    for (network, name), done in verified.items():
+        if not done:
+            print(f"[{network}] {name} was not verified in time")
+    return write_manifest(deployments, verified, path), errors
+
+
+def network_target(name: str) -> Target:
+    """
+    Target for a network of the moccasin config, with its default account.
+    Call from the main thread: connecting also sets boa's global env.
+    """
+    from moccasin.config import get_config
+
+    network = get_config().get_network(name)
+    env = network.create_and_set_or_set_boa_env()
+    if not hasattr(env, "last_receipt") and hasattr(env, "_send_txn"):
+        _keep_last_receipt(env)
+    account = network.get_default_account()
+    if account is not None and hasattr(env, "add_account"):
+        env.add_account(account, force_eoa=True)
+
+    verify = None
+    if network.has_explorer() and not network.is_local_or_forked_network():
+        verify = network.moccasin_verify
+    return Target(name, env, network.chain_id, network.is_zksync, verify)
+
+
+def moccasin_main():
+    names = [name.strip() for name in os.environ.get("ZKTITANS_NETWORKS", "").split(",") if name.strip()]
+    if not names:
+        raise ValueError("Set ZKTITANS_NETWORKS to a comma separated list of networks from pyproject.toml")
+
+    # Same metadata URI as script/deploy.py
+    metadata_uri = ""
+    manifest, errors = run([network_target(name) for name in names], metadata_uri)
+    print(f"Wrote {MANIFEST_PATH} with {len(names) - len(errors)} of {len(names)} networks")
+    for name, error in errors.items():
+        print(f"[{name}] Deployment failed: {error!r}")
+
+    if METRICS.enabled:
+        print(METRICS.render())
+    if errors:
+        raise RuntimeError(f"Deployment failed on {', '.join(errors)}")
+    return manifest
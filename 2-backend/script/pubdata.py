@@ -0,0 +1,299 @@
+"""
+zkSync pubdata estimator for zkTitans entry points.
+
+On zkSync Era the fee of a call is driven by the pubdata it publishes to L1,
+not by its execution gas. Pubdata is the state diff of a batch: every storage
+slot whose value changed, published once with its final value, whatever the
+number of writes to it. Each changed slot costs
+
+- its key: 32 bytes for an initial write to a slot never written before, or a
+  4-byte enumeration index for a repeated write
+- one metadata byte and the value, compressed as the shortest of the new value
+  itself, `new - old` or `old - new` with leading zero bytes stripped (32 bytes
+  when none is shorter)
+
+Events, reads and slots written back to their original value publish nothing.
+
+`StateDiffTracer` records the value of every slot before its first write in a
+boa environment and estimates the pubdata of everything run inside it, so one
+call per tracer gives the cost of that call alone in a batch and one tracer
+around many calls gives the cost of batching them together. Each transaction
+also bumps the sender's nonce and pays its fee from the sender's balance,
+accounted as `TX_OVERHEAD_BYTES`. Contract deployments additionally publish
+their bytecode, which is not estimated here.
+
+A zero slot is taken as never written unless boa saw a store to it. boa keeps
+that record across `anchor()` rollbacks, so after one a slot may be counted as a
+repeated write although the state that wrote it was discarded.
+
+Run with `mox run pubdata` for a table of every entry point, written to out/pubdata.csv.
+"""
+
+import csv
+from dataclasses import dataclass
+from pathlib import Path
+
+import boa
+from boa.vm.utils import to_int
+
+INITIAL_WRITE_KEY_BYTES = 32
+REPEATED_WRITE_KEY_BYTES = 4
+METADATA_BYTES = 1
+# Nonce increment (repeated write, `add 1`) and fee debit from the sender's
+# balance (repeated write, `sub fee` of about 7 bytes)
+TX_OVERHEAD_BYTES = (REPEATED_WRITE_KEY_BYTES + METADATA_BYTES + 1) + (
+    REPEATED_WRITE_KEY_BYTES + METADATA_BYTES + 7
+)
+
+OUT_DIR = Path("out")
+WORD = 2**256
+
+
+def _byte_length(value: int) -> int:
+    return (value.bit_length() + 7) // 8
+
+
+def compressed_value_size(before: int, after: int) -> int:
+    """
+    Size of the shortest zkSync encoding of a slot changing from `before` to `after`.
+    """
+    return min(
+        32,
+        _byte_length(after),
+        _byte_length((after - before) % WORD),
+        _byte_length((before - after) % WORD),
+    )
+
+
+@dataclass
+class StateWrite:
+    address: str
+    slot: int
+    before: int
+    after: int
+    # No value was ever stored at the slot, so its full key is published
+    initial: bool
+    variable: str
+
+    @property
+    def pubdata_bytes(self) -> int:
+        if self.before == self.after:
+            return 0
+        key = INITIAL_WRITE_KEY_BYTES if self.initial else REPEATED_WRITE_KEY_BYTES
+        return key + METADATA_BYTES + compressed_value_size(self.before, self.after)
+
+
+class StateDiffTracer:
+    """
+    Context manager recording the net storage writes of everything run inside it.
+    @param env: boa environment to trace, the active one by default
+    """
+
+    def __init__(self, env=None):
+        self.env = env or boa.env
+        self.writes: list[StateWrite] = []
+        self.transactions = 0
+        # (address, slot) -> (value before the first write, initial write)
+        self._before: dict[tuple[bytes, int], tuple[int, bool]] = {}
+        self._computation_class = None
+        self._sstore = None
+
+    def __enter__(self) -> "StateDiffTracer":
+        self._computation_class = self.env.evm.vm.state.computation_class
+        self._sstore = self._computation_class.opcodes[0x55]
+        self._computation_class.opcodes[0x55] = self._record_sstore
+        return self
+
+    def __exit__(self, *exc):
+        self._computation_class.opcodes[0x55] = self._sstore
+        self.writes = self._collect()
+
+    def transaction(self):
+        """
+        Count a transaction for `TX_OVERHEAD_BYTES`, for callers timing several calls.
+        """
+        self.transactions += 1
+
+    @property
+    def changed(self) -> list[StateWrite]:
+        return [write for write in self.writes if write.before != write.after]
+
+    @property
+    def storage_bytes(self) -> int:
+        return sum(write.pubdata_bytes for write in self.writes)
+
+    @property
+    def pubdata_bytes(self) -> int:
+        return self.storage_bytes + self.transactions * TX_OVERHEAD_BYTES
+
+    def by_variable(self) -> dict[str, int]:
+        """
+        Pubdata bytes per storage variable, most expensive first.
+        """
+        totals: dict[str, int] = {}
+        for write in self.changed:
+            totals[write.variable] = totals.get(write.variable, 0) + write.pubdata_bytes
+        return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+    # ------------------------------------------------------------------
+    #                            INTERNALS
+    # ------------------------------------------------------------------
+
+    def _record_sstore(self, computation):
+        slot = to_int(computation._stack.values[-1])
+        account = computation.msg.storage_address
+        key = (account, slot)
+        if key not in self._before:
+            before = computation.state.get_storage(account, slot)
+            # Zero slots count as unwritten unless boa saw a store to them
+            written = slot in self.env.sstore_trace.get(account, ())
+            self._before[key] = (before, before == 0 and not written)
+        self._sstore(computation)
+
+    def _collect(self) -> list[StateWrite]:
+        layouts = _StorageLayouts(self.env)
+        writes = []
+        for (account, slot), (before, initial) in self._before.items():
+            after = self.env.evm.vm.state.get_storage(account, slot)
+            writes.append(
+                StateWrite(
+                    address="0x" + account.hex(),
+                    slot=slot,
+                    before=before,
+                    after=after,
+                    initial=initial,
+                    variable=layouts.variable(account, slot),
+                )
+            )
+        return writes
+
+
+class _StorageLayouts:
+    """
+    Names the storage variable a slot belongs to, from the compiler's storage layout
+    and the preimages of the HashMap slots boa saw being hashed.
+    """
+
+    # Struct members and array items are stored right after their base slot
+    MAX_OFFSET = 64
+
+    def __init__(self, env):
+        self.env = env
+        self._layouts: dict[bytes, list[tuple[int, int, str]]] = {}
+        # boa maps 64-byte preimages to their hash, slots need the reverse
+        self._preimages = {image: preimage for preimage, image in env.sha3_trace.items()}
+
+    def variable(self, account: bytes, slot: int) -> str:
+        layout = self._layout(account)
+        if layout is None:
+            return f"slot {hex(slot)}"
+
+        base = self._root_slot(slot)
+        for start, size, name in layout:
+            if start <= base < start + size:
+                return name
+        return f"slot {hex(slot)}"
+
+    def _root_slot(self, slot: int) -> int:
+        for offset in range(min(self.MAX_OFFSET, slot + 1)):
+            preimage = self._preimages.get((slot - offset).to_bytes(32, "big"))
+            if preimage is not None:
+                return self._root_slot(int.from_bytes(preimage[:32], "big"))
+        return slot
+
+    def _layout(self, account: bytes):
+        if account not in self._layouts:
+            contract = self.env.lookup_contract(account)
+            compiler_data = getattr(contract, "compiler_data", None)
+            if compiler_data is None:
+                self._layouts[account] = None
+            else:
+                layout = compiler_data.storage_layout["storage_layout"]
+                self._layouts[account] = [(info["slot"], info["n_slots"], name) for name, info in layout.items()]
+        return self._layouts[account]
+
+
+def trace_call(function, *args, sender=None) -> tuple[StateDiffTracer, int]:
+    """
+    Run one transaction and estimate its pubdata as if it were alone in a batch.
+    @return: The tracer and the execution gas the call used
+    """
+    gas_before = boa.env.get_gas_used()
+    with StateDiffTracer() as tracer:
+        tracer.transaction()
+        if sender is None:
+            function(*args)
+        else:
+            with boa.env.prank(sender):
+                function(*args)
+    return tracer, boa.env.get_gas_used() - gas_before
+
+
+def estimate_entry_points() -> tuple[list[dict], StateDiffTracer]:
+    """
+    Play a full game on a fresh zkTitans and estimate every state changing call.
+    Runs in a new environment, so no slot counts as written by earlier runs.
+    @return: One row per call, and a tracer of the whole game as a single batch
+    """
+    # Deferred, deploy prints and imports the contract module
+    from script.deploy import deploy_zktitans
+
+    rows = []
+    with boa.swap_env(boa.Env()):
+        titans = deploy_zktitans("")
+        player1 = boa.env.generate_address("pubdata player 1")
+        player2 = boa.env.generate_address("pubdata player 2")
+
+        calls = [
+            ("registerPlayer", titans.registerPlayer, ("Player One", "Token"), player1),
+            ("registerPlayer", titans.registerPlayer, ("Player Two", "Token"), player2),
+            ("createRandomGameToken", titans.createRandomGameToken, ("New Token",), player1),
+            ("createBattle", titans.createBattle, ("Pubdata Battle",), player1),
+            ("joinBattle", titans.joinBattle, ("Pubdata Battle",), player2),
+            ("attackOrDefendChoice (first move)", titans.attackOrDefendChoice, (1, "Pubdata Battle"), player1),
+            ("attackOrDefendChoice (resolves round)", titans.attackOrDefendChoice, (2, "Pubdata Battle"), player2),
+            ("quitBattle", titans.quitBattle, ("Pubdata Battle",), player1),
+        ]
+
+        with StateDiffTracer() as batch:
+            for name, function, args, sender in calls:
+                batch.transaction()
+                tracer, gas = trace_call(function, *args, sender=sender)
+                rows.append(
+                    {
+                        "entry_point": name,
+                        "gas": gas,
+                        "slots_changed": len(tracer.changed),
+                        "initial_writes": sum(write.initial for write in tracer.changed),
+                        "storage_bytes": tracer.storage_bytes,
+                        "pubdata_bytes": tracer.pubdata_bytes,
+                        "top_variables": ", ".join(f"{var}={size}" for var, size in tracer.by_variable().items()),
+                    }
+                )
+                boa.env.time_travel(blocks=1)
+
+    return rows, batch
+
+
+def write_csv(rows: list[dict], path: Path = OUT_DIR / "pubdata.csv"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def moccasin_main():
+    rows, batch = estimate_entry_points()
+    write_csv(rows)
+
+    print(f"{'entry point':<40} {'gas':>9} {'slots':>6} {'initial':>8} {'pubdata':>8}")
+    for row in rows:
+        print(
+            f"{row['entry_point']:<40} {row['gas']:>9,} {row['slots_changed']:>6} "
+            f"{row['initial_writes']:>8} {row['pubdata_bytes']:>7}B"
+        )
+        print(f"    {row['top_variables']}")
+
+    separate = sum(row["pubdata_bytes"] for row in rows)
+    print(f"\nOne call per batch: {separate:,} bytes; all calls in one batch: {batch.pubdata_bytes:,} bytes")
@@ -0,0 +1,366 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+
+from eth_account import Account
+from eth_account.messages import encode_typed_data
+from moccasin.boa_tools import VyperContract
+from moccasin.config import get_active_network
+
+from script.metrics import METRICS, instrument, write_metrics
+
+# Must match the constants in contracts/MoveForwarder.vy
+EIP712_NAME = "zkTitans MoveForwarder"
+EIP712_VERSION = "1"
+MAX_RELAY_BATCH = 100
+
+MOVE_TYPES = {
+    "Move": [
+        {"name": "player", "type": "address"},
+        {"name": "choice", "type": "uint8"},
+        {"name": "battleName", "type": "string"},
+        {"name": "nonce", "type": "uint256"},
+        {"name": "deadline", "type": "uint256"},
+    ]
+}
+MOVE_FIELDS = [field["name"] for field in MOVE_TYPES["Move"]]
+
+
+class InvalidMove(ValueError):
+    """Raised when a submitted move can never be relayed successfully."""
+
+
+def _domain(forwarder_address: str, chain_id: int) -> dict:
+    return {
+        "name": EIP712_NAME,
+        "version": EIP712_VERSION,
+        "chainId": chain_id,
+        "verifyingContract": str(forwarder_address),
+    }
+
+
+def _message(move: dict) -> dict:
+    return {field: move[field] for field in MOVE_FIELDS}
+
+
+def sign_move(private_key, forwarder_address: str, chain_id: int, move: dict) -> dict:
+    """
+    Sign a move as EIP-712 typed data for the MoveForwarder
+    @param private_key: Key of the player, whose address must be `move["player"]`
+    @param forwarder_address: Address of the MoveForwarder contract
+    @param chain_id: Chain the forwarder is deployed on
+    @param move: Dict with player, choice, battleName, nonce and deadline
+    @return: The move with its v, r and s signature fields added
+    """
+    signable = encode_typed_data(
+        domain_data=_domain(forwarder_address, chain_id),
+        message_types=MOVE_TYPES,
+        message_data=_message(move),
+    )
+    signed = Account.sign_message(signable, private_key)
+    return {
+        **move,
+        "v": signed.v,
+        "r": signed.r.to_bytes(32, "big"),
+        "s": signed.s.to_bytes(32, "big"),
+    }
+
+
+def recover_move_signer(forwarder_address: str, chain_id: int, move: dict) -> str:
+    """
+    Recover the address that signed `move`
+    """
+    signable = encode_typed_data(
+        domain_data=_domain(forwarder_address, chain_id),
+        message_types=MOVE_TYPES,
+        message_data=_message(move),
+    )
+    return Account.recover_message(
+        signable, vrs=(move["v"], move["r"], move["s"])
+    )
+
+
+def move_to_struct(move: dict) -> tuple:
+    """
+    Order a signed move as the forwarder's SignedMove struct
+    """
+    return tuple(move[field] for field in MOVE_FIELDS) + (
+        move["v"],
+        move["r"],
+        move["s"],
+    )
+
+
+def move_from_json(data: dict) -> dict:
+    """
+    Parse a signed move from its JSON form, where r and s are 0x-prefixed hex strings
+    """
+    try:
+        return {
+            "player": str(data["player"]),
+            "choice": int(data["choice"]),
+            "battleName": str(data["battleName"]),
+            "nonce": int(data["nonce"]),
+            "deadline": int(data["deadline"]),
+            "v": int(data["v"]),
+            "r": bytes.fromhex(data["r"].removeprefix("0x")),
+            "s": bytes.fromhex(data["s"].removeprefix("0x")),
+        }
+    except (KeyError, TypeError, ValueError) as e:
+        raise InvalidMove(f"Malformed move: {e}") from e
+
+
+class MoveRelayer:
+    """
+    Collects signed moves and relays them to the MoveForwarder in batches.
+    Batches are sent one at a time, and the next one is only built once the
+    previous one landed: a boa environment must not be used from several
+    threads at once, and the forwarder skips a player's move unless its nonce
+    is the next one. A player's moves join batches in nonce order, starting
+    at the forwarder's nonce; a move waits while an earlier one is missing,
+    and is dropped once it expires. Moves the forwarder skipped anyway, e.g.
+    because another relayer used their nonce first, are counted as skipped
+    rather than relayed.
+    @param forwarder: Deployed MoveForwarder contract
+    @param chain_id: Chain the forwarder is deployed on
+    @param max_batch: Maximum number of moves per `relayMoves` transaction
+    @param send_batch: Callable submitting a list of SignedMove tuples, defaults to
+        `forwarder.relayMoves`
+    """
+
+    def __init__(
+        self,
+        forwarder: VyperContract,
+        chain_id: int,
+        max_batch: int = MAX_RELAY_BATCH,
+        send_batch: Callable[[list[tuple]], Any] | None = None,
+    ):
+        self.forwarder = forwarder
+        self.forwarder_address = str(forwarder.address)
+        self.chain_id = chain_id
+        self.max_batch = min(max_batch, MAX_RELAY_BATCH)
+        self.send_batch = send_batch or forwarder.relayMoves
+
+        self._pending: list[dict] = []
+        self._seen: set[tuple[str, int]] = set()
+        # Next nonce the forwarder expects, per player, as last read from the chain
+        self._nonces: dict[str, int] = {}
+        self._lock = threading.Lock()
+        # Serializes every call to the forwarder, and with it every batch
+        self._chain_lock = threading.Lock()
+
+        self.stats = {"received": 0, "rejected": 0, "relayed": 0, "skipped": 0, "batches": 0, "dropped": 0, "failed": 0}
+
+    def submit(self, move: dict) -> int:
+        """
+        Validate a signed move and queue it for the next batch
+        @return: Number of moves queued ahead of this one, as an acknowledgement
+        @raise InvalidMove: If the move is malformed, expired, duplicated, badly signed
+            or its nonce was already used
+        """
+        try:
+            self._validate(move)
+            if move["nonce"] < self._next_nonce(move["player"].lower()):
+                raise InvalidMove("Nonce already used")
+        except InvalidMove:
+            with self._lock:
+                self.stats["rejected"] += 1
+            raise
+
+        key = (move["player"].lower(), move["nonce"])
+        with self._lock:
+            if key in self._seen:
+                self.stats["rejected"] += 1
+                raise InvalidMove("Move with this nonce already submitted")
+            self._seen.add(key)
+            self._pending.append(move)
+            self.stats["received"] += 1
+            return len(self._pending) - 1
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> Any:
+        """
+        Submit up to `max_batch` queued moves that are next in their player's nonce
+        order as one batch, waiting for any batch another thread is submitting first.
+        @return: The forwarder's return value, or None if no move was ready
+        @raise Exception: Whatever sending the batch raised; its moves stay queued
+        """
+        with self._chain_lock:
+            with self._lock:
+                batch = self._next_batch()
+            if not batch:
+                return None
+            return self._send(batch)
+
+    def run(self, block_time: float = 12.0, stop: threading.Event | None = None):
+        """
+        Flush every move that is ready once per block until `stop` is set. A batch that
+        fails to send is logged and retried the next block.
+        """
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            started = time.monotonic()
+            try:
+                while self.flush() is not None:
+                    pass
+            except Exception as e:
+                print(f"Relaying moves failed, retrying next block: {e!r}")
+            stop.wait(max(0.0, block_time - (time.monotonic() - started)))
+
+    def _next_nonce(self, player: str) -> int:
+        with self._lock:
+            nonce = self._nonces.get(player)
+        if nonce is None:
+            with self._chain_lock:
+                nonce = self.forwarder.nonces(player)
+            with self._lock:
+                nonce = self._nonces.setdefault(player, nonce)
+        return nonce
+
+    def _next_batch(self) -> list[dict]:
+        # Callers hold self._lock
+        now = time.time()
+        expected = dict(self._nonces)
+        batch, waiting = [], []
+        for move in sorted(self._pending, key=lambda move: move["nonce"]):
+            player = move["player"].lower()
+            nonce = expected[player]
+            if move["nonce"] < nonce or move["deadline"] < now:
+                # Used by a move relayed meanwhile, or expired while an earlier nonce was missing
+                self._seen.discard((player, move["nonce"]))
+                self.stats["dropped"] += 1
+            elif move["nonce"] == nonce and len(batch) < self.max_batch:
+                batch.append(move)
+                expected[player] = nonce + 1
+            else:
+                waiting.append(move)
+        self._pending = waiting
+        return batch
+
+    def _send(self, batch: list[dict]):
+        # Callers hold self._chain_lock
+        players = {move["player"].lower() for move in batch}
+        try:
+            before = {player: self.forwarder.nonces(player) for player in players}
+            result = self.send_batch([move_to_struct(move) for move in batch])
+            after = {player: self.forwarder.nonces(player) for player in players}
+        except Exception:
+            # Put the moves back in front, they keep their place and their nonces stay reserved
+            with self._lock:
+                self._pending[:0] = batch
+                self.stats["failed"] += 1
+            raise
+
+        with self._lock:
+            self._nonces.update(after)
+            self.stats["batches"] += 1
+            retry = []
+            for move in batch:
+                player = move["player"].lower()
+                if before[player] <= move["nonce"] < after[player]:
+                    self.stats["relayed"] += 1
+                else:
+                    self.stats["skipped"] += 1
+                    if move["nonce"] >= after[player]:
+                        # Its nonce is still unused, so it can go in a later batch unless it expired
+                        retry.append(move)
+                        continue
+                self._seen.discard((player, move["nonce"]))
+            self._pending[:0] = retry
+        return result
+
+    def _validate(self, move: dict):
+        if move["choice"] not in (1, 2):
+            raise InvalidMove("Choice should be either 1 or 2")
+        if len(move["battleName"]) > 100:
+            raise InvalidMove("Battle name too long")
+        if move["deadline"] < time.time():
+            raise InvalidMove("Move expired")
+
+        try:
+            signer = recover_move_signer(self.forwarder_address, self.chain_id, move)
+        except Exception as e:
+            raise InvalidMove(f"Bad signature: {e}") from e
+        if signer.lower() != move["player"].lower():
+            raise InvalidMove("Signature does not match player")
+
+
+class _MoveRequestHandler(BaseHTTPRequestHandler):
+    server: "RelayerHTTPServer"
+
+    def do_POST(self):
+        if self.path != "/moves":
+            return self._reply(404, {"error": "Not found"})
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length < 0:
+                raise ValueError("Negative Content-Length")
+            move = move_from_json(json.loads(self.rfile.read(length)))
+            position = self.server.relayer.submit(move)
+        except ValueError as e:
+            # InvalidMove, JSONDecodeError and a malformed Content-Length
+            return self._reply(400, {"accepted": False, "error": str(e)})
+
+        self._reply(202, {"accepted": True, "position": position})
+
+    def do_GET(self):
+        if self.path == "/metrics" and METRICS.enabled:
+            return write_metrics(self, METRICS)
+        if self.path != "/status":
+            return self._reply(404, {"error": "Not found"})
+
+        relayer = self.server.relayer
+        self._reply(200, {"pending": relayer.pending(), **relayer.stats})
+
+    def _reply(self, status: int, body: dict):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RelayerHTTPServer(ThreadingHTTPServer):
+    """
+    HTTP front end of a MoveRelayer.
+    POST /moves takes a JSON signed move, GET /status reports relayer counters
+    and, with metrics enabled, GET /metrics serves them for Prometheus.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, relayer: MoveRelayer, host: str = "127.0.0.1", port: int = 8645):
+        super().__init__((host, port), _MoveRequestHandler)
+        self.relayer = relayer
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+def moccasin_main():
+    active_network = get_active_network()
+    forwarder = active_network.get_latest_contract_unchecked("MoveForwarder")
+    if forwarder is None:
+        raise RuntimeError("No MoveForwarder deployment found on the active network")
+
+    relayer = MoveRelayer(instrument(forwarder), active_network.chain_id)
+    server = RelayerHTTPServer(relayer)
+    server.start()
+    print(f"Relaying moves to {forwarder.address} on http://127.0.0.1:8645/moves")
+
+    try:
+        relayer.run()
+    finally:
+        server.shutdown()
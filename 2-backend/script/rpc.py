@@ -0,0 +1,401 @@
+"""
+Pooled, batching JSON-RPC transport with failover.
+
+`RpcTransport` keeps persistent keep-alive connections to every configured
+endpoint, coalesces calls made concurrently from any thread into JSON-RPC
+batch requests, and sends each batch to the healthiest endpoint, failing
+over to the next one on connection errors, timeouts and 5xx/429 responses.
+Endpoints are ranked by a moving average of their success rate and latency,
+and an endpoint that keeps failing is benched for an exponentially growing
+cool-down.
+
+Use it directly from bots and indexers, or hand `TransportRPC(transport)` to
+boa's `NetworkEnv` so contract calls and deployments go through it.
+"""
+
+import http.client
+import itertools
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any
+from urllib.parse import urlparse
+
+DEFAULT_TIMEOUT = 30.0
+
+# Weight of the newest sample in the health moving averages
+_HEALTH_DECAY = 0.2
+_BACKOFF_BASE = 0.5
+_BACKOFF_MAX = 60.0
+
+
+class RpcError(Exception):
+    """Error object returned by a node for a single JSON-RPC call."""
+
+    def __init__(self, message: str, code: int):
+        super().__init__(f"{code}: {message}")
+        self.message = message
+        self.code = code
+
+
+class TransportError(Exception):
+    """Raised when no endpoint could serve a request."""
+
+
+class _RetryableResponse(Exception):
+    """Raised for HTTP responses another endpoint may answer successfully."""
+
+
+class Endpoint:
+    """
+    A JSON-RPC URL with its pool of keep-alive connections and health score.
+    @param url: HTTP(S) URL of the node
+    @param pool_size: Maximum number of concurrent connections
+    @param timeout: Socket timeout in seconds
+    """
+
+    def __init__(self, url: str, pool_size: int = 8, timeout: float = DEFAULT_TIMEOUT):
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported RPC URL scheme: {url}")
+
+        self.url = url
+        # Host only, RPC URLs often carry an API key in their path
+        self.host = parsed.hostname
+        self._https = parsed.scheme == "https"
+        self._netloc = parsed.netloc
+        self._path = parsed.path or "/"
+        if parsed.query:
+            self._path += "?" + parsed.query
+        self._timeout = timeout
+
+        self._idle: queue.LifoQueue[http.client.HTTPConnection] = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._lock = threading.Lock()
+
+        # Moving averages of the success rate and of successful request latency
+        self.success_rate = 1.0
+        self.latency = 0.0
+        self.consecutive_failures = 0
+        self.benched_until = 0.0
+        self.requests = 0
+        self.connections_opened = 0
+
+    def health(self, now: float | None = None) -> float:
+        """
+        Ranking score, higher is better; benched endpoints score below zero.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if now < self.benched_until:
+                return -1.0 / (1.0 + self.consecutive_failures)
+            return self.success_rate / (1.0 + self.latency)
+
+    def post(self, body: bytes) -> bytes:
+        """
+        POST `body` over a pooled connection and return the response body.
+        A reused connection the server already closed is retried once on a fresh one.
+        """
+        with self._slots:
+            connection, reused = self._acquire()
+            try:
+                return self._request(connection, body)
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                connection.close()
+                if not reused:
+                    raise
+                return self._request(self._new_connection(), body)
+
+    def record(self, ok: bool, latency: float = 0.0):
+        with self._lock:
+            self.requests += 1
+            self.success_rate += _HEALTH_DECAY * (float(ok) - self.success_rate)
+            if ok:
+                self.latency += _HEALTH_DECAY * (latency - self.latency)
+                self.consecutive_failures = 0
+                self.benched_until = 0.0
+            else:
+                self.consecutive_failures += 1
+                backoff = _BACKOFF_BASE * 2 ** (self.consecutive_failures - 1)
+                self.benched_until = time.monotonic() + min(backoff, _BACKOFF_MAX)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _acquire(self) -> tuple[http.client.HTTPConnection, bool]:
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            return self._new_connection(), False
+
+    def _new_connection(self) -> http.client.HTTPConnection:
+        with self._lock:
+            self.connections_opened += 1
+        if self._https:
+            return http.client.HTTPSConnection(self._netloc, timeout=self._timeout)
+        return http.client.HTTPConnection(self._netloc, timeout=self._timeout)
+
+    def _request(self, connection: http.client.HTTPConnection, body: bytes) -> bytes:
+        try:
+            connection.request(
+                "POST",
+                self._path,
+                body=body,
+                headers={"Content-Type": "application/json", "Connection": "keep-alive"},
+            )
+            response = connection.getresponse()
+            data = response.read()
+        except BaseException:
+            connection.close()
+            raise
+
+        if response.will_close:
+            connection.close()
+        else:
+            self._idle.put(connection)
+
+        if response.status == 429 or response.status >= 500:
+            raise _RetryableResponse(f"{self.url} answered HTTP {response.status}")
+        if response.status != 200:
+            raise TransportError(f"{self.url} answered HTTP {response.status}")
+        return data
+
+
+class RpcTransport:
+    """
+    Thread-safe JSON-RPC client shared by deploy scripts, bots and indexers.
+    @param urls: Endpoint URLs, in order of preference while equally healthy
+    @param max_batch: Maximum number of calls per JSON-RPC batch request
+    @param batch_window: Seconds to wait for more calls before sending a batch
+    @param pool_size: Keep-alive connections per endpoint, also the number of batches in flight
+    @param timeout: Socket timeout in seconds
+    @param metrics: Registry to record request latency and failures per endpoint in, see script/metrics.py
+    """
+
+    def __init__(
+        self,
+        urls: list[str],
+        max_batch: int = 100,
+        batch_window: float = 0.002,
+        pool_size: int = 8,
+        timeout: float = DEFAULT_TIMEOUT,
+        metrics=None,
+    ):
+        if not urls:
+            raise ValueError("At least one RPC URL is required")
+
+        self.endpoints = [Endpoint(url, pool_size, timeout) for url in urls]
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.metrics = metrics
+
+        self._ids = itertools.count()
+        self._pending: list[tuple[str, Any, Future]] = []
+        self._wakeup = threading.Condition()
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=pool_size)
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+
+        self.stats = {"calls": 0, "batches": 0, "failovers": 0}
+
+    def call(self, method: str, params: Any = ()) -> Any:
+        """
+        Make a single call, batched with any others issued at the same time.
+        @raise RpcError: If the node returned an error for this call
+        @raise TransportError: If no endpoint could be reached
+        """
+        return self.call_async(method, params).result()
+
+    def call_async(self, method: str, params: Any = ()) -> Future:
+        future: Future = Future()
+        with self._wakeup:
+            if self._closed:
+                raise TransportError("Transport is closed")
+            self._pending.append((method, list(params), future))
+            self.stats["calls"] += 1
+            self._wakeup.notify()
+        return future
+
+    def batch(self, calls: list[tuple[str, Any]]) -> list[Any]:
+        """
+        Send `calls` as batch requests right away, without waiting for the batch window.
+        @return: Results in the order of `calls`
+        @raise RpcError: For the first call the node returned an error for
+        """
+        futures = []
+        for start in range(0, len(calls), self.max_batch):
+            items = [(method, list(params), Future()) for method, params in calls[start : start + self.max_batch]]
+            with self._wakeup:
+                self.stats["calls"] += len(items)
+            self._executor.submit(self._send_batch, items)
+            futures += [future for _, _, future in items]
+        return [future.result() for future in futures]
+
+    def health(self) -> list[dict[str, Any]]:
+        """
+        Health score and counters of every endpoint, best first.
+        """
+        now = time.monotonic()
+        return [
+            {
+                "url": endpoint.url,
+                "health": endpoint.health(now),
+                "success_rate": endpoint.success_rate,
+                "latency": endpoint.latency,
+                "benched": now < endpoint.benched_until,
+                "requests": endpoint.requests,
+                "connections_opened": endpoint.connections_opened,
+            }
+            for endpoint in self._ranked()
+        ]
+
+    def close(self):
+        with self._wakeup:
+            self._closed = True
+            self._wakeup.notify()
+        self._dispatcher.join()
+        self._executor.shutdown(wait=True)
+        for endpoint in self.endpoints:
+            endpoint.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ------------------------------------------------------------------
+    #                            INTERNALS
+    # ------------------------------------------------------------------
+
+    def _dispatch(self):
+        while True:
+            with self._wakeup:
+                while not self._pending and not self._closed:
+                    self._wakeup.wait()
+                if not self._pending:
+                    return
+
+            # Give concurrent callers a moment to join the batch
+            if self.batch_window:
+                time.sleep(self.batch_window)
+
+            with self._wakeup:
+                items = self._pending[: self.max_batch]
+                del self._pending[: self.max_batch]
+            self._executor.submit(self._send_batch, items)
+
+    def _ranked(self) -> list[Endpoint]:
+        now = time.monotonic()
+        # Stable sort keeps the configured order between equally healthy endpoints
+        return sorted(self.endpoints, key=lambda endpoint: -endpoint.health(now))
+
+    def _send_batch(self, items: list[tuple[str, Any, Future]]):
+        ids = [next(self._ids) for _ in items]
+        request = [
+            {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+            for request_id, (method, params, _) in zip(ids, items)
+        ]
+        try:
+            response = self._post(json.dumps(request).encode())
+        except Exception as e:
+            for _, _, future in items:
+                future.set_exception(e)
+            return
+
+        # A node that rejects the whole batch answers with a single error object
+        if isinstance(response, dict):
+            response = [{**response, "id": request_id} for request_id in ids]
+        results = {item.get("id"): item for item in response}
+
+        for request_id, (_, _, future) in zip(ids, items):
+            item = results.get(request_id)
+            if item is None:
+                future.set_exception(TransportError(f"No response for request {request_id}"))
+            elif "error" in item:
+                error = item["error"]
+                future.set_exception(RpcError(error.get("message", ""), error.get("code", 0)))
+            else:
+                future.set_result(item.get("result"))
+
+    def _post(self, body: bytes) -> Any:
+        with self._wakeup:
+            self.stats["batches"] += 1
+
+        last_error: Exception | None = None
+        for attempt, endpoint in enumerate(self._ranked()):
+            if attempt:
+                with self._wakeup:
+                    self.stats["failovers"] += 1
+
+            started = time.monotonic()
+            try:
+                response = json.loads(endpoint.post(body))
+            except (OSError, http.client.HTTPException, _RetryableResponse, ValueError) as e:
+                endpoint.record(False)
+                if self.metrics is not None:
+                    self.metrics.inc("zktitans_rpc_failures_total", endpoint=endpoint.host)
+                last_error = e
+                continue
+
+            latency = time.monotonic() - started
+            endpoint.record(True, latency)
+            if self.metrics is not None:
+                self.metrics.observe("zktitans_rpc_request_seconds", latency, endpoint=endpoint.host)
+            return response
+
+        raise TransportError(f"All {len(self.endpoints)} RPC endpoints failed: {last_error}") from last_error
+
+
+class TransportRPC:
+    """
+    boa RPC backed by an RpcTransport, for `boa.set_env(NetworkEnv(TransportRPC(transport)))`.
+    Implements the interface of `boa.rpc.RPC` and raises its RPCError.
+    """
+
+    def __init__(self, transport: RpcTransport):
+        self.transport = transport
+
+    @property
+    def identifier(self) -> str:
+        return ",".join(endpoint.url for endpoint in self.transport.endpoints)
+
+    @property
+    def name(self) -> str:
+        # Only scheme and host, URLs often embed API keys
+        return ",".join(
+            f"{urlparse(endpoint.url).scheme}://{urlparse(endpoint.url).netloc}"
+            for endpoint in self.transport.endpoints
+        )
+
+    def fetch(self, method: str, params: Any) -> Any:
+        return self.fetch_multi([(method, params)])[0]
+
+    def fetch_uncached(self, method: str, params: Any) -> Any:
+        return self.fetch(method, params)
+
+    def fetch_multi(self, payloads: list[tuple[str, Any]]) -> list[Any]:
+        # Only needed here, the transport itself does not depend on boa
+        from boa.rpc import RPCError
+
+        try:
+            return self.transport.batch(payloads)
+        except RpcError as e:
+            raise RPCError(e.message, e.code) from e
+
+    def wait_for_tx_receipt(self, tx_hash, timeout: float, poll_latency: float = 0.25):
+        deadline = time.monotonic() + timeout
+        while True:
+            receipt = self.fetch_uncached("eth_getTransactionReceipt", [tx_hash])
+            if receipt is not None:
+                return receipt
+            if time.monotonic() + poll_latency > deadline:
+                raise ValueError(f"Timed out waiting for ({tx_hash})")
+            time.sleep(poll_latency)
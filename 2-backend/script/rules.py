@@ -0,0 +1,114 @@
+"""
+Reference implementation of the zkTitans round rules.
+
+Mirrors `_resolveBattle`, `_updateRandomStats` and the mana check in
+`_registerPlayerMove` of contracts/zkTitans.vy, for off-chain tooling that
+needs to predict round outcomes without calling the contract.
+"""
+
+from typing import NamedTuple
+
+# Must match the constants and literals in contracts/zkTitans.vy
+MAX_ATTACK_DEFEND_STRENGTH = 10
+STARTING_HEALTH = 10
+STARTING_MANA = 25
+MAX_MANA = 25
+ATTACK_MANA_COST = 3
+DEFEND_MANA_GAIN = 3
+
+ATTACK = 1
+DEFEND = 2
+
+
+class PlayerState(NamedTuple):
+    health: int
+    mana: int
+    attack: int
+
+    @property
+    def defense(self) -> int:
+        return MAX_ATTACK_DEFEND_STRENGTH - self.attack
+
+
+class RoundResult(NamedTuple):
+    p1: PlayerState
+    p2: PlayerState
+    # Index of the winning player (0 or 1) if the round ended the battle
+    winner: int | None
+
+
+def stat_distribution(strength: int = MAX_ATTACK_DEFEND_STRENGTH) -> dict[int, float]:
+    """
+    Probability of each attack strength drawn by `_createRandomNum`.
+    A draw of 0 is replaced by `strength // 2`, which is therefore twice as likely.
+    """
+    probabilities = {value: 1 / strength for value in range(1, strength)}
+    probabilities[strength // 2] += 1 / strength
+    return probabilities
+
+
+def can_attack(player: PlayerState) -> bool:
+    return player.mana >= ATTACK_MANA_COST
+
+
+def _spend(mana: int) -> int:
+    return mana - min(mana, ATTACK_MANA_COST)
+
+
+def _gain(mana: int, max_mana: int) -> int:
+    return min(mana + DEFEND_MANA_GAIN, max_mana)
+
+
+def _defended_health(
+    defender: PlayerState, attacker: PlayerState, strength: int
+) -> int:
+    defense = strength - defender.attack
+    if defense >= attacker.attack:
+        return defender.health
+    return max(0, defender.health + defense - attacker.attack)
+
+
+def resolve_round(
+    p1: PlayerState,
+    p2: PlayerState,
+    move1: int,
+    move2: int,
+    strength: int = MAX_ATTACK_DEFEND_STRENGTH,
+    max_mana: int = MAX_MANA,
+) -> RoundResult:
+    """
+    Apply one round to both players' health and mana, before the random stat redraw.
+    @param move1: Player 1's move, ATTACK or DEFEND
+    @param move2: Player 2's move, ATTACK or DEFEND
+    @return: Updated player states and the winner if a player's health dropped to 0
+    """
+    if move1 == ATTACK and move2 == ATTACK:
+        health1 = max(0, p1.health - p2.attack)
+        health2 = max(0, p2.health - p1.attack)
+        new_p1 = p1._replace(health=health1, mana=_spend(p1.mana))
+        new_p2 = p2._replace(health=health2, mana=_spend(p2.mana))
+
+        winner = None
+        if health1 == 0 and health2 == 0:
+            winner = 0 if p1.attack > p2.attack else 1
+        elif health1 == 0:
+            winner = 1
+        elif health2 == 0:
+            winner = 0
+        return RoundResult(new_p1, new_p2, winner)
+
+    if move1 == ATTACK and move2 == DEFEND:
+        health2 = _defended_health(p2, p1, strength)
+        new_p1 = p1._replace(mana=_spend(p1.mana))
+        new_p2 = p2._replace(health=health2, mana=_gain(p2.mana, max_mana))
+        return RoundResult(new_p1, new_p2, 0 if health2 == 0 else None)
+
+    if move1 == DEFEND and move2 == ATTACK:
+        health1 = _defended_health(p1, p2, strength)
+        new_p1 = p1._replace(health=health1, mana=_gain(p1.mana, max_mana))
+        new_p2 = p2._replace(mana=_spend(p2.mana))
+        return RoundResult(new_p1, new_p2, 1 if health1 == 0 else None)
+
+    new_p1 = p1._replace(mana=_gain(p1.mana, max_mana))
+    new_p2 = p2._replace(mana=_gain(p2.mana, max_mana))
+    return RoundResult(new_p1, new_p2, None)
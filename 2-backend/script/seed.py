@@ -0,0 +1,273 @@
+"""
+Bulk state seeding for large-state benchmarks.
+
+Instead of sending one transaction per player and battle, `StorageSeeder`
+writes values straight into a deployed contract's storage with
+`boa.env.set_storage`, at the slots given by the compiler's storage layout:
+
+- value types take one slot, strings a length slot followed by 32-byte data slots
+- structs and static arrays lay their members out in consecutive slots
+- a DynArray keeps its length at its slot and its elements right after it
+- a HashMap value lives at keccak256(slot ++ key), with string keys hashed first
+
+`seed_state` uses it to fill zkTitans with realistic players, game tokens,
+balances and battles in seconds. It only works on a local boa environment, and
+seeded entries are not stamped in `battleVersion` and `playerVersion`.
+"""
+
+import random
+from dataclasses import dataclass, field
+
+import boa
+from eth_abi import encode
+from eth_utils import keccak, to_checksum_address
+from vyper.semantics.types import BytesT, DArrayT, HashMapT, SArrayT, StringT, StructT
+
+# Must match the literals in contracts/zkTitans.vy
+BATTLE_STATUS_PENDING = 1
+BATTLE_STATUS_STARTED = 2
+BATTLE_STATUS_ENDED = 4
+MAX_CARD_TYPES = 30
+MAX_ATTACK_DEFEND_STRENGTH = 10
+STARTING_MANA = 25
+STARTING_HEALTH = 10
+
+
+def _word(value) -> int:
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        return int(value, 16)
+    return int.from_bytes(value, "big")
+
+
+def encode_storage(typ, value) -> dict[int, int]:
+    """
+    Storage words of `value` as vyper lays out `typ`, keyed by offset from its first slot.
+    Zero words are left out since fresh storage is already zero.
+    """
+    words: dict[int, int] = {}
+
+    if isinstance(typ, (StringT, BytesT)):
+        data = value.encode() if isinstance(value, str) else bytes(value)
+        words[0] = len(data)
+        for i in range(0, len(data), 32):
+            words[1 + i // 32] = int.from_bytes(data[i : i + 32].ljust(32, b"\0"), "big")
+
+    elif isinstance(typ, StructT):
+        offset = 0
+        values = value if isinstance(value, dict) else dict(zip(typ.tuple_keys(), value))
+        for name, member_typ in typ.tuple_items():
+            for i, word in encode_storage(member_typ, values[name]).items():
+                words[offset + i] = word
+            offset += member_typ.storage_size_in_words
+
+    elif isinstance(typ, (SArrayT, DArrayT)):
+        offset = 0
+        if isinstance(typ, DArrayT):
+            words[0] = len(value)
+            offset = 1
+        for item in value:
+            for i, word in encode_storage(typ.value_type, item).items():
+                words[offset + i] = word
+            offset += typ.value_type.storage_size_in_words
+
+    else:
+        words[0] = _word(value)
+
+    return {i: word for i, word in words.items() if word}
+
+
+def hashmap_slot(slot: int, key_typ, key) -> int:
+    """
+    Storage slot of `key` in a HashMap rooted at `slot`.
+    """
+    if isinstance(key_typ, (StringT, BytesT)):
+        key_bytes = keccak(key.encode() if isinstance(key, str) else bytes(key))
+    else:
+        key_bytes = _word(key).to_bytes(32, "big")
+    return int.from_bytes(keccak(slot.to_bytes(32, "big") + key_bytes), "big")
+
+
+class StorageSeeder:
+    """
+    Writes typed values into a deployed vyper contract's storage variables.
+    @param contract: boa VyperContract deployed in the active local environment
+    """
+
+    def __init__(self, contract):
+        self.contract = contract
+        layout = contract.compiler_data.storage_layout["storage_layout"]
+        self.slots = {name: info["slot"] for name, info in layout.items()}
+        variables = contract.compiler_data.global_ctx.variables
+        self.types = {name: variables[name].typ for name in self.slots}
+        self.writes = 0
+        # DynArray lengths written so far, so appends need no storage reads
+        self._lengths: dict[str, int] = {}
+
+    def set(self, name: str, value):
+        """
+        Overwrite a whole storage variable.
+        """
+        self._write(self.slots[name], self.types[name], value)
+        if isinstance(self.types[name], DArrayT):
+            self._lengths[name] = len(value)
+
+    def get(self, name: str, offset: int = 0) -> int:
+        return boa.env.get_storage(self.contract.address, self.slots[name] + offset)
+
+    def length(self, name: str) -> int:
+        """
+        Current length of a DynArray variable.
+        """
+        if name not in self._lengths:
+            self._lengths[name] = self.get(name)
+        return self._lengths[name]
+
+    def extend(self, name: str, items: list) -> int:
+        """
+        Append `items` to a DynArray variable.
+        @return: Index of the first appended item
+        """
+        typ = self.types[name]
+        slot = self.slots[name]
+        length = self.length(name)
+        if length + len(items) > typ.length:
+            raise ValueError(f"{name} holds at most {typ.length} items")
+
+        item_size = typ.value_type.storage_size_in_words
+        for i, item in enumerate(items):
+            self._write(slot + 1 + (length + i) * item_size, typ.value_type, item)
+        self._lengths[name] = length + len(items)
+        self._store(slot, length + len(items))
+        return length
+
+    def set_item(self, name: str, keys: tuple, value):
+        """
+        Set a (nested) HashMap entry, `keys` holding one key per level.
+        """
+        typ = self.types[name]
+        slot = self.slots[name]
+        for key in keys:
+            assert isinstance(typ, HashMapT), f"{name} has fewer than {len(keys)} key levels"
+            slot = hashmap_slot(slot, typ.key_type, key)
+            typ = typ.value_type
+        self._write(slot, typ, value)
+
+    def _write(self, slot: int, typ, value):
+        for offset, word in encode_storage(typ, value).items():
+            self._store(slot + offset, word)
+
+    def _store(self, slot: int, word: int):
+        boa.env.set_storage(self.contract.address, slot, word)
+        self.writes += 1
+
+
+@dataclass
+class SeededState:
+    players: list[str] = field(default_factory=list)
+    battles: list[str] = field(default_factory=list)
+    started_battles: list[str] = field(default_factory=list)
+
+
+def _address(index: int) -> str:
+    return to_checksum_address(keccak(b"zkTitans seed player" + index.to_bytes(32, "big"))[-20:])
+
+
+def seed_state(
+    titans,
+    players: int,
+    battles: int,
+    started_fraction: float = 0.2,
+    pending_fraction: float = 0.1,
+    seed: int = 0,
+) -> SeededState:
+    """
+    Fill a freshly deployed zkTitans with players, their game tokens and balances, and battles.
+    A `started_fraction` of battles is in progress between players not in any other battle,
+    a `pending_fraction` waits for an opponent and the rest has ended with a winner.
+    @return: Addresses of the seeded players and names of the seeded battles
+    """
+    rng = random.Random(seed)
+    seeder = StorageSeeder(titans)
+    state = SeededState(players=[_address(i) for i in range(players)])
+
+    # Appended after the dummy entries at index 0
+    first_player = seeder.length("players")
+    first_token = seeder.length("gameTokens")
+
+    in_battle = [False] * players
+    started = min(int(battles * started_fraction), players // 2)
+    pending = min(int(battles * pending_fraction), battles - started)
+    idle = list(range(players))
+    rng.shuffle(idle)
+
+    battle_items = []
+    for i in range(battles):
+        name = f"Seeded Battle {i}"
+        if i < started:
+            p1, p2 = idle.pop(), idle.pop()
+            in_battle[p1] = in_battle[p2] = True
+            status, winner = BATTLE_STATUS_STARTED, 0
+            state.started_battles.append(name)
+        elif i < started + pending:
+            p1, p2 = rng.randrange(players), None
+            status, winner = BATTLE_STATUS_PENDING, 0
+        else:
+            p1, p2 = rng.sample(range(players), 2)
+            status, winner = BATTLE_STATUS_ENDED, rng.choice((p1, p2))
+
+        addresses = [state.players[p1], state.players[p2] if p2 is not None else 0]
+        battle_items.append(
+            {
+                "battleStatus": status,
+                "battleHash": keccak(encode(["string"], [name])),
+                "name": name,
+                "players": addresses,
+                "moves": [0, 0],
+                "winner": state.players[winner] if status == BATTLE_STATUS_ENDED else 0,
+            }
+        )
+        state.battles.append(name)
+
+    player_items = []
+    token_items = []
+    for i, address in enumerate(state.players):
+        attack = rng.randint(1, MAX_ATTACK_DEFEND_STRENGTH - 1)
+        card_id = rng.randrange(1, MAX_CARD_TYPES)
+        player_items.append(
+            {
+                "playerAddress": address,
+                "playerName": f"Seeded Player {i}",
+                "playerMana": rng.randint(0, STARTING_MANA) if in_battle[i] else STARTING_MANA,
+                "playerHealth": rng.randint(1, STARTING_HEALTH) if in_battle[i] else STARTING_HEALTH,
+                "inBattle": in_battle[i],
+            }
+        )
+        token_items.append(
+            {
+                "name": f"Seeded Token {i}",
+                "id": card_id,
+                "attackStrength": attack,
+                "defenseStrength": MAX_ATTACK_DEFEND_STRENGTH - attack,
+            }
+        )
+        seeder.set_item("playerInfo", (address,), first_player + i)
+        seeder.set_item("playerTokenInfo", (address,), first_token + i)
+        seeder.set_item("_balances", (card_id, address), 1)
+
+    seeder.extend("players", player_items)
+    # The total supply follows from the number of game tokens, one card each
+    seeder.extend("gameTokens", token_items)
+
+    first_battle = seeder.extend("battles", battle_items)
+    now = boa.env.evm.patch.timestamp
+    for i, name in enumerate(state.battles):
+        battle_id = first_battle + i + 1
+        seeder.set_item("battleInfo", (name,), battle_id)
+        if battle_items[i]["battleStatus"] == BATTLE_STATUS_STARTED:
+            seeder.set_item("lastMoveTime", (battle_id,), now)
+
+    return state
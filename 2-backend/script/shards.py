@@ -0,0 +1,144 @@
+"""
+Horizontal sharding of zkTitans across several deployments.
+
+Every shard is an independent zkTitans contract with its own players, tokens
+and battles, so N shards hold N times the 5,000 player cap and spread their
+storage writes over N contracts. Players belong to one shard and only battle
+players of the same shard.
+
+`ShardRouter` assigns players to shards off-chain with rendezvous hashing:
+a player goes to the shard whose address scores highest in
+keccak256(shard address ++ player address). The assignment needs no state and
+no extra transaction, every client computes the same one, and adding a shard
+only moves the players that now score highest on it. Players registered before
+a shard was added keep playing where they are, which `ShardedTitans.locate`
+finds by asking the other shards.
+
+`ShardedTitans` fans reads out across the shards and merges the results. Pass
+an executor to query the shards concurrently, e.g. over an `RpcTransport`.
+
+Deploy with `ZKTITANS_SHARDS=<n> mox run deploy`; the shard addresses are
+written to out/shards.json.
+"""
+
+import json
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Any, Callable
+
+from eth_utils import keccak, to_canonical_address
+
+from script.bindings import Battle, GameToken, Player
+
+SHARDS_PATH = Path("out") / "shards.json"
+
+
+class ShardRouter:
+    """
+    Deterministic player to shard assignment.
+    @param addresses: Shard contract addresses, in deployment order
+    """
+
+    def __init__(self, addresses: list[str]):
+        if not addresses:
+            raise ValueError("At least one shard is needed")
+        self.addresses = [str(address) for address in addresses]
+        self._keys = [to_canonical_address(address) for address in self.addresses]
+
+    def __len__(self) -> int:
+        return len(self.addresses)
+
+    def shard_for(self, player: str) -> int:
+        """
+        Index of the shard `player` registers on.
+        """
+        player_key = to_canonical_address(player)
+        scores = [keccak(key + player_key) for key in self._keys]
+        return max(range(len(scores)), key=scores.__getitem__)
+
+    def save(self, path: Path = SHARDS_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"shards": self.addresses}, indent=2))
+
+    @classmethod
+    def load(cls, path: Path = SHARDS_PATH) -> "ShardRouter":
+        return cls(json.loads(path.read_text())["shards"])
+
+
+class ShardedTitans:
+    """
+    Reads zkTitans state across shards.
+    @param shards: zkTitans contracts, in the router's order
+    @param executor: Executor to query shards concurrently, shards are queried in turn without one
+    """
+
+    def __init__(self, shards: list, executor: Executor | None = None):
+        self.shards = shards
+        self.router = ShardRouter([shard.address for shard in shards])
+        self.executor = executor
+
+    def shard_for(self, player: str):
+        """
+        Contract a new player registers on.
+        """
+        return self.shards[self.router.shard_for(player)]
+
+    def locate(self, player: str) -> int | None:
+        """
+        Index of the shard `player` is registered on, None if on none.
+        Checks the routed shard first, then the others for players registered
+        before shards were added.
+        """
+        routed = self.router.shard_for(player)
+        if self.shards[routed].isPlayer(player):
+            return routed
+
+        others = [i for i in range(len(self.shards)) if i != routed]
+        found = self._fan_out(lambda shard: shard.isPlayer(player), [self.shards[i] for i in others])
+        return next((i for i, registered in zip(others, found) if registered), None)
+
+    def isPlayer(self, player: str) -> bool:
+        return self.locate(player) is not None
+
+    def getPlayer(self, player: str) -> Player:
+        return Player.from_tuple(self.shards[self._registered(player)].getPlayer(player))
+
+    def getPlayerToken(self, player: str) -> GameToken:
+        return GameToken.from_tuple(self.shards[self._registered(player)].getPlayerToken(player))
+
+    def getAllPlayers(self) -> list[Player]:
+        """
+        Players of every shard, shard by shard, without the dummy entries.
+        """
+        pages = self._fan_out(lambda shard: shard.getAllPlayers())
+        return [Player.from_tuple(player) for page in pages for player in page[1:]]
+
+    def getAllBattles(self) -> list[tuple[int, Battle]]:
+        """
+        Battles of every shard, paired with the index of their shard.
+        """
+        pages = self._fan_out(lambda shard: shard.getAllBattles())
+        return [(i, Battle.from_tuple(battle)) for i, page in enumerate(pages) for battle in page]
+
+    def findBattle(self, name: str) -> list[tuple[int, Battle]]:
+        """
+        Battles named `name`, with the index of their shard. Names are only unique
+        within a shard, so several shards may hold a battle of the same name.
+        """
+        found = self._fan_out(lambda shard: shard.isBattle(name))
+        return [(i, Battle.from_tuple(self.shards[i].getBattle(name))) for i, exists in enumerate(found) if exists]
+
+    def getTotalSupply(self) -> int:
+        return sum(self._fan_out(lambda shard: shard.getTotalSupply()))
+
+    def _registered(self, player: str) -> int:
+        index = self.locate(player)
+        if index is None:
+            raise KeyError(f"{player} is not registered on any shard")
+        return index
+
+    def _fan_out(self, call: Callable[[Any], Any], shards: list | None = None) -> list:
+        shards = self.shards if shards is None else shards
+        if self.executor is None:
+            return [call(shard) for shard in shards]
+        return list(self.executor.map(call, shards))
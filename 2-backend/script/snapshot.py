@@ -0,0 +1,338 @@
+"""
+On-disk snapshots of a boa environment, to restore deployed and seeded state in
+another process without replaying it.
+
+`dump_snapshot` writes every account of an environment, its nonce, balance,
+code and non-zero storage slots, to one file together with the block number,
+timestamp and chain id and the addresses of the named contracts. It only reads
+the environment, so it can run inside an `anchor()`.
+
+`load_snapshot` memory-maps the file into a fresh boa environment. Accounts are
+set up front, but storage is not copied: the file holds an open addressing hash
+table of every slot, and each contract's storage reads fall through to it from
+the environment's journals. Writes stay in memory, so the file is never
+modified and any number of processes can share it. Loading takes milliseconds
+whatever the size of the state.
+
+A snapshot records the keccak256 of each named contract's runtime bytecode as
+compiled when it was written. Loading it with deployers whose bytecode differs
+raises `StaleSnapshotError`, and `snapshot_path` puts the bytecode hashes into
+the file name, so `cached_env` builds a new snapshot whenever a contract
+changes and reuses the existing one otherwise.
+
+Accounts and storage are read from py-evm's journals, which hold all state of
+an environment that never committed a block. boa never does, but forked
+environments and ones persisted by hand are rejected.
+
+Run with `mox run snapshot` to write a snapshot of thousands of seeded players
+mid-battle to out/snapshots and time loading it.
+"""
+
+import json
+import mmap
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+import boa
+import rlp
+from eth.constants import BLANK_ROOT_HASH
+from eth.db.backends.base import BaseDB
+from eth.db.cache import CacheDB
+from eth.db.journal import JournalDB
+from eth.db.storage import AccountStorageDB
+from eth_utils import keccak
+
+SNAPSHOT_DIR = Path("out") / "snapshots"
+SNAPSHOT_VERSION = 1
+
+# File layout: magic, metadata length, metadata JSON, storage table size, the
+# storage table, the slot numbers of every account, then the code of every
+# account. The storage table is an open addressing hash table of
+# (keccak256(address ++ slot), value) with linear probing and at least half its
+# entries empty, probed from the first bytes of the hash.
+MAGIC = b"ZKTSNAP\0"
+_LENGTH = struct.Struct(">Q")
+_TABLE_ENTRY = struct.Struct(">32s32s")
+_EMPTY_KEY = b"\0" * 32
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class StaleSnapshotError(SnapshotError):
+    pass
+
+
+def bytecode_hash(deployer) -> str:
+    """
+    keccak256 of the runtime bytecode a deployer compiles to.
+    """
+    return "0x" + keccak(deployer.compiler_data.bytecode_runtime).hex()
+
+
+def _storage_key(address: bytes, slot: bytes) -> bytes:
+    return keccak(address + slot.rjust(32, b"\0"))
+
+
+class _SnapshotFile:
+    """
+    A memory-mapped snapshot file.
+    """
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.buffer[: len(MAGIC)] != MAGIC:
+            raise SnapshotError(f"{path} is not a snapshot")
+
+        offset = len(MAGIC)
+        (header_length,) = _LENGTH.unpack_from(self.buffer, offset)
+        offset += _LENGTH.size
+        self.metadata = json.loads(self.buffer[offset : offset + header_length])
+        offset += header_length
+        (size,) = _LENGTH.unpack_from(self.buffer, offset)
+        self._table = offset + _LENGTH.size
+        self._mask = size - 1
+        self.slots_start = self._table + size * _TABLE_ENTRY.size
+        self.code_start = self.slots_start + 32 * self.metadata["slot_count"]
+
+    def lookup(self, key: bytes) -> bytes | None:
+        i = int.from_bytes(key[:8], "big") & self._mask
+        while True:
+            entry, value = _TABLE_ENTRY.unpack_from(self.buffer, self._table + i * _TABLE_ENTRY.size)
+            if entry == key:
+                return value
+            if entry == _EMPTY_KEY:
+                return None
+            i = (i + 1) & self._mask
+
+    def code(self, account: dict) -> bytes:
+        offset, length = account["code"]
+        return bytes(self.buffer[self.code_start + offset : self.code_start + offset + length])
+
+
+class _SnapshotStorage(BaseDB):
+    """
+    One account's storage in a mapped snapshot, in place of the storage trie under its
+    AccountStorageDB: keys are big-endian slot numbers, values RLP-encoded.
+    """
+
+    def __init__(self, snapshot: _SnapshotFile, address: bytes, slots: list[int]):
+        self.snapshot = snapshot
+        self.address = address
+        self._slots = slots
+
+    def slots(self) -> list[int]:
+        """
+        Slot numbers of the account's storage in the snapshot.
+        """
+        index, count = self._slots
+        start = self.snapshot.slots_start + 32 * index
+        data = self.snapshot.buffer[start : start + 32 * count]
+        return [int.from_bytes(data[i : i + 32], "big") for i in range(0, len(data), 32)]
+
+    def __getitem__(self, key: bytes) -> bytes:
+        value = self.snapshot.lookup(_storage_key(self.address, key))
+        if value is None:
+            raise KeyError(key)
+        return rlp.encode(int.from_bytes(value, "big"))
+
+    def __setitem__(self, key: bytes, value: bytes) -> None:
+        raise SnapshotError("Snapshot storage is read-only")
+
+    def __delitem__(self, key: bytes) -> None:
+        raise SnapshotError("Snapshot storage is read-only")
+
+    def _exists(self, key: bytes) -> bool:
+        return self.snapshot.lookup(_storage_key(self.address, key)) is not None
+
+
+def _accounts(env) -> dict[bytes, tuple[int, int, bytes, list[tuple[int, int]]]]:
+    """
+    Nonce, balance, code and non-zero storage of every account of `env` that has any.
+    """
+    account_db = env.evm.vm.state._account_db
+    if env.evm.is_forked or account_db._root_hash_at_last_persist != BLANK_ROOT_HASH:
+        raise SnapshotError("Only environments that never persisted their state can be written to a snapshot")
+
+    state = env.evm.vm.state
+    accounts = {}
+    for address in set(account_db._journaltrie._journal._current_values) | set(account_db._account_stores):
+        slots = set()
+        store = account_db._account_stores.get(address)
+        if store is not None:
+            for journal in (store._journal_storage, store._locked_changes):
+                slots.update(int.from_bytes(key, "big") for key in journal._journal._current_values)
+            snapshot_storage = getattr(store, "snapshot_storage", None)
+            if snapshot_storage is not None:
+                slots.update(snapshot_storage.slots())
+        storage = sorted((slot, value) for slot in slots if (value := state.get_storage(address, slot)))
+
+        nonce, balance, code = state.get_nonce(address), state.get_balance(address), state.get_code(address)
+        if nonce or balance or code or storage:
+            accounts[address] = (nonce, balance, code, storage)
+    return accounts
+
+
+def dump_snapshot(path: Path, contracts: dict[str, Any], env=None) -> dict:
+    """
+    Write the state of `env` to `path`.
+    @param contracts: Contracts to record by name, as loaded again by `load_snapshot`
+    @param env: boa environment, the active one by default
+    @return: The snapshot metadata
+    """
+    env = env or boa.env
+    accounts = _accounts(env)
+
+    slot_count = sum(len(storage) for *_, storage in accounts.values())
+    size = 1 << (2 * slot_count).bit_length()
+    table = [None] * size
+    slots, code = [], []
+    headers = []
+    code_length = 0
+    for address, (nonce, balance, account_code, storage) in sorted(accounts.items()):
+        # Slot and code positions are relative to the start of their section
+        headers.append(
+            {
+                "address": "0x" + address.hex(),
+                "nonce": nonce,
+                "balance": balance,
+                "slots": [len(slots), len(storage)],
+                "code": [code_length, len(account_code)],
+            }
+        )
+        for slot, value in storage:
+            slot_bytes = slot.to_bytes(32, "big")
+            key = _storage_key(address, slot_bytes)
+            i = int.from_bytes(key[:8], "big") & (size - 1)
+            while table[i] is not None:
+                i = (i + 1) & (size - 1)
+            table[i] = _TABLE_ENTRY.pack(key, value.to_bytes(32, "big"))
+            slots.append(slot_bytes)
+        code.append(account_code)
+        code_length += len(account_code)
+
+    metadata = {
+        "version": SNAPSHOT_VERSION,
+        "block_number": env.evm.patch.block_number,
+        "timestamp": env.evm.patch.timestamp,
+        "chain_id": env.evm.patch.chain_id,
+        "contracts": {
+            name: {"address": str(contract.address), "bytecode_hash": bytecode_hash(contract.deployer)}
+            for name, contract in contracts.items()
+        },
+        "slot_count": slot_count,
+        "accounts": headers,
+    }
+    header = json.dumps(metadata).encode()
+
+    # Write then rename, so a reader never maps a half written snapshot
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    empty = _TABLE_ENTRY.pack(_EMPTY_KEY, _EMPTY_KEY)
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + _LENGTH.pack(len(header)) + header + _LENGTH.pack(size))
+        f.write(b"".join(entry or empty for entry in table))
+        f.write(b"".join(slots))
+        f.write(b"".join(code))
+    os.replace(tmp, path)
+    return metadata
+
+
+def load_snapshot(path: Path, deployers: dict[str, Any], env=None) -> tuple[Any, dict[str, Any]]:
+    """
+    Restore a snapshot into a boa environment.
+    @param deployers: Deployer of every contract recorded in the snapshot, by name
+    @param env: Environment without state of its own to restore into, a new one by default
+    @return: The environment and the snapshot's contracts bound in it, by name
+    """
+    snapshot = _SnapshotFile(path)
+    metadata = snapshot.metadata
+    if metadata["version"] != SNAPSHOT_VERSION:
+        raise StaleSnapshotError(f"{path} has version {metadata['version']}, expected {SNAPSHOT_VERSION}")
+    for name, contract in metadata["contracts"].items():
+        if name not in deployers:
+            raise SnapshotError(f"No deployer for {name} of {path}")
+        if bytecode_hash(deployers[name]) != contract["bytecode_hash"]:
+            raise StaleSnapshotError(f"{path} holds a different build of {name}")
+
+    env = env or boa.Env()
+    state = env.evm.vm.state
+    account_db = state._account_db
+    for account in metadata["accounts"]:
+        address = bytes.fromhex(account["address"][2:])
+        state.set_nonce(address, account["nonce"])
+        state.set_balance(address, account["balance"])
+        state.set_code(address, snapshot.code(account))
+
+        # Storage reads fall through the account's journals to the mapped file
+        store = AccountStorageDB(account_db._raw_store_db, BLANK_ROOT_HASH, address)
+        store.snapshot_storage = _SnapshotStorage(snapshot, address, account["slots"])
+        store._storage_cache = CacheDB(store.snapshot_storage)
+        store._locked_changes = JournalDB(store._storage_cache)
+        store._journal_storage = JournalDB(store._locked_changes)
+        account_db._account_stores[address] = store
+
+    env.evm.patch.block_number = metadata["block_number"]
+    env.evm.patch.timestamp = metadata["timestamp"]
+    env.evm.patch.chain_id = metadata["chain_id"]
+
+    with boa.swap_env(env):
+        contracts = {name: deployers[name].at(contract["address"]) for name, contract in metadata["contracts"].items()}
+    return env, contracts
+
+
+def snapshot_path(name: str, deployers: dict[str, Any], directory: Path = SNAPSHOT_DIR) -> Path:
+    """
+    Snapshot file of `name` for the current build of `deployers`.
+    """
+    hashes = "".join(f"{contract}={bytecode_hash(deployer)}" for contract, deployer in sorted(deployers.items()))
+    return Path(directory) / f"{name}-{keccak(hashes.encode()).hex()[:16]}.snapshot"
+
+
+def cached_env(
+    name: str,
+    build: Callable[[], dict[str, Any]],
+    deployers: dict[str, Any],
+    directory: Path = SNAPSHOT_DIR,
+) -> tuple[Any, dict[str, Any]]:
+    """
+    Load the snapshot `name` of the current build, first building it if there is none.
+    @param build: Deploys and sets up state in the active environment and returns the contracts
+        to record by name; called in a new environment
+    @return: The environment and its contracts, as returned by `load_snapshot`
+    """
+    path = snapshot_path(name, deployers, directory)
+    if not path.exists():
+        with boa.swap_env(boa.Env()):
+            dump_snapshot(path, build())
+    return load_snapshot(path, deployers)
+
+
+def moccasin_main():
+    from contracts import MoveForwarder, zkTitans
+    from script.deploy import deploy_move_forwarder, deploy_zktitans
+    from script.seed import seed_state
+
+    deployers = {"zkTitans": zkTitans, "MoveForwarder": MoveForwarder}
+
+    def build():
+        titans = deploy_zktitans("")
+        forwarder = deploy_move_forwarder(titans)
+        seed_state(titans, players=4_000, battles=10_000, started_fraction=0.4)
+        return {"zkTitans": titans, "MoveForwarder": forwarder}
+
+    started = time.perf_counter()
+    env, contracts = cached_env("seeded", build, deployers)
+    print(f"Snapshot ready in {time.perf_counter() - started:.2f}s: {snapshot_path('seeded', deployers)}")
+
+    started = time.perf_counter()
+    env, contracts = load_snapshot(snapshot_path("seeded", deployers), deployers)
+    print(f"Loaded in {(time.perf_counter() - started) * 1000:.1f}ms")
+    with boa.swap_env(env):
+        print(f"{len(contracts['zkTitans'].getAllPlayers()) - 1:,} players")
@@ -0,0 +1,247 @@
+"""
+Exact optimal-play solver for zkTitans battles.
+
+A battle is a two-player zero-sum stochastic game: both players pick ATTACK or
+DEFEND simultaneously, the round is resolved by the rules in `script.rules`,
+and if nobody died both attack strengths are redrawn at random. The solver
+runs Shapley value iteration over every (health, mana, attack strength) state,
+one health layer at a time, and stores player 1's win probability and both
+players' optimal attack probabilities in a NumPy table.
+
+Health never increases, so layers are solved from low to high health and each
+only iterates over its own within-layer transitions. Rounds that can repeat
+forever (both players defending at full mana) converge to the initial 0.5, so
+a stalemate counts as half a win.
+
+Build the table with `mox run solver`, then load it with `PolicyTable.load`.
+"""
+
+from pathlib import Path
+
+import numpy as np
+
+from script.rules import (
+    ATTACK,
+    ATTACK_MANA_COST,
+    DEFEND,
+    DEFEND_MANA_GAIN,
+    MAX_ATTACK_DEFEND_STRENGTH,
+    MAX_MANA,
+    STARTING_HEALTH,
+    stat_distribution,
+)
+
+DEFAULT_TABLE_PATH = Path("out/policy_table.npy")
+
+# Quantized table layout, indexed [health1, health2, mana1, mana2, attack1 - 1, attack2 - 1]
+POLICY_DTYPE = np.dtype([("value", "<u2"), ("p1_attack", "u1"), ("p2_attack", "u1")])
+_VALUE_SCALE = np.iinfo(np.uint16).max
+_PROB_SCALE = np.iinfo(np.uint8).max
+
+
+def solve_matrix_games(a, b, c, d, p1_can_attack, p2_can_attack):
+    """
+    Solve 2x2 zero-sum games elementwise, player 1 maximizing.
+    Rows are player 1's moves and columns player 2's, in (ATTACK, DEFEND) order:
+    `a` is attack/attack, `b` attack/defend, `c` defend/attack, `d` defend/defend.
+    @return: (value, p1 attack probability, p2 attack probability) arrays
+    """
+    a, b, c, d = np.broadcast_arrays(a, b, c, d)
+    p1_can_attack = np.broadcast_to(p1_can_attack, a.shape)
+    p2_can_attack = np.broadcast_to(p2_can_attack, a.shape)
+
+    # Mixed equilibrium, only used where no pure saddle point exists
+    denominator = a - b - c + d
+    safe = np.where(denominator == 0, 1.0, denominator)
+    mixed_value = (a * d - b * c) / safe
+    mixed_p1 = np.clip((d - c) / safe, 0.0, 1.0)
+    mixed_p2 = np.clip((d - b) / safe, 0.0, 1.0)
+
+    lower = np.maximum(np.minimum(a, b), np.minimum(c, d))
+    upper = np.minimum(np.maximum(a, c), np.maximum(b, d))
+    saddle = np.isclose(lower, upper, rtol=0.0, atol=1e-12)
+
+    value = np.where(saddle, lower, mixed_value)
+    p1 = np.where(saddle, np.minimum(a, b) >= np.minimum(c, d), mixed_p1)
+    p2 = np.where(saddle, np.maximum(a, c) <= np.maximum(b, d), mixed_p2)
+
+    # A player short of mana can only defend, leaving a one-sided choice
+    only_p2 = ~p1_can_attack & p2_can_attack
+    only_p1 = p1_can_attack & ~p2_can_attack
+    neither = ~p1_can_attack & ~p2_can_attack
+
+    value = np.where(only_p2, np.minimum(c, d), value)
+    p1 = np.where(only_p2, 0.0, p1)
+    p2 = np.where(only_p2, c <= d, p2)
+
+    value = np.where(only_p1, np.maximum(b, d), value)
+    p1 = np.where(only_p1, b >= d, p1)
+    p2 = np.where(only_p1, 0.0, p2)
+
+    value = np.where(neither, d, value)
+    p1 = np.where(neither, 0.0, p1)
+    p2 = np.where(neither, 0.0, p2)
+
+    return value, p1.astype(float), p2.astype(float)
+
+
+def solve(
+    max_health: int = STARTING_HEALTH,
+    max_mana: int = MAX_MANA,
+    strength: int = MAX_ATTACK_DEFEND_STRENGTH,
+    tolerance: float = 1e-9,
+    max_iterations: int = 10_000,
+):
+    """
+    Compute the value of every battle state under optimal play.
+    @return: (value, p1_attack, p2_attack) float arrays indexed
+        [health1, health2, mana1, mana2, attack1 - 1, attack2 - 1]
+    """
+    distribution = stat_distribution(strength)
+    attacks = np.arange(1, strength)
+    probabilities = np.array([distribution[attack] for attack in attacks])
+
+    manas = np.arange(max_mana + 1)
+    m1 = manas[:, None, None, None]
+    m2 = manas[None, :, None, None]
+    a1 = attacks[None, None, :, None]
+    a2 = attacks[None, None, None, :]
+    d1 = strength - a1
+    d2 = strength - a2
+
+    spent1 = m1 - np.minimum(m1, ATTACK_MANA_COST)
+    spent2 = m2 - np.minimum(m2, ATTACK_MANA_COST)
+    gained1 = np.minimum(m1 + DEFEND_MANA_GAIN, max_mana)
+    gained2 = np.minimum(m2 + DEFEND_MANA_GAIN, max_mana)
+    p1_can_attack = m1 >= ATTACK_MANA_COST
+    p2_can_attack = m2 >= ATTACK_MANA_COST
+
+    shape = (max_health + 1, max_health + 1, max_mana + 1, max_mana + 1)
+    value = np.zeros(shape + (len(attacks), len(attacks)))
+    p1_attack = np.zeros_like(value)
+    p2_attack = np.zeros_like(value)
+    # Value of a state before its attack strengths are redrawn
+    expected = np.zeros(shape)
+
+    def continuation(h1_next, h2_next, m1_next, m2_next):
+        return expected[h1_next, h2_next, m1_next, m2_next]
+
+    for h1 in range(1, max_health + 1):
+        for h2 in range(1, max_health + 1):
+            # Both attack
+            aa_h1 = np.maximum(0, h1 - a2)
+            aa_h2 = np.maximum(0, h2 - a1)
+            aa_end = (aa_h1 == 0) | (aa_h2 == 0)
+            aa_win = np.where((aa_h1 == 0) & (aa_h2 == 0), a1 > a2, aa_h2 == 0)
+
+            # Player 1 attacks, player 2 defends
+            ad_h2 = np.where(d2 >= a1, h2, np.maximum(0, h2 + d2 - a1))
+            ad_end = ad_h2 == 0
+
+            # Player 1 defends, player 2 attacks
+            da_h1 = np.where(d1 >= a2, h1, np.maximum(0, h1 + d1 - a2))
+            da_end = da_h1 == 0
+
+            layer_value = np.full(value.shape[2:], 0.5)
+            for _ in range(max_iterations):
+                expected[h1, h2] = layer_value @ probabilities @ probabilities
+
+                q_aa = np.where(
+                    aa_end, aa_win, continuation(aa_h1, aa_h2, spent1, spent2)
+                )
+                q_ad = np.where(ad_end, 1.0, continuation(h1, ad_h2, spent1, gained2))
+                q_da = np.where(da_end, 0.0, continuation(da_h1, h2, gained1, spent2))
+                q_dd = continuation(h1, h2, gained1, gained2)
+
+                new_value, p1, p2 = solve_matrix_games(
+                    q_aa, q_ad, q_da, q_dd, p1_can_attack, p2_can_attack
+                )
+                converged = np.max(np.abs(new_value - layer_value)) < tolerance
+                layer_value = new_value
+                if converged:
+                    break
+
+            value[h1, h2] = layer_value
+            p1_attack[h1, h2] = p1
+            p2_attack[h1, h2] = p2
+            expected[h1, h2] = layer_value @ probabilities @ probabilities
+
+    # A player at 0 health has lost
+    value[:, 0] = 1.0
+    value[0, :] = 0.0
+
+    return value, p1_attack, p2_attack
+
+
+def build_table(**kwargs) -> np.ndarray:
+    """
+    Solve the game and quantize the result into a POLICY_DTYPE table.
+    Accepts the same keyword arguments as `solve`.
+    """
+    value, p1_attack, p2_attack = solve(**kwargs)
+
+    table = np.empty(value.shape, dtype=POLICY_DTYPE)
+    table["value"] = np.rint(value * _VALUE_SCALE)
+    table["p1_attack"] = np.rint(p1_attack * _PROB_SCALE)
+    table["p2_attack"] = np.rint(p2_attack * _PROB_SCALE)
+    return table
+
+
+class PolicyTable:
+    """
+    Lookup table of optimal moves and win chances, indexed by battle state.
+    """
+
+    def __init__(self, table: np.ndarray):
+        self.table = table
+
+    @classmethod
+    def load(cls, path: Path | str = DEFAULT_TABLE_PATH) -> "PolicyTable":
+        """
+        Memory-map a table saved with `save`; only the looked-up pages are read.
+        """
+        return cls(np.load(path, mmap_mode="r"))
+
+    def save(self, path: Path | str = DEFAULT_TABLE_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.save(path, self.table)
+
+    def _entry(self, player: int, own, opponent):
+        """
+        Look up a state from the point of view of `player` (0 or 1), where
+        `own` and `opponent` are (health, mana, attack) tuples.
+        """
+        if player == 0:
+            p1, p2 = own, opponent
+        else:
+            p1, p2 = opponent, own
+        return self.table[p1[0], p2[0], p1[1], p2[1], p1[2] - 1, p2[2] - 1]
+
+    def win_chance(self, player: int, own, opponent) -> float:
+        """
+        Probability that `player` wins under optimal play by both sides.
+        """
+        value = int(self._entry(player, own, opponent)["value"]) / _VALUE_SCALE
+        return value if player == 0 else 1.0 - value
+
+    def attack_probability(self, player: int, own, opponent) -> float:
+        """
+        Probability with which `player` should attack in the optimal mixed strategy.
+        """
+        field = "p1_attack" if player == 0 else "p2_attack"
+        return int(self._entry(player, own, opponent)[field]) / _PROB_SCALE
+
+    def best_move(self, player: int, own, opponent, rng=None) -> int:
+        """
+        Optimal move for `player`, sampled from the mixed strategy if `rng` is given.
+        """
+        probability = self.attack_probability(player, own, opponent)
+        threshold = rng.random() if rng is not None else 0.5
+        return ATTACK if probability > threshold else DEFEND
+
+
+def moccasin_main():
+    table = PolicyTable(build_table())
+    table.save()
+    print(f"Saved {table.table.size} battle states to {DEFAULT_TABLE_PATH}")
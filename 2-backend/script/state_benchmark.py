@@ -0,0 +1,140 @@
+"""
+Gas and latency of the main zkTitans entry points as a function of state size.
+
+For every size, a fresh contract is seeded with `script.seed.seed_state` and two
+new players then read all players, create and join a battle, and play a round
+that triggers `_resolveBattle`. Results are written to out/state_benchmark.csv
+and, if matplotlib is installed, plotted to out/state_benchmark.png.
+
+Run with `mox run state_benchmark`.
+"""
+
+import csv
+import time
+from pathlib import Path
+
+import boa
+
+from contracts import zkTitans
+from script.seed import seed_state
+
+# Player counts to benchmark; of the 5,000 player slots one holds the dummy player
+# and two stay free for the benchmark players. Each size gets four battles per
+# player, up to the 20,000 cap
+PLAYER_SIZES = [0, 1_000, 2_500, 4_997]
+BATTLES_PER_PLAYER = 4
+MAX_BATTLES = 20_000 - 1
+
+OUT_DIR = Path("out")
+ENTRY_POINTS = ["getAllPlayers", "createBattle", "joinBattle", "resolveRound"]
+
+
+def _measure(function, *args, sender=None) -> tuple[int, float]:
+    gas_before = boa.env.get_gas_used()
+    started = time.perf_counter()
+    if sender is None:
+        function(*args)
+    else:
+        with boa.env.prank(sender):
+            function(*args)
+    return boa.env.get_gas_used() - gas_before, time.perf_counter() - started
+
+
+def benchmark_size(players: int, battles: int) -> list[dict]:
+    """
+    Measure every entry point once on a contract seeded with `players` and `battles`.
+    @return: One row per entry point with gas used and wall-clock seconds
+    """
+    with boa.env.anchor():
+        titans = zkTitans.deploy("", False)
+        started = time.perf_counter()
+        seed_state(titans, players, battles)
+        seed_seconds = time.perf_counter() - started
+
+        player1 = boa.env.generate_address("benchmark player 1")
+        player2 = boa.env.generate_address("benchmark player 2")
+        with boa.env.prank(player1):
+            titans.registerPlayer("Benchmark One", "Token")
+        with boa.env.prank(player2):
+            titans.registerPlayer("Benchmark Two", "Token")
+
+        results = {
+            "getAllPlayers": _measure(titans.getAllPlayers),
+            "createBattle": _measure(titans.createBattle, "Benchmark Battle", sender=player1),
+            "joinBattle": _measure(titans.joinBattle, "Benchmark Battle", sender=player2),
+        }
+        with boa.env.prank(player1):
+            titans.attackOrDefendChoice(1, "Benchmark Battle")
+        results["resolveRound"] = _measure(
+            titans.attackOrDefendChoice, 1, "Benchmark Battle", sender=player2
+        )
+
+    return [
+        {
+            "players": players,
+            "battles": battles,
+            "entry_point": name,
+            "gas": gas,
+            "seconds": seconds,
+            "seed_seconds": seed_seconds,
+        }
+        for name, (gas, seconds) in results.items()
+    ]
+
+
+def run(player_sizes: list[int] = PLAYER_SIZES) -> list[dict]:
+    rows = []
+    for players in player_sizes:
+        battles = min(players * BATTLES_PER_PLAYER, MAX_BATTLES)
+        rows += benchmark_size(players, battles)
+    return rows
+
+
+def write_csv(rows: list[dict], path: Path = OUT_DIR / "state_benchmark.csv"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def plot(rows: list[dict], path: Path = OUT_DIR / "state_benchmark.png") -> bool:
+    """
+    Plot gas and latency per entry point against the number of players.
+    @return: False if matplotlib is not installed
+    """
+    try:
+        import matplotlib
+
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        return False
+
+    fig, (gas_ax, time_ax) = plt.subplots(1, 2, figsize=(12, 5))
+    for name in ENTRY_POINTS:
+        points = [row for row in rows if row["entry_point"] == name]
+        sizes = [row["players"] for row in points]
+        gas_ax.plot(sizes, [row["gas"] for row in points], marker="o", label=name)
+        time_ax.plot(sizes, [row["seconds"] * 1000 for row in points], marker="o", label=name)
+
+    gas_ax.set(title="Gas used", xlabel="Players (battles = 4x)", ylabel="gas", yscale="log")
+    time_ax.set(title="Local execution time", xlabel="Players (battles = 4x)", ylabel="ms", yscale="log")
+    gas_ax.legend()
+    fig.tight_layout()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(path)
+    return True
+
+
+def moccasin_main():
+    rows = run()
+    write_csv(rows)
+    for row in rows:
+        print(
+            f"{row['players']:>6} players {row['battles']:>6} battles  "
+            f"{row['entry_point']:<14} {row['gas']:>12,} gas  {row['seconds'] * 1000:>9.1f} ms"
+        )
+    if not plot(rows):
+        print("Install matplotlib to plot the results")
@@ -1,5 +1,33 @@
 import pytest
-from script.deploy import deploy_zktitans
+from script.deploy import deploy_move_forwarder, deploy_zktitans
+from script.gas_profile import GasProfile, GasProfiler
+
+# Merged call-tree profile of the whole run, when --gas-call-tree is given
+_session_profile = GasProfile()
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--gas-call-tree",
+        metavar="PATH",
+        help="Write a collapsed-stack gas profile of every test to PATH",
+    )
+
+
+def pytest_sessionfinish(session):
+    path = session.config.getoption("--gas-call-tree")
+    if path and _session_profile.stacks:
+        _session_profile.save(path)
+
+
+@pytest.fixture(autouse=True)
+def gas_call_tree(request):
+    if not request.config.getoption("--gas-call-tree"):
+        yield
+        return
+    with GasProfiler() as profiler:
+        yield
+    _session_profile.merge(profiler.profile)
 
 
 @pytest.fixture(scope="session")
@@ -10,3 +38,8 @@ def metadata_uri():
 @pytest.fixture(scope="function")
 def titans(metadata_uri):
     return deploy_zktitans(metadata_uri)
+
+
+@pytest.fixture(scope="function")
+def forwarder(titans):
+    return deploy_move_forwarder(titans)
@@ -0,0 +1,93 @@
+import boa
+import pytest
+from eth_utils import keccak
+
+from script.battle_id_benchmark import FIRST_MOVE, RESOLVING_MOVE, calldata_gas, run
+from script.cache import decode_boa_logs
+
+BATTLE_NAME = "Id Battle"
+
+
+@pytest.fixture
+def players(titans):
+    player1 = boa.env.generate_address("player1")
+    player2 = boa.env.generate_address("player2")
+    with boa.env.prank(player1):
+        titans.registerPlayer("Player One", "Token One")
+        titans.createBattle(BATTLE_NAME)
+    with boa.env.prank(player2):
+        titans.registerPlayer("Player Two", "Token Two")
+    return player1, player2
+
+
+def test_id_entry_points_play_a_battle(titans, players):
+    player1, player2 = players
+    battle_id = titans.battleInfo(BATTLE_NAME)
+    assert battle_id == 1
+
+    with boa.env.prank(player2):
+        battle = titans.joinBattleById(battle_id)
+    assert battle[0] == 2
+    assert titans.getBattle(BATTLE_NAME) == titans.battles(battle_id - 1)
+
+    with boa.env.prank(player1):
+        titans.attackOrDefendChoiceById(1, battle_id)
+    assert titans.getBattleMovesById(battle_id) == titans.getBattleMoves(BATTLE_NAME) == (1, 0)
+
+    # The move is logged under the battle name, as for name addressed moves
+    with boa.env.prank(player2):
+        titans.attackOrDefendChoiceById(2, battle_id)
+    moves = [args for event, args in decode_boa_logs(titans) if event == "BattleMove"]
+    assert moves == [{"battleName": keccak(text=BATTLE_NAME), "isFirstMove": False}]
+    assert titans.getBattleMovesById(battle_id) == (0, 0)
+
+    with boa.env.prank(player1):
+        assert titans.checkBattleResolutionById(battle_id) == titans.getBattle(BATTLE_NAME)
+        titans.quitBattleById(battle_id)
+    battle = titans.getBattle(BATTLE_NAME)
+    assert battle[0] == 4
+    assert battle[5] == player2
+
+
+def test_id_entry_points_reject_unknown_battles(titans, players):
+    player1, player2 = players
+    missing = len(titans.getAllBattles()) + 1
+    for battle_id in (0, missing):
+        with boa.env.prank(player2), boa.reverts("No battle found"):
+            titans.joinBattleById(battle_id)
+        with boa.env.prank(player1), boa.reverts("Battle doesn't exist!"):
+            titans.attackOrDefendChoiceById(1, battle_id)
+        with boa.env.prank(player1), boa.reverts("Battle doesn't exist!"):
+            titans.quitBattleById(battle_id)
+        with boa.reverts("Battle doesn't exist!"):
+            titans.getBattleMovesById(battle_id)
+        with boa.reverts("Battle doesn't exist!"):
+            titans.checkBattleResolutionById(battle_id)
+
+    unregistered = boa.env.generate_address("unregistered")
+    with boa.env.prank(unregistered), boa.reverts("Player not registered"):
+        titans.joinBattleById(1)
+
+
+def test_calldata_gas():
+    assert calldata_gas(bytes([0, 0, 1, 255])) == 4 + 4 + 16 + 16
+
+
+def test_benchmark_ids_save_calldata_and_gas():
+    rows = run([8, 100])
+    assert {row["entry_point"] for row in rows} == {
+        "joinBattle",
+        FIRST_MOVE,
+        RESOLVING_MOVE,
+        "checkBattleResolution",
+        "quitBattle",
+    }
+    for row in rows:
+        # selector, plus one word per argument
+        assert row["id_calldata_bytes"] in (4 + 32, 4 + 64)
+        assert row["name_calldata_bytes"] > row["id_calldata_bytes"]
+        assert row["gas_saved"] > 0
+
+    long_moves = [row for row in rows if row["entry_point"] == FIRST_MOVE and row["name_length"] == 100]
+    short_moves = [row for row in rows if row["entry_point"] == FIRST_MOVE and row["name_length"] == 8]
+    assert long_moves[0]["gas_saved"] > short_moves[0]["gas_saved"]
@@ -0,0 +1,109 @@
+import boa
+import eth_abi
+import pytest
+
+from script.bindings import (
+    Battle,
+    BattleStatus,
+    GameToken,
+    Player,
+    battles_to_array,
+    call_raw,
+    decode_battle,
+    decode_battles,
+    decode_game_token,
+    decode_game_tokens,
+    decode_player,
+    decode_players,
+)
+from script.decode_benchmark import benchmark, make_battles_payload
+
+
+@pytest.fixture
+def played_titans(titans):
+    """zkTitans with two players, one started battle with a move and one pending battle.
+    Returns the contract and the first player's address."""
+    player1 = boa.env.generate_address("player1")
+    player2 = boa.env.generate_address("player2")
+
+    with boa.env.prank(player1):
+        titans.registerPlayer("Player One", "Token One")
+        titans.createBattle("Started Battle")
+    with boa.env.prank(player2):
+        titans.registerPlayer("Player Two", "Token Two")
+        titans.joinBattle("Started Battle")
+        titans.createBattle("Pending Battle")
+    with boa.env.prank(player1):
+        titans.attackOrDefendChoice(2, "Started Battle")
+    return titans, player1
+
+
+@pytest.mark.parametrize(
+    "binding, function_name",
+    [(Player, "getPlayer"), (GameToken, "getPlayerToken"), (Battle, "getBattle")],
+)
+def test_bindings_match_compiled_abi(titans, binding, function_name):
+    abi = next(item for item in titans.abi if item.get("name") == function_name)
+    components = abi["outputs"][0]["components"]
+
+    assert binding.FIELDS == tuple(component["name"] for component in components)
+    assert binding.ABI_TYPES == tuple(component["type"] for component in components)
+
+
+def test_decode_single_structs(played_titans):
+    titans, player1 = played_titans
+
+    player = decode_player(call_raw(titans, "getPlayer", player1))
+    assert player == titans.getPlayer(player1)
+    assert player.playerName == "Player One" and player.inBattle
+
+    token = decode_game_token(call_raw(titans, "getPlayerToken", player1))
+    assert token == titans.getPlayerToken(player1)
+    assert token.attackStrength + token.defenseStrength == 10
+
+    battle = decode_battle(call_raw(titans, "getBattle", "Started Battle"))
+    assert battle == Battle.from_tuple(titans.getBattle("Started Battle"))
+    assert battle.battleStatus is BattleStatus.STARTED
+    assert battle.moves == (2, 0)
+
+
+def test_decode_bulk_results(played_titans):
+    titans, _ = played_titans
+    players = decode_players(call_raw(titans, "getAllPlayers"))
+    assert players == [Player.from_tuple(p) for p in titans.getAllPlayers()]
+
+    tokens = decode_game_tokens(call_raw(titans, "getAllPlayerTokens"))
+    assert tokens == [GameToken.from_tuple(t) for t in titans.getAllPlayerTokens()]
+
+    battles = decode_battles(call_raw(titans, "getAllBattles"))
+    assert battles == [Battle.from_tuple(b) for b in titans.getAllBattles()]
+    print(f"Decoded {len(players)} players, {len(tokens)} tokens, {len(battles)} battles")
+
+
+def test_battles_to_array_matches_generic_decoder():
+    payload = make_battles_payload(200)
+    expected = eth_abi.decode([f"{Battle.abi_type()}[]"], payload)[0]
+
+    table = battles_to_array(payload)
+    assert len(table) == len(expected)
+    for row, battle in zip(table, expected):
+        status, battle_hash, name, players, moves, winner = battle
+        assert row["battleStatus"] == status
+        assert row["battleHash"].tobytes() == battle_hash
+        assert row["name"] == name
+        assert [p.tobytes() for p in row["players"]] == [bytes.fromhex(p[2:]) for p in players]
+        assert list(row["moves"]) == list(moves)
+        assert row["winner"].tobytes() == bytes.fromhex(winner[2:])
+
+    # eth_abi returns lowercase addresses, the bindings checksum them like boa does
+    decoded = decode_battles(payload)
+    assert [b.name for b in decoded] == [b[2] for b in expected]
+    assert [[p.lower() for p in b.players] for b in decoded] == [list(b[3]) for b in expected]
+    assert [b.winner.lower() for b in decoded] == [b[5] for b in expected]
+    assert len(battles_to_array(make_battles_payload(0))) == 0
+
+
+def test_decode_benchmark_runs():
+    results = benchmark(count=500, repeat=1)
+    assert set(results) == {"eth_abi", "decode_battles", "battles_to_array"}
+    assert all(rate > 0 for rate in results.values())
@@ -0,0 +1,192 @@
+import boa
+import pytest
+
+from script.cache import ZERO_ADDRESS, CachedTitans, decode_boa_logs
+
+BATTLE_STATUS_ENDED = 4
+
+
+@pytest.fixture
+def battle(titans):
+    """Two registered players in a started battle named "Cached Battle\""""
+    player1 = boa.env.generate_address("player1")
+    player2 = boa.env.generate_address("player2")
+
+    with boa.env.prank(player1):
+        titans.registerPlayer("Player One", "Token One")
+        titans.createBattle("Cached Battle")
+    with boa.env.prank(player2):
+        titans.registerPlayer("Player Two", "Token Two")
+        titans.joinBattle("Cached Battle")
+    return player1, player2
+
+
+def transact(cache, titans, sender, function, *args):
+    """Send a transaction and feed its logs to the cache, as a log subscriber would"""
+    with boa.env.prank(sender):
+        getattr(titans, function)(*args)
+    cache.process_logs(decode_boa_logs(titans))
+
+
+def assert_fresh(cache, titans, players, battle_name):
+    """Every cached read must match a direct contract read"""
+    for player in players:
+        assert cache.getPlayer(player) == titans.getPlayer(player)
+        assert cache.getPlayerToken(player) == titans.getPlayerToken(player)
+        assert cache.isPlayer(player) == titans.isPlayer(player)
+    assert cache.getBattle(battle_name) == titans.getBattle(battle_name)
+    assert cache.isBattle(battle_name) == titans.isBattle(battle_name)
+
+
+def test_cache_serves_repeated_reads(titans, battle):
+    player1, _ = battle
+    cache = CachedTitans(titans)
+
+    for _ in range(10):
+        assert cache.getPlayer(player1)[1] == "Player One"
+        assert cache.getBattle("Cached Battle")[2] == "Cached Battle"
+        assert not cache.isBattle("Unknown Battle")
+
+    metrics = cache.metrics()
+    print(f"Cache metrics: {metrics}")
+    assert metrics["misses"] == 3 and metrics["hits"] == 27
+    assert metrics["hit_rate"] == pytest.approx(0.9)
+
+
+def test_cache_never_stale_after_round(titans, battle):
+    player1, player2 = battle
+    cache = CachedTitans(titans)
+    assert_fresh(cache, titans, battle, "Cached Battle")
+
+    # First move changes only the battle
+    transact(cache, titans, player1, "attackOrDefendChoice", 1, "Cached Battle")
+    assert cache.getBattle("Cached Battle")[4] == [1, 0]
+    assert_fresh(cache, titans, battle, "Cached Battle")
+
+    # Resolving the round changes health, mana and token stats of both players
+    hits = cache.stats["hits"]
+    transact(cache, titans, player2, "attackOrDefendChoice", 2, "Cached Battle")
+    assert_fresh(cache, titans, battle, "Cached Battle")
+    assert cache.stats["hits"] == hits + 3, "Only isPlayer and isBattle results survive the round"
+
+    # Quitting ends the battle and frees both players
+    transact(cache, titans, player1, "quitBattle", "Cached Battle")
+    assert cache.getBattle("Cached Battle")[0] == BATTLE_STATUS_ENDED
+    assert_fresh(cache, titans, battle, "Cached Battle")
+
+
+def test_cache_invalidates_new_players_and_battles(titans, battle):
+    cache = CachedTitans(titans)
+    newcomer = boa.env.generate_address("newcomer")
+
+    assert not cache.isPlayer(newcomer)
+    assert not cache.isBattle("New Battle")
+
+    transact(cache, titans, newcomer, "registerPlayer", "Newcomer", "Token")
+    transact(cache, titans, newcomer, "createBattle", "New Battle")
+
+    assert cache.isPlayer(newcomer)
+    assert cache.isBattle("New Battle")
+    assert_fresh(cache, titans, [newcomer], "New Battle")
+
+
+def test_cache_drops_everything_for_unknown_round(titans, battle):
+    player1, player2 = battle
+    cache = CachedTitans(titans)
+    cache.getPlayer(player1)
+    cache.getPlayerToken(player2)
+
+    # The battle of these players was never seen, so the other player is unknown
+    stranger = boa.env.generate_address("stranger")
+    cache.process_logs([("RoundEnded", {"damagedPlayers": [stranger, stranger]})])
+    assert cache.metrics()["entries"] == 0
+
+
+def test_cache_frees_players_of_unseen_battle_ended_without_winner(titans, battle):
+    player1, player2 = battle
+    cache = CachedTitans(titans)
+    assert cache.getPlayer(player1)[4] and cache.getPlayer(player2)[4], "Both players are in battle"
+
+    # Neither player moves, so the keeper ends the battle without a winner
+    boa.env.time_travel(seconds=titans.MOVE_TIMEOUT())
+    titans.resolveBattles([titans.battleInfo("Cached Battle")])
+    logs = decode_boa_logs(titans)
+    assert logs == [("BattleEnded", {"battleName": "Cached Battle", "winner": ZERO_ADDRESS, "loser": ZERO_ADDRESS})]
+
+    cache.process_logs(logs)
+    assert not cache.getPlayer(player1)[4] and not cache.getPlayer(player2)[4]
+    assert_fresh(cache, titans, battle, "Cached Battle")
+
+
+def test_cache_fetches_unseen_battle_players_outside_the_lock(titans, battle):
+    player1, player2 = battle
+    cache = CachedTitans(titans)
+    cache.getPlayer(player1)
+
+    class LockCheckingTitans:
+        def getBattle(self, name):
+            assert not cache._lock.locked(), "Contract read with the cache lock held"
+            return titans.getBattle(name)
+
+    cache.titans = LockCheckingTitans()
+    cache.process_logs([("BattleEnded", {"battleName": "Cached Battle", "winner": ZERO_ADDRESS, "loser": ZERO_ADDRESS})])
+    assert cache.metrics()["entries"] == 0, "player1 was in the battle"
+
+
+def test_cache_keys_reads_by_block(titans, battle):
+    player1, _ = battle
+    history = {}
+
+    class HistoricTitans:
+        """Serves getPlayer at any block, as script.client.Client does over RPC"""
+
+        def __init__(self):
+            self.calls = []
+
+        def getPlayer(self, addr):
+            return titans.getPlayer(addr)
+
+        def call(self, name, addr, block):
+            self.calls.append((name, addr, block))
+            return history[block]
+
+    history["0x5"] = titans.getPlayer(player1)
+    transact(CachedTitans(titans), titans, player1, "quitBattle", "Cached Battle")
+    history["0x6"] = titans.getPlayer(player1)
+    assert history["0x5"] != history["0x6"]
+    cache = CachedTitans(HistoricTitans())
+
+    assert cache.getPlayer(player1, block=5) == history["0x5"]
+    assert cache.getPlayer(player1, block=6) == history["0x6"]
+    assert cache.getPlayer(player1, block=5) == history["0x5"]
+    assert cache.titans.calls == [("getPlayer", player1, "0x5"), ("getPlayer", player1, "0x6")]
+
+    # Events only invalidate the latest state; a past block's state cannot change
+    cache.getPlayer(player1)
+    cache.process_logs([("NewPlayer", {"owner": player1})])
+    assert cache.metrics()["entries"] == 2
+    hits = cache.stats["hits"]
+    cache.getPlayer(player1, block=5)
+    assert cache.stats["hits"] == hits + 1
+
+
+def test_cache_evicts_least_recently_used(titans, battle):
+    player1, player2 = battle
+    cache = CachedTitans(titans, max_entries=2)
+
+    cache.getPlayer(player1)
+    cache.getPlayer(player2)
+    cache.getPlayer(player1)
+    cache.getBattle("Cached Battle")
+
+    assert cache.stats["evictions"] == 1
+    hits = cache.stats["hits"]
+    cache.getPlayer(player1)
+    assert cache.stats["hits"] == hits + 1, "The recently used entry was kept"
+
+
+def test_cache_does_not_cache_reverts(titans):
+    cache = CachedTitans(titans)
+    with boa.reverts("Battle doesn't exist!"):
+        cache.getBattle("Missing Battle")
+    assert cache.metrics()["entries"] == 0
@@ -0,0 +1,65 @@
+import json
+
+import boa
+import pytest
+
+from script.cards import ASSETS_DIR, CARDS, THUMBNAIL_SIZE, build, build_metadata
+
+
+def test_cards_match_contract_constants(titans):
+    assert len(CARDS) == titans.MAX_CARD_TYPES()
+    for card in CARDS:
+        assert getattr(titans, card.constant)() == card.id
+        assert (ASSETS_DIR / card.image).exists()
+
+
+def test_uri_builds_metadata_url(titans):
+    base_uri = titans.BASE_URI()
+    assert titans.uri(0) == f"{base_uri}0.json"
+    assert titans.uri(29) == f"{base_uri}29.json"
+
+    with boa.env.prank(titans.owner()):
+        titans.setURI("https://cards.example/metadata/")
+    assert titans.uri(7) == "https://cards.example/metadata/7.json"
+
+
+def test_uri_fits_interface_bound(titans):
+    base_uri = "x" * titans.MAX_BASE_URI_LENGTH()
+    with boa.env.prank(titans.owner()):
+        titans.setURI(base_uri)
+
+    token_uri = titans.uri(2**256 - 1)
+    assert token_uri == f"{base_uri}{2**256 - 1}.json"
+    assert len(token_uri) == 512
+
+
+def test_build_metadata(tmp_path):
+    written = build_metadata(tmp_path, "https://cards.example/")
+    assert [path.name for path in written] == [f"{card.id}.json" for card in CARDS]
+
+    metadata = json.loads((tmp_path / "metadata" / "27.json").read_text())
+    assert metadata["name"] == "Uka Uka"
+    assert metadata["image"] == "https://cards.example/Uka_Uka-Villain.png"
+    assert metadata["attributes"] == [{"trait_type": "Class", "value": "Villain"}]
+
+
+def test_build_images_and_atlas(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    manifest = build(out_dir=tmp_path, image_base_uri="https://cards.example/")
+
+    source_bytes = sum((ASSETS_DIR / card.image).stat().st_size for card in CARDS)
+    image_paths = [tmp_path / name for name in manifest["images"].values()]
+    assert len(set(image_paths)) == len(CARDS)
+    assert sum(path.stat().st_size for path in image_paths) < source_bytes / 5
+
+    metadata = json.loads((tmp_path / "metadata" / "3.json").read_text())
+    assert metadata["image"] == "https://cards.example/" + manifest["images"]["3"]
+
+    with Image.open(tmp_path / manifest["atlas"]["image"]) as atlas:
+        assert atlas.format == "WEBP"
+        for x, y, width, height in manifest["atlas"]["frames"].values():
+            assert 0 < width <= THUMBNAIL_SIZE[0] and 0 < height <= THUMBNAIL_SIZE[1]
+            assert x + width <= atlas.width and y + height <= atlas.height
+
+    # Unchanged art gets the same content-hashed names
+    assert build(out_dir=tmp_path, image_base_uri="https://cards.example/") == manifest
@@ -0,0 +1,324 @@
+import os
+import threading
+
+import boa
+import pytest
+from eth_account import Account
+
+from script.channel import ChannelClient, ChannelServer, ChannelState, ChannelTimeout, commitment, next_state, sign_state
+from script.rules import ATTACK, DEFEND, STARTING_HEALTH, STARTING_MANA, PlayerState, can_attack
+
+BATTLE_NAME = "Channel Battle"
+
+
+@pytest.fixture
+def chain_id():
+    return boa.env.evm.chain.chain_id
+
+
+@pytest.fixture
+def battle(titans, forwarder):
+    """Two registered players in a started battle, with their signing keys"""
+    player1 = Account.create()
+    player2 = Account.create()
+    with boa.env.prank(player1.address):
+        titans.registerPlayer("Player One", "Token One")
+        titans.createBattle(BATTLE_NAME)
+    with boa.env.prank(player2.address):
+        titans.registerPlayer("Player Two", "Token Two")
+        titans.joinBattle(BATTLE_NAME)
+    return titans.battleInfo(BATTLE_NAME), player1, player2
+
+
+@pytest.fixture
+def server():
+    server = ChannelServer(port=0)
+    server.start()
+    yield server
+    server.shutdown()
+
+
+def opening_state(titans, battle_id, *accounts) -> ChannelState:
+    states = [
+        PlayerState(titans.getPlayer(account.address)[3], titans.getPlayer(account.address)[2], titans.getPlayerToken(account.address)[2])
+        for account in accounts
+    ]
+    return ChannelState.open(battle_id, *states)
+
+
+def signed_state(forwarder, chain_id, state, *accounts):
+    return tuple(state), tuple(sign_state(account.key, forwarder.address, chain_id, state) for account in accounts)
+
+
+def open_channel(titans, forwarder, chain_id, battle_id, player1, player2) -> ChannelState:
+    state = opening_state(titans, battle_id, player1, player2)
+    forwarder.openChannel(*signed_state(forwarder, chain_id, state, player1, player2))
+    return state
+
+
+def open_clients(forwarder, chain_id, server, state, accounts, timeouts=(5, 5)) -> list[ChannelClient]:
+    """Clients of both players that signed the opening state together and opened the channel"""
+    players = tuple(account.address for account in accounts)
+    clients = [
+        ChannelClient(account, forwarder.address, chain_id, players, state, server.url, timeout=timeout)
+        for account, timeout in zip(accounts, timeouts)
+    ]
+    play_together(clients, lambda client: client.open())
+    forwarder.openChannel(*clients[0].settlement())
+    return clients
+
+
+def play_together(clients, play):
+    threads = [threading.Thread(target=play, args=(client,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=60)
+
+
+def on_chain_stats(titans, account) -> tuple[int, int, int]:
+    player = titans.getPlayer(account.address)
+    return player[3], player[2], titans.getPlayerToken(account.address)[2]
+
+
+def test_battle_played_off_chain_settles_in_one_transaction(titans, forwarder, battle, server, chain_id):
+    battle_id, player1, player2 = battle
+    state = opening_state(titans, battle_id, player1, player2)
+    assert (state.health1, state.mana1) == (STARTING_HEALTH, STARTING_MANA)
+
+    players = (player1.address, player2.address)
+    clients = open_clients(forwarder, chain_id, server, state, (player1, player2))
+    assert titans.channelOpen(battle_id)
+
+    def play(client):
+        while not client.state.winner:
+            me = client.state.players()[client.index]
+            client.play_round(ATTACK if can_attack(me) else DEFEND)
+
+    play_together(clients, play)
+
+    assert clients[0].state == clients[1].state
+    final = clients[0].state
+    assert final.winner in (1, 2) and final.round >= 1
+    # Three messages per player per round and the opening signatures, no transactions
+    assert len(server.messages(battle_id)) == 6 * final.round + 2
+
+    forwarder.settleChannel(*clients[1].settlement())
+
+    winner = players[final.winner - 1]
+    battle_status, *_, battle_winner = titans.battles(battle_id - 1)
+    assert battle_status == 4
+    assert battle_winner == winner
+    assert not titans.getPlayer(player1.address)[4] and not titans.getPlayer(player2.address)[4]
+    # The off-chain rounds' health and mana are kept on zkTitans
+    assert on_chain_stats(titans, player1)[:2] == (final.health1, final.mana1)
+    assert on_chain_stats(titans, player2)[:2] == (final.health2, final.mana2)
+    assert not titans.channelOpen(battle_id) and forwarder.closedChannels(battle_id)
+
+    # A settled battle cannot be settled again
+    with boa.reverts("Battle not started"):
+        forwarder.settleChannel(*clients[0].settlement())
+
+
+def test_settlement_needs_a_final_state_signed_by_both(titans, forwarder, battle, chain_id):
+    battle_id, player1, player2 = battle
+    state = next_state(opening_state(titans, battle_id, player1, player2), DEFEND, DEFEND, b"seed")
+    outsider = Account.create()
+    final = state._replace(round=2, health2=0, winner=1)
+
+    with boa.reverts("Channel not open"):
+        forwarder.settleChannel(*signed_state(forwarder, chain_id, final, player1, player2))
+    open_channel(titans, forwarder, chain_id, battle_id, player1, player2)
+
+    with boa.reverts("Battle not over"):
+        forwarder.settleChannel(*signed_state(forwarder, chain_id, state, player1, player2))
+
+    with boa.reverts("Invalid signature"):
+        forwarder.settleChannel(*signed_state(forwarder, chain_id, final, player1, outsider))
+    with boa.reverts("Invalid signature"):
+        forwarder.settleChannel(*signed_state(forwarder, chain_id, final, player2, player1))
+    with boa.reverts("Loser has health left"):
+        forwarder.settleChannel(*signed_state(forwarder, chain_id, final._replace(health2=1), player1, player2))
+    # Signed stats cannot go beyond what the rules allow
+    with boa.reverts("Invalid channel state"):
+        forwarder.settleChannel(*signed_state(forwarder, chain_id, final._replace(health1=STARTING_HEALTH + 1), player1, player2))
+
+    forwarder.settleChannel(*signed_state(forwarder, chain_id, final, player1, player2))
+    assert titans.battles(battle_id - 1)[-1] == player1.address
+
+
+def test_dispute_lets_the_waiting_player_win(titans, forwarder, battle, server, chain_id):
+    battle_id, player1, player2 = battle
+    state = opening_state(titans, battle_id, player1, player2)
+    client1, client2 = open_clients(forwarder, chain_id, server, state, (player1, player2))
+    client1.timeout = 0.2
+
+    # One round together, then player2 disappears
+    play_together([client1, client2], lambda client: client.play_round(DEFEND))
+    with pytest.raises(ChannelTimeout):
+        client1.play_round(ATTACK)
+
+    with boa.env.prank(player1.address):
+        forwarder.disputeChannel(*client1.settlement())
+    assert forwarder.channelDisputes(battle_id)[:2] == (1, player1.address)
+    with boa.env.prank(player1.address), boa.reverts("Dispute open"):
+        forwarder.disputeChannel(*client1.settlement())
+
+    with boa.reverts("Dispute still open"):
+        forwarder.claimChannelTimeout(battle_id)
+    boa.env.time_travel(seconds=forwarder.CHANNEL_CHALLENGE_PERIOD() + 1)
+    with boa.env.prank(player2.address), boa.reverts("Dispute expired"):
+        forwarder.answerChannelDisputeWithMove(client1.state, DEFEND)
+
+    # No on-chain move for longer than MOVE_TIMEOUT, but keepers leave the open channel alone
+    assert titans.MOVE_TIMEOUT() <= forwarder.CHANNEL_CHALLENGE_PERIOD()
+    assert titans.resolveBattles([battle_id]) == 0
+    assert titans.battles(battle_id - 1)[0] == 2
+
+    forwarder.claimChannelTimeout(battle_id)
+    assert titans.battles(battle_id - 1)[-1] == player1.address
+    assert forwarder.channelDisputes(battle_id)[1] == "0x" + "00" * 20
+
+
+def test_dispute_is_answered_with_a_newer_state(titans, forwarder, battle, chain_id):
+    battle_id, player1, player2 = battle
+    first = next_state(opening_state(titans, battle_id, player1, player2), DEFEND, DEFEND, b"seed")
+    second = next_state(first, DEFEND, DEFEND, b"seed")
+
+    with boa.env.prank(player2.address), boa.reverts("Channel not open"):
+        forwarder.disputeChannel(*signed_state(forwarder, chain_id, first, player1, player2))
+    open_channel(titans, forwarder, chain_id, battle_id, player1, player2)
+
+    with boa.env.prank(boa.env.generate_address("channel outsider")), boa.reverts("Not in battle"):
+        forwarder.disputeChannel(*signed_state(forwarder, chain_id, first, player1, player2))
+    with boa.env.prank(player2.address):
+        forwarder.disputeChannel(*signed_state(forwarder, chain_id, first, player1, player2))
+    assert forwarder.channelDisputes(battle_id)[3] == forwarder.hashChannelState(first)
+
+    # Showing up is not enough, the answer has to move the channel on
+    with boa.reverts("State not newer"):
+        forwarder.answerChannelDispute(*signed_state(forwarder, chain_id, first, player1, player2))
+    with boa.reverts("Invalid signature"):
+        forwarder.answerChannelDispute(*signed_state(forwarder, chain_id, second, player1, player1))
+
+    with boa.env.prank(player1.address):
+        forwarder.answerChannelDispute(*signed_state(forwarder, chain_id, second, player1, player2))
+    assert forwarder.channelDisputes(battle_id) == (2, "0x" + "00" * 20, 0, b"\x00" * 32)
+    with boa.reverts("No dispute"):
+        forwarder.claimChannelTimeout(battle_id)
+
+    # The older state cannot be disputed again, the answering one can
+    with boa.env.prank(player2.address), boa.reverts("Stale state"):
+        forwarder.disputeChannel(*signed_state(forwarder, chain_id, first, player1, player2))
+    with boa.env.prank(player2.address):
+        forwarder.disputeChannel(*signed_state(forwarder, chain_id, second, player1, player2))
+    assert forwarder.channelDisputes(battle_id)[:2] == (2, player2.address)
+
+
+def test_dispute_is_answered_with_an_on_chain_move(titans, forwarder, battle, chain_id):
+    battle_id, player1, player2 = battle
+    opening = open_channel(titans, forwarder, chain_id, battle_id, player1, player2)
+    state = next_state(opening, ATTACK, ATTACK, b"seed")
+    settlement = signed_state(forwarder, chain_id, state, player1, player2)
+
+    with boa.env.prank(player2.address):
+        forwarder.disputeChannel(*settlement)
+    with boa.env.prank(player2.address), boa.reverts("Not the other player"):
+        forwarder.answerChannelDisputeWithMove(state, DEFEND)
+    # The answer continues from the disputed state, not from an older one
+    with boa.env.prank(player1.address), boa.reverts("Not the disputed state"):
+        forwarder.answerChannelDisputeWithMove(opening, DEFEND)
+
+    with boa.env.prank(player1.address):
+        forwarder.answerChannelDisputeWithMove(state, DEFEND)
+    assert titans.battles(battle_id - 1)[4] == [DEFEND, 0], "The move landed on zkTitans"
+    assert not titans.channelOpen(battle_id) and forwarder.closedChannels(battle_id)
+    with boa.reverts("No dispute"):
+        forwarder.claimChannelTimeout(battle_id)
+
+    # The fight is not reset: zkTitans holds the disputed state's stats
+    assert on_chain_stats(titans, player1) == (state.health1, state.mana1, state.attack1)
+    assert on_chain_stats(titans, player2) == (state.health2, state.mana2, state.attack2)
+    assert state.mana1 < STARTING_MANA and state.mana2 < STARTING_MANA
+
+    # The battle is played on-chain from here, the channel cannot be disputed or opened again
+    with boa.env.prank(player2.address), boa.reverts("Channel not open"):
+        forwarder.disputeChannel(*settlement)
+    with boa.reverts("Channel closed"):
+        forwarder.openChannel(*signed_state(forwarder, chain_id, opening, player1, player2))
+    with boa.env.prank(player2.address):
+        titans.attackOrDefendChoiceById(DEFEND, battle_id)
+    assert titans.battles(battle_id - 1)[4] == [0, 0], "Round resolved"
+
+
+def test_withheld_signature_continues_from_the_last_signed_state(titans, forwarder, battle, server, chain_id):
+    battle_id, player1, player2 = battle
+    state = opening_state(titans, battle_id, player1, player2)
+    client1, client2 = open_clients(forwarder, chain_id, server, state, (player1, player2))
+    play_together([client1, client2], lambda client: client.play_round(ATTACK))
+    signed = client1.state
+
+    # Player2 plays the next round up to the signatures, then withholds theirs
+    def withhold_signature(move):
+        salt = os.urandom(32)
+        round_number = client2.state.round + 1
+        client2._post("commit", round_number, commitment=commitment(move, salt).hex())
+        client2._receive("commit", round_number)
+        client2._post("reveal", round_number, move=move, salt=salt.hex())
+        client2._receive("reveal", round_number)
+
+    thread = threading.Thread(target=withhold_signature, args=(DEFEND,))
+    thread.start()
+    client1.timeout = 0.5
+    with pytest.raises(ChannelTimeout):
+        client1.play_round(ATTACK)
+    thread.join()
+    assert client1.state == signed
+
+    # Player2 disputes the last signed state hoping to restart from zkTitans' stats; player1 answers
+    # on-chain and the battle goes on from the signed state
+    with boa.env.prank(player2.address):
+        forwarder.disputeChannel(*client1.settlement())
+    with boa.env.prank(player1.address):
+        forwarder.answerChannelDisputeWithMove(signed, DEFEND)
+
+    assert on_chain_stats(titans, player1) == (signed.health1, signed.mana1, signed.attack1)
+    assert on_chain_stats(titans, player2) == (signed.health2, signed.mana2, signed.attack2)
+    assert (signed.mana1, signed.mana2) == (STARTING_MANA - 3, STARTING_MANA - 3)
+
+
+def test_open_channel_blocks_direct_moves_and_timeouts(titans, forwarder, battle, chain_id):
+    battle_id, player1, player2 = battle
+    opening = opening_state(titans, battle_id, player1, player2)
+
+    with boa.reverts("Not an opening state"):
+        forwarder.openChannel(*signed_state(forwarder, chain_id, next_state(opening, DEFEND, DEFEND, b"seed"), player1, player2))
+    with boa.reverts("Invalid signature"):
+        forwarder.openChannel(*signed_state(forwarder, chain_id, opening, player1, player1))
+    with boa.env.prank(player1.address), boa.reverts("Not the trusted forwarder"):
+        titans.openChannel(battle_id)
+
+    # A round already started on-chain has to be finished first
+    with boa.env.prank(player1.address):
+        titans.attackOrDefendChoiceById(DEFEND, battle_id)
+    with boa.reverts("Round in progress"):
+        forwarder.openChannel(*signed_state(forwarder, chain_id, opening, player1, player2))
+    with boa.env.prank(player2.address):
+        titans.attackOrDefendChoiceById(DEFEND, battle_id)
+
+    opening = open_channel(titans, forwarder, chain_id, battle_id, player1, player2)
+    with boa.reverts("Channel open"):
+        forwarder.openChannel(*signed_state(forwarder, chain_id, opening, player1, player2))
+
+    # Neither player can move around the channel, nor can a keeper time the battle out
+    with boa.env.prank(player1.address), boa.reverts("Channel open"):
+        titans.attackOrDefendChoiceById(ATTACK, battle_id)
+    with boa.env.prank(player2.address), boa.reverts("Channel open"):
+        titans.attackOrDefendChoice(ATTACK, BATTLE_NAME)
+    boa.env.time_travel(seconds=titans.MOVE_TIMEOUT())
+    assert titans.getResolvableBattles(0, 10) == ([], titans.battleInfo(BATTLE_NAME))
+    assert titans.resolveBattles([battle_id]) == 0
+    assert titans.battles(battle_id - 1)[0] == 2
+
+    with boa.env.prank(player1.address), boa.reverts("Not the trusted forwarder"):
+        titans.closeChannel(battle_id, [0, 0], [0, 0], [0, 0])
@@ -0,0 +1,93 @@
+import json
+
+import boa
+import pytest
+from vyper.compiler.output import build_abi_output
+
+from script.bindings import Battle, Player
+from script.client import ABI_DIR, CONTRACTS, Client
+from script.import_benchmark import MODULE_BUDGET, baseline_modules, cold_start, heavy_modules
+
+BATTLE_NAME = "Client Battle"
+
+
+class StandInRpc:
+    """Answers eth_call from the boa test environment"""
+
+    def call(self, method, params):
+        assert method == "eth_call"
+        call, block = params
+        assert block == "latest"
+        output = boa.env.raw_call(call["to"], data=bytes.fromhex(call["data"][2:])).output
+        return "0x" + bytes(output).hex()
+
+
+@pytest.fixture
+def battle(titans):
+    player1 = boa.env.generate_address("player1")
+    player2 = boa.env.generate_address("player2")
+    with boa.env.prank(player1):
+        titans.registerPlayer("Player One", "Token One")
+        titans.createBattle(BATTLE_NAME)
+    with boa.env.prank(player2):
+        titans.registerPlayer("Player Two", "Token Two")
+        titans.joinBattle(BATTLE_NAME)
+    with boa.env.prank(player1):
+        titans.attackOrDefendChoice(1, BATTLE_NAME)
+    return player1, player2
+
+
+@pytest.mark.parametrize("contract", CONTRACTS)
+def test_abi_files_match_contracts(contract):
+    # Regenerate with `mox run client` when this fails
+    compiled = build_abi_output(boa.load_partial(f"contracts/{contract}.vy").compiler_data)
+    assert json.loads((ABI_DIR / f"{contract}.json").read_text()) == compiled
+
+
+def test_calldata_matches_boa(titans):
+    client = Client(titans.address)
+    player = boa.env.generate_address("player")
+    calls = [
+        ("attackOrDefendChoiceById", 2, 7),
+        ("createBattle", "Some Battle Ñame"),
+        ("batchAttackOrDefendChoice", [1, 2, 1], ["One", "Two", "Three"]),
+        ("resolveBattles", [1, 2, 3]),
+        ("isPlayer", player),
+        ("getAllBattles",),
+        ("importPlayers", 1, [(player, "Imported", 10, 25, True)], [1], b"\x01" * 32),
+    ]
+    for name, *args in calls:
+        assert client.calldata(name, *args) == getattr(titans, name).prepare_calldata(*args), name
+
+    with pytest.raises(TypeError):
+        client.calldata("createBattle")
+    with pytest.raises(ValueError):
+        client.calldata("attackOrDefendChoiceById", 256, 1)
+    with pytest.raises(AttributeError):
+        client.calldata("noSuchFunction")
+
+
+def test_calls_decode_like_boa(titans, battle):
+    player1, player2 = battle
+    client = Client(titans.address, StandInRpc())
+
+    assert client.getBattle(BATTLE_NAME) == Battle.from_tuple(titans.getBattle(BATTLE_NAME))
+    assert client.getAllPlayers() == [Player.from_tuple(player) for player in titans.getAllPlayers()]
+    assert client.getBattleMoves(BATTLE_NAME) == (1, 0)
+    assert client.battleInfo(BATTLE_NAME) == 1
+    assert client.isPlayer(player1) is True
+    assert client.isBattle("Missing Battle") is False
+    assert client.owner() == titans.owner()
+    assert client.getResolvableBattles(0, 10) == ((), 1)
+    assert client.getPlayer(player2).playerName == "Player Two"
+
+    with pytest.raises(AttributeError, match="changes state"):
+        client.createBattle("Battle")
+    with pytest.raises(ValueError):
+        Client(titans.address).getBattle(BATTLE_NAME)
+
+
+def test_client_imports_stay_light():
+    _, modules = cold_start()
+    assert heavy_modules(modules) == []
+    assert len(set(modules) - set(baseline_modules())) <= MODULE_BUDGET
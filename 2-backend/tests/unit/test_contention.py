@@ -0,0 +1,44 @@
+import boa
+
+from script.contention import measure_contention
+from script.pubdata import StateDiffTracer
+from script.seed import StorageSeeder
+
+
+def written_slots(titans, function, *args) -> set[int]:
+    with StateDiffTracer() as tracer:
+        function(*args)
+    return {write.slot for write in tracer.writes if write.address.lower() == str(titans.address).lower()}
+
+
+def test_only_appends_are_shared():
+    """
+    Gameplay no longer contends, but entity creation still does: the players, gameTokens and battles
+    arrays hand out ids by appending, so every registration and new battle writes a shared length.
+    Removing that needs ids that do not come from a global counter and is not done yet.
+    """
+    rows = {row["entry_point"]: row for row in measure_contention()}
+
+    assert rows["registerPlayer"]["shared_variables"] == "gameTokens, players"
+    assert rows["createBattle"]["shared_variables"] == "battles"
+    # Re-rolls and gameplay touch only their own player's and battle's slots
+    for name in ("createRandomGameToken", "joinBattle", "attackOrDefendChoice (first move)", "attackOrDefendChoice (resolves round)", "quitBattle"):
+        assert rows[name]["shared_slots"] == 0, rows[name]
+
+
+def test_unrelated_registrations_share_only_array_lengths(titans):
+    """Two registrations write disjoint player and token slots; they only meet at the array lengths"""
+    slots = StorageSeeder(titans).slots
+    players = {name: boa.env.generate_address(name) for name in ("Alice", "Bob")}
+    written = []
+    for name, player in players.items():
+        with boa.env.prank(player):
+            written.append(written_slots(titans, titans.registerPlayer, name, "Token"))
+
+    assert written[0] & written[1] == {slots["players"], slots["gameTokens"]}
+
+    # New battles of different players meet only at the battles array length
+    for name, player in players.items():
+        with boa.env.prank(player):
+            written.append(written_slots(titans, titans.createBattle, f"{name}'s Battle"))
+    assert written[2] & written[3] == {slots["battles"]}
@@ -0,0 +1,116 @@
+import time
+
+import boa
+import pytest
+from eth_account import Account
+
+from script.gas_profile import GasProfile, GasProfiler, collapsed_diff, diff
+from script.relayer import move_to_struct, sign_move
+
+BATTLE_NAME = "Profiled Battle"
+
+
+@pytest.fixture
+def players(titans):
+    player1 = Account.create()
+    player2 = Account.create()
+    with boa.env.prank(player1.address):
+        titans.registerPlayer("Player One", "Token One")
+        titans.createBattle(BATTLE_NAME)
+    with boa.env.prank(player2.address):
+        titans.registerPlayer("Player Two", "Token Two")
+        titans.joinBattle(BATTLE_NAME)
+    return player1, player2
+
+
+def play_round(titans, players, choice=1):
+    for player in players:
+        with boa.env.prank(player.address):
+            titans.attackOrDefendChoice(choice, BATTLE_NAME)
+
+
+def test_profile_attributes_all_gas_to_internal_functions(titans, players):
+    gas_before = boa.env.get_gas_used()
+    with GasProfiler() as profiler:
+        play_round(titans, players)
+    gas_used = boa.env.get_gas_used() - gas_before
+
+    profile = profiler.profile
+    assert profile.total == gas_used, "Every unit of execution gas is in exactly one stack"
+
+    resolve = ("zkTitans.vy", "attackOrDefendChoice", "_attackOrDefendChoice", "_awaitBattleResults", "_resolveBattle")
+    assert profile.stacks[resolve] > 0
+    assert profile.stacks[resolve + ("[LOG]",)] > 0, "RoundEnded is emitted by _resolveBattle"
+    assert profile.stacks[resolve + ("updateBattle", "[SSTORE]")] > 0
+
+    functions = profile.by_function()
+    print({name: (entry["self"], entry["total"]) for name, entry in functions.items()})
+    dispatch = profile.stacks[("zkTitans.vy",)]
+    assert functions["attackOrDefendChoice"]["total"] + dispatch == gas_used
+    assert functions["attackOrDefendChoice"]["calls"] == 2
+    assert functions["_resolveBattle"]["calls"] == 1
+    assert functions["_touchBattle"]["self"] == functions["_touchBattle"]["total"]
+    for entry in functions.values():
+        assert 0 <= entry["self"] <= entry["total"]
+
+    assert sum(profile.lines.values()) <= gas_used
+    contract, function, lineno, gas, source = profile.top_lines(1)[0]
+    assert contract == "zkTitans" and gas > 0 and source
+
+
+def test_profile_nests_external_calls(titans, forwarder, players):
+    chain_id = boa.env.evm.chain.chain_id
+    moves = []
+    for player, choice in zip(players, (1, 2)):
+        move = {
+            "player": player.address,
+            "choice": choice,
+            "battleName": BATTLE_NAME,
+            "nonce": 0,
+            "deadline": int(time.time()) + 3600,
+        }
+        moves.append(move_to_struct(sign_move(player.key, forwarder.address, chain_id, move)))
+
+    gas_before = boa.env.get_gas_used()
+    with GasProfiler() as profiler:
+        with boa.env.prank(boa.env.generate_address("relayer")):
+            assert forwarder.relayMoves(moves) == 2
+    profile = profiler.profile
+
+    assert profile.total == boa.env.get_gas_used() - gas_before, "Callee gas is not counted twice"
+    nested = [stack for stack in profile.stacks if "zkTitans.vy" in stack[1:]]
+    assert nested and all(stack[:2] == ("MoveForwarder.vy", "relayMoves") for stack in nested)
+    assert any(stack[-1] == "_resolveBattle" for stack in nested)
+
+    functions = profile.by_function()
+    assert "zkTitans.vy" not in functions
+    assert functions["attackOrDefendChoice"]["calls"] == 2
+    assert functions["relayMoves"]["total"] >= functions["attackOrDefendChoice"]["total"]
+    assert any(stack[-1] == "<unknown code>" for stack in profile.stacks), "ecrecover precompile"
+
+
+def test_profiles_save_load_and_diff(titans, players, tmp_path):
+    with GasProfiler() as first:
+        play_round(titans, players, choice=1)
+    boa.env.time_travel(blocks=1)
+    with GasProfiler() as second:
+        play_round(titans, players, choice=2)
+
+    path = first.profile.save(tmp_path / "round.folded")
+    loaded = GasProfile.load(path)
+    assert loaded.stacks == +first.profile.stacks
+    assert loaded.collapsed() == first.profile.collapsed()
+
+    changes = diff(loaded, second.profile)
+    print(changes[:5])
+    assert diff(loaded, loaded)[0][3] == 0
+    assert changes[0][3] != 0
+    assert sum(change for name, *_, change in changes if name == "attackOrDefendChoice") == (
+        second.profile.total - loaded.total
+    )
+
+    lines = collapsed_diff(loaded, second.profile).splitlines()
+    assert all(len(line.rsplit(" ", 2)) == 3 for line in lines)
+
+    merged = GasProfile().merge(first.profile).merge(second.profile)
+    assert merged.total == first.profile.total + second.profile.total
@@ -0,0 +1,99 @@
+import boa
+import pytest
+
+from script.gas_table import (
+    REQUIRED_PATHS,
+    TRANSACTION_GAS,
+    GasTable,
+    GasTableError,
+    bytecode_hash,
+    calldata_gas,
+    measure,
+    move_path,
+)
+from script.rules import ATTACK, DEFEND, PlayerState
+
+
+class StandInRpc:
+    """Answers eth_getCode from the boa test environment"""
+
+    def call(self, method, params):
+        assert method == "eth_getCode"
+        return "0x" + boa.env.get_code(params[0]).hex()
+
+
+@pytest.fixture(scope="module")
+def table():
+    return measure(min_samples=2)
+
+
+def test_measure_covers_every_path(table, titans):
+    assert sorted(table.paths) == sorted(REQUIRED_PATHS)
+
+    # Ending a battle costs more than continuing it
+    assert table.paths["attackOrDefendChoice/AA-end"] > table.paths["attackOrDefendChoice/AA"]
+    # Constructor arguments do not change the runtime code the table is bound to
+    assert table.bytecode_hash == bytecode_hash(titans)
+
+
+def test_limits_cover_a_new_game(table, titans):
+    players = [boa.env.generate_address(f"limit player {i}") for i in range(2)]
+    for i, player in enumerate(players):
+        with boa.env.prank(player):
+            titans.registerPlayer(f"Limit Player {i}", "Token")
+    with boa.env.prank(players[0]):
+        titans.createBattle("Limit Battle")
+    with boa.env.prank(players[1]):
+        titans.joinBattle("Limit Battle")
+    battle_id = titans.battleInfo("Limit Battle")
+
+    def state(player):
+        return PlayerState(titans.getPlayer(player)[3], titans.getPlayer(player)[2], titans.getPlayerToken(player)[2])
+
+    while titans.battles(battle_id - 1)[0] != 4:
+        states = (state(players[0]), state(players[1]))
+        moves = [0, 0]
+        for player in (1, 0):
+            choice = ATTACK if states[player].mana >= 3 else DEFEND
+            path = move_path(tuple(moves), player, choice, states)
+            calldata = titans.attackOrDefendChoiceById.prepare_calldata(choice, battle_id)
+            limit = table.limit("attackOrDefendChoiceById", calldata, path)
+            with boa.env.prank(players[player]):
+                titans.attackOrDefendChoiceById(choice, battle_id)
+            # The first moves on a fresh contract write slots the measured games found
+            # already set, the margin covers them
+            used = titans._computation.get_gas_used()
+            assert TRANSACTION_GAS + calldata_gas(calldata) + used <= limit
+            moves[player] = choice
+
+
+def test_move_path():
+    strong = PlayerState(health=10, mana=25, attack=9)
+    dying = PlayerState(health=1, mana=25, attack=5)
+    assert move_path((0, 0), 0, ATTACK) == "first"
+    assert move_path((0, 2), 1, ATTACK) == "first"
+    assert move_path((1, 0), 1, DEFEND) == ("AD", "AD-end")
+    assert move_path((0, 1), 0, ATTACK, (strong, dying)) == "AA-end"
+    assert move_path((0, 2), 0, DEFEND, (strong, dying)) == "DD"
+
+
+def test_table_is_bound_to_bytecode(table, titans, forwarder, tmp_path):
+    rpc = StandInRpc()
+    assert table.matches(rpc, titans.address)
+    assert not table.matches(rpc, forwarder.address)
+
+    table.save(tmp_path / "gas_table.json")
+    loaded = GasTable.load(tmp_path / "gas_table.json")
+    assert loaded.paths == table.paths and loaded.bytecode_hash == table.bytecode_hash
+    # Without the players' state the larger of the two second move paths is used
+    assert loaded.execution_gas("attackOrDefendChoice", ("AD", "AD-end")) == table.paths["attackOrDefendChoice/AD-end"]
+
+    with pytest.raises(GasTableError):
+        loaded.execution_gas("resolveBattles")
+    with pytest.raises(GasTableError):
+        GasTable(table.bytecode_hash, table.paths, version=0)
+
+
+def test_measure_reports_unreached_paths():
+    with pytest.raises(GasTableError, match="quitBattle"):
+        measure(max_games=2)
@@ -0,0 +1,181 @@
+import boa
+import numpy as np
+import pytest
+
+from script.cache import decode_boa_logs
+from script.history import GameHistory, HistoryExporter, _write_arrow, fetch_logs
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+class _Game:
+    """Plays zkTitans calls one block at a time, keeping their logs"""
+
+    def __init__(self, titans):
+        self.titans = titans
+        self.block = 0
+        self.blocks = []
+
+    def call(self, sender, function, *args):
+        with boa.env.prank(sender):
+            getattr(self.titans, function)(*args)
+        self.block += 1
+        self.blocks.append((self.block, decode_boa_logs(self.titans), self.titans._computation))
+
+    def fight(self, name, player1, player2):
+        """Both players attack until the battle ends; returns the number of rounds"""
+        self.call(player1, "createBattle", name)
+        self.call(player2, "joinBattle", name)
+        rounds = 0
+        while self.titans.getBattle(name)[0] != 4:
+            self.call(player1, "attackOrDefendChoice", 1, name)
+            self.call(player2, "attackOrDefendChoice", 1, name)
+            rounds += 1
+        return rounds
+
+
+@pytest.fixture
+def game(titans):
+    game = _Game(titans)
+    game.players = [boa.env.generate_address(f"history player {i}") for i in range(4)]
+    for i, player in enumerate(game.players):
+        game.call(player, "registerPlayer", f"History Player {i}", "Token")
+    return game
+
+
+def test_export_builds_rounds_and_results(game, tmp_path):
+    p = game.players
+    rounds = [game.fight("First Fight", p[0], p[1]), game.fight("Second Fight", p[2], p[3])]
+
+    exporter = HistoryExporter(tmp_path)
+    for block, logs, _ in game.blocks:
+        exporter.process_logs(logs, block)
+    assert exporter.flush() == sum(rounds) + 2
+    exporter.snapshot(game.titans)
+
+    history = GameHistory(tmp_path)
+    round_rows = history.table("rounds")
+    assert round_rows.num_rows == sum(rounds)
+    assert round_rows["round"].to_pylist() == list(range(1, rounds[0] + 1)) + list(range(1, rounds[1] + 1))
+
+    results = history.table("results").to_pylist()
+    assert [row["battle_name"] for row in results] == ["First Fight", "Second Fight"]
+    assert [row["rounds"] for row in results] == rounds
+    for row in results:
+        battle = game.titans.getBattle(row["battle_name"])
+        assert row["winner"] == bytes.fromhex(battle[5][2:])
+        winner_card = game.titans.getPlayerToken(battle[5])[1]
+        assert row["winner_card"] == winner_card
+
+    assert history.average_rounds_per_battle() == sum(rounds) / 2
+    rates = history.win_rate_by_card()
+    played = {row["winner_card"] for row in results} | {row["loser_card"] for row in results}
+    assert set(np.flatnonzero(~np.isnan(rates))) == played
+
+    assert history.mana_curve().sum() == 4
+    assert history.mana_curve(in_battle=True).sum() == 0
+    assert history.table("battles").num_rows == 2
+
+    written = history.export_parquet(tmp_path / "parquet")
+    assert pq.read_table(tmp_path / "parquet" / "results.parquet").equals(history.table("results"))
+    assert len(written) == 5
+
+
+def test_export_resumes_and_skips_replayed_blocks(game, tmp_path):
+    p = game.players
+    game.fight("Resumed Fight", p[0], p[1])
+    # Stop the first export right after the first round
+    half = next(i for i, (_, logs, _) in enumerate(game.blocks) if "RoundEnded" in dict(logs)) + 1
+
+    exporter = HistoryExporter(tmp_path)
+    for block, logs, _ in game.blocks[:half]:
+        exporter.process_logs(logs, block)
+    exporter.flush()
+
+    # A new exporter picks up the open battle's round count and ignores replayed blocks
+    exporter = HistoryExporter(tmp_path)
+    for block, logs, _ in game.blocks:
+        exporter.process_logs(logs, block)
+    exporter.flush()
+
+    history = GameHistory(tmp_path)
+    assert len(list((tmp_path / "rounds").glob("part-*.arrow"))) == 2
+    rounds = history.table("rounds")["round"].to_pylist()
+    assert rounds == list(range(1, len(rounds) + 1))
+    assert history.table("results")["rounds"].to_pylist() == [len(rounds)]
+
+
+def test_export_counts_rounds_of_battles_created_before_it(game, tmp_path):
+    p = game.players
+    rounds = game.fight("Older Fight", p[0], p[1])
+    # Start exporting after the battle was created and joined
+    first = next(i for i, (_, logs, _) in enumerate(game.blocks) if "BattleMove" in dict(logs))
+
+    exporter = HistoryExporter(tmp_path)
+    for block, logs, _ in game.blocks[first:]:
+        exporter.process_logs(logs, block)
+    exporter.flush()
+
+    history = GameHistory(tmp_path)
+    assert history.table("results")["rounds"].to_pylist() == [rounds]
+    assert exporter._rounds == {}, "The ended battle's counter is removed"
+
+
+def test_fetch_logs_decodes_rpc_logs(game):
+    game.fight("Fetched Fight", game.players[0], game.players[1])
+
+    raw = []
+    for block, _, computation in game.blocks:
+        for index, address, topics, data in game.titans._get_logs(computation, True):
+            raw.append(
+                {
+                    "blockNumber": hex(block),
+                    "logIndex": hex(index),
+                    "topics": ["0x" + topic.to_bytes(32, "big").hex() for topic in topics],
+                    "data": "0x" + data.hex(),
+                }
+            )
+
+    class StandInRpc:
+        def fetch(self, method, params):
+            assert method == "eth_getLogs"
+            return list(reversed(raw))
+
+    fetched = fetch_logs(StandInRpc(), game.titans, 0, game.block)
+    assert fetched == [(block, logs) for block, logs, _ in game.blocks if logs]
+
+
+def test_queries_run_on_memory_mapped_parts(tmp_path):
+    rng = np.random.default_rng(0)
+    rows = 2_000_000
+    winners = rng.integers(0, 30, rows, dtype=np.int8)
+    losers = rng.integers(0, 30, rows, dtype=np.int8)
+    lengths = rng.integers(1, 12, rows, dtype=np.int32)
+    parts = 4
+    for i, part in enumerate(np.array_split(np.arange(rows), parts)):
+        _write_arrow(
+            tmp_path / "results" / f"part-{i + 1:06d}.arrow",
+            pa.table(
+                {
+                    "block": pa.array(part.astype(np.int64)),
+                    "battle_name": pa.array([""] * len(part), pa.string()),
+                    "winner": pa.array([b"\0" * 20] * len(part), pa.binary(20)),
+                    "loser": pa.array([b"\0" * 20] * len(part), pa.binary(20)),
+                    "winner_card": pa.array(winners[part]),
+                    "loser_card": pa.array(losers[part]),
+                    "rounds": pa.array(lengths[part]),
+                }
+            ),
+        )
+
+    allocated = pa.total_allocated_bytes()
+    history = GameHistory(tmp_path)
+    rates = history.win_rate_by_card()
+    assert history.average_rounds_per_battle() == pytest.approx(lengths.mean())
+    # Columns are read straight from the mapped files, only the small count arrays are allocated
+    assert pa.total_allocated_bytes() - allocated < 1_000_000
+
+    wins = np.bincount(winners, minlength=30)
+    expected = wins / (wins + np.bincount(losers, minlength=30))
+    np.testing.assert_allclose(rates, expected)
@@ -0,0 +1,109 @@
+import boa
+
+from script.keeper import MAX_BATCH_SIZE, MAX_GAS_PER_BATTLE, RESOLVE_BASE_GAS, ResolutionKeeper
+
+BATTLE_STATUS_ENDED = 4
+
+
+def start_battles(titans, count):
+    """Register 2 * count players and start `count` battles between them"""
+    names = []
+    for i in range(count):
+        creator = boa.env.generate_address(f"creator{i}")
+        joiner = boa.env.generate_address(f"joiner{i}")
+        battle_name = f"Battle {i}"
+
+        with boa.env.prank(creator):
+            titans.registerPlayer(f"Creator {i}", "Token")
+            titans.createBattle(battle_name)
+        with boa.env.prank(joiner):
+            titans.registerPlayer(f"Joiner {i}", "Token")
+            titans.joinBattle(battle_name)
+        names.append(battle_name)
+    return names
+
+
+def test_keeper_chunk_size_respects_budget(titans):
+    keeper = ResolutionKeeper(titans, gas_budget=1_000_000, gas_per_item=300_000)
+    assert keeper.chunk_size() == 3
+
+    keeper = ResolutionKeeper(titans, gas_budget=100_000_000, gas_per_item=1)
+    assert keeper.chunk_size() == MAX_BATCH_SIZE
+
+    keeper = ResolutionKeeper(titans, gas_budget=1, gas_per_item=300_000)
+    assert keeper.chunk_size() == 1
+
+
+def test_keeper_sweep_times_out_abandoned_battles(titans):
+    names = start_battles(titans, 5)
+    keeper = ResolutionKeeper(titans, gas_budget=200_000, gas_per_item=100_000)
+
+    assert keeper.sweep() == 0, "Nothing to resolve before the timeout"
+
+    boa.env.time_travel(seconds=titans.MOVE_TIMEOUT())
+    assert len(keeper.find_resolvable_battles()) == 5
+
+    assert keeper.sweep() == 5
+    for name in names:
+        assert titans.getBattle(name)[0] == BATTLE_STATUS_ENDED
+
+    assert keeper.find_resolvable_battles() == []
+    assert keeper.gas_per_item > 0
+
+
+def test_keeper_chunks_fit_the_budget_before_sending(titans):
+    names = start_battles(titans, 7)
+    # One player moved in the first three battles, so they time out with a winner
+    for name in names[:3]:
+        with boa.env.prank(titans.getBattle(name)[3][0]):
+            titans.attackOrDefendChoice(1, name)
+    boa.env.time_travel(seconds=titans.MOVE_TIMEOUT())
+
+    keeper = ResolutionKeeper(titans, gas_budget=RESOLVE_BASE_GAS + 3 * MAX_GAS_PER_BATTLE)
+    chunks = []
+    resolve_battles = titans.resolveBattles
+
+    def sized_resolve(battle_ids):
+        chunks.append(list(battle_ids))
+        handled = resolve_battles(battle_ids)
+        assert titans._computation.get_gas_used() <= keeper.gas_budget
+        return handled
+
+    titans.resolveBattles = sized_resolve
+    try:
+        assert keeper.sweep() == 7
+    finally:
+        del titans.resolveBattles
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+
+
+def test_keeper_gas_bound_covers_a_resolved_round(titans):
+    (name,) = start_battles(titans, 1)
+    players = titans.getBattle(name)[3]
+    with boa.env.prank(players[0]):
+        titans.attackOrDefendChoice(1, name)
+    with boa.env.prank(players[1]):
+        # Registers the move and resolves the round, more than resolveBattles does for it
+        titans.attackOrDefendChoice(1, name)
+    assert titans._computation.get_gas_used() <= MAX_GAS_PER_BATTLE
+
+
+def test_keeper_run_survives_a_failed_sweep(titans):
+    (name,) = start_battles(titans, 1)
+    boa.env.time_travel(seconds=titans.MOVE_TIMEOUT())
+    keeper = ResolutionKeeper(titans)
+
+    sweeps = []
+    sweep = keeper.sweep
+
+    def flaky_sweep():
+        sweeps.append(len(sweeps))
+        if len(sweeps) == 1:
+            raise ConnectionError("RPC unreachable")
+        return sweep()
+
+    keeper.sweep = flaky_sweep
+    keeper.run(interval=0, max_sweeps=2)
+
+    assert sweeps == [0, 1]
+    assert titans.getBattle(name)[0] == BATTLE_STATUS_ENDED
@@ -0,0 +1,84 @@
+import time
+from contextlib import contextmanager
+
+import boa
+import pytest
+
+from script.metrics import Metrics, instrument, revert_reason
+
+
+def test_instrumented_calls_record_metrics(titans):
+    metrics = Metrics()
+    instrumented = instrument(titans, metrics)
+    labels = {"contract": "zkTitans", "function": "registerPlayer"}
+
+    player = boa.env.generate_address("metrics player")
+    with boa.env.prank(player):
+        instrumented.registerPlayer("Metrics Player", "Token")
+        with pytest.raises(boa.BoaError):
+            instrumented.registerPlayer("Metrics Player", "Token")
+    assert instrumented.isPlayer(player)
+    assert instrumented.address == titans.address
+
+    assert metrics.value("zktitans_calls_total", **labels, status="ok") == 1
+    assert metrics.value("zktitans_calls_total", **labels, status="revert") == 1
+    assert metrics.value("zktitans_reverts_total", **labels, reason="Player already registered") == 1
+    assert metrics.value("zktitans_call_seconds", **labels) == 2
+    assert metrics.value("zktitans_gas_used", **labels) == 1
+    assert metrics.value("zktitans_calls_total", contract="zkTitans", function="isPlayer", status="ok") == 1
+
+    text = metrics.render()
+    print(text)
+    assert "# TYPE zktitans_gas_used histogram" in text
+    assert 'zktitans_reverts_total{contract="zkTitans",function="registerPlayer",reason="Player already registered"} 1' in text
+    assert 'zktitans_gas_used_bucket{contract="zkTitans",function="registerPlayer",le="+Inf"} 1' in text
+
+
+def test_histograms_render_cumulative_buckets():
+    metrics = Metrics()
+    for gas in (30_000, 30_000, 400_000, 50_000_000):
+        metrics.observe("zktitans_gas_used", gas, contract="c", function="f")
+    metrics.inc("zktitans_reverts_total", contract="c", function="f", reason='bad "input"\nline')
+
+    lines = metrics.render().splitlines()
+    assert 'zktitans_gas_used_bucket{contract="c",function="f",le="21000"} 0' in lines
+    assert 'zktitans_gas_used_bucket{contract="c",function="f",le="50000"} 2' in lines
+    assert 'zktitans_gas_used_bucket{contract="c",function="f",le="500000"} 3' in lines
+    assert 'zktitans_gas_used_bucket{contract="c",function="f",le="30000000"} 3' in lines
+    assert 'zktitans_gas_used_bucket{contract="c",function="f",le="+Inf"} 4' in lines
+    assert 'zktitans_gas_used_sum{contract="c",function="f"} 50460000' in lines
+    assert 'zktitans_reverts_total{contract="c",function="f",reason="bad \\"input\\"\\nline"} 1' in lines
+
+
+def test_disabled_metrics_leave_contracts_untouched(titans):
+    metrics = Metrics(enabled=False)
+    assert instrument(titans, metrics) is titans
+
+    with metrics.timed("zkTitans", "deploy"):
+        pass
+    metrics.inc("zktitans_calls_total", contract="c", function="f", status="ok")
+    assert metrics.render() == "\n"
+
+
+def test_spans_wrap_calls_and_timed_blocks(titans):
+    spans = []
+
+    class StandInTracer:
+        @contextmanager
+        def start_as_current_span(self, name, attributes=None):
+            spans.append((name, attributes))
+            yield
+
+    metrics = Metrics(tracer=StandInTracer())
+    instrument(titans, metrics).getTotalSupply()
+    with pytest.raises(ValueError):
+        with metrics.timed("zkTitans", "deploy"):
+            time.sleep(0.001)
+            raise ValueError("failed deploy")
+
+    assert spans == [
+        ("zkTitans.getTotalSupply", {"contract": "zkTitans", "function": "getTotalSupply"}),
+        ("zkTitans.deploy", {"contract": "zkTitans", "function": "deploy"}),
+    ]
+    assert metrics.value("zktitans_calls_total", contract="zkTitans", function="deploy", status="error") == 1
+    assert revert_reason(ValueError("x")) == "ValueError"
@@ -0,0 +1,212 @@
+import boa
+import pytest
+
+from script.deploy import deploy_zktitans
+from script.migrate import IMPORT_FUNCTIONS, PHASES, Migration, MigrationError, _StateReader
+from script.seed import MAX_CARD_TYPES, StorageSeeder, seed_state
+
+
+@pytest.fixture
+def source(titans):
+    """A deployment with seeded state and a few players who played through the contract"""
+    state = seed_state(titans, players=30, battles=60)
+
+    player1 = boa.env.generate_address("migration player 1")
+    player2 = boa.env.generate_address("migration player 2")
+    with boa.env.prank(player1):
+        titans.registerPlayer("Migrating One", "Token")
+        titans.createRandomGameToken("Second Token")
+        titans.createBattle("Migrating Battle")
+    with boa.env.prank(player2):
+        titans.registerPlayer("Migrating Two", "Token")
+        titans.joinBattle("Migrating Battle")
+    with boa.env.prank(player1):
+        titans.attackOrDefendChoice(1, "Migrating Battle")
+
+    titans.state = state
+    return titans
+
+
+@pytest.fixture
+def target(metadata_uri):
+    return deploy_zktitans(metadata_uri, import_open=True)
+
+
+def _balances(contract, players):
+    reader = _StateReader(contract)
+    return {(p, i): reader.balance(p, i) for p in players for i in range(MAX_CARD_TYPES)}
+
+
+def test_migration_copies_state(source, target, tmp_path):
+    migration = Migration(source, target, tmp_path / "migration.json", gas_budget=2_000_000)
+    assert migration.run()
+    assert migration.checkpoint.transactions > len(PHASES), "Small budget splits phases into several chunks"
+
+    assert target.getAllPlayers() == source.getAllPlayers()
+    assert target.getAllPlayerTokens() == source.getAllPlayerTokens()
+    assert target.getAllBattles() == source.getAllBattles()
+    assert target.TOTAL_SUPPLY() == source.TOTAL_SUPPLY()
+    players = [p[0] for p in source.getAllPlayers()[1:]]
+    assert _balances(target, players) == _balances(source, players)
+    for address in players:
+        assert target.playerInfo(address) == source.playerInfo(address)
+        assert target.playerTokenInfo(address) == source.playerTokenInfo(address)
+    for name in source.state.battles + ["Migrating Battle"]:
+        assert target.battleInfo(name) == source.battleInfo(name)
+
+    assert not target.importOpen()
+    with pytest.raises(boa.BoaError, match="Import is closed"):
+        target.importBattles(len(target.getAllBattles()), [], b"\0" * 32)
+
+    # The battle in progress carries on in the new deployment
+    player1, player2 = target.getBattle("Migrating Battle")[3]
+    with boa.env.prank(player2):
+        target.attackOrDefendChoice(2, "Migrating Battle")
+    assert target.getBattle("Migrating Battle")[4] == [0, 0], "Round resolved"
+
+
+def test_compacting_migration_drops_orphaned_tokens(source, target, tmp_path):
+    # Re-rolls of older deployments appended a token and minted its card, and left the previous
+    # token orphaned while its card stayed with the player
+    seeder = StorageSeeder(source)
+    rerolled = source.state.players[:3]
+    for address in rerolled:
+        token = dict(zip(("name", "id", "attackStrength", "defenseStrength"), source.getPlayerToken(address)))
+        index = seeder.extend("gameTokens", [{**token, "name": "Re-rolled"}])
+        seeder.set_item("playerTokenInfo", (address,), index)
+        seeder.set_item("_balances", (token["id"], address), 2)
+    players = source.getAllPlayers()
+    assert len(source.getAllPlayerTokens()) == len(players) + len(rerolled)
+
+    migration = Migration(source, target, tmp_path / "migration.json", gas_budget=2_000_000, compact=True)
+    assert migration.run()
+
+    assert target.getAllPlayers() == players
+    assert len(target.getAllPlayerTokens()) == len(players)
+    for player in players[1:]:
+        address = player[0]
+        assert target.playerTokenInfo(address) == target.playerInfo(address)
+        assert target.getPlayerToken(address) == source.getPlayerToken(address)
+    assert [target.getPlayerToken(address)[0] for address in rerolled] == ["Re-rolled"] * 3
+    assert target.TOTAL_SUPPLY() == source.TOTAL_SUPPLY()
+
+    with pytest.raises(MigrationError, match="compact=True"):
+        Migration(source, target, tmp_path / "migration.json")
+
+
+def test_migration_resumes_after_interruption(source, target, tmp_path):
+    path = tmp_path / "migration.json"
+    assert not Migration(source, target, path, gas_budget=2_000_000).run(max_chunks=3)
+
+    # A chunk that landed without its checkpoint being confirmed is picked up
+    migration = Migration(source, target, path, gas_budget=2_000_000)
+    assert migration.checkpoint.transactions == 3
+    chunk = next(migration.chunks("players"))
+    migration.checkpoint.begin(chunk)
+    target.importPlayers(*chunk.args())
+
+    # A chunk checkpointed but never sent is sent again
+    migration = Migration(source, target, path, gas_budget=2_000_000)
+    migration.recover()
+    assert migration.checkpoint.next["players"] == chunk.end
+    migration.checkpoint.begin(next(migration.chunks("players")))
+
+    migration = Migration(source, target, path, gas_budget=2_000_000)
+    assert migration.run()
+    assert target.getAllPlayers() == source.getAllPlayers()
+    assert target.getAllBattles() == source.getAllBattles()
+    assert target.TOTAL_SUPPLY() == source.TOTAL_SUPPLY()
+
+
+def test_migration_detects_foreign_imports(source, target, tmp_path):
+    path = tmp_path / "migration.json"
+    Migration(source, target, path).run(max_chunks=1)
+
+    target.importBalances(1, [], b"\1" * 32)
+    with pytest.raises(MigrationError, match="does not match the checkpoint"):
+        Migration(source, target, path).run()
+
+    with pytest.raises(MigrationError, match="other contracts"):
+        Migration(target, source, path)
+
+
+def test_import_guards(source, target):
+    player = source.getAllPlayers()[1]
+    token = source.getAllPlayerTokens()[1]
+
+    with boa.env.prank(boa.env.generate_address("stranger")):
+        with pytest.raises(boa.BoaError, match="ownable: caller is not the owner"):
+            target.importGameTokens(1, [token], b"\0" * 32)
+        with pytest.raises(boa.BoaError, match="ownable: caller is not the owner"):
+            target.finishImport()
+
+    with pytest.raises(boa.BoaError, match="Chunk out of order"):
+        target.importGameTokens(2, [token], b"\0" * 32)
+    with pytest.raises(boa.BoaError, match="length mismatch"):
+        target.importPlayers(1, [player], [], b"\0" * 32)
+
+    target.importPlayers(1, [player], [1], b"\0" * 32)
+    with pytest.raises(boa.BoaError, match="Player already registered"):
+        target.importPlayers(2, [player], [1], b"\0" * 32)
+
+    # Balance chunks follow the player order and cannot be resent
+    entry = 3 << 168 | 7 << 160 | int(player[0], 16)
+    with pytest.raises(boa.BoaError, match="Chunk out of order"):
+        target.importBalances(0, [entry], b"\0" * 32)
+    with pytest.raises(boa.BoaError, match="Balance out of order"):
+        target.importBalances(2, [entry], b"\0" * 32)
+    target.importBalances(1, [entry], b"\0" * 32)
+    with pytest.raises(boa.BoaError, match="Chunk out of order"):
+        target.importBalances(1, [entry], b"\0" * 32)
+    assert target.TOTAL_SUPPLY() == 3
+
+
+def test_import_is_opt_in(titans, target):
+    newcomer = boa.env.generate_address("newcomer")
+
+    # A plain deployment takes no imports
+    assert not titans.importOpen()
+    with pytest.raises(boa.BoaError, match="Import is closed"):
+        titans.importBalances(1, [], b"\0" * 32)
+
+    # A migration target is closed to players until the import is finished
+    assert target.importOpen()
+    with boa.env.prank(newcomer):
+        with pytest.raises(boa.BoaError, match="Import in progress"):
+            target.registerPlayer("Newcomer", "Token")
+    with pytest.raises(boa.BoaError, match="Import in progress"):
+        target.resolveBattles([1])
+
+    target.finishImport()
+    with boa.env.prank(newcomer):
+        target.registerPlayer("Newcomer", "Token")
+        target.createBattle("First Battle")
+    assert target.isPlayer(newcomer)
+
+
+def test_full_state_fits_bounded_transactions(titans, target, tmp_path):
+    """The largest state the arrays hold, planned without sending"""
+    seed_state(titans, players=4_999, battles=20_000)
+    migration = Migration(titans, target, tmp_path / "migration.json")
+
+    chunks = {phase: list(migration.chunks(phase)) for phase in PHASES}
+    print({phase: len(items) for phase, items in chunks.items()})
+    assert sum(len(items) for items in chunks.values()) < 500
+    assert chunks["battles"][-1].end == 20_000
+
+    # The fullest chunk of each phase stays within the gas budget, sent to a target
+    # whose array already has the chunk's start length, or whose players are imported
+    reader = _StateReader(target)
+    seeder = StorageSeeder(target)
+    for phase in PHASES:
+        chunk = max(chunks[phase], key=lambda c: len(c.values))
+        with boa.env.anchor():
+            if phase != "balances":
+                boa.env.set_storage(target.address, reader.slots[phase], chunk.start)
+            else:
+                for entry in chunk.values:
+                    owner = entry & (2**160 - 1)
+                    seeder.set_item("playerInfo", (f"0x{owner:040x}",), titans.playerInfo(f"0x{owner:040x}"))
+            gas_before = boa.env.get_gas_used()
+            getattr(target, IMPORT_FUNCTIONS[phase])(*chunk.args())
+            assert boa.env.get_gas_used() - gas_before < migration.gas_budget
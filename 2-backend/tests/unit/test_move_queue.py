@@ -0,0 +1,136 @@
+import boa
+import pytest
+
+from script.cache import decode_boa_logs
+from script.keeper import ResolutionKeeper
+from script.seed import StorageSeeder
+
+BATTLE_NAME = "Queued Battle"
+ATTACK, DEFEND = 1, 2
+
+
+@pytest.fixture
+def battle(titans, forwarder):
+    player1 = boa.env.generate_address("queue player1")
+    player2 = boa.env.generate_address("queue player2")
+    with boa.env.prank(player1):
+        titans.registerPlayer("Player One", "Token One")
+        titans.createBattle(BATTLE_NAME)
+    with boa.env.prank(player2):
+        titans.registerPlayer("Player Two", "Token Two")
+        titans.joinBattle(BATTLE_NAME)
+    return titans.battleInfo(BATTLE_NAME), player1, player2
+
+
+def set_mana(titans, player, mana):
+    seeder = StorageSeeder(titans)
+    item_size = seeder.types["players"].value_type.storage_size_in_words
+    # playerAddress takes one slot and playerName six before playerMana
+    slot = seeder.slots["players"] + 1 + titans.playerInfo(player) * item_size + 6
+    boa.env.set_storage(titans.address, slot, mana)
+    assert titans.getPlayer(player)[2] == mana
+
+
+def test_queued_moves_play_as_rounds_resolve(titans, forwarder, battle):
+    battle_id, player1, player2 = battle
+
+    with boa.env.prank(player1):
+        assert forwarder.queueMoves(battle_id, [DEFEND, DEFEND, DEFEND]) == 1
+    assert titans.getBattleMovesById(battle_id) == (DEFEND, 0)
+    assert forwarder.getQueuedMoves(battle_id, player1) == [DEFEND, DEFEND]
+
+    # The second queue completes the first round, which plays the next queued moves, and so on,
+    # until player1's queue runs out with player2's last move played
+    with boa.env.prank(player2):
+        assert forwarder.queueMoves(battle_id, [DEFEND, DEFEND, DEFEND, DEFEND]) == 6
+    assert [name for name, _ in decode_boa_logs(titans, forwarder._computation)].count("RoundEnded") == 3
+
+    assert titans.getBattleMovesById(battle_id) == (0, DEFEND)
+    assert forwarder.getQueuedMoves(battle_id, player1) == []
+    assert forwarder.getQueuedMoves(battle_id, player2) == []
+
+    # A direct move completes the round; queued moves wait for the forwarder to play them
+    with boa.env.prank(player1):
+        titans.attackOrDefendChoiceById(DEFEND, battle_id)
+        forwarder.queueMoves(battle_id, [DEFEND])
+    assert titans.getBattleMovesById(battle_id) == (DEFEND, 0)
+
+
+def test_keeper_plays_queues_stalled_by_a_direct_move(titans, forwarder, battle):
+    battle_id, player1, player2 = battle
+    keeper = ResolutionKeeper(titans, forwarder=forwarder)
+
+    with boa.env.prank(player1):
+        assert forwarder.queueMoves(battle_id, [DEFEND, DEFEND, DEFEND]) == 1
+    assert forwarder.getPlayableBattles(0, 10) == ([], 1)
+
+    # The opponent moves directly on zkTitans: the round resolves, but player1's next queued move
+    # is not played and waits for the forwarder
+    with boa.env.prank(player2):
+        titans.attackOrDefendChoiceById(DEFEND, battle_id)
+    assert titans.getBattleMovesById(battle_id) == (0, 0)
+    assert forwarder.getQueuedMoves(battle_id, player1) == [DEFEND, DEFEND]
+    assert keeper.find_playable_battles() == [battle_id]
+
+    # The keeper's sweep plays it, before the battle could time out in favour of player2
+    assert keeper.sweep() == 0
+    assert titans.getBattleMovesById(battle_id) == (DEFEND, 0)
+    assert forwarder.getQueuedMoves(battle_id, player1) == [DEFEND]
+    assert keeper.find_playable_battles() == []
+
+    # A keeper without the forwarder leaves queues alone
+    assert ResolutionKeeper(titans).play_queued_moves() == 0
+
+
+def test_battle_ends_in_two_transactions_per_player(titans, forwarder, battle):
+    battle_id, player1, player2 = battle
+
+    with boa.env.prank(player1):
+        forwarder.queueMoves(battle_id, [ATTACK, DEFEND] * 16)
+    with boa.env.prank(player2):
+        forwarder.queueMoves(battle_id, [ATTACK, DEFEND] * 16)
+
+    battle_status, *_, winner = titans.battles(battle_id - 1)
+    assert battle_status == 4
+    assert winner in (player1, player2)
+    assert not titans.getPlayer(player1)[4] and not titans.getPlayer(player2)[4]
+
+    # Left over queues of an ended battle play nothing
+    assert forwarder.playQueuedMoves(battle_id) == 0
+
+
+def test_rejected_queued_move_clears_the_queue(titans, forwarder, battle):
+    battle_id, player1, player2 = battle
+    set_mana(titans, player1, 3)
+
+    with boa.env.prank(player2):
+        forwarder.queueMoves(battle_id, [DEFEND, DEFEND, DEFEND])
+    # The second attack lacks mana after the first one spent it
+    with boa.env.prank(player1):
+        assert forwarder.queueMoves(battle_id, [ATTACK, ATTACK, DEFEND]) == 2
+
+    played = [event for name, event in decode_boa_logs(forwarder) if name == "QueuedMovePlayed"]
+    assert [(event["player"], event["choice"], event["success"]) for event in played] == [
+        (str(player1).lower(), ATTACK, True),
+        (str(player1).lower(), ATTACK, False),
+        (str(player2).lower(), DEFEND, True),
+    ]
+    assert titans.getPlayer(player1)[2] == 0
+    assert forwarder.getQueuedMoves(battle_id, player1) == []
+    assert forwarder.getQueuedMoves(battle_id, player2) == [DEFEND]
+    assert titans.getBattleMovesById(battle_id) == (0, DEFEND)
+
+
+def test_queue_only_plays_for_battle_players(titans, forwarder, battle):
+    battle_id, player1, _ = battle
+    outsider = boa.env.generate_address("queue outsider")
+
+    with boa.env.prank(outsider):
+        assert forwarder.queueMoves(battle_id, [ATTACK]) == 0
+        with boa.reverts("Choice should be either 1 or 2!"):
+            forwarder.queueMoves(battle_id, [DEFEND, 3])
+    assert titans.getBattleMovesById(battle_id) == (0, 0)
+
+    with boa.env.prank(player1):
+        forwarder.queueMoves(battle_id, [])
+    assert forwarder.moveQueues(battle_id, player1) == 0
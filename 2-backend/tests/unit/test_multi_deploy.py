@@ -0,0 +1,177 @@
+import json
+import threading
+
+import boa
+from eth_utils import keccak
+
+from script.multi_deploy import Target, _keep_last_receipt, _record, deploy_network, poll_verifications, run
+
+
+class MockExplorer:
+    """
+    Accepts every submission at once and reports it verified after `polls` polls.
+    Submissions of all networks meet at `barrier`, so deployments that do not run
+    concurrently fail the test instead of waiting for each other.
+    """
+
+    def __init__(self, polls: int, barrier: threading.Barrier, failing_polls: int = 0):
+        self.polls = polls
+        self.failing_polls = failing_polls
+        self.barrier = barrier
+        self.submitted = []
+
+    def verify(self, contract):
+        if not self.submitted:
+            self.barrier.wait()
+        self.submitted.append(contract.address)
+        return _Submission(self)
+
+
+class _Submission:
+    def __init__(self, explorer: MockExplorer):
+        self.explorer = explorer
+        self.polls = 0
+
+    def is_verified(self):
+        self.polls += 1
+        if self.polls <= self.explorer.failing_polls:
+            raise ConnectionError("explorer unavailable")
+        return self.polls >= self.explorer.polls
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_deploys_to_every_network_concurrently(tmp_path):
+    barrier = threading.Barrier(2, timeout=30)
+    explorers = {"chain-a": MockExplorer(polls=2, barrier=barrier), "chain-b": MockExplorer(polls=4, barrier=barrier, failing_polls=2)}
+    envs = {name: boa.Env() for name in explorers}
+    targets = [Target(name, envs[name], chain_id, verify=explorers[name].verify) for chain_id, name in enumerate(explorers, 1)]
+    clock = FakeClock()
+
+    manifest, errors = run(targets, path=tmp_path / "deployments.json", backoff=1.0, backoff_factor=2.0, sleep=clock.sleep, clock=clock)
+
+    assert errors == {}
+    assert json.loads((tmp_path / "deployments.json").read_text()) == manifest
+    for chain_id, name in enumerate(explorers, 1):
+        network = manifest["networks"][name]
+        assert network["chain_id"] == chain_id
+        assert [contract["address"] for contract in network["contracts"].values()] == explorers[name].submitted
+        for contract in network["contracts"].values():
+            assert contract["bytecode_hash"] == "0x" + keccak(envs[name].get_code(contract["address"])).hex()
+            assert contract["block"] == envs[name].evm.patch.block_number
+            assert contract["verified"] is True
+
+        with boa.swap_env(envs[name]):
+            titans = boa.load_partial("contracts/zkTitans.vy").at(network["contracts"]["zkTitans"]["address"])
+            assert titans.trustedForwarder() == network["contracts"]["MoveForwarder"]["address"]
+
+    # chain-b answers after four polls, the last two rounds polling only its contracts
+    assert clock.sleeps == [1.0, 2.0, 4.0]
+
+
+def test_failed_network_keeps_the_others(tmp_path):
+    path = tmp_path / "deployments.json"
+    path.write_text(json.dumps({"version": 1, "networks": {"old-chain": {"chain_id": 9, "contracts": {}}}}))
+
+    class BrokenEnv:
+        def __getattr__(self, name):
+            raise ConnectionError("RPC unreachable")
+
+    targets = [Target("chain-a", boa.Env(), 1), Target("broken", BrokenEnv(), 2)]
+    manifest, errors = run(targets, path=path)
+
+    assert list(errors) == ["broken"]
+    assert list(manifest["networks"]) == ["chain-a", "old-chain"]
+    assert manifest["networks"]["chain-a"]["contracts"]["zkTitans"]["verified"] is False
+
+
+def test_verification_polling_times_out():
+    explorer = MockExplorer(polls=100, barrier=threading.Barrier(1))
+    submissions = {("chain-a", "zkTitans"): _Submission(explorer), ("chain-a", "MoveForwarder"): _Submission(explorer)}
+    submissions[("chain-a", "MoveForwarder")].polls = 98
+    clock = FakeClock()
+
+    verified = poll_verifications(submissions, timeout=20, backoff=2, backoff_factor=2, max_backoff=5, sleep=clock.sleep, clock=clock)
+
+    assert verified == {("chain-a", "zkTitans"): False, ("chain-a", "MoveForwarder"): True}
+    assert clock.sleeps == [2, 4, 5, 5]
+    assert clock.now <= 20
+
+
+def test_network_deployment_block_comes_from_the_receipt():
+    class StubNetworkEnv:
+        def _send_txn(self, from_, to=None, gas=None, value=None, data=None):
+            return {}, {"blockNumber": "0x2a", "status": "0x1"}, None
+
+        def get_code(self, address):
+            return b"code"
+
+    class StubContract:
+        address = "0x0000000000000000000000000000000000000001"
+
+    env = StubNetworkEnv()
+    _keep_last_receipt(env)
+    env._send_txn("0x0000000000000000000000000000000000000002", data=b"")
+
+    deployment = _record(env, StubContract())
+    assert deployment.block == 42
+    assert deployment.bytecode_hash == "0x" + keccak(b"code").hex()
+
+
+def test_network_deployment_blocks_are_the_deploy_transactions():
+    class StubNetworkEnv:
+        """Mines every transaction in a block of its own, as a network without batching"""
+
+        def __init__(self):
+            self.block = 100
+            self.last_receipt = None
+            self.deploy_blocks = {}
+
+        def send(self):
+            self.block += 1
+            self.last_receipt = {"blockNumber": hex(self.block)}
+
+        def get_code(self, address):
+            return bytes.fromhex(address[2:])
+
+    class StubContract:
+        def __init__(self, env, address):
+            self.env = env
+            self.address = address
+            self.trusted = None
+
+        def setTrustedForwarder(self, address):
+            self.env.send()
+            self.trusted = address
+
+    class StubDeployer:
+        def __init__(self, address):
+            self.address = address
+
+        def deploy(self, *args, env=None):
+            env.send()
+            env.deploy_blocks[self.address] = env.block
+            self.contract = StubContract(env, self.address)
+            return self.contract
+
+    env = StubNetworkEnv()
+    titans_address, forwarder_address = "0x" + "11" * 20, "0x" + "22" * 20
+    titans_deployer = StubDeployer(titans_address)
+    deployment = deploy_network(Target("chain-a", env, 1), "", (titans_deployer, StubDeployer(forwarder_address)))
+
+    contracts = deployment.contracts
+    assert contracts["zkTitans"].block == env.deploy_blocks[titans_address] == 101
+    assert contracts["MoveForwarder"].block == env.deploy_blocks[forwarder_address] == 102
+    assert env.block == 103, "setTrustedForwarder was sent after the forwarder was recorded"
+    assert titans_deployer.contract.trusted == forwarder_address
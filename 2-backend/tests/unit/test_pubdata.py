@@ -0,0 +1,109 @@
+import boa
+import pytest
+
+from script.pubdata import (
+    INITIAL_WRITE_KEY_BYTES,
+    METADATA_BYTES,
+    REPEATED_WRITE_KEY_BYTES,
+    TX_OVERHEAD_BYTES,
+    StateDiffTracer,
+    StateWrite,
+    compressed_value_size,
+    estimate_entry_points,
+    trace_call,
+)
+
+BATTLE_NAME = "Pubdata Battle"
+
+
+@pytest.fixture
+def players(titans):
+    player1 = boa.env.generate_address("player1")
+    player2 = boa.env.generate_address("player2")
+    with boa.env.prank(player1):
+        titans.registerPlayer("Player One", "Token One")
+        titans.createBattle(BATTLE_NAME)
+    with boa.env.prank(player2):
+        titans.registerPlayer("Player Two", "Token Two")
+        titans.joinBattle(BATTLE_NAME)
+    return player1, player2
+
+
+@pytest.mark.parametrize(
+    "before, after, size",
+    [
+        (0, 0x05, 1),  # the new value itself
+        (0x1234, 0, 0),  # cleared
+        (2**255, 2**255 + 7, 1),  # add
+        (2**255 + 7, 2**255, 1),  # sub
+        (0, 2**256 - 1, 1),  # sub wraps around
+        (0, 2**200, 26),
+        (2**255, 2**254, 32),  # none is shorter than the full word
+    ],
+)
+def test_compressed_value_size(before, after, size):
+    assert compressed_value_size(before, after) == size
+
+
+def test_state_write_key_sizes():
+    initial = StateWrite("0x00", 1, 0, 0xFF, initial=True, variable="x")
+    repeated = StateWrite("0x00", 1, 0xFE, 0xFF, initial=False, variable="x")
+    unchanged = StateWrite("0x00", 1, 0xFF, 0xFF, initial=False, variable="x")
+
+    assert initial.pubdata_bytes == INITIAL_WRITE_KEY_BYTES + METADATA_BYTES + 1
+    assert repeated.pubdata_bytes == REPEATED_WRITE_KEY_BYTES + METADATA_BYTES + 1
+    assert unchanged.pubdata_bytes == 0
+
+
+def test_tracer_records_register_player(titans):
+    player = boa.env.generate_address("new player")
+    tracer, gas = trace_call(titans.registerPlayer, "New Player", "Token", sender=player)
+
+    assert gas > 0
+    variables = tracer.by_variable()
+    print(variables)
+    for name in ("players", "gameTokens", "playerInfo", "playerTokenInfo", "_balances"):
+        assert variables[name] > 0
+
+    (player_info,) = [write for write in tracer.changed if write.variable == "playerInfo"]
+    assert player_info.initial and (player_info.before, player_info.after) == (0, 1)
+    assert player_info.pubdata_bytes == INITIAL_WRITE_KEY_BYTES + METADATA_BYTES + 1
+    assert tracer.pubdata_bytes == tracer.storage_bytes + TX_OVERHEAD_BYTES
+
+    # The second player only appends to arrays that already hold values
+    tracer, _ = trace_call(titans.registerPlayer, "Newer Player", "Token", sender=boa.env.generate_address())
+    # The length of a DynArray is stored at its first slot, in front of the elements
+    players_length = min((write for write in tracer.changed if write.variable == "players"), key=lambda write: write.slot)
+    assert not players_length.initial
+    assert players_length.after == players_length.before + 1
+    assert players_length.pubdata_bytes == REPEATED_WRITE_KEY_BYTES + METADATA_BYTES + 1
+
+
+def test_batch_publishes_each_slot_once(titans, players):
+    player1, player2 = players
+    with StateDiffTracer() as batch:
+        first, _ = trace_call(titans.attackOrDefendChoice, 1, BATTLE_NAME, sender=player1)
+        second, _ = trace_call(titans.attackOrDefendChoice, 2, BATTLE_NAME, sender=player2)
+
+    # The first move is reset to zero when the round resolves, so the batch never publishes it
+    first_move = {(write.address, write.slot) for write in first.changed if write.variable == "battles"}
+    assert first_move
+    assert not first_move & {(write.address, write.slot) for write in batch.changed}
+    assert batch.storage_bytes < first.storage_bytes + second.storage_bytes
+
+
+def test_reverted_call_publishes_nothing(titans, players):
+    player1, _ = players
+    with StateDiffTracer() as tracer:
+        with boa.env.prank(player1), boa.reverts():
+            titans.createBattle(BATTLE_NAME)
+    assert tracer.storage_bytes == 0
+
+
+def test_estimate_entry_points():
+    rows, batch = estimate_entry_points()
+    assert [row["entry_point"] for row in rows][:2] == ["registerPlayer", "registerPlayer"]
+    assert all(row["pubdata_bytes"] > TX_OVERHEAD_BYTES for row in rows)
+    # Every registration creates the same player, token and balance slots
+    assert rows[1]["initial_writes"] == rows[0]["initial_writes"]
+    assert batch.pubdata_bytes < sum(row["pubdata_bytes"] for row in rows)
@@ -0,0 +1,252 @@
+import http.client
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import boa
+import pytest
+from eth_account import Account
+
+from script.relayer import (
+    InvalidMove,
+    MoveRelayer,
+    RelayerHTTPServer,
+    move_to_struct,
+    sign_move,
+)
+
+BATTLE_NAME = "Relayed Battle"
+
+
+@pytest.fixture
+def chain_id():
+    return boa.env.evm.chain.chain_id
+
+
+@pytest.fixture
+def accounts(titans):
+    """Two registered players in a started battle, with their signing keys"""
+    player1 = Account.create()
+    player2 = Account.create()
+
+    with boa.env.prank(player1.address):
+        titans.registerPlayer("Player One", "Token One")
+        titans.createBattle(BATTLE_NAME)
+    with boa.env.prank(player2.address):
+        titans.registerPlayer("Player Two", "Token Two")
+        titans.joinBattle(BATTLE_NAME)
+
+    return player1, player2
+
+
+def signed(account, forwarder, chain_id, choice, nonce=0, deadline=None):
+    move = {
+        "player": account.address,
+        "choice": choice,
+        "battleName": BATTLE_NAME,
+        "nonce": nonce,
+        "deadline": deadline or int(time.time()) + 3600,
+    }
+    return sign_move(account.key, forwarder.address, chain_id, move)
+
+
+def test_forwarder_digest_matches_eip712(forwarder, accounts, chain_id):
+    player1, _ = accounts
+    move = signed(player1, forwarder, chain_id, 2)
+
+    digest = forwarder.hashMove(move_to_struct(move))
+    assert Account._recover_hash(digest, vrs=(move["v"], move["r"], move["s"])) == (
+        player1.address
+    )
+
+
+def test_relay_moves_resolves_round(titans, forwarder, accounts, chain_id):
+    player1, player2 = accounts
+    moves = [
+        signed(player1, forwarder, chain_id, 1),
+        signed(player2, forwarder, chain_id, 2),
+    ]
+
+    relayer_eoa = boa.env.generate_address("relayer")
+    with boa.env.prank(relayer_eoa):
+        accepted = forwarder.relayMoves([move_to_struct(move) for move in moves])
+
+    assert accepted == 2
+    assert forwarder.nonces(player1.address) == 1
+    assert titans.getBattleMoves(BATTLE_NAME) == (0, 0), "Round should be resolved"
+    assert titans.getPlayer(player1.address)[2] == 22, "Attacker should pay mana"
+
+
+def test_relay_moves_skips_invalid(titans, forwarder, accounts, chain_id):
+    player1, player2 = accounts
+
+    forged = signed(player2, forwarder, chain_id, 1)
+    forged["player"] = player1.address
+    expired = signed(player2, forwarder, chain_id, 1, deadline=1)
+    valid = signed(player1, forwarder, chain_id, 2)
+
+    batch = [move_to_struct(move) for move in (forged, expired, valid)]
+    assert forwarder.relayMoves(batch) == 1
+    assert titans.getBattleMoves(BATTLE_NAME) == (2, 0)
+
+    # Replaying the same nonce is ignored
+    assert forwarder.relayMoves([move_to_struct(valid)]) == 0
+    assert forwarder.nonces(player1.address) == 1
+
+
+def test_forwarder_only_trusted_by_titans(titans, accounts):
+    player1, _ = accounts
+    impostor = boa.env.generate_address("impostor")
+
+    # Appending a player address only works for the trusted forwarder
+    calldata = titans.attackOrDefendChoice.prepare_calldata(2, BATTLE_NAME)
+    with pytest.raises(Exception):
+        boa.env.raw_call(
+            titans.address,
+            sender=impostor,
+            data=calldata + bytes.fromhex(player1.address[2:]),
+        )
+
+    with boa.env.prank(impostor):
+        with pytest.raises(Exception):
+            titans.setTrustedForwarder(impostor)
+
+
+def test_relayer_batches_and_validates(titans, forwarder, accounts, chain_id):
+    player1, player2 = accounts
+    relayer = MoveRelayer(forwarder, chain_id)
+
+    assert relayer.submit(signed(player1, forwarder, chain_id, 1)) == 0
+    assert relayer.submit(signed(player2, forwarder, chain_id, 1)) == 1
+
+    with pytest.raises(InvalidMove):
+        relayer.submit(signed(player1, forwarder, chain_id, 1))
+    with pytest.raises(InvalidMove):
+        relayer.submit(signed(player1, forwarder, chain_id, 3, nonce=1))
+
+    assert relayer.flush() == 2
+    assert relayer.pending() == 0
+    assert relayer.stats == {"received": 2, "rejected": 2, "relayed": 2, "skipped": 0, "batches": 1, "dropped": 0, "failed": 0}
+
+    # Nonces the forwarder already used are refused
+    with pytest.raises(InvalidMove, match="Nonce already used"):
+        relayer.submit(signed(player1, forwarder, chain_id, 2))
+
+    # Both attacked, so both paid the attack mana
+    assert titans.getPlayer(player1.address)[2] == 22
+    assert titans.getPlayer(player2.address)[2] == 22
+
+
+def test_relayer_keeps_moves_of_a_failed_batch(forwarder, accounts, chain_id):
+    player1, player2 = accounts
+    failures = [RuntimeError("connection reset")]
+
+    def send_batch(moves):
+        if failures:
+            raise failures.pop()
+        return forwarder.relayMoves(moves)
+
+    relayer = MoveRelayer(forwarder, chain_id, send_batch=send_batch)
+    relayer.submit(signed(player1, forwarder, chain_id, 1))
+    relayer.submit(signed(player2, forwarder, chain_id, 1))
+
+    with pytest.raises(RuntimeError, match="connection reset"):
+        relayer.flush()
+    assert relayer.pending() == 2 and relayer.stats["failed"] == 1
+    with pytest.raises(InvalidMove, match="already submitted"):
+        relayer.submit(signed(player1, forwarder, chain_id, 1))
+
+    # The run loop logs the failure and sends the batch again
+    stop = threading.Event()
+    failures.append(RuntimeError("connection reset"))
+    thread = threading.Thread(target=relayer.run, kwargs={"block_time": 0.01, "stop": stop})
+    thread.start()
+    while relayer.stats["relayed"] < 2:
+        time.sleep(0.01)
+    stop.set()
+    thread.join()
+    assert relayer.stats["relayed"] == 2 and relayer.stats["failed"] == 2
+    assert forwarder.nonces(player1.address) == forwarder.nonces(player2.address) == 1
+
+
+def test_relayer_counts_moves_the_forwarder_skipped(forwarder, accounts, chain_id):
+    player1, player2 = accounts
+    relayer = MoveRelayer(forwarder, chain_id)
+    move = signed(player1, forwarder, chain_id, 1)
+    relayer.submit(move)
+    relayer.submit(signed(player2, forwarder, chain_id, 1))
+
+    # Another relayer gets player1's move in first, so the forwarder skips this copy
+    forwarder.relayMoves([move_to_struct(move)])
+    assert relayer.flush() == 1
+    assert relayer.stats["relayed"] == 1 and relayer.stats["skipped"] == 1
+    assert relayer.pending() == 0
+
+
+def test_relayer_sends_a_players_moves_in_nonce_order(titans, forwarder, accounts, chain_id):
+    player1, player2 = accounts
+    relayer = MoveRelayer(forwarder, chain_id)
+
+    # The second move waits for the first one
+    relayer.submit(signed(player1, forwarder, chain_id, 2, nonce=1))
+    assert relayer.flush() is None
+    assert relayer.pending() == 1
+
+    relayer.submit(signed(player1, forwarder, chain_id, 2, nonce=0))
+    relayer.submit(signed(player2, forwarder, chain_id, 2, nonce=0))
+    relayer.flush()
+    assert forwarder.nonces(player1.address) == 2
+    assert relayer.pending() == 0
+
+    # A move stuck behind a missing nonce is dropped once it expires
+    relayer.submit(signed(player2, forwarder, chain_id, 2, nonce=2, deadline=int(time.time()) + 1))
+    time.sleep(1.1)
+    assert relayer.flush() is None
+    assert relayer.pending() == 0 and relayer.stats["dropped"] == 1
+
+
+def test_relayer_http_server(forwarder, accounts, chain_id):
+    player1, _ = accounts
+    relayer = MoveRelayer(forwarder, chain_id)
+    server = RelayerHTTPServer(relayer, port=0)
+    server.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def post(body):
+        request = urllib.request.Request(
+            f"{url}/moves",
+            data=json.dumps(body).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    try:
+        move = signed(player1, forwarder, chain_id, 2)
+        body = {**move, "r": "0x" + move["r"].hex(), "s": "0x" + move["s"].hex()}
+
+        assert post(body) == (202, {"accepted": True, "position": 0})
+        status, reply = post({**body, "choice": 1})
+        assert status == 400 and not reply["accepted"]
+
+        with urllib.request.urlopen(f"{url}/status") as response:
+            assert json.loads(response.read())["pending"] == 1
+
+        for length in ("abc", "-1"):
+            connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+            connection.putrequest("POST", "/moves")
+            connection.putheader("Content-Length", length)
+            connection.endheaders()
+            response = connection.getresponse()
+            assert response.status == 400 and not json.loads(response.read())["accepted"]
+            connection.close()
+
+        assert relayer.flush() == 1
+    finally:
+        server.shutdown()
+    
\ No newline at end of file
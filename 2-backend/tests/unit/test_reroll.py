@@ -0,0 +1,35 @@
+import boa
+
+from script.cache import decode_boa_logs
+from script.migrate import _StateReader
+
+ZERO_ADDRESS = "0x" + "00" * 20
+
+
+def test_reroll_replaces_the_players_token(titans):
+    player1 = boa.env.generate_address("reroll player1")
+    player2 = boa.env.generate_address("reroll player2")
+    with boa.env.prank(player1):
+        titans.registerPlayer("Player One", "Token One")
+    with boa.env.prank(player2):
+        titans.registerPlayer("Player Two", "Token Two")
+    index = titans.playerTokenInfo(player1)
+    reader = _StateReader(titans)
+
+    for round in range(5):
+        old_id = titans.getPlayerToken(player1)[1]
+        boa.env.time_travel(seconds=1)
+        with boa.env.prank(player1):
+            titans.createRandomGameToken(f"Re-roll {round}")
+        logs = decode_boa_logs(titans)
+        new_id = titans.getPlayerToken(player1)[1]
+
+        transfers = [(event["_from"], event["_to"], event["_id"]) for name, event in logs if name == "TransferSingle"]
+        assert transfers == [(str(player1).lower(), ZERO_ADDRESS, old_id), (ZERO_ADDRESS, str(player1).lower(), new_id)]
+        assert reader.balance(str(player1), new_id) == 1
+        assert old_id == new_id or reader.balance(str(player1), old_id) == 0
+
+    # One token per player plus the dummy entry, however often they re-roll
+    assert titans.playerTokenInfo(player1) == index
+    assert [token[0] for token in titans.getAllPlayerTokens()] == ["", "Re-roll 4", "Token Two"]
+    assert titans.getTotalSupply() == 2
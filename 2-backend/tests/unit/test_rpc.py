@@ -0,0 +1,184 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from script.metrics import Metrics
+from script.rpc import RpcError, RpcTransport, TransportError, TransportRPC
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, don't let them wait on delayed ACKs
+    disable_nagle_algorithm = True
+    server: "StandInRpcServer"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            failing = server.fail_requests > 0
+            if failing:
+                server.fail_requests -= 1
+
+        time.sleep(server.latency)
+        if failing:
+            return self._reply(503, b"unavailable")
+
+        request = json.loads(body)
+        calls = request if isinstance(request, list) else [request]
+        with server.lock:
+            server.batch_sizes.append(len(calls))
+        responses = [self._answer(call) for call in calls]
+        self._reply(200, json.dumps(responses if isinstance(request, list) else responses[0]).encode())
+
+    def _answer(self, call):
+        method, params = call["method"], call.get("params", [])
+        if method == "eth_chainId":
+            return {"jsonrpc": "2.0", "id": call["id"], "result": hex(self.server.chain_id)}
+        if method == "echo":
+            return {"jsonrpc": "2.0", "id": call["id"], "result": params}
+        return {"jsonrpc": "2.0", "id": call["id"], "error": {"code": -32601, "message": "Method not found"}}
+
+    def _reply(self, status, payload):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInRpcServer(ThreadingHTTPServer):
+    """Local JSON-RPC node that can inject latency and failures"""
+
+    daemon_threads = True
+
+    def __init__(self, chain_id=300, latency=0.0):
+        super().__init__(("127.0.0.1", 0), _StandInHandler)
+        self.chain_id = chain_id
+        self.latency = latency
+        self.fail_requests = 0
+        self.requests = 0
+        self.connections = 0
+        self.batch_sizes = []
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}/"
+
+
+@pytest.fixture
+def servers():
+    started = [StandInRpcServer(chain_id=300), StandInRpcServer(chain_id=301)]
+    yield started
+    for server in started:
+        server.shutdown()
+        server.server_close()
+
+
+def test_transport_reuses_connections(servers):
+    primary, _ = servers
+    with RpcTransport([primary.url], batch_window=0) as transport:
+        for i in range(20):
+            assert transport.call("echo", [i]) == [i]
+
+    assert primary.requests == 20
+    assert primary.connections == 1, "Calls made one after another share one keep-alive connection"
+
+
+def test_transport_coalesces_concurrent_calls(servers):
+    primary, _ = servers
+    primary.latency = 0.01
+    with RpcTransport([primary.url], batch_window=0.02, max_batch=50) as transport:
+        with ThreadPoolExecutor(max_workers=100) as pool:
+            results = list(pool.map(lambda i: transport.call("echo", [i]), range(100)))
+
+        assert results == [[i] for i in range(100)]
+        print(f"100 concurrent calls sent as batches of {primary.batch_sizes}")
+        assert primary.requests < 100
+        assert max(primary.batch_sizes) <= 50
+        assert transport.stats["calls"] == 100
+
+
+def test_transport_batch_keeps_order_and_errors(servers):
+    primary, _ = servers
+    with RpcTransport([primary.url], max_batch=3) as transport:
+        assert transport.batch([("echo", [i]) for i in range(7)]) == [[i] for i in range(7)]
+        assert sorted(primary.batch_sizes) == [1, 3, 3]
+
+        # Errors are per call and never trigger failover
+        with pytest.raises(RpcError, match="Method not found"):
+            transport.call("eth_unknownMethod")
+        assert transport.call("eth_chainId") == hex(300)
+        assert transport.stats["failovers"] == 0
+
+
+def test_transport_fails_over_and_scores_health(servers):
+    primary, backup = servers
+    primary.fail_requests = 3
+
+    with RpcTransport([primary.url, backup.url], batch_window=0) as transport:
+        # The failing primary is benched, so later calls go straight to the backup
+        assert transport.call("eth_chainId") == hex(301)
+        assert transport.call("eth_chainId") == hex(301)
+        assert transport.stats["failovers"] == 1
+        assert primary.requests == 1
+
+        health = transport.health()
+        assert health[0]["url"] == backup.url
+        assert health[1]["benched"]
+
+        # Once the primary recovers and its cool-down expires it is preferred again
+        primary.fail_requests = 0
+        transport.endpoints[0].benched_until = 0.0
+        transport.endpoints[1].record(False)
+        assert transport.call("eth_chainId") == hex(300)
+
+
+def test_transport_records_metrics(servers):
+    primary, backup = servers
+    primary.fail_requests = 1
+    metrics = Metrics()
+
+    with RpcTransport([primary.url, backup.url], batch_window=0, metrics=metrics) as transport:
+        transport.call("eth_chainId")
+        transport.call("eth_chainId")
+
+    assert metrics.value("zktitans_rpc_failures_total", endpoint="127.0.0.1") == 1
+    assert metrics.value("zktitans_rpc_request_seconds", endpoint="127.0.0.1") == 2
+
+
+def test_transport_raises_when_all_endpoints_fail(servers):
+    primary, backup = servers
+    primary.fail_requests = backup.fail_requests = 10
+
+    with RpcTransport([primary.url, backup.url], batch_window=0) as transport:
+        with pytest.raises(TransportError, match="All 2 RPC endpoints failed"):
+            transport.call("eth_chainId")
+
+
+def test_transport_rpc_speaks_boa_interface(servers):
+    from boa.rpc import RPCError
+
+    primary, backup = servers
+    with RpcTransport([primary.url, backup.url]) as transport:
+        rpc = TransportRPC(transport)
+        assert rpc.fetch("eth_chainId", []) == hex(300)
+        assert rpc.fetch_multi([("echo", [1]), ("echo", [2])]) == [[1], [2]]
+        with pytest.raises(RPCError):
+            rpc.fetch("eth_unknownMethod", [])
+        assert rpc.name == f"http://127.0.0.1:{primary.server_port},http://127.0.0.1:{backup.server_port}"
@@ -0,0 +1,65 @@
+import itertools
+
+import boa
+import pytest
+
+from script.rules import (
+    ATTACK,
+    DEFEND,
+    MAX_ATTACK_DEFEND_STRENGTH,
+    PlayerState,
+    resolve_round,
+    stat_distribution,
+)
+
+
+def test_rules_constants_match_contract(titans):
+    assert titans.MAX_ATTACK_DEFEND_STRENGTH() == MAX_ATTACK_DEFEND_STRENGTH
+
+
+def test_stat_distribution():
+    distribution = stat_distribution()
+    assert sorted(distribution) == list(range(1, MAX_ATTACK_DEFEND_STRENGTH))
+    assert sum(distribution.values()) == pytest.approx(1.0)
+    assert distribution[5] == pytest.approx(2 * distribution[1])
+
+
+@pytest.mark.parametrize(
+    "move1,move2", list(itertools.product([ATTACK, DEFEND], repeat=2))
+)
+def test_resolve_round_matches_contract(titans, move1, move2):
+    player1 = boa.env.generate_address("player1")
+    player2 = boa.env.generate_address("player2")
+
+    with boa.env.prank(player1):
+        titans.registerPlayer("Player One", "Token One")
+        titans.createBattle("Rules Battle")
+    with boa.env.prank(player2):
+        titans.registerPlayer("Player Two", "Token Two")
+        titans.joinBattle("Rules Battle")
+
+    def state(player):
+        player_data = titans.getPlayer(player)
+        return PlayerState(
+            health=player_data[3],
+            mana=player_data[2],
+            attack=titans.getPlayerToken(player)[2],
+        )
+
+    expected = resolve_round(state(player1), state(player2), move1, move2)
+
+    with boa.env.prank(player1):
+        titans.attackOrDefendChoice(move1, "Rules Battle")
+    with boa.env.prank(player2):
+        titans.attackOrDefendChoice(move2, "Rules Battle")
+
+    # Attack strengths are redrawn after the round, health and mana are not
+    for player, expected_state in [(player1, expected.p1), (player2, expected.p2)]:
+        assert titans.getPlayer(player)[3] == expected_state.health
+        assert titans.getPlayer(player)[2] == expected_state.mana
+
+    battle = titans.getBattle("Rules Battle")
+    if expected.winner is None:
+        assert battle[5] == "0x0000000000000000000000000000000000000000"
+    else:
+        assert battle[5] == [player1, player2][expected.winner]
@@ -0,0 +1,77 @@
+import boa
+import pytest
+
+from script.seed import (
+    BATTLE_STATUS_ENDED,
+    BATTLE_STATUS_PENDING,
+    BATTLE_STATUS_STARTED,
+    StorageSeeder,
+    seed_state,
+)
+from script.state_benchmark import ENTRY_POINTS, benchmark_size
+
+
+def test_seeded_state_matches_contract_views(titans):
+    state = seed_state(titans, players=40, battles=60)
+
+    assert len(titans.getAllPlayers()) == 41, "Seeded after the dummy player"
+    assert len(titans.getAllPlayerTokens()) == 41
+    assert len(titans.getAllBattles()) == 60
+    assert titans.getTotalSupply() == 40
+
+    for i, address in enumerate(state.players):
+        player = titans.getPlayer(address)
+        token = titans.getPlayerToken(address)
+        assert titans.isPlayer(address)
+        assert player[0] == address and player[1] == f"Seeded Player {i}"
+        assert token[2] + token[3] == titans.MAX_ATTACK_DEFEND_STRENGTH()
+
+    statuses = [titans.getBattle(name)[0] for name in state.battles]
+    assert statuses.count(BATTLE_STATUS_STARTED) == len(state.started_battles) == 12
+    assert statuses.count(BATTLE_STATUS_PENDING) == 6
+    assert statuses.count(BATTLE_STATUS_ENDED) == 42
+
+    # Players in a started battle are flagged, and in no other started battle
+    fighting = [p for name in state.started_battles for p in titans.getBattle(name)[3]]
+    assert len(set(fighting)) == len(fighting)
+    assert all(titans.getPlayer(p)[4] for p in fighting)
+
+
+def test_seeded_battles_are_playable(titans):
+    state = seed_state(titans, players=10, battles=5, started_fraction=1.0)
+    name = state.started_battles[0]
+    player1, player2 = titans.getBattle(name)[3]
+
+    with boa.env.prank(player1):
+        titans.attackOrDefendChoice(2, name)
+    with boa.env.prank(player2):
+        titans.attackOrDefendChoice(2, name)
+    assert titans.getBattle(name)[4] == [0, 0], "Round resolved"
+
+    # New players and battles append after the seeded ones
+    newcomer = boa.env.generate_address("newcomer")
+    with boa.env.prank(newcomer):
+        titans.registerPlayer("Newcomer", "Token")
+        titans.createBattle("After Seeding")
+    assert titans.playerInfo(newcomer) == 11
+    assert titans.battleInfo("After Seeding") == 6
+
+    with boa.env.prank(player1):
+        titans.quitBattle(name)
+    assert titans.getBattle(name)[5] == player2
+
+
+def test_storage_seeder_respects_caps(titans):
+    seeder = StorageSeeder(titans)
+    assert seeder.slots["players"] < seeder.slots["gameTokens"] < seeder.slots["battles"]
+
+    with pytest.raises(ValueError, match="at most 5000"):
+        seeder.extend("players", [{}] * 5000)
+    assert seeder.writes == 0
+
+
+def test_state_benchmark_runs(titans):
+    rows = benchmark_size(players=20, battles=40)
+    print({row["entry_point"]: row["gas"] for row in rows})
+    assert [row["entry_point"] for row in rows] == ENTRY_POINTS
+    assert all(row["gas"] > 0 for row in rows)
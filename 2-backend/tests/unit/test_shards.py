@@ -0,0 +1,95 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import boa
+import pytest
+
+from script.deploy import deploy_shards
+from script.shards import ShardedTitans, ShardRouter
+
+
+def _addresses(count, label="shard player"):
+    return [boa.env.generate_address(f"{label} {i}") for i in range(count)]
+
+
+def test_router_is_deterministic_and_balanced():
+    shards = _addresses(4, "shard")
+    players = _addresses(2_000)
+    router = ShardRouter(shards)
+
+    assignment = [router.shard_for(player) for player in players]
+    assert assignment == [ShardRouter(shards).shard_for(player) for player in players]
+    counts = [assignment.count(i) for i in range(4)]
+    print(counts)
+    assert all(400 <= count <= 600 for count in counts)
+
+    # Adding a shard only moves players onto the new shard, about a fifth of them
+    grown = ShardRouter(shards + _addresses(1, "new shard"))
+    moved = [i for i, player in enumerate(players) if grown.shard_for(player) != assignment[i]]
+    assert all(grown.shard_for(players[i]) == 4 for i in moved)
+    assert 300 <= len(moved) <= 500
+
+    with pytest.raises(ValueError):
+        ShardRouter([])
+
+
+def test_router_save_and_load(tmp_path):
+    router = ShardRouter(_addresses(3, "shard"))
+    router.save(tmp_path / "shards.json")
+    assert ShardRouter.load(tmp_path / "shards.json").addresses == router.addresses
+
+
+def test_sharded_reads_merge_across_shards(metadata_uri):
+    shards = deploy_shards(metadata_uri, 3)
+    assert all(forwarder.titans() == titans.address for titans, forwarder in shards)
+    sharded = ShardedTitans([titans for titans, _ in shards])
+
+    players = _addresses(12)
+    for i, player in enumerate(players):
+        with boa.env.prank(player):
+            sharded.shard_for(player).registerPlayer(f"Shard Player {i}", "Token")
+
+    # Pair up players of the same shard for a battle on that shard
+    by_shard = {}
+    for player in players:
+        by_shard.setdefault(sharded.router.shard_for(player), []).append(player)
+    for index, members in by_shard.items():
+        if len(members) >= 2:
+            with boa.env.prank(members[0]):
+                sharded.shards[index].createBattle("Shard Battle")
+            with boa.env.prank(members[1]):
+                sharded.shards[index].joinBattle("Shard Battle")
+
+    assert sorted(p.playerName for p in sharded.getAllPlayers()) == sorted(f"Shard Player {i}" for i in range(12))
+    assert sharded.getTotalSupply() == 12
+    for player in players:
+        assert sharded.locate(player) == sharded.router.shard_for(player)
+        assert sharded.getPlayer(player).playerAddress == player
+        assert sharded.getPlayerToken(player).name == "Token"
+
+    found = sharded.findBattle("Shard Battle")
+    assert [index for index, _ in found] == sorted(i for i, members in by_shard.items() if len(members) >= 2)
+    assert all(battle.players[0] == by_shard[index][0] for index, battle in found)
+    assert [index for index, _ in sharded.getAllBattles()] == [index for index, _ in found]
+
+    stranger = boa.env.generate_address("stranger")
+    assert not sharded.isPlayer(stranger)
+    with pytest.raises(KeyError):
+        sharded.getPlayer(stranger)
+
+
+def test_players_registered_before_resharding_are_found(metadata_uri):
+    (first, _), (second, _) = deploy_shards(metadata_uri, 2)
+    sharded = ShardedTitans([second, first])
+    # A player registered on the first shard whom the grown shard list routes elsewhere
+    veteran = next(p for p in _addresses(20, "veteran") if sharded.router.shard_for(p) == 0)
+    with boa.env.prank(veteran):
+        first.registerPlayer("Veteran", "Token")
+
+    assert sharded.locate(veteran) == 1
+    assert sharded.getPlayer(veteran).playerName == "Veteran"
+
+    # Fan-out through an executor gives the same results
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        concurrent = ShardedTitans([second, first], executor=executor)
+        assert concurrent.locate(veteran) == 1
+        assert concurrent.getTotalSupply() == sharded.getTotalSupply() == 1
@@ -0,0 +1,133 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import boa
+import pytest
+
+from script.seed import seed_state
+from script.snapshot import SnapshotError, StaleSnapshotError, cached_env, dump_snapshot, load_snapshot, snapshot_path
+
+PROJECT_DIR = Path(__file__).parent.parent.parent
+
+# Loads a snapshot in a fresh interpreter, reads a battle from it and reports how many
+# storage slots that took from the file
+LOAD_JOB = """
+import json, sys
+import boa
+from script import snapshot
+lookups = set()
+lookup = snapshot._SnapshotFile.lookup
+snapshot._SnapshotFile.lookup = lambda self, key: lookups.add(key) or lookup(self, key)
+deployers = {name: boa.load_partial(f"contracts/{name}.vy") for name in ("zkTitans", "MoveForwarder")}
+env, contracts = snapshot.load_snapshot(sys.argv[1], deployers)
+loaded = len(lookups)
+with boa.swap_env(env):
+    battle = contracts["zkTitans"].getBattle("Snapshot Battle")
+slots = snapshot._SnapshotFile(sys.argv[1]).metadata["slot_count"]
+print(json.dumps({"moves": battle[4], "loaded": loaded, "read": len(lookups), "slots": slots}))
+"""
+
+
+@pytest.fixture
+def deployers(titans, forwarder):
+    return {"zkTitans": titans.deployer, "MoveForwarder": forwarder.deployer}
+
+
+@pytest.fixture
+def snapshot(titans, forwarder, tmp_path):
+    """A snapshot of seeded state with a battle in progress"""
+    seed_state(titans, players=50, battles=40)
+    player1 = boa.env.generate_address("snapshot player1")
+    player2 = boa.env.generate_address("snapshot player2")
+    with boa.env.prank(player1):
+        titans.registerPlayer("Player One", "Token One")
+        titans.createBattle("Snapshot Battle")
+    with boa.env.prank(player2):
+        titans.registerPlayer("Player Two", "Token Two")
+        titans.joinBattle("Snapshot Battle")
+    with boa.env.prank(player1):
+        titans.attackOrDefendChoice(2, "Snapshot Battle")
+
+    path = tmp_path / "state.snapshot"
+    dump_snapshot(path, {"zkTitans": titans, "MoveForwarder": forwarder})
+    return path, player2
+
+
+def test_snapshot_restores_state(titans, forwarder, deployers, snapshot):
+    path, player2 = snapshot
+    block = (boa.env.evm.patch.block_number, boa.env.evm.patch.timestamp)
+    env, contracts = load_snapshot(path, deployers)
+    loaded = contracts["zkTitans"]
+
+    with boa.swap_env(env):
+        assert loaded.address == titans.address
+        assert loaded.getAllPlayers() == titans.getAllPlayers()
+        assert loaded.getAllPlayerTokens() == titans.getAllPlayerTokens()
+        assert loaded.getAllBattles() == titans.getAllBattles()
+        assert loaded.TOTAL_SUPPLY() == titans.TOTAL_SUPPLY()
+        assert loaded.trustedForwarder() == contracts["MoveForwarder"].address == forwarder.address
+        assert (boa.env.evm.patch.block_number, boa.env.evm.patch.timestamp) == block
+
+        # The battle carries on in the loaded environment only, and reverts like any other state
+        with boa.env.anchor():
+            with boa.env.prank(player2):
+                loaded.attackOrDefendChoice(2, "Snapshot Battle")
+            assert loaded.getBattle("Snapshot Battle")[4] == [0, 0]
+        assert loaded.getBattle("Snapshot Battle")[4] == [2, 0]
+        with boa.env.prank(player2):
+            loaded.attackOrDefendChoice(2, "Snapshot Battle")
+
+        # A loaded environment can be written to a snapshot of its own
+        dump_snapshot(path.with_name("again.snapshot"), contracts)
+
+    assert titans.getBattle("Snapshot Battle")[4] == [2, 0]
+    env, contracts = load_snapshot(path.with_name("again.snapshot"), deployers)
+    with boa.swap_env(env):
+        assert contracts["zkTitans"].getBattle("Snapshot Battle")[4] == [0, 0]
+        assert contracts["zkTitans"].getAllPlayers() == titans.getAllPlayers()
+
+
+def test_stale_snapshot_is_rejected(deployers, snapshot, tmp_path):
+    path, _ = snapshot
+    swapped = {"zkTitans": deployers["MoveForwarder"], "MoveForwarder": deployers["zkTitans"]}
+
+    with pytest.raises(StaleSnapshotError, match="different build of"):
+        load_snapshot(path, swapped)
+    with pytest.raises(SnapshotError, match="No deployer for MoveForwarder"):
+        load_snapshot(path, {"zkTitans": deployers["zkTitans"]})
+    assert snapshot_path("state", swapped, tmp_path) != snapshot_path("state", deployers, tmp_path)
+
+    (tmp_path / "other.snapshot").write_bytes(b"not a snapshot")
+    with pytest.raises(SnapshotError, match="is not a snapshot"):
+        load_snapshot(tmp_path / "other.snapshot", deployers)
+
+
+def test_cached_env_builds_once(deployers, tmp_path):
+    builds = []
+
+    def build():
+        titans = deployers["zkTitans"].deploy("", False)
+        seed_state(titans, players=10, battles=5)
+        builds.append(titans)
+        return {"zkTitans": titans}
+
+    for _ in range(2):
+        env, contracts = cached_env("cached", build, {"zkTitans": deployers["zkTitans"]}, tmp_path)
+        with boa.swap_env(env):
+            assert len(contracts["zkTitans"].getAllPlayers()) == 11
+    assert len(builds) == 1
+    assert [path.name for path in tmp_path.iterdir()] == [snapshot_path("cached", {"zkTitans": deployers["zkTitans"]}, tmp_path).name]
+
+
+def test_snapshot_loads_in_another_process(titans, snapshot):
+    path, _ = snapshot
+    result = subprocess.run(
+        [sys.executable, "-c", LOAD_JOB, str(path)], cwd=PROJECT_DIR, capture_output=True, text=True, check=True
+    )
+    report = json.loads(result.stdout.splitlines()[-1])
+    assert report["moves"] == [2, 0]
+    # Loading reads no storage, and the battle read touches its own slots, not the whole file
+    assert report["loaded"] == 0
+    assert 0 < report["read"] < report["slots"] // 10
\ No newline at end of file
@@ -0,0 +1,90 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from script.rules import ATTACK, DEFEND, PlayerState, resolve_round, stat_distribution
+from script.solver import PolicyTable, build_table, solve, solve_matrix_games
+
+MAX_HEALTH = 3
+
+
+@pytest.fixture(scope="module")
+def solution():
+    return solve(max_health=MAX_HEALTH)
+
+
+def test_solve_matrix_games():
+    # Matching pennies has no saddle point
+    value, p1, p2 = solve_matrix_games(1.0, 0.0, 0.0, 1.0, True, True)
+    assert value == pytest.approx(0.5)
+    assert p1 == pytest.approx(0.5) and p2 == pytest.approx(0.5)
+
+    # Attacking dominates for player 1
+    value, p1, p2 = solve_matrix_games(0.9, 0.8, 0.2, 0.1, True, True)
+    assert value == pytest.approx(0.8)
+    assert p1 == 1.0 and p2 == 0.0
+
+    # Without mana player 1 can only defend
+    value, p1, p2 = solve_matrix_games(0.9, 0.8, 0.2, 0.1, False, True)
+    assert value == pytest.approx(0.1)
+    assert p1 == 0.0 and p2 == 0.0
+
+
+def test_solver_finds_forced_win(solution):
+    value, p1_attack, _ = solution
+    # Player 2 has 1 health and no mana, player 1 attacks with 9 through 5 defense
+    assert value[2, 1, 3, 0, 9 - 1, 5 - 1] == pytest.approx(1.0)
+    assert p1_attack[2, 1, 3, 0, 9 - 1, 5 - 1] == 1.0
+
+
+def test_solver_satisfies_bellman_equation(solution):
+    """Every solved state's value is the game value of one more round under the rules"""
+    value, _, _ = solution
+    distribution = stat_distribution()
+    rng = np.random.default_rng(0)
+
+    def expected_value(p1, p2):
+        return sum(
+            pa * pb * value[p1.health, p2.health, p1.mana, p2.mana, a - 1, b - 1]
+            for (a, pa), (b, pb) in itertools.product(distribution.items(), repeat=2)
+        )
+
+    for _ in range(50):
+        h1, h2 = rng.integers(1, MAX_HEALTH + 1, size=2)
+        m1, m2 = rng.integers(0, 26, size=2)
+        a1, a2 = rng.integers(1, 10, size=2)
+        p1 = PlayerState(int(h1), int(m1), int(a1))
+        p2 = PlayerState(int(h2), int(m2), int(a2))
+
+        payoffs = []
+        for move1, move2 in itertools.product([ATTACK, DEFEND], repeat=2):
+            result = resolve_round(p1, p2, move1, move2)
+            if result.winner is not None:
+                payoffs.append(1.0 if result.winner == 0 else 0.0)
+            else:
+                payoffs.append(expected_value(result.p1, result.p2))
+
+        expected, _, _ = solve_matrix_games(
+            *payoffs, p1.mana >= 3, p2.mana >= 3
+        )
+        assert value[h1, h2, m1, m2, a1 - 1, a2 - 1] == pytest.approx(
+            float(expected), abs=1e-6
+        )
+
+
+def test_policy_table_round_trip(tmp_path):
+    table = PolicyTable(build_table(max_health=2))
+    path = tmp_path / "policy.npy"
+    table.save(path)
+
+    loaded = PolicyTable.load(path)
+    assert isinstance(loaded.table, np.memmap)
+    assert np.array_equal(loaded.table, table.table)
+
+    own, opponent = (2, 3, 9), (1, 0, 5)
+    assert loaded.win_chance(0, own, opponent) == pytest.approx(1.0)
+    assert loaded.win_chance(1, opponent, own) == pytest.approx(0.0)
+    assert loaded.best_move(0, own, opponent) == ATTACK
+    # Without mana the only move is to defend
+    assert loaded.best_move(1, opponent, own) == DEFEND
@@ -515,13 +515,13 @@ def test_get_total_supply(titans):
     print(f"- Supply after three registrations: {supply_after_three}")
     assert supply_after_three == supply_after_one + 2, "Supply should increase by 2"
 
-    # Case 4: After creating additional token
+    # Case 4: After re-rolling a token (old card burnt, new one minted)
     with boa.env.prank(player1):
         titans.createRandomGameToken("Token Four")
 
     final_supply = titans.getTotalSupply()
-    print(f"- Final supply after additional token: {final_supply}")
-    assert final_supply == supply_after_three + 1, "Supply should increase by 1"
+    print(f"- Final supply after re-rolled token: {final_supply}")
+    assert final_supply == supply_after_three, "Supply should stay the same"
 
     print("All getTotalSupply cases passed successfully!")
 
@@ -1122,42 +1122,44 @@ def test_attack_or_defend_choice(titans):
     print(f"P1 state after move: {p1_data_after_move}")
     print(f"P2 state after move: {p2_data_after_move}")
 
-    # Player 2 defends
+    # Player 2 defends, completing the round
     with boa.env.prank(player2):
         titans.attackOrDefendChoice(2, battle_name)
 
+    # The second move resolves the round immediately and resets the moves
     battle_after_p2 = titans.getBattleState(battle_name)
-    assert battle_after_p2[4][1] == 2, "Player2 defense move not registered"
-    print("✓ Player2 defense move registered")
+    assert battle_after_p2[4] == [0, 0], "Round should be resolved on second move"
+    print("✓ Player2 defense move registered and round resolved")
 
-    # Get states before resolution
-    p1_before_resolution = titans.players(titans.playerInfo(player1))
-    p2_before_resolution = titans.players(titans.playerInfo(player2))
-    print(f"P1 before resolution: {p1_before_resolution}")
-    print(f"P2 before resolution: {p2_before_resolution}")
+    p1_after_round = titans.players(titans.playerInfo(player1))
+    p2_after_round = titans.players(titans.playerInfo(player2))
+    print(f"P1 after round: {p1_after_round}")
+    print(f"P2 after round: {p2_after_round}")
 
-    # Resolve battle
+    # Verify state changes after resolution
+    assert (
+        p1_after_round[2] == p1_data_after_move[2] - 3
+    ), "Player1 mana should decrease by the attack cost"
+    assert p2_after_round[2] == min(
+        p2_data_after_move[2] + 3, 25
+    ), "Player2 mana should increase by the defense bonus, capped at 25"
+    print("✓ Player1 mana decreased (attack cost)")
+    print("✓ Player2 mana increased (defense bonus)")
+
+    # Resolving again must not replay the round
     with boa.env.prank(player1):
         titans.checkBattleResolution(battle_name)
 
-    # Get final states
     p1_after_resolution = titans.players(titans.playerInfo(player1))
     p2_after_resolution = titans.players(titans.playerInfo(player2))
-    print(f"P1 after resolution: {p1_after_resolution}")
-    print(f"P2 after resolution: {p2_after_resolution}")
+    assert p1_after_resolution == p1_after_round, "Round should not be replayed"
+    assert p2_after_resolution == p2_after_round, "Round should not be replayed"
 
-    # Verify state changes after resolution
-    assert (
-        p1_after_resolution[2] != p1_before_resolution[2]
-    ), "Player1 mana should change"
-    assert (
-        p2_after_resolution[2] != p2_before_resolution[2]
-    ), "Player2 mana should change"
-
-    if p1_before_resolution[2] > p1_after_resolution[2]:
-        print("✓ Player1 mana decreased (attack cost)")
-    if p2_before_resolution[2] < p2_after_resolution[2]:
-        print("✓ Player2 mana increased (defense bonus)")
+    # Next round can be played
+    with boa.env.prank(player1):
+        titans.attackOrDefendChoice(2, battle_name)
+    assert titans.getBattleState(battle_name)[4][0] == 2, "Next round move not registered"
+    print("✓ Next round move registered")
 
     print("\nAll attackOrDefendChoice functionality verified successfully!")
 
@@ -1327,3 +1329,330 @@ def test_attack_or_defend_choice(titans):
 #     ), "One player should have lost all health"
 
 #     print("\nAll battle scenarios tested successfully!")
+
+
+def test_queue_for_battle(titans):
+    """Test matchmaking queue pairing"""
+    print("\nTesting queueForBattle function")
+
+    player1 = boa.env.generate_address("player1")
+    player2 = boa.env.generate_address("player2")
+    player3 = boa.env.generate_address("player3")
+
+    # Case 1: Unregistered player cannot queue
+    with boa.env.prank(player1):
+        with pytest.raises(Exception):
+            titans.queueForBattle("Queue Battle")
+    print("- Unregistered player error caught successfully")
+
+    with boa.env.prank(player1):
+        titans.registerPlayer("Player One", "Token One")
+    with boa.env.prank(player2):
+        titans.registerPlayer("Player Two", "Token Two")
+    with boa.env.prank(player3):
+        titans.registerPlayer("Player Three", "Token Three")
+
+    # Case 2: First player waits in a new pending battle
+    with boa.env.prank(player1):
+        battle = titans.queueForBattle("Queue Battle")
+    print(f"- Queued battle: {battle}")
+    assert battle[0] == BATTLE_STATUS_PENDING, "Queued battle should be PENDING"
+    assert battle[3][0] == player1, "Player 1 should be waiting"
+    assert titans.queuedBattle(player1) == titans.battleInfo("Queue Battle")
+    assert titans.matchQueueTail() - titans.matchQueueHead() == 1
+
+    # Case 3: Player cannot queue twice
+    with boa.env.prank(player1):
+        with pytest.raises(Exception):
+            titans.queueForBattle("Second Queue Battle")
+    print("- Double queue error caught successfully")
+
+    # Case 4: Second player is paired with the oldest waiting player
+    with boa.env.prank(player2):
+        battle = titans.queueForBattle("Unused Name")
+    print(f"- Paired battle: {battle}")
+    assert battle[0] == BATTLE_STATUS_STARTED, "Paired battle should be STARTED"
+    assert battle[2] == "Queue Battle", "Should join the waiting battle"
+    assert battle[3][0] == player1 and battle[3][1] == player2
+    assert not titans.isBattle("Unused Name"), "No new battle should be created"
+    assert titans.matchQueueTail() == titans.matchQueueHead(), "Queue should be empty"
+    assert titans.getPlayer(player1)[4] and titans.getPlayer(player2)[4]
+
+    # Case 5: Player already in battle cannot queue
+    with boa.env.prank(player2):
+        with pytest.raises(Exception):
+            titans.queueForBattle("Another Battle")
+    print("- Already in battle error caught successfully")
+
+    print("All queueForBattle cases passed successfully!")
+
+
+def test_queue_for_battle_skips_stale_entries(titans):
+    """Test that joined or quit battles are skipped by the matchmaking queue"""
+    player1 = boa.env.generate_address("player1")
+    player2 = boa.env.generate_address("player2")
+    player3 = boa.env.generate_address("player3")
+    player4 = boa.env.generate_address("player4")
+
+    for player, name in [
+        (player1, "Player One"),
+        (player2, "Player Two"),
+        (player3, "Player Three"),
+        (player4, "Player Four"),
+    ]:
+        with boa.env.prank(player):
+            titans.registerPlayer(name, "Token")
+
+    # Player 1 waits in the queue
+    with boa.env.prank(player1):
+        titans.queueForBattle("Stale Battle")
+
+    # Player 1 quits the waiting battle, leaving a stale queue entry
+    with boa.env.prank(player1):
+        titans.quitBattle("Stale Battle")
+
+    with boa.env.prank(player2):
+        waiting = titans.queueForBattle("Fresh Battle")
+    assert waiting[0] == BATTLE_STATUS_PENDING, "Stale entry should be skipped"
+    assert waiting[3][0] == player2
+
+    # Player 3 joins player 2's battle directly, then player 4 queues
+    with boa.env.prank(player3):
+        titans.joinBattle("Fresh Battle")
+    with boa.env.prank(player4):
+        battle = titans.queueForBattle("Player Four Battle")
+
+    print(f"- Battle after skipping stale entries: {battle}")
+    assert battle[0] == BATTLE_STATUS_PENDING, "Joined entry should be skipped"
+    assert battle[2] == "Player Four Battle"
+    assert titans.matchQueueTail() - titans.matchQueueHead() == 1
+
+
+def test_queue_for_battle_cancels_stale_pending_battle(titans):
+    """Test that a creator whose queued battle was skipped can queue again"""
+    player1 = boa.env.generate_address("player1")
+    player2 = boa.env.generate_address("player2")
+    player3 = boa.env.generate_address("player3")
+
+    for player, name in [
+        (player1, "Player One"),
+        (player2, "Player Two"),
+        (player3, "Player Three"),
+    ]:
+        with boa.env.prank(player):
+            titans.registerPlayer(name, "Token")
+
+    # Player 1 waits in the queue, then joins player 2's battle directly
+    with boa.env.prank(player1):
+        titans.queueForBattle("Waiting Battle")
+    with boa.env.prank(player2):
+        titans.createBattle("Direct Battle")
+    with boa.env.prank(player1):
+        titans.joinBattle("Direct Battle")
+
+    # Player 3 skips the stale entry, which cancels player 1's waiting battle
+    with boa.env.prank(player3):
+        waiting = titans.queueForBattle("Player Three Battle")
+    assert waiting[0] == BATTLE_STATUS_PENDING
+    assert waiting[3][0] == player3
+    assert titans.getBattle("Waiting Battle")[0] == BATTLE_STATUS_ENDED
+    assert titans.queuedBattle(player1) == 0
+    assert titans.getPlayer(player1)[4], "Player 1 should stay in the direct battle"
+
+    # Once the direct battle is over, player 1 queues again and is paired with player 3
+    with boa.env.prank(player1):
+        titans.quitBattle("Direct Battle")
+        battle = titans.queueForBattle("Unused Name")
+    assert battle[0] == BATTLE_STATUS_STARTED
+    assert battle[2] == "Player Three Battle"
+    assert battle[3][0] == player3 and battle[3][1] == player1
+
+
+def test_batch_attack_or_defend_choice(titans):
+    """Test submitting moves for several battles at once"""
+    creator = boa.env.generate_address("creator")
+    opponent1 = boa.env.generate_address("opponent1")
+    opponent2 = boa.env.generate_address("opponent2")
+
+    for player, name in [
+        (creator, "Creator"),
+        (opponent1, "Opponent One"),
+        (opponent2, "Opponent Two"),
+    ]:
+        with boa.env.prank(player):
+            titans.registerPlayer(name, "Token")
+
+    # The creator hosts two battles at once
+    with boa.env.prank(creator):
+        titans.createBattle("Battle One")
+        titans.createBattle("Battle Two")
+    with boa.env.prank(opponent1):
+        titans.joinBattle("Battle One")
+    with boa.env.prank(opponent2):
+        titans.joinBattle("Battle Two")
+
+    # Mismatched lengths are rejected
+    with boa.env.prank(creator):
+        with pytest.raises(Exception):
+            titans.batchAttackOrDefendChoice([2], ["Battle One", "Battle Two"])
+
+    with boa.env.prank(creator):
+        titans.batchAttackOrDefendChoice([2, 1], ["Battle One", "Battle Two"])
+
+    assert titans.getBattleMoves("Battle One") == (2, 0)
+    assert titans.getBattleMoves("Battle Two") == (1, 0)
+
+    # One invalid move reverts the whole batch
+    with boa.env.prank(creator):
+        with pytest.raises(Exception):
+            titans.batchAttackOrDefendChoice([2, 2], ["Battle One", "Battle Two"])
+
+
+def test_resolve_battles(titans):
+    """Test keeper-driven bulk resolution and timeouts"""
+    player1 = boa.env.generate_address("player1")
+    player2 = boa.env.generate_address("player2")
+    player3 = boa.env.generate_address("player3")
+    player4 = boa.env.generate_address("player4")
+
+    for player, name in [
+        (player1, "Player One"),
+        (player2, "Player Two"),
+        (player3, "Player Three"),
+        (player4, "Player Four"),
+    ]:
+        with boa.env.prank(player):
+            titans.registerPlayer(name, "Token")
+
+    with boa.env.prank(player1):
+        titans.createBattle("Abandoned Battle")
+    with boa.env.prank(player2):
+        titans.joinBattle("Abandoned Battle")
+    with boa.env.prank(player3):
+        titans.createBattle("Half Played Battle")
+    with boa.env.prank(player4):
+        titans.joinBattle("Half Played Battle")
+    with boa.env.prank(player3):
+        titans.attackOrDefendChoice(2, "Half Played Battle")
+
+    abandoned_id = titans.battleInfo("Abandoned Battle")
+    half_played_id = titans.battleInfo("Half Played Battle")
+
+    # Nothing to do before the timeout; unknown ids are skipped
+    ids, total = titans.getResolvableBattles(0, 100)
+    assert ids == [] and total == 2
+    keeper = boa.env.generate_address("keeper")
+    with boa.env.prank(keeper):
+        assert titans.resolveBattles([abandoned_id, half_played_id, 0, 99]) == 0
+
+    boa.env.time_travel(seconds=titans.MOVE_TIMEOUT())
+
+    ids, _ = titans.getResolvableBattles(0, 100)
+    assert ids == [abandoned_id, half_played_id]
+
+    with boa.env.prank(keeper):
+        assert titans.resolveBattles(ids) == 2
+
+    abandoned = titans.getBattle("Abandoned Battle")
+    half_played = titans.getBattle("Half Played Battle")
+    assert abandoned[0] == BATTLE_STATUS_ENDED
+    assert abandoned[5] == ZERO_ADDRESS, "Nobody moved, so nobody wins"
+    assert half_played[0] == BATTLE_STATUS_ENDED
+    assert half_played[5] == player3, "The player who moved wins"
+    assert not titans.getPlayer(player1)[4] and not titans.getPlayer(player4)[4]
+
+    # Ended battles are skipped
+    with boa.env.prank(keeper):
+        assert titans.resolveBattles(ids) == 0
+
+
+def test_version_stamps(titans):
+    """Test that battles and players are stamped with the block of their last change"""
+    player1 = boa.env.generate_address("player1")
+    player2 = boa.env.generate_address("player2")
+
+    with boa.env.prank(player1):
+        titans.registerPlayer("Player One", "Token One")
+    with boa.env.prank(player2):
+        titans.registerPlayer("Player Two", "Token Two")
+    with boa.env.prank(player1):
+        titans.createBattle("Delta Battle")
+
+    battle_id = titans.battleInfo("Delta Battle")
+    index1, index2 = titans.playerInfo(player1), titans.playerInfo(player2)
+    registered = boa.env.evm.patch.block_number
+    assert titans.battleVersion(battle_id) == registered
+    assert titans.playerVersion(index1) == titans.playerVersion(index2) == registered
+
+    # Joining changes the battle and both players
+    boa.env.time_travel(blocks=1)
+    with boa.env.prank(player2):
+        titans.joinBattle("Delta Battle")
+    joined = boa.env.evm.patch.block_number
+    assert titans.battleVersion(battle_id) == joined
+    assert titans.playerVersion(index1) == titans.playerVersion(index2) == joined
+
+    # A one-sided move only changes the battle
+    boa.env.time_travel(blocks=1)
+    with boa.env.prank(player1):
+        titans.attackOrDefendChoice(2, "Delta Battle")
+    assert titans.battleVersion(battle_id) == joined + 1
+    assert titans.playerVersion(index1) == titans.playerVersion(index2) == joined
+
+    # Resolving the round changes the battle and both players' stats
+    boa.env.time_travel(blocks=1)
+    with boa.env.prank(player2):
+        titans.attackOrDefendChoice(2, "Delta Battle")
+    assert titans.battleVersion(battle_id) == joined + 2
+    assert titans.playerVersion(index1) == titans.playerVersion(index2) == joined + 2
+
+    # A client that synced at `joined` only has to refetch what is stamped later
+    changed = [index for index in (index1, index2) if titans.playerVersion(index) > joined]
+    assert changed == [index1, index2]
+
+
+def test_get_changes_since(titans):
+    """Test that getChangesSince only returns what changed after the given block"""
+    players = [boa.env.generate_address(f"player{i}") for i in range(4)]
+    for i, player in enumerate(players):
+        with boa.env.prank(player):
+            titans.registerPlayer(f"Player {i}", f"Token {i}")
+
+    with boa.env.prank(players[0]):
+        titans.createBattle("Changed Battle")
+    with boa.env.prank(players[1]):
+        titans.joinBattle("Changed Battle")
+    with boa.env.prank(players[2]):
+        titans.createBattle("Quiet Battle")
+    with boa.env.prank(players[3]):
+        titans.joinBattle("Quiet Battle")
+
+    synced = boa.env.evm.patch.block_number
+    everything = titans.getChangesSince(0, 0, titans.MAX_BATTLE_PAGE())
+    assert everything[0] == [titans.battleInfo("Changed Battle"), titans.battleInfo("Quiet Battle")]
+    assert [player[0] for player in everything[2]] == players
+    assert everything[4] == 4
+
+    # A one-sided move changes one battle and no player
+    boa.env.time_travel(blocks=1)
+    with boa.env.prank(players[0]):
+        titans.attackOrDefendChoice(2, "Changed Battle")
+    ids, battles, changed_players, tokens, total = titans.getChangesSince(synced, 0, titans.MAX_BATTLE_PAGE())
+    assert ids == [titans.battleInfo("Changed Battle")]
+    assert battles[0][2] == "Changed Battle" and battles[0][4][0] == 2
+    assert changed_players == [] and tokens == []
+    assert total == 4
+
+    # Resolving the round also changes its two players, returned with their game tokens
+    boa.env.time_travel(blocks=1)
+    with boa.env.prank(players[1]):
+        titans.attackOrDefendChoice(2, "Changed Battle")
+    ids, battles, changed_players, tokens, total = titans.getChangesSince(synced, 0, titans.MAX_BATTLE_PAGE())
+    assert ids == [titans.battleInfo("Changed Battle")]
+    assert [player[0] for player in changed_players] == players[:2]
+    assert [token[0] for token in tokens] == ["Token 0", "Token 1"]
+
+    # Pages only scan their window of indexes
+    ids, battles, changed_players, tokens, total = titans.getChangesSince(synced, 1, 1)
+    assert ids == [] and battles == []
+    assert [player[0] for player in changed_players] == [players[1]]